@@ -13,7 +13,14 @@ from pyutils.utils import synchronize_time
 from mdtpy import connect
 
 from welder import ElectricCurrentMeasure, read_measures_from_csv
-from welder.database_utils import open_connection, create_ampere_log_table_if_absent, log_measure
+from welder.database_utils import ReconnectingConnection, create_ampere_log_table_if_absent, log_measures, \
+                                  log_compressed_measures, create_ampere_pyramid_table_if_absent, \
+                                  log_ampere_summaries
+from welder.pyramid import AmperePyramid
+from welder.compression import AmpereCompressor
+from welder.replay import ReplayScheduler
+from welder.ingest import IngestStage, reorder
+from welder.spool import Spool, SpoolDrainer
 
 DATABASE_PARAMS = {
     'dbname': 'mdt_app',
@@ -30,45 +37,82 @@ logger = logging.getLogger('append_ampere_record')
 def define_args(parser):
     parser.add_argument("files", nargs='+', help="CSV files to be merged")
     parser.add_argument("--interval", type=float, default=1, help="Interval in seconds")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="원래 측정 시각의 간격을 이 배율로 빠르게 재생 (지정하면 --interval은 무시)")
     parser.add_argument("--sync", action='store_true', default=False)
+    parser.add_argument("--spool-dir", default="spool/append_ampere_record",
+                        help="데이터베이스 기록을 임시 저장할 로컬 spool 디렉토리")
+    parser.add_argument("--drain-timeout", type=float, default=10, help="종료 전 spool 반영 대기 시간(초)")
+    parser.add_argument("--no-compression", action='store_true', default=False,
+                        help="대기 구간의 전류 값을 압축하지 않고 모두 저장")
+    parser.add_argument("--error", type=float, default=0.2, help="swinging-door 압축의 허용 오차(A)")
+    parser.add_argument("--deadband", type=float, default=0.2, help="변화가 없는 것으로 간주하는 전류 변화량(A)")
   
 def get_utc_millis(measure:ElectricCurrentMeasure):
     return round(measure.timestamp.timestamp() * 1000)
 
+def create_tables_if_absent(conn) -> None:
+    create_ampere_log_table_if_absent(conn)
+    create_ampere_pyramid_table_if_absent(conn)
+
 def run(args):
     readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
     measures = heapq.merge(*readers, key=lambda m: m.timestamp)
-    measures = compact(measures)
+    # 여러 파일에 겹쳐 있는 같은 시각의 측정값은 한 번만 사용한다.
+    ingest = IngestStage()
+    measures = reorder(measures, ingest)
+    scheduler = None
     if args.sync:
         measures = synchronize_time(measures, utc_millis=get_utc_millis)
     else:
-        measures = emulate_measure(measures, args.interval)
+        scheduler = ReplayScheduler(speed=args.speed or 1.0)
+        scheduler.add_stream(0, measures, interval=None if args.speed else args.interval)
+        measures = scheduler.measures()
 
-    # 데이터베이스에 연결하고, 전류 로그 테이블이 없으면 생성한다.
-    with open_connection(DATABASE_PARAMS) as conn:
-        create_ampere_log_table_if_absent(conn)
-        
+    # 전류 값은 로컬 spool에 먼저 기록하고, 백그라운드 drainer가 데이터베이스에 일괄로 저장한다.
+    # 데이터베이스에 연결될 때 전류 로그 테이블과 요약 피라미드 테이블이 없으면 생성한다.
+    db = ReconnectingConnection(DATABASE_PARAMS, on_connect=create_tables_if_absent)
+    spool = Spool(args.spool_dir)
+    drainer = SpoolDrainer(spool, { 'ampere': db.handler(log_measures),
+                                    'ampere_point': db.handler(log_compressed_measures),
+                                    'ampere_summary': db.handler(log_ampere_summaries) }).start()
+    # 조회용 1초/10초/1분/10분 요약은 (압축 이전의) 모든 측정값으로 집계한다.
+    pyramid = AmperePyramid()
+    # 작업 구간은 모두 저장하고, 대기 구간은 오차 범위 내에서 압축된 값들만 저장한다.
+    compressor = None if args.no_compression else AmpereCompressor(error=args.error, deadband=args.deadband)
+    try:
         for measure in measures:
-            # 전류 값을 데이터베이스에 저장
-            log_measure(conn, measure)
+            for summary in pyramid.add(measure):
+                spool.append('ampere_summary', summary)
+            if compressor is None:
+                spool.append('ampere', measure)
+            else:
+                for point in compressor.add(measure):
+                    spool.append('ampere_point', point)
             logger.info(f"ts={measure.timestamp} ampere={measure.ampere:.3}")
+        if compressor is not None:
+            for point in compressor.flush():
+                spool.append('ampere_point', point)
+            logger.info(f"compressed {compressor.input_count} measures into {compressor.output_count} rows "
+                        f"(ratio={compressor.ratio():.2f})")
+        for summary in pyramid.flush():
+            spool.append('ampere_summary', summary)
+        if scheduler is not None:
+            logger.info(f"replay: {scheduler.stats}")
+        logger.info(f"ingest: {ingest.stats}")
+        
+        # 남은 기록이 모두 반영될 때까지 잠시 기다린다. 반영되지 못한 기록은 다음 실행 시 재생된다.
+        deadline = time.time() + args.drain_timeout
+        while spool.pending_bytes() > 0 and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        # 중단된 경우에도 진행 중인 요약 구간을 기록한다. 다음 실행에서 같은 구간의 측정값이 오면 병합된다.
+        for summary in pyramid.flush():
+            spool.append('ampere_summary', summary)
+        drainer.stop(timeout=5)
+        spool.close()
             
 
-def emulate_measure(measures:Iterable[ElectricCurrentMeasure], interval:float) -> Generator[ElectricCurrentMeasure,None,None]:
-    for measure in measures:
-        started = time.time()
-        yield measure
-        wait_time = interval - (time.time() - started)
-        if wait_time > 0.003:
-            time.sleep(wait_time-0.002)
-            
-def compact(measures:Iterable[ElectricCurrentMeasure]) -> Generator[ElectricCurrentMeasure,None,None]:
-    last_ts = None
-    for measure in measures:
-        if last_ts is None or last_ts < measure.timestamp:
-            yield measure
-    last_ts = measure.timestamp
-
 def main():
     parser = argparse.ArgumentParser(description="Update welder parameters")
     define_args(parser)
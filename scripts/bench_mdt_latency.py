@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import Any
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from welder import read_measures_from_csv
+from welder.ingest import reorder
+from welder.synthetic import LoadProfile, SyntheticWelder
+from welder.mdt_stub import MDTServerStub, PROFILES, default_nozzle_production
+from scripts import inspect_waveform
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('bench_mdt_latency')
+
+INSTANCE_ID = 'welder'
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='*', default=['data/fasten.csv'],
+                        help="부하 모델을 학습할 전류 측정값 CSV 파일들")
+    parser.add_argument("--profile", nargs='+', default=['local', 'slow', 'flaky'], choices=sorted(PROFILES),
+                        help="측정할 MDT 서버 지연/장애 프로파일들")
+    parser.add_argument("--duration", type=float, default=120, help="프로파일별 측정 시간(초)")
+    parser.add_argument("--rate", type=float, default=1.0, help="용접기가 보고하는 전류 값의 빈도(samples/s)")
+    parser.add_argument("--interval", type=int, default=700, help="inspect_waveform의 조회 주기(milli-second)")
+    parser.add_argument("--defect-rate", type=float, default=None, help="불량 작업의 비율 (기본값: 학습 데이터의 비율)")
+    parser.add_argument("--seed", type=int, default=None, help="난수 seed")
+
+def feed(stub:MDTServerStub, welder:SyntheticWelder, rate:float, published:dict[datetime,float],
+         stop:threading.Event) -> None:
+    """`rate`의 빈도로 합성 전류 값을 stub에 보고하고, 측정 시각별 보고 시각을 기록한다."""
+    base = datetime.now().replace(microsecond=0)
+    started = time.monotonic()
+    k = 0
+    while not stop.is_set():
+        for ampere in welder.generate(64):
+            due = started + k / rate
+            delay = due - time.monotonic()
+            if delay > 0 and stop.wait(delay):
+                return
+            ts = base + timedelta(seconds=k / rate)
+            published[ts] = time.monotonic()
+            stub.publish_ampere(INSTANCE_ID, ts, float(ampere))
+            k += 1
+
+def measure_profile(args, profile_name:str, load:LoadProfile) -> dict[str,Any]:
+    stub = MDTServerStub(profile_name, seed=args.seed)
+    stub.add_instance(INSTANCE_ID, { 'NozzleProduction': default_nozzle_production(),
+                                     'Status': 'IDLE' })
+    published:dict[datetime,float] = {}
+    latencies:list[float] = []
+
+    # NozzleProduction이 기록되면 해당 작업의 마지막 측정값이 보고된 시각부터의 지연을 기록한다.
+    def on_write(instance_id:str, name:str, value:dict[str,Any]) -> None:
+        if name == 'NozzleProduction':
+            reported = published.get(value['EventDateTime'])
+            if reported is not None:
+                latencies.append((time.monotonic() - reported) * 1000)
+    stub.on_write = on_write
+
+    welder = SyntheticWelder(load, defect_rate=args.defect_rate, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix='bench_mdt_latency') as workdir:
+        parser = argparse.ArgumentParser()
+        inspect_waveform.define_args(parser)
+        inspect_args = parser.parse_args(['--instance', INSTANCE_ID, '--interval', str(args.interval),
+                                          '--spool-dir', os.path.join(workdir, 'spool'),
+                                          '--checkpoint', os.path.join(workdir, 'inspect_waveform.ckpt')])
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=inspect_waveform.run, args=(inspect_args, stub, stop), daemon=True),
+            threading.Thread(target=feed, args=(stub, welder, args.rate, published, stop), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        stop.wait(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=15)
+
+    return {
+        'profile': profile_name,
+        'samples': len(published),
+        'cycles': welder.cycles,
+        'recorded': len(latencies),
+        'latency': np.percentile(latencies, [50, 95, 99, 100]).round(1).tolist() if latencies else None,
+        'endpoints': stub.summary(),
+    }
+
+def report(result:dict[str,Any]) -> None:
+    latency = result['latency'] or ['-'] * 4
+    print(f"{result['profile']:<10}{result['samples']:>9}{result['cycles']:>8}{result['recorded']:>10}"
+          + ''.join(f"{v:>10}" for v in latency))
+    for endpoint, stats in result['endpoints'].items():
+        quantiles = ', '.join(f"{k}={v:.1f}" for k, v in stats['latency'].items() if v is not None)
+        print(f"    {endpoint:<16} calls={stats['calls']}, failures={stats['failures']}, latency(ms): {quantiles}")
+
+def run(args):
+    load = LoadProfile.learn(reorder(m for file in args.files for m in read_measures_from_csv(file)))
+    logger.info(f"load profile: {load.describe()}")
+
+    # drainer의 데이터베이스 재연결 경고는 측정과 무관하므로 숨긴다.
+    for name in ('welder.spool', 'welder.database_utils'):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    results = []
+    for profile_name in args.profile:
+        logger.info(f"measuring profile '{profile_name}': {PROFILES[profile_name]}")
+        results.append(measure_profile(args, profile_name, load))
+
+    print(f"{'profile':<10}{'samples':>9}{'cycles':>8}{'recorded':>10}"
+          f"{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for result in results:
+        report(result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure end-to-end nozzle latency against a local MDT stand-in")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
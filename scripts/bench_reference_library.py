@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+import heapq
+import argparse
+import logging
+
+import numpy as np
+
+from welder import read_measures_from_csv
+from welder.waveform import BASE_PATTERNS, segment_waveforms
+from welder.features import PATTERN_COLUMNS, extract_features
+from welder.reference_library import ReferenceSet, dtw_distance
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('bench_reference_library')
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='*', default=['data/fasten.csv'],
+                        help="CSV files whose waveform patterns are used as queries")
+    parser.add_argument("--references", type=int, nargs='+', default=[10, 1000, 5000, 10000],
+                        help="Numbers of reference patterns to index")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of query patterns per library size")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="Sigma of the noise added to BASE_PATTERNS to generate references")
+    parser.add_argument("--threshold", type=float, default=2.0, help="DTW threshold of any_within()")
+    parser.add_argument("--seed", type=int, default=0)
+
+def load_queries(files:list[str], count:int, rng:np.random.Generator) -> np.ndarray:
+    readers = [read_measures_from_csv(file) for file in files]
+    waveforms = list(segment_waveforms(heapq.merge(*readers, key=lambda m: m.timestamp)))
+    patterns = extract_features(waveforms, dtw=False)[:, PATTERN_COLUMNS]
+    patterns = patterns[~np.isnan(patterns).any(axis=1)]
+    return patterns[rng.choice(len(patterns), size=min(count, len(patterns)), replace=False)]
+
+def timings(func, queries:np.ndarray) -> np.ndarray:
+    elapsed = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        elapsed.append(time.perf_counter() - started)
+    return np.array(elapsed) * 1000
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    queries = load_queries(args.files, args.queries, rng)
+    logger.info(f"{len(queries)} query patterns from {args.files}")
+    base = np.array(BASE_PATTERNS)
+
+    print(f"{'refs':>7}{'build(ms)':>11}{'matches':>9}"
+          f"{'any p50':>10}{'any p99':>10}{'any max':>10}{'near p50':>10}{'near p99':>10}{'linear':>10}")
+    for count in args.references:
+        references = base[rng.integers(len(base), size=count)] + rng.normal(0, args.spread, (count, len(base[0])))
+        started = time.perf_counter()
+        refs = ReferenceSet(references)
+        build = (time.perf_counter() - started) * 1000
+
+        matches = sum(refs.any_within(q, args.threshold) for q in queries)
+        any_ms = timings(lambda q: refs.any_within(q, args.threshold), queries)
+        nearest_ms = timings(refs.nearest, queries)
+        # 선형 탐색은 느리므로 일부 질의로만 측정한다.
+        rows = refs.rows
+        linear_ms = timings(lambda q: min(dtw_distance(q.tolist(), row) for row in rows), queries[:50])
+        print(f"{count:>7}{build:>11.1f}{matches:>9}"
+              + ''.join(f"{v:>10.3f}" for v in (np.median(any_ms), np.percentile(any_ms, 99), any_ms.max(),
+                                                 np.median(nearest_ms), np.percentile(nearest_ms, 99),
+                                                 np.median(linear_ms))))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-pattern query time of the reference library (ms)")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
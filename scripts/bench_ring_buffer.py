@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import time
+import argparse
+import logging
+import multiprocessing as mp
+from datetime import datetime
+
+import numpy as np
+
+from welder.types import ElectricCurrentMeasure
+from welder.ring_buffer import SharedRingBuffer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('bench_ring_buffer')
+
+
+def define_args(parser):
+    parser.add_argument("--samples", type=int, default=1_000_000, help="Number of samples to transfer")
+    parser.add_argument("--batch", type=int, default=100, help="Number of samples per write")
+    parser.add_argument("--consumers", type=int, default=2, help="Number of consumer processes")
+    parser.add_argument("--capacity", type=int, default=1 << 20, help="Ring buffer capacity (records)")
+    parser.add_argument("--skip-queue", action='store_true', help="Do not run the multiprocessing.Queue baseline")
+
+def ring_consumer(name:str, total:int, results:mp.Queue) -> None:
+    ring = SharedRingBuffer.attach(name)
+    reader = ring.reader(0)
+    count, ampere_sum = 0, 0.0
+    while reader.next_seq < total:
+        if not reader.wait(timeout=5.0):
+            break
+        records = reader.poll()
+        ampere_sum += float(records['ampere'].sum())
+        count += len(reader.validate(records))
+        del records
+    results.put((count, reader.lost, ampere_sum))
+    reader = None
+    ring.close()
+
+def queue_consumer(queue:mp.Queue, results:mp.Queue) -> None:
+    count, ampere_sum = 0, 0.0
+    while True:
+        batch = queue.get()
+        if batch is None:
+            break
+        ampere_sum += sum(m.ampere for m in batch)
+        count += len(batch)
+    results.put((count, 0, ampere_sum))
+
+def run_ring(args, times:np.ndarray, amperes:np.ndarray) -> float:
+    ring = SharedRingBuffer.create(capacity=args.capacity)
+    results = mp.Queue()
+    consumers = [mp.Process(target=ring_consumer, args=(ring.name, len(times), results))
+                 for _ in range(args.consumers)]
+    for p in consumers:
+        p.start()
+    # 소비자들이 연결할 시간을 준다 (생산자는 소비자를 기다리지 않는다).
+    time.sleep(0.5)
+
+    started = time.perf_counter()
+    for start in range(0, len(times), args.batch):
+        ring.extend(times[start:start + args.batch], amperes[start:start + args.batch])
+    produced = time.perf_counter() - started
+    outputs = [results.get() for _ in consumers]
+    elapsed = time.perf_counter() - started
+    for p in consumers:
+        p.join()
+    ring.close()
+    for count, lost, _ in outputs:
+        logger.info(f"ring consumer: received={count}, lost={lost}")
+    logger.info(f"ring buffer: produce={produced:.3f}s ({len(times)/produced:,.0f} samples/s), "
+                f"end-to-end={elapsed:.3f}s")
+    return elapsed
+
+def run_queue(args, times:np.ndarray, amperes:np.ndarray) -> float:
+    # 기존 방식: ElectricCurrentMeasure 리스트를 multiprocessing.Queue로 각 소비자에게 전달한다.
+    measures = [ElectricCurrentMeasure(datetime.fromtimestamp(t / 1000), float(a))
+                for t, a in zip(times.tolist(), amperes.tolist())]
+    results = mp.Queue()
+    queues = [mp.Queue() for _ in range(args.consumers)]
+    consumers = [mp.Process(target=queue_consumer, args=(q, results)) for q in queues]
+    for p in consumers:
+        p.start()
+    time.sleep(0.5)
+
+    started = time.perf_counter()
+    for start in range(0, len(measures), args.batch):
+        batch = measures[start:start + args.batch]
+        for q in queues:
+            q.put(batch)
+    for q in queues:
+        q.put(None)
+    produced = time.perf_counter() - started
+    outputs = [results.get() for _ in consumers]
+    elapsed = time.perf_counter() - started
+    for p in consumers:
+        p.join()
+    logger.info(f"queue: produce={produced:.3f}s ({len(measures)/produced:,.0f} samples/s), "
+                f"end-to-end={elapsed:.3f}s, received={[c for c, _, _ in outputs]}")
+    return elapsed
+
+def run(args):
+    times = np.arange(args.samples, dtype=np.int64) * 100 + int(time.time() * 1000)
+    amperes = np.random.default_rng(0).uniform(0, 12, args.samples).astype(np.float32)
+    ring_elapsed = run_ring(args, times, amperes)
+    if not args.skip_queue:
+        queue_elapsed = run_queue(args, times, amperes)
+        logger.info(f"speed-up: {queue_elapsed / ring_elapsed:.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the shared-memory ring buffer with multiprocessing.Queue")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
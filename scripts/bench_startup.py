@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('bench_startup')
+
+# 측정 대상: (이름, 실행할 import 문)
+TARGETS = [
+    ('python', 'pass'),
+    ('welder', 'import welder'),
+    ('welder.types', 'from welder import NozzleProductionAudit'),
+    ('welder.reader', 'from welder import read_measures_from_csv'),
+    ('read_nozzle_audit', 'import scripts.read_nozzle_audit'),
+    ('welder.waveform', 'from welder import inspect_waveform'),
+    ('welder.database_utils', 'import welder.database_utils'),
+]
+
+
+def define_args(parser):
+    parser.add_argument("targets", nargs='*', help="Names of the targets to measure (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="Number of runs per target")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Print the N most expensive modules of each target (python -X importtime)")
+
+def measure(statement:str, repeat:int) -> list[float]:
+    elapsed = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True)
+        elapsed.append(time.perf_counter() - started)
+    return elapsed
+
+def top_imports(statement:str, count:int) -> list[tuple[int,str]]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return rows[:count]
+
+def run(args):
+    targets = [t for t in TARGETS if not args.targets or t[0] in args.targets]
+    print(f"{'target':<24}{'min(ms)':>10}{'median(ms)':>12}{'max(ms)':>10}")
+    for name, statement in targets:
+        elapsed = measure(statement, args.repeat)
+        print(f"{name:<24}{min(elapsed)*1000:>10.1f}{statistics.median(elapsed)*1000:>12.1f}"
+              f"{max(elapsed)*1000:>10.1f}")
+        if args.top > 0:
+            for cumulative, module in top_imports(statement, args.top):
+                print(f"    {cumulative/1000:>8.1f}ms {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start-up (import) time of the welder package")
+    define_args(parser)
+    args = parser.parse_args()
+    # 저장소 루트에서 실행하지 않더라도 welder, scripts 패키지를 찾을 수 있도록 한다.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ['PYTHONPATH'] = os.pathsep.join(p for p in (root, os.environ.get('PYTHONPATH')) if p)
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+import csv
+import heapq
+import argparse
+import logging
+
+import numpy as np
+from dateutil.parser import parse
+
+from welder import read_measures_from_csv
+from welder.waveform import segment_waveforms
+from welder.features import PATTERN_COLUMNS, extract_features, feature
+from welder.reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('build_reference_library')
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='+', help="CSV files of ampere measures")
+    parser.add_argument("--library", default="reference_library.json", help="Reference library file to create/update")
+    parser.add_argument("--welder-type", default=DEFAULT_WELDER_TYPE, help="Welder type of the measures")
+    parser.add_argument("--labels", default=None,
+                        help="CSV file of (waveform end timestamp, label) rows; label 'good' marks good waveforms")
+    parser.add_argument("--k", type=int, default=10, help="Number of reference patterns (medoids)")
+    parser.add_argument("--width-threshold", type=float, default=2.0,
+                        help="Minimum peak width for a waveform to be considered good when no labels are given")
+
+def read_labels(file:str) -> dict:
+    with open(file, 'r') as f:
+        return { parse(row[0]): row[1].strip().lower() == 'good' for row in csv.reader(f) if row }
+
+def run(args):
+    labels = read_labels(args.labels) if args.labels else None
+
+    readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+    measures = heapq.merge(*readers, key=lambda m: m.timestamp)
+    waveforms = list(segment_waveforms(measures))
+    features = extract_features(waveforms)
+    
+    patterns = features[:, PATTERN_COLUMNS]
+    good = ~np.isnan(patterns).any(axis=1)
+    if labels is not None:
+        good &= np.array([labels.get(w[-1].timestamp, False) for w in waveforms], dtype=bool)
+    else:
+        # 레이블이 없으면 피크 크기(9A 이상)와 너비 기준을 만족하는 파형을 양품으로 간주한다.
+        with np.errstate(invalid='ignore'):
+            good &= (feature(features, 's2_max') >= 9.0) & (feature(features, 'peak_width') >= args.width_threshold)
+    patterns = patterns[good]
+    logger.info(f"collected {len(patterns)} good patterns out of {len(waveforms)} waveforms")
+    if len(patterns) == 0:
+        return
+
+    library = ReferenceLibrary.load(args.library) if os.path.exists(args.library) else ReferenceLibrary()
+    refs = library.learn(args.welder_type, patterns, k=args.k)
+    library.save(args.library)
+    logger.info(f"saved {len(refs)} references for '{args.welder_type}' to {args.library} (version={library.version})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build reference patterns from good waveforms")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import io
+import os
+import time
+import heapq
+import argparse
+import tempfile
+import logging
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from welder import read_measures_from_csv
+from welder.synthetic import LoadProfile, SyntheticWelder
+from welder.sketch import QuantileSketch
+from welder.mdt_stub import MDTServerStub, PROFILES, default_nozzle_production
+from welder.database_utils import ReconnectingConnection
+from scripts import inspect_waveform
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('capacity_test')
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='*', default=['data/fasten.csv'], help="CSV files to learn the load profile from")
+    parser.add_argument("--welders", type=int, nargs='+', default=None,
+                        help="Welder counts to test (default: double from --start until a step fails)")
+    parser.add_argument("--start", type=int, default=8, help="First welder count of the ramp")
+    parser.add_argument("--max-welders", type=int, default=4096, help="Upper bound of the ramp")
+    parser.add_argument("--bisect", type=int, default=3, help="Bisection steps between the last passing and first failing count")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Seconds of load per step (long enough for every welder to finish several cycles)")
+    parser.add_argument("--rate", type=float, default=None, help="Samples per second per welder (default: learned interval)")
+    parser.add_argument("--interval", type=int, default=None,
+                        help="Polling interval of inspect_waveform in ms (default: half the sample interval)")
+    parser.add_argument("--mdt-profile", default='local', choices=sorted(PROFILES),
+                        help="Latency/failure profile of the MDT server stand-in")
+    parser.add_argument("--defect-rate", type=float, default=None, help="Defect rate of the synthetic welders (default: learned)")
+    parser.add_argument("--latency-slo", type=float, default=1000,
+                        help="p99 latency from the last sample of a cycle to its NozzleProduction write (ms)")
+    parser.add_argument("--dsn", default=None,
+                        help="Record nozzle productions into this Postgres database instead of the stand-in")
+    parser.add_argument("--db-latency", type=float, default=2.0, help="Median round-trip time of the Postgres stand-in per batch (ms)")
+    parser.add_argument("--db-row-latency", type=float, default=5.0, help="Additional time of the Postgres stand-in per row (us)")
+    parser.add_argument("--db-jitter", type=float, default=0.5, help="Sigma of the log-normal round-trip time of the Postgres stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+class PostgresStandIn:
+    """
+    데이터베이스 대역. `ReconnectingConnection.handler()`와 같은 방식으로 spool handler를 만들지만,
+    실제로 기록하지는 않고 묶음마다 지연 시간 모델에 따라 기다리기만 한다.
+
+    지연 시간은 (왕복 시간 + 행 수 * 행당 시간)이며, 왕복 시간은 중앙값이 `round_trip`이고
+    log-normal 분포(sigma=`jitter`)를 따른다. 기다리는 동안 GIL을 놓으므로, 실제 데이터베이스처럼
+    drainer 쓰레드의 CPU는 거의 사용하지 않는다.
+    """
+    def __init__(self, round_trip:float, row_latency:float=0.0, jitter:float=0.0, seed:Optional[int]=None):
+        self.round_trip = round_trip
+        self.row_latency = row_latency
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.batches = 0
+        self.busy = 0.0
+
+    def latency(self, rows:int) -> float:
+        with self.lock:
+            jitter = float(self.rng.lognormal(0.0, self.jitter)) if self.jitter > 0 else 1.0
+        return self.round_trip * jitter + rows * self.row_latency
+
+    def handler(self, func) -> Any:
+        def handle(payloads:list) -> None:
+            latency = self.latency(len(payloads))
+            time.sleep(latency)
+            with self.lock:
+                self.rows += len(payloads)
+                self.batches += 1
+                self.busy += latency
+        return handle
+
+
+def feed(stub:MDTServerStub, sources:dict[str,SyntheticWelder], rate:float, published:dict[tuple[str,datetime],float],
+         lateness:QuantileSketch, stop:threading.Event) -> None:
+    """
+    합성 용접기들의 전류 값을 절대 일정에 따라 MDT 서버 대역에 보고한다 (MQTT broker를 거쳐 'Ampere'
+    파라미터가 갱신되는 것의 대역). 측정값마다 (인스턴스, 측정 시각)별 보고 시각을 기록한다.
+    """
+    base = datetime.now().replace(microsecond=0)
+    started = time.monotonic()
+    k = 0
+    while not stop.is_set():
+        due = started + k / rate
+        delay = due - time.monotonic()
+        if delay > 0 and stop.wait(delay):
+            return
+        lateness.add(max(0.0, time.monotonic() - due) * 1000)
+        ts = base + timedelta(seconds=k / rate)
+        for instance_id, source in sources.items():
+            published[(instance_id, ts)] = time.monotonic()
+            stub.publish_ampere(instance_id, ts, float(source.generate(1)[0]))
+        k += 1
+
+
+def run_step(args, profile:LoadProfile, welders:int, rate:float, interval:int) -> dict[str,Any]:
+    stub = MDTServerStub(args.mdt_profile, seed=args.seed)
+    if args.dsn:
+        from psycopg2.extensions import parse_dsn
+        db = ReconnectingConnection(parse_dsn(args.dsn), on_connect=inspect_waveform.create_tables)
+    else:
+        db = PostgresStandIn(args.db_latency / 1000, row_latency=args.db_row_latency / 1e6, jitter=args.db_jitter,
+                             seed=args.seed)
+    sources = {}
+    for w in range(welders):
+        instance_id = f'welder-{w:04d}'
+        stub.add_instance(instance_id, { 'NozzleProduction': default_nozzle_production(), 'Status': 'IDLE' })
+        sources[instance_id] = SyntheticWelder(profile, defect_rate=args.defect_rate, seed=args.seed + w)
+
+    published:dict[tuple[str,datetime],float] = {}
+    latency = QuantileSketch()
+    lateness = QuantileSketch()
+    verdicts = 0
+    lock = threading.Lock()
+
+    # NozzleProduction이 기록되면 해당 작업의 마지막 측정값이 보고된 시각부터의 지연을 기록한다.
+    def on_write(instance_id:str, name:str, value:dict[str,Any]) -> None:
+        nonlocal verdicts
+        if name == 'NozzleProduction':
+            reported = published.get((instance_id, value['EventDateTime']))
+            with lock:
+                verdicts += 1
+                if reported is not None:
+                    latency.add((time.monotonic() - reported) * 1000)
+    stub.on_write = on_write
+
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory(prefix='capacity_test_') as workdir:
+        threads = []
+        for instance_id in sources:
+            parser = argparse.ArgumentParser()
+            inspect_waveform.define_args(parser)
+            inspect_args = parser.parse_args(['--instance', instance_id, '--interval', str(interval),
+                                              '--spool-dir', os.path.join(workdir, instance_id, 'spool'),
+                                              '--checkpoint', os.path.join(workdir, instance_id, 'ckpt'),
+                                              '--profile-dir', os.path.join(workdir, instance_id, 'profile')])
+            threads.append(threading.Thread(target=inspect_waveform.run, args=(inspect_args, stub, stop, db),
+                                            name=instance_id, daemon=True))
+        feeder = threading.Thread(target=feed, args=(stub, sources, rate, published, lateness, stop), daemon=True)
+
+        # inspect_waveform이 작업마다 출력하는 생산 통계는 측정과 무관하므로 버린다.
+        cpu_started = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in threads:
+                thread.start()
+            feeder.start()
+            stop.wait(args.duration)
+            stop.set()
+            for thread in [feeder] + threads:
+                thread.join(timeout=15)
+        cpu = time.process_time() - cpu_started
+
+    # 작업 하나가 끝났다고 인식되려면 다음 대기 구간의 측정값이 필요하고, 재시작 직후의 첫 작업은
+    # 시작부터 보지 못했을 수 있으므로, 용접기마다 두 개까지는 판정되지 않아도 된다.
+    cycles = sum(s.cycles for s in sources.values())
+    planned_defects = sum(s.defects for s in sources.values())
+    expected = max(1, cycles - 2 * welders)
+    quantiles = latency.quantiles()
+    generator_late = lateness.quantile(0.99) or 0.0
+    passed = (verdicts >= expected
+              and quantiles['p99'] is not None and quantiles['p99'] <= args.latency_slo)
+    return {
+        'welders': welders,
+        'samples_per_sec': len(published) / args.duration,
+        'cpu': cpu / args.duration,
+        'latency': quantiles,
+        'cycles': cycles,
+        'planned_defects': planned_defects,
+        'expected': expected,
+        'verdicts': verdicts,
+        'mdt': stub.summary(),
+        'db_rows': db.rows if isinstance(db, PostgresStandIn) else None,
+        'db_busy': db.busy / args.duration if isinstance(db, PostgresStandIn) else None,
+        'passed': passed,
+        # 생성기가 일정을 지키지 못하면 측정 결과는 검사기의 한계가 아니다.
+        'generator_bound': generator_late > 1000.0 / rate,
+    }
+
+def report(result:dict[str,Any]) -> None:
+    lat = result['latency']
+    latency = ', '.join(f"{k}={v:.1f}ms" for k, v in lat.items() if v is not None) or '-'
+    logger.info(f"welders={result['welders']}: {'PASS' if result['passed'] else 'FAIL'}"
+                f"{' (generator-bound)' if result['generator_bound'] else ''}, "
+                f"{result['samples_per_sec']:,.0f} samples/s, cpu={result['cpu']*100:.0f}%, latency {latency}")
+    db = f", db rows={result['db_rows']} (busy {result['db_busy']*100:.0f}%)" if result['db_rows'] is not None else ''
+    logger.info(f"  cycles={result['cycles']} (planned defects={result['planned_defects']}), "
+                f"verdicts={result['verdicts']} (expected >= {result['expected']}){db}")
+    for endpoint, stats in result['mdt'].items():
+        logger.info(f"  mdt {endpoint}: calls={stats['calls']}, failures={stats['failures']}")
+
+def run(args):
+    readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+    profile = LoadProfile.learn(heapq.merge(*readers, key=lambda m: m.timestamp))
+    logger.info(f"load profile: {profile.describe()}")
+    rate = args.rate if args.rate else 1.0 / profile.interval
+    # inspect_waveform은 'Ampere' 파라미터의 최신 값만 조회하므로, 측정값을 놓치지 않도록 더 자주 조회한다.
+    interval = args.interval if args.interval else max(10, int(500 / rate))
+
+    # 용접기별 처리 루프의 로그와 drainer의 데이터베이스 재연결 경고는 측정과 무관하므로 숨긴다.
+    for name in ('inspect_waveform', 'welder.spool', 'welder.database_utils', 'welder.checkpoint',
+                 'welder.shedding'):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    results = []
+    def step(welders:int) -> bool:
+        result = run_step(args, profile, welders, rate, interval)
+        report(result)
+        results.append(result)
+        return result['passed']
+
+    if args.welders:
+        for welders in args.welders:
+            step(welders)
+    else:
+        # 실패할 때까지 용접기 수를 두 배씩 늘린 뒤, 마지막 성공과 첫 실패 사이를 이분 탐색한다.
+        passed, failed = 0, None
+        welders = args.start
+        while welders <= args.max_welders:
+            if not step(welders):
+                failed = welders
+                break
+            passed = welders
+            welders *= 2
+        for _ in range(args.bisect if failed is not None else 0):
+            if failed - passed <= 1:
+                break
+            middle = (passed + failed) // 2
+            if step(middle):
+                passed = middle
+            else:
+                failed = middle
+
+    sustainable = [r['welders'] for r in results if r['passed']]
+    logger.info(f"max sustainable welders at {rate:.1f} samples/s each "
+                f"(polling every {interval}ms): {max(sustainable) if sustainable else 0}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Capacity test of inspect_waveform against MDT/database stand-ins")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import argparse
+import logging
+
+from welder import read_measures_from_csv
+from welder.waveform import segment_waveforms
+from welder.features import FEATURES, extract_features, inspect_features
+from welder.reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('extract_waveform_features')
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='+', help="CSV files of ampere measures")
+    parser.add_argument("--output", default="waveform_features.csv", help="Output CSV file path")
+    parser.add_argument("--library", default=None, help="Reference library file (default: built-in patterns)")
+    parser.add_argument("--welder-type", default=DEFAULT_WELDER_TYPE, help="Welder type of the measures")
+
+def run(args):
+    library = ReferenceLibrary.load(args.library) if args.library else None
+
+    readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+    measures = heapq.merge(*readers, key=lambda m: m.timestamp)
+    waveforms = list(segment_waveforms(measures))
+    
+    # 모든 파형의 특징을 한 번에 계산하고, 판정 결과도 특징 행렬로부터 구한다.
+    features = extract_features(waveforms, library, args.welder_type)
+    verdicts = inspect_features(features)
+    
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['start', 'end', *FEATURES, 'verdict'])
+        for waveform, row, verdict in zip(waveforms, features, verdicts):
+            writer.writerow([waveform[0].timestamp.isoformat(), waveform[-1].timestamp.isoformat(),
+                             *(f'{v:.6g}' for v in row), int(verdict)])
+    logger.info(f"wrote features of {len(waveforms)} waveforms to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract waveform features from ampere measures")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+import argparse
+import logging
+
+from welder.reader import LAYOUTS
+from welder.channels import ChannelMonitor, read_channel_frame_from_csv, inspect_channels
+from welder.monitor import EVENT_FINISHED
+from welder.database_utils import open_connection, create_ampere_channel_table_if_absent, log_channel_frame
+
+DATABASE_PARAMS = {
+    'dbname': 'mdt_app',
+    'user': 'mdt',
+    'password': 'mdt2025',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('inspect_channels')
+
+
+def define_args(parser):
+    parser.add_argument("files", nargs='+', help="'ts,channel,value' 또는 'ts,value[,state]' 형식의 CSV 파일들")
+    parser.add_argument("--layout", choices=LAYOUTS, default=None,
+                        help="CSV 파일 형식 (기본값: 파일별로 첫 행에서 판단. 채널 이름이 숫자이면 'channel'을 지정)")
+    parser.add_argument("--channels", nargs='+', default=None, help="사용할 채널들 (기본값: 파일의 모든 채널)")
+    parser.add_argument("--driver", default=None,
+                        help="작업 인식에 사용할 채널 (기본값: 시각별 채널 최대값)")
+    parser.add_argument("--store", action='store_true', default=False,
+                        help="채널별 측정값을 welder_ampere_channels 테이블에 저장")
+    parser.add_argument("--quiet", action='store_true', default=False, help="노즐별 판정 결과를 출력하지 않음")
+
+def run(args):
+    frame = read_channel_frame_from_csv(args.files, args.channels, args.layout)
+    logger.info(f"read {len(frame)} timestamps of channels {frame.channels}")
+    if args.store:
+        with open_connection(DATABASE_PARAMS) as conn:
+            create_ampere_channel_table_if_absent(conn)
+            log_channel_frame(conn, frame)
+
+    monitor = ChannelMonitor(frame.channels, args.driver)
+    nozzles = 0
+    defects = dict.fromkeys(frame.channels, 0)
+    started = time.perf_counter()
+    events = [e for ts, row in frame.rows() for e in monitor.push(ts, row)] + monitor.flush()
+    for kind, waveform in events:
+        if kind != EVENT_FINISHED:
+            continue
+        # 기존 스크립트들과 같이 inspect_waveform()의 결과가 True인 파형을 불량으로 본다.
+        verdicts = inspect_channels(waveform)
+        nozzles += 1
+        for channel, is_defect in verdicts.items():
+            defects[channel] += int(is_defect)
+        if not args.quiet:
+            print(f"{waveform.waveform[-1].timestamp}: "
+                  + ', '.join(f"{c}={'Defect' if v else 'Good'}" for c, v in verdicts.items()))
+    elapsed = time.perf_counter() - started
+
+    logger.info(f"nozzles={nozzles}, elapsed={elapsed:.3f}s, ingest={monitor.monitor.ingest.stats}")
+    for channel, count in defects.items():
+        logger.info(f"  {channel}: defects={count} ({count / max(nozzles, 1):.3f})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize and inspect nozzle waveforms of multi-channel ampere records")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,33 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Optional
 from dataclasses import asdict
+from functools import partial
 
+import os
 import time
+import json
+import logging
 import argparse
+import threading
 from datetime import datetime, timedelta
 
+from psycopg2.extensions import connection
+
 from mdtpy import connect
-from welder import ElectricCurrentMeasure, NozzleProductionAudit, recognize_work, inspect_waveform, \
-                    open_connection, create_nozzle_production_audit_table, create_ampere_log_table_if_absent
+from welder import ElectricCurrentMeasure, NozzleProductionAudit, \
+                    create_nozzle_production_audit_table, create_ampere_log_table_if_absent
+from welder.types import INSPECTION_FULL
+from welder.inspect_nozzle import read_tail_measures
+from welder.monitor import NozzleMonitor, NozzleEvent, IdlePeriod, STATE_RUNNING, EVENT_STARTED, EVENT_FINISHED
+from welder.early_inspection import EarlyInspector, EarlyVerdict
+from welder.checkpoint import Checkpointer
+from welder.production import ProductionTracker
+from welder.spool import Spool, SpoolDrainer
+from welder.profiling import ProfilerControl, LoopStats
+from welder.shedding import LoadShedder, ReinspectionQueue, inspect_waveform_in_mode
+from welder.database_utils import ReconnectingConnection, create_nozzle_production_rollup_table, \
+                                  record_nozzle_productions, record_reinspections
 
 
 DATABASE_PARAMS = {
@@ -20,9 +38,8 @@ DATABASE_PARAMS = {
     'port': '5432'
 }
 
-STATE_UNKNOWN = -1
-STATE_IDLE = 0
-STATE_RUNNING = 1
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('inspect_waveform')
 
 
 def define_args(parser):
@@ -30,99 +47,298 @@ def define_args(parser):
     parser.add_argument("--port", default=12985, help="MDT 프레임워크 서버 포트")
     parser.add_argument("--instance", help="MDT 인스턴스 식별자")
     parser.add_argument("--interval", type=int, default=700, help="조회 주기(milli-second)")
+    parser.add_argument("--sketch-parameter", default=None,
+                        help="처리/대기 시간 분위수 스케치를 저장할 파라미터 이름 (지정하지 않으면 저장하지 않음)")
+    parser.add_argument("--spool-dir", default="spool/inspect_waveform",
+                        help="데이터베이스/MDT 기록을 임시 저장할 로컬 spool 디렉토리")
+    parser.add_argument("--alert-parameter", default=None,
+                        help="작업 도중의 잠정 판정과 최종 판정('Defect'/'Good')을 기록할 파라미터 이름")
+    parser.add_argument("--checkpoint", default="checkpoint/inspect_waveform.ckpt",
+                        help="인식기/생산 통계 상태를 저장할 체크포인트 파일")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="체크포인트 저장 주기(초)")
+    parser.add_argument("--lateness", type=int, default=0,
+                        help="늦게 도착한 전류 값을 재정렬하기 위해 기다리는 시간(milli-second)")
+    parser.add_argument("--profile-dir", default="profile/inspect_waveform",
+                        help="요청 시(SIGUSR1: 표본 추출, SIGUSR2: cProfile) 수행한 프로파일 결과를 저장할 디렉토리")
+    parser.add_argument("--profile-duration", type=float, default=30, help="프로파일 수행 시간(초)")
+    parser.add_argument("--control-topic", default=None,
+                        help="프로파일 요청을 받을 MQTT 제어 토픽 (예: {\"command\": \"sample\", \"duration\": 60})")
+    parser.add_argument("--mqtt-broker", default="localhost", help="제어 토픽의 MQTT broker 주소")
+    parser.add_argument("--mqtt-port", type=int, default=1883, help="제어 토픽의 MQTT broker 포트")
+    parser.add_argument("--loop-report", type=float, default=60, help="조회 주기 초과(overrun) 통계를 보고하는 주기(초)")
+    parser.add_argument("--shed-thresholds", type=float, nargs=2, default=[3.0, 6.0],
+                        metavar=('NO_DTW', 'WIDTH_ONLY'),
+                        help="처리 지연(초)이 각 값을 넘으면 해당 저비용 검사 방식으로 전환한다")
+    parser.add_argument("--reinspection-size", type=int, default=10000,
+                        help="저비용 방식으로 판정한 파형을 보관하는 재검사 큐의 최대 크기")
+    parser.add_argument("--reinspection-interval", type=float, default=1.0,
+                        help="처리가 밀리는 동안 재검사를 수행하는 간격(초)")
 
-def calc_moving_average(old_avg:float, new_value:float, count:int) -> float:
-    return (old_avg * (count-1) + new_value) / count
-
-idle_count = 0
-def on_nozzle_production_started(production:NozzleProductionAudit, waveform:list[ElectricCurrentMeasure]):
-    global idle_count
-    
-    if ( len(waveform) == 0 ):
+def on_nozzle_production_started(tracker:ProductionTracker, idle:IdlePeriod):
+    if ( len(idle) == 0 ):
         return
 
-    idle_count += 1
-    waiting_time = waveform[-1].timestamp - waveform[0].timestamp
-    production.AvgWaitingTime = calc_moving_average(production.AvgWaitingTime, waiting_time, idle_count)
+    tracker.on_started(idle.waiting_time)
 
   
-def on_nozzle_production_finished(production:NozzleProductionAudit, waveform:list[ElectricCurrentMeasure]):
-    # processing_time = timedelta(seconds=(waveform[-1].timestamp - waveform[0].timestamp).total_seconds())
+def on_nozzle_production_finished(tracker:ProductionTracker, spool:Spool, waveform:list[ElectricCurrentMeasure],
+                                  is_defect:Optional[bool]=None, mode:str=INSPECTION_FULL,
+                                  reinspection:Optional[ReinspectionQueue]=None):
     processing_time = waveform[-1].timestamp - waveform[0].timestamp
-    production.Timestamp = waveform[-1].timestamp
-    production.QuantityProduced += 1
-    production.AvgProcessingTime = calc_moving_average(production.AvgProcessingTime, processing_time, production.QuantityProduced)
+    waiting_time = tracker.last_waiting_time
 
-    # Waveform을 검사하여 불량 파형인지 확인한다.
-    is_defect = inspect_waveform(waveform)
-    if is_defect:
-        production.DefectVolume += 1
-        production.AvgDefectRate = production.DefectVolume / production.QuantityProduced  
+    # 작업 도중에 판정하지 못한 경우에는 Waveform 전체를 주어진 방식으로 검사하여 불량 파형인지 확인한다.
+    # 저비용 방식의 판정은 전체 검사와 다를 수 있으므로 잠정 판정으로 따로 세고, 재검사 큐에서 확정한다.
+    if is_defect is None:
+        is_defect = inspect_waveform_in_mode(waveform, mode)
+        if mode != INSPECTION_FULL and reinspection is not None:
+            reinspection.submit(waveform, is_defect)
+    tracker.on_finished(waveform[-1].timestamp, processing_time, is_defect, mode)
+    
+    # 노즐 생산 기록과 분/시간/교대 단위 집계는 spool을 거쳐 한 트랜잭션으로 데이터베이스에 반영한다.
+    spool.append('nozzle', (tracker.production, (waveform[-1].timestamp, processing_time, waiting_time, is_defect)))
 
 
-def run(args):
+def create_tables(conn:connection) -> None:
     # 노즐 생산 로그 테이블이 존재하지 않으면 생성한다.
-    with open_connection(DATABASE_PARAMS) as conn:
-        create_ampere_log_table_if_absent(conn)
-        create_nozzle_production_audit_table(conn)
+    create_ampere_log_table_if_absent(conn)
+    create_nozzle_production_audit_table(conn)
+    create_nozzle_production_rollup_table(conn)
 
-    # MDT 프레임워크 서버에 연결하고 대상 인스턴스를 찾음
-    mdt = connect(host=args.host, port=args.port)
-    instance = mdt.instances[args.instance]
-    parameters = instance.parameters
 
+def load_tracker(parameters, saved:Optional[dict[str,Any]], sketch_parameter:Optional[str]) -> ProductionTracker:
     prod_smc = parameters['NozzleProduction'].read_value()
     value = prod_smc['ParameterValue'] | { 'Timestamp': prod_smc['EventDateTime'] }
     production = NozzleProductionAudit(**value)
-    
-    state = STATE_UNKNOWN
-    waveform = []
-    last_ts = None
-    
-    while True:
-        started = datetime.now()
-        
-        ampere_smc:dict[str, Any] = parameters['Ampere'].read_value()
-        ts, ampere = ampere_smc['EventDateTime'], ampere_smc['ParameterValue']
+
+    # 체크포인트의 생산 통계가 트윈보다 최신이면 (누적 합계와 스케치를 포함하여) 그대로 이어서 사용한다.
+    if saved is not None:
+        tracker:ProductionTracker = saved['tracker']
+        try:
+            if tracker.production.Timestamp >= production.Timestamp:
+                return tracker
+        except TypeError as e:
+            logger.warning(f"cannot compare checkpoint with the twin, ignoring checkpoint: {e}")
+
+    tracker = ProductionTracker(production)
+    if sketch_parameter:
+        # 이전에 저장된 분위수 스케치가 있으면 복원하여 이어서 집계한다.
+        try:
+            sketch_smc = parameters[sketch_parameter].read_value()
+            if sketch_smc['ParameterValue']:
+                tracker.restore_sketches(json.loads(sketch_smc['ParameterValue']))
+        except Exception as e:
+            logger.warning(f"failed to restore quantile sketches: {e}")
+    return tracker
+
+
+def run(args, mdt=None, stop:Optional[threading.Event]=None, db=None):
+    # MDT 프레임워크 서버에 연결하고 대상 인스턴스를 찾음
+    # (mdt가 주어지면 그것을 사용한다. 예: welder.mdt_stub.MDTServerStub)
+    # (db가 주어지면 ReconnectingConnection 대신 그 handler()로 데이터베이스에 기록한다)
+    if mdt is None:
+        mdt = connect(host=args.host, port=args.port)
+    instance = mdt.instances[args.instance]
+    parameters = instance.parameters
+
+    checkpointer = Checkpointer(args.checkpoint, interval=args.checkpoint_interval)
+    saved = checkpointer.load()
+    tracker = load_tracker(parameters, saved, args.sketch_parameter)
+    production = tracker.production
+    monitor = NozzleMonitor.from_snapshot(saved['monitor']) if saved is not None else NozzleMonitor()
+    monitor.ingest.lateness = timedelta(milliseconds=args.lateness)
+
+    # 데이터베이스와 MDT 파라미터에 기록할 내용은 모두 로컬 spool에 먼저 기록하고,
+    # 백그라운드 drainer가 각 저장소가 가용할 때 일괄로 반영한다.
+    def update_parameters(updates:list[tuple[str,Any]]) -> None:
+        for name, value in updates:
+            parameters[name] = value
+    # 한 저장소의 장애가 다른 저장소로의 반영을 막지 않도록 저장소별로 spool을 둔다.
+    if db is None:
+        db = ReconnectingConnection(DATABASE_PARAMS, on_connect=create_tables)
+    db_spool = Spool(os.path.join(args.spool_dir, 'db'))
+    mdt_spool = Spool(os.path.join(args.spool_dir, 'mdt'))
+    drainers = [
+        # 생산 기록은 (인스턴스 식별자, 시각)을 키로 upsert하고 새로 삽입된 기록만 집계에 더하므로,
+        # 재전송된 기록도 중복 저장되거나 중복 집계되지 않는다.
+        SpoolDrainer(db_spool, { 'nozzle': db.handler(partial(record_nozzle_productions, welder_id=args.instance)),
+                                 'reinspection': db.handler(partial(record_reinspections,
+                                                                    welder_id=args.instance)) }).start(),
+        SpoolDrainer(mdt_spool, { 'parameter': update_parameters }).start(),
+    ]
+    checkpointer.start()
+    inspector = EarlyInspector()
+
+    # 재시작 없이 처리 루프를 프로파일링할 수 있도록 시그널과 제어 토픽으로 요청을 받는다.
+    profiler = ProfilerControl(args.profile_dir, 'inspect_waveform', duration=args.profile_duration)
+    if threading.current_thread() is threading.main_thread():
+        profiler.install_signals()
+    control = None
+    if args.control_topic:
+        from welder.mqtt_client import MQTTClient
+        control = MQTTClient(client_id=f'inspect_waveform-{args.instance}', broker=args.mqtt_broker,
+                             port=args.mqtt_port)
+        control.connect()
+        control.subscribe(args.control_topic, profiler.on_control_message)
+    loop_stats = LoopStats(args.interval / 1000)
+
+    # 처리가 밀리면 저비용 검사 방식으로 전환하고, 미룬 전체 검사는 백그라운드에서 수행한다.
+    shedder = LoadShedder(tuple(args.shed_thresholds))
+    reinspection = ReinspectionQueue(max_size=args.reinspection_size,
+                                     throttled_interval=args.reinspection_interval).start()
+    if saved is not None:
+        reinspection.restore(saved['reinspection'])
+    reported_overruns = 0
+    last_report = time.monotonic()
+
+    def on_verdict(verdict:EarlyVerdict) -> None:
+        label = 'Defect' if verdict.verdict else 'Good'
+        if verdict.final:
+            if verdict.changed:
+                logger.warning(f"final verdict differs from the provisional one: {label}")
+        else:
+            logger.info(f"provisional verdict: {label} (state-2 samples={verdict.samples})")
+        if args.alert_parameter and (not verdict.final or verdict.changed):
+            mdt_spool.append('parameter', (args.alert_parameter,
+                                           { 'EventDateTime': verdict.timestamp, 'ParameterValue': label }))
+
+    def handle_event(event:NozzleEvent, live:bool=True) -> None:
+        kind, waveform = event
+        if kind == EVENT_STARTED:
+            on_nozzle_production_started(tracker, waveform)
+            ts = waveform.last if waveform else monitor.last_ts
+            mdt_spool.append('parameter', ('Status', { 'EventDateTime': ts, 'ParameterValue': 'WORKING' }))
+        elif kind == EVENT_FINISHED:
+            # 작업 도중에 파형 전체를 점진적으로 판정했다면 그 최종 판정을 사용한다.
+            is_defect = None
+            mode = shedder.mode if live else INSPECTION_FULL
+            if live and inspector.covers(waveform):
+                verdict = inspector.finish(waveform[-1].timestamp)
+                on_verdict(verdict)
+                is_defect = verdict.verdict
+                mode = INSPECTION_FULL
+            shedder.record(mode)
+            on_nozzle_production_finished(tracker, db_spool, waveform, is_defect, mode, reinspection)
+
+            prod_dict = asdict(production)
+            ts = prod_dict.pop('Timestamp')
+            # 검사 방식은 데이터베이스의 생산 기록에만 남긴다.
+            prod_dict.pop('InspectionMode')
+            prod_dict = { 'EventDateTime': ts, 'ParameterValue': prod_dict }
+
+            mdt_spool.append('parameter', ('NozzleProduction', prod_dict))
+            if args.sketch_parameter:
+                mdt_spool.append('parameter', (args.sketch_parameter,
+                                               { 'EventDateTime': ts,
+                                                 'ParameterValue': json.dumps(tracker.sketches_to_dict()) }))
+            mdt_spool.append('parameter', ('Status', { 'EventDateTime': ts, 'ParameterValue': 'IDLE' }))
+            print(production)
+            if tracker.provisional_defects > 0:
+                logger.info(f"provisional defects awaiting re-inspection: {tracker.provisional_defects}")
+            logger.info(f"cycle-time quantiles(ms): {tracker.quantiles()}")
+            # 생산 기록 직후의 상태를 저장하여 재시작 시 다시 따라잡을 구간을 줄인다. 저장은 비동기이므로
+            # spool에 기록된 노즐이 checkpoint에 반영되기 전에 중단될 수 있으며, 이때 다시 기록되는
+            # 'nozzle' 레코드는 record_nozzle_productions()가 (인스턴스 식별자, 시각)으로 걸러낸다.
+            save_checkpoint()
+
+    def apply_reinspections() -> None:
+        for result in reinspection.drain():
+            if result.changed:
+                logger.warning(f"re-inspection changed the verdict of {result.timestamp}: "
+                               f"{'Defect' if result.verdict else 'Good'}")
+            tracker.on_reinspected(result.provisional, result.verdict, result.timestamp)
+            db_spool.append('reinspection', (result.timestamp, result.provisional, result.verdict))
+
+    def save_checkpoint() -> None:
+        checkpointer.save({ 'monitor': monitor.snapshot(), 'tracker': tracker,
+                            'reinspection': reinspection.snapshot() })
+
+    # 중단되어 있던 동안의 측정값을 Tail 세그먼트에서 읽어 인식기 상태를 따라잡는다.
+    # 이미 생산 통계에 반영된 시점 이전의 이벤트는 다시 집계하지 않는다. checkpoint 이후에 spool에만
+    # 기록되었던 노즐은 같은 시각과 생산 통계로 다시 기록되며, 데이터베이스와 MDT 파라미터에는
+    # 덮어쓰기로 반영되므로 중복 집계되지 않는다.
+    try:
+        events = monitor.catch_up(read_tail_measures(instance))
+        for event in events:
+            kind, waveform = event
+            last = waveform.last if kind == EVENT_STARTED else waveform[-1].timestamp if waveform else None
+            if last is not None and last <= production.Timestamp:
+                continue
+            handle_event(event, live=False)
+        logger.info(f"caught up from WelderAmpereLog Tail segment: last={monitor.last_ts}, events={len(events)}")
+    except Exception as e:
+        logger.warning(f"failed to catch up from WelderAmpereLog Tail segment: {e}")
+
+    try:
+        while stop is None or not stop.is_set():
+            started = datetime.now()
+            # 조회 일정보다 늦어진 시간으로 검사 방식을 정한다. 측정 시각과의 차이는 측정 장비와의
+            # 시계 차이와 값이 갱신되지 않은 시간이 섞여 있으므로 사용하지 않는다.
+            shedder.update(loop_stats.begin(time.monotonic()))
+            profiler.poll()
         
-        if ts != last_ts:
-            code = recognize_work(ts, ampere)
-            if state == STATE_RUNNING:
-                waveform.append(ElectricCurrentMeasure(ts, ampere, code))
-                if code == 3:
-                    on_nozzle_production_finished(production, waveform)
-
-                    prod_dict = asdict(production)
-                    ts = prod_dict.pop('Timestamp')
-                    prod_dict = { 'EventDateTime': ts, 'ParameterValue': prod_dict }
-
-                    parameters['NozzleProduction'] = prod_dict
-                    parameters['Status'] = { 'EventDateTime': ts, 'ParameterValue': 'IDLE' }
-                    print(production)
-                    waveform = []
-                    state = STATE_IDLE
-            elif state == STATE_IDLE:
-                if code == 0:
-                    waveform.append(ElectricCurrentMeasure(ts, ampere, code))
-                elif code == 1:
-                    on_nozzle_production_started(production, waveform)
-                    parameters['Status'] = { 'EventDateTime': ts, 'ParameterValue': 'WORKING' }
-                    waveform = [ElectricCurrentMeasure(ts, ampere, code)]
-                    state = STATE_RUNNING
+            try:
+                ampere_smc:dict[str, Any] = parameters['Ampere'].read_value()
+                ts, ampere = ampere_smc['EventDateTime'], ampere_smc['ParameterValue']
+            except Exception as e:
+                # MDT 서버가 일시적으로 응답하지 않는 경우 다음 주기에 다시 시도한다.
+                logger.error(f"failed to read 'Ampere' parameter: {e}")
+            else:
+                # 같은 측정값을 다시 읽었거나 늦게 도착한 측정값은 재정렬 단계에서 걸러진다.
+                for m in monitor.ingest.push(ElectricCurrentMeasure(ts, ampere)):
+                    event = monitor.update(m.timestamp, m.ampere)
+                    if monitor.state == STATE_RUNNING:
+                        if shedder.mode == INSPECTION_FULL:
+                            # 작업 도중의 측정값으로 잠정 판정을 내려 불량을 일찍 알린다.
+                            verdict = inspector.update(monitor.waveform)
+                            if verdict is not None:
+                                on_verdict(verdict)
+                        else:
+                            # 처리가 밀리는 동안에는 점진적 판정을 중단하고 작업 종료 시 저비용 방식으로 판정한다.
+                            inspector.reset()
+                    if event is not None:
+                        handle_event(event)
+
+            # 처리가 밀리는 동안에는 재검사를 천천히 수행하고, 그 결과는 이 쓰레드에서 반영한다.
+            if shedder.mode == INSPECTION_FULL:
+                reinspection.resume()
             else:
-                if code == 1:
-                    waveform = [ElectricCurrentMeasure(ts, ampere, code)]
-                    state = STATE_RUNNING
-                elif code == 3:
-                    waveform = []
-                    state = STATE_IDLE
-            last_ts = ts
+                reinspection.throttle()
+            apply_reinspections()
+
+            if checkpointer.due():
+                save_checkpoint()
         
-        # 주기에서 수행시간 만큼 뺀 시간만큼 대기함.
-        elapsed = (datetime.now() - started).total_seconds() * 1000
-        sleep_millis = args.interval - elapsed
-        if sleep_millis > 10:
-            time.sleep(sleep_millis / 1000)
+            elapsed = (datetime.now() - started).total_seconds() * 1000
+            loop_stats.record(elapsed / 1000)
+            if time.monotonic() - last_report >= args.loop_report:
+                # 주기를 넘긴 경우가 새로 생겼을 때만 보고한다.
+                if loop_stats.overruns > reported_overruns:
+                    logger.warning(f"polling loop overran its interval: {loop_stats}")
+                    reported_overruns = loop_stats.overruns
+                last_report = time.monotonic()
+            # 다음 조회 예정 시각까지 대기함. 일정보다 늦어진 경우에는 대기하지 않고 따라잡는다.
+            sleep_millis = loop_stats.sleep_time(time.monotonic()) * 1000
+            if sleep_millis > 10:
+                if stop is not None:
+                    stop.wait(sleep_millis / 1000)
+                else:
+                    time.sleep(sleep_millis / 1000)
+    finally:
+        logger.info(f"ingest: {monitor.ingest.stats}")
+        logger.info(f"loop: {loop_stats}")
+        logger.info(f"inspection modes: {dict(shedder.decisions)}, re-inspection: {reinspection.stats()}")
+        reinspection.stop(timeout=5)
+        apply_reinspections()
+        profiler.close()
+        if control is not None:
+            control.disconnect()
+        save_checkpoint()
+        checkpointer.stop(timeout=5)
+        for drainer in drainers:
+            drainer.stop(timeout=5)
+        db_spool.close()
+        mdt_spool.close()
         
 def main():
     parser = argparse.ArgumentParser(description="Merge multiple CSV files")
@@ -14,7 +14,6 @@ from mdtpy.client import MDTInstance
 from welder import ElectricCurrentMeasure, NozzleProductionAudit, extract_last_waveform, log_nozzle_waveform, process_nozzle_waveform
 from welder.mqtt_client import MQTTClient
 from welder.database_utils import open_connection, create_nozzle_production_audit_table
-from paho.mqtt.client import MQTTMessage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('inspect_waveform')
@@ -69,12 +68,10 @@ def run(args):
 
 
 last_status = None
-def on_status_changed(client, userdata, msg:MQTTMessage):
+def on_status_changed(topic:str, payload:dict):
     global last_status, instance
 
-    topic = msg.topic
     try:
-        payload = json.loads(msg.payload.decode('utf-8'))
         value = payload['value']
         job_finished = (value == 'IDLE' and last_status == 'WORKING')
         last_status = value
@@ -90,8 +87,6 @@ def on_status_changed(client, userdata, msg:MQTTMessage):
         with open_connection(DATABASE_PARAMS) as conn:
             log_nozzle_waveform(conn, logEntry)
 
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON payload from topic {topic}")
     except Exception as e:
         logger.error(f"Error processing message from topic {topic}: {e}")
   
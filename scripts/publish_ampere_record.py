@@ -9,13 +9,17 @@ import time
 from datetime import datetime, timedelta
 import logging
 import json
+import numpy as np
 import paho.mqtt.client as mqtt
 
 from pyutils.utils import synchronize_time
 from mdtpy import connect
 
 from welder import ElectricCurrentMeasure, read_measures_from_csv
+from welder.payload import FORMATS, FORMAT_TEXT, encode_samples, label_samples
 from welder.database_utils import open_connection, create_ampere_log_table_if_absent, log_measure
+from welder.replay import ReplayScheduler
+from welder.ingest import reorder
 
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
@@ -34,13 +38,29 @@ def define_args(parser):
     parser.add_argument("files", nargs='+', help="CSV files to be merged")
     parser.add_argument("--interval", type=int, default=1000, help="Interval in milliseconds")
     parser.add_argument("--sync", action='store_true', default=False)
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Replay the original timestamps this many times faster (overrides --interval)")
+    parser.add_argument("--line", action='store_true', default=False,
+                        help="Replay each CSV file as a separate welder ('<mqtt-topic>/<index>') on one schedule")
     parser.add_argument("--mqtt-broker", type=str, default=MQTT_BROKER, help="MQTT broker address")
     parser.add_argument("--mqtt-port", type=int, default=MQTT_PORT, help="MQTT broker port")
     parser.add_argument("--mqtt-topic", type=str, default=MQTT_TOPIC, help="MQTT topic to publish")
+    parser.add_argument("--batch", type=int, default=1, help="Number of samples per message")
+    parser.add_argument("--format", choices=FORMATS, default=FORMAT_TEXT,
+                        help="Payload format ('text' carries a single sample without timestamp and state)")
+    parser.add_argument("--welders", type=int, default=1,
+                        help="Number of simulated welders (topic: '<mqtt-topic>/<welder>' or '{welder}' in topic)")
+    parser.add_argument("--rate", type=float, default=None, help="Samples per second per welder (batch mode)")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to publish in batch mode (default: one pass)")
   
 def get_utc_millis(measure:ElectricCurrentMeasure):
     return round(measure.timestamp.timestamp() * 1000)
 
+def welder_topic(topic:str, welder:int, nwelders:int) -> str:
+    if '{welder}' in topic:
+        return topic.format(welder=welder)
+    return topic if nwelders == 1 else f'{topic}/{welder}'
+
 def run(args):
     # MQTT 클라이언트 설정
     mqtt_client = mqtt.Client()
@@ -48,50 +68,106 @@ def run(args):
     mqtt_client.connect(args.mqtt_broker, args.mqtt_port)
     mqtt_client.loop_start()
 
-    readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
-    measures = heapq.merge(*readers, key=lambda m: m.timestamp)
-    measures = compact(measures)
+    if args.batch > 1 or args.welders > 1 or args.format != FORMAT_TEXT:
+        run_batched(args, mqtt_client)
+    else:
+        run_single(args, mqtt_client)
+    
+    mqtt_client.loop_stop()
+    mqtt_client.disconnect()
+
+def run_single(args, mqtt_client:mqtt.Client):
     if args.sync:
-        measures = synchronize_time(measures, utc_millis=get_utc_millis)
+        readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+        measures = reorder(heapq.merge(*readers, key=lambda m: m.timestamp))
+        batches = ([(0, m)] for m in synchronize_time(measures, utc_millis=get_utc_millis))
+        topics = [args.mqtt_topic]
+        scheduler = None
     else:
-        measures = emulate_measure(measures, args.interval)
+        # 모든 스트림을 하나의 timer wheel로 절대 일정에 맞추어 재생한다.
+        scheduler = ReplayScheduler(speed=args.speed or 1.0)
+        interval = None if args.speed else args.interval / 1000
+        if args.line:
+            # 각 CSV 파일을 서로 다른 용접기로 보고 같은 시각 축에서 함께 재생한다.
+            topics = [welder_topic(args.mqtt_topic, w, len(args.files)) for w in range(len(args.files))]
+            for w, csv_file in enumerate(args.files):
+                scheduler.add_stream(w, reorder(read_measures_from_csv(csv_file)), interval=interval)
+        else:
+            topics = [args.mqtt_topic]
+            readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+            scheduler.add_stream(0, reorder(heapq.merge(*readers, key=lambda m: m.timestamp)), interval=interval)
+        batches = scheduler.run(report_interval=5)
 
     count = 0
     started = time.time()
-    # 데이터베이스에 연결하고, 전류 로그 테이블이 없으면 생성한다.
-    for measure in measures:
-        # logger.info(f"ts={measure.timestamp} ampere={measure.ampere:.3}")
-        
-        # MQTT로 전류 값 publish
-        payload = str(measure.ampere)
-        mqtt_client.publish(args.mqtt_topic, payload)
-        count += 1
-        if count % 1000 == 0:
-            millis_per_msg = int(((time.time() - started) * 1000) / count)
-            logger.info(f"published {count} messages {millis_per_msg} millis/msg")
-    
-    mqtt_client.loop_stop()
-    mqtt_client.disconnect()
+    for batch in batches:
+        for w, measure in batch:
+            # MQTT로 전류 값 publish
+            payload = str(measure.ampere)
+            mqtt_client.publish(topics[w], payload)
+            count += 1
+            if count % 1000 == 0:
+                millis_per_msg = int(((time.time() - started) * 1000) / count)
+                logger.info(f"published {count} messages {millis_per_msg} millis/msg")
+    if scheduler is not None:
+        logger.info(f"replay: {scheduler.stats}")
 
-def emulate_measure(measures:Iterable[ElectricCurrentMeasure], interval:int) -> Generator[ElectricCurrentMeasure,None,None]:
-    for measure in measures:
-        started = time.time()
-        yield measure
-        wait_time = interval - (time.time() - started)*1000
-        if wait_time > 1:
-            time.sleep((wait_time) / 1000)
+def run_batched(args, mqtt_client:mqtt.Client):
+    """
+    여러 용접기의 전류 샘플을 N개씩 묶어 publish한다.
+    
+    CSV의 전류 값을 한 번만 읽어 `WorkRecognizer`로 인식한 상태 코드와 함께 배열로 만든 뒤,
+    각 용접기는 서로 다른 위치부터 이를 순환하며 사용한다. 샘플 시각은 절대 일정(시작 시각 + k / rate)에 따라 부여하고, 각 묶음도
+    그 일정에 맞추어 publish하므로 처리 지연이 누적되지 않는다.
+    """
+    readers = [read_measures_from_csv(csv_file) for csv_file in args.files]
+    amperes, states = label_samples(reorder(heapq.merge(*readers, key=lambda m: m.timestamp)))
+    nsamples = len(amperes)
+    
+    rate = args.rate if args.rate else 1000.0 / args.interval
+    batch = args.batch
+    topics = [welder_topic(args.mqtt_topic, w, args.welders) for w in range(args.welders)]
+    offsets = [(w * nsamples) // args.welders for w in range(args.welders)]
+    total_batches = int(args.duration * rate / batch) if args.duration else nsamples // batch
+    
+    period = batch / rate
+    start_wall_ms = time.time() * 1000
+    start = time.monotonic()
+    sample_step_ms = 1000.0 / rate
+    batch_offsets = np.arange(batch)
+    published = 0
+    last_report = start
+    for k in range(total_batches):
+        # 다음 묶음의 예정 시각까지 대기한다.
+        due = start + k * period
+        wait = due - time.monotonic()
+        if wait > 0.001:
+            time.sleep(wait)
             
-def compact(measures:Iterable[ElectricCurrentMeasure]) -> Generator[ElectricCurrentMeasure,None,None]:
-    last_ts = None
-    for measure in measures:
-        if last_ts is None or last_ts < measure.timestamp:
-            yield measure
-    last_ts = measure.timestamp
+        seq = k * batch + batch_offsets
+        times = (start_wall_ms + seq * sample_step_ms).astype(np.int64)
+        for topic, offset in zip(topics, offsets):
+            idx = (offset + seq) % nsamples
+            payload = encode_samples(times, amperes[idx], states[idx], format=args.format)
+            mqtt_client.publish(topic, payload)
+        published += batch * len(topics)
+        
+        now = time.monotonic()
+        if now - last_report >= 5:
+            lag = now - due
+            logger.info(f"published {published} samples, {published / (now - start):.0f} samples/s, lag={lag*1000:.1f}ms")
+            last_report = now
+    
+    elapsed = time.monotonic() - start
+    logger.info(f"published {published} samples in {elapsed:.1f}s ({published / max(elapsed, 1e-9):.0f} samples/s)")
 
 def main():
     parser = argparse.ArgumentParser(description="Update welder parameters")
     define_args(parser)
     args = parser.parse_args()
+    if args.format == FORMAT_TEXT and args.batch > 1:
+        parser.error(f"--format {FORMAT_TEXT} carries a single sample per message: use --format json or binary "
+                     f"with --batch {args.batch}")
     run(args)
 
 if __name__ == '__main__':
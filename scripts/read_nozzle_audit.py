@@ -1,13 +1,12 @@
 from __future__ import annotations
 
-import sys
-import csv
+import time
 import argparse
 from datetime import datetime
 import logging
-from typing import Generator
 
-from welder import NozzleProductionAudit
+from welder.audit import read_audit_frame_from_csv
+from welder.rollup import RESOLUTIONS, DEFAULT_SHIFT_HOURS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('read_nozzle_audit')
@@ -15,43 +14,55 @@ logger = logging.getLogger('read_nozzle_audit')
 def define_args(parser):
     parser.add_argument("input", nargs='?', default="output.csv", help="Input CSV file path (default: output.csv)")
     parser.add_argument("--delimiter", default=",", help="CSV delimiter character")
-
-def read_audit_csv(file_path: str, delimiter: str = ",") -> Generator[NozzleProductionAudit, None, None]:
-    """
-    CSV 파일을 읽어서 NozzleProductionAudit 객체를 생성하는 제너레이터
-    
-    Args:
-        file_path: CSV 파일 경로
-        delimiter: CSV 구분자 (기본값: 쉼표)
-        
-    Yields:
-        NozzleProductionAudit: CSV의 각 행을 변환한 객체
-    """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter=delimiter)
-        for row in reader:
-            try:
-                # CSV의 각 필드를 NozzleProductionAudit 객체의 필드에 맞게 변환
-                audit_data = {
-                    'Timestamp': datetime.fromisoformat(row['timestamp']),
-                    'QuantityProduced': int(row['quantity_produced']),
-                    'AvgProcessingTime': float(row['avg_processing_time'])/1000,
-                    'AvgWaitingTime': float(row['avg_waiting_time'])/1000,
-                    'DefectVolume': int(row['defect_volume']),
-                    'AvgDefectRate': float(row['avg_defect_rate'])
-                }
-                audit = NozzleProductionAudit(**audit_data)
-                yield audit
-            except (KeyError, ValueError) as e:
-                logger.error(f"Error processing row: {row}, Error: {e}")
-                continue
+    parser.add_argument("--welder-id", default=None,
+                        help="여러 용접기의 기록이 섞인 파일에서 읽을 용접기 식별자 (welder_id 컬럼)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help="조회 구간의 시작 시각 (ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="조회 구간의 끝 시각 (ISO 8601)")
+    parser.add_argument("--resolution", choices=RESOLUTIONS, default=None,
+                        help="지정하면 기록 대신 구간(분/시/교대)별 집계를 출력")
+    parser.add_argument("--shift-hours", type=int, nargs='+', default=list(DEFAULT_SHIFT_HOURS),
+                        help="교대 시작 시각들 (기본값: 6 14 22)")
+    parser.add_argument("--nozzles", action='store_true', default=False,
+                        help="누적 평균으로부터 복원한 노즐별 처리/대기 시간을 출력")
+    parser.add_argument("--max-relative-error", type=float, default=0.1,
+                        help="--nozzles: 평균값의 반올림 오차(누적 수량 × 0.5ms)의 상한이 값의 이 비율을 넘는 "
+                             "노즐은 출력하지 않음 (기본값: 0.1, 음수이면 모두 출력)")
 
 def run(args):
-    count = 0
-    for audit in read_audit_csv(args.input, args.delimiter):
-        print(audit)
-        count += 1
-    logger.info(f"Processed {count} records from {args.input}")
+    started = time.perf_counter()
+    frame = read_audit_frame_from_csv(args.input, args.delimiter, args.welder_id)
+    logger.info(f"loaded {len(frame)} records from {args.input} in {time.perf_counter() - started:.3f}s")
+
+    if args.resolution is not None:
+        buckets = frame.buckets(args.resolution, tuple(args.shift_hours), args.start, args.end)
+        for i, start in enumerate(buckets.starts):
+            print(f"{start.isoformat()}: quantity={buckets.quantity[i]}, defects={buckets.defects[i]}, "
+                  f"processing={buckets.avg_processing_time[i]:.0f}ms, waiting={buckets.avg_waiting_time[i]:.0f}ms, "
+                  f"defect_rate={buckets.defect_rate[i]:.3f}")
+        count = len(buckets)
+    elif args.nozzles:
+        deltas = frame.deltas().window(args.start, args.end)
+        max_error = args.max_relative_error if args.max_relative_error >= 0 else None
+        nozzles = deltas.nozzles(max_error)
+        for ts, proc, wait, defect, proc_err, wait_err \
+                in zip(nozzles.times.tolist(), nozzles.processing_time.tolist(), nozzles.waiting_time.tolist(),
+                       nozzles.defects.tolist(), nozzles.processing_error.tolist(), nozzles.waiting_error.tolist()):
+            print(f"{ts.isoformat()}: processing={proc:.0f}±{proc_err:.1f}ms, waiting={wait:.0f}±{wait_err:.1f}ms, "
+                  f"defect={bool(defect)}")
+        count = len(nozzles)
+        omitted = len(deltas.nozzles()) - count
+        if omitted:
+            # 누적 수량이 커질수록 복원한 노즐별 시간의 오차(±누적 수량 × 0.5ms 정도)가 값 자체에 가까워진다.
+            logger.warning(f"omitted {omitted} nozzles whose reconstruction error exceeds "
+                           f"{args.max_relative_error:.0%} of the value (up to ±{deltas.processing_error.max():.0f}ms "
+                           f"at quantity {frame.quantity_produced.max()}); per-nozzle times cannot be recovered "
+                           f"from cumulative averages rounded to milli-seconds")
+    else:
+        window = frame.window(args.start, args.end)
+        for audit in window.audits():
+            print(audit)
+        count = len(window)
+    logger.info(f"Processed {count} records from {args.input} in {time.perf_counter() - started:.3f}s")
 
 def main():
     parser = argparse.ArgumentParser(description="Read nozzle production audit records from CSV")
@@ -60,4 +71,4 @@ def main():
     run(args)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import csv
+import time
+import heapq
+import argparse
+import itertools
+import logging
+
+import numpy as np
+
+from welder import read_measures_from_csv
+from welder.waveform import segment_waveforms
+from welder.work_recognizer import WorkRecognizer, START_THRESHOLD, END_THRESHOLD, VALUE_THRESHOLD
+from welder.features import FEATURES, extract_features, inspect_features
+from welder.reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+from welder.sweep import DEFAULT_INSPECTION_THRESHOLDS, sweep_inspection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sweep_thresholds')
+
+
+def _dtw_threshold(text:str):
+    return None if text.lower() == 'none' else float(text)
+
+def define_args(parser):
+    parser.add_argument("files", nargs='+', help="CSV files of ampere measures")
+    parser.add_argument("--output", default="threshold_sweep.csv", help="Output CSV file path")
+    parser.add_argument("--library", default=None, help="Reference library file (default: built-in patterns)")
+    parser.add_argument("--welder-type", default=DEFAULT_WELDER_TYPE, help="Welder type of the measures")
+    # 판정 임계값 후보들 (격자 전체를 한 번에 평가한다)
+    parser.add_argument("--height", type=float, nargs='+', default=[DEFAULT_INSPECTION_THRESHOLDS['height']],
+                        help="최대 피크 높이 임계값 후보들")
+    parser.add_argument("--peak-floor", type=float, nargs='+', default=[DEFAULT_INSPECTION_THRESHOLDS['peak_floor']],
+                        help="최대 전류 임계값 후보들")
+    parser.add_argument("--width", type=float, nargs='+', default=[DEFAULT_INSPECTION_THRESHOLDS['width_threshold']],
+                        help="피크 너비 임계값 후보들")
+    parser.add_argument("--dtw", type=_dtw_threshold, nargs='+', default=[DEFAULT_INSPECTION_THRESHOLDS['dtw_threshold']],
+                        help="DTW 거리 임계값 후보들 ('none'이면 DTW 조건을 검사하지 않음)")
+    # 작업 인식 임계값 후보들 (인식은 순차적이므로 조합마다 파형을 다시 분할한다)
+    parser.add_argument("--start-threshold", type=float, nargs='+', default=[START_THRESHOLD],
+                        help="작업 시작 전류 임계값 후보들")
+    parser.add_argument("--end-threshold", type=float, nargs='+', default=[END_THRESHOLD],
+                        help="작업 종료 전류 임계값 후보들")
+    parser.add_argument("--value-threshold", type=float, nargs='+', default=[VALUE_THRESHOLD],
+                        help="종료 판단에 사용하는 피크 전류 임계값 후보들")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="특징 행렬을 한 번에 계산하는 파형 수")
+
+def waveform_features(files:list[str], recognizer:WorkRecognizer, library, welder_type:str,
+                      chunk_size:int) -> np.ndarray:
+    """
+    파일들의 측정값을 시각 순서로 읽으면서 파형으로 분할하고, `chunk_size`개의 파형씩 특징 행렬을 계산한다.
+    측정값과 파형을 모두 메모리에 올리지 않으므로, 인식 임계값 조합마다 파일을 다시 읽는다.
+    """
+    readers = [read_measures_from_csv(csv_file) for csv_file in files]
+    waveforms = segment_waveforms(heapq.merge(*readers, key=lambda m: m.timestamp), recognizer)
+    chunks = []
+    while chunk := list(itertools.islice(waveforms, chunk_size)):
+        chunks.append(extract_features(chunk, library, welder_type))
+    return np.vstack(chunks) if chunks else np.empty((0, len(FEATURES)))
+
+def run(args):
+    library = ReferenceLibrary.load(args.library) if args.library else None
+    grid = { 'height': args.height, 'peak_floor': args.peak_floor, 'width_threshold': args.width,
+             'dtw_threshold': args.dtw }
+
+    with open(args.output, 'w', newline='') as f:
+        writer = None
+        configs = 0
+        for start, end, value in itertools.product(args.start_threshold, args.end_threshold, args.value_threshold):
+            started = time.perf_counter()
+            recognizer = WorkRecognizer(start, end, value)
+            features = waveform_features(args.files, recognizer, library, args.welder_type, args.chunk_size)
+            segmented = time.perf_counter()
+
+            # 일치율은 같은 파형들을 기본 판정 임계값으로 판정한 결과와 비교한다.
+            result = sweep_inspection(features, grid, reference=inspect_features(features))
+            for row in result.rows():
+                row = { 'start_threshold': start, 'end_threshold': end, 'value_threshold': value,
+                        'waveforms': result.total, **row }
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            configs += result.defects.size
+            logger.info(f"recognizer=({start}, {end}, {value}): waveforms={result.total}, "
+                        f"segmentation={segmented - started:.3f}s, "
+                        f"sweep of {result.defects.size} configurations={time.perf_counter() - segmented:.3f}s")
+    logger.info(f"wrote {configs} configurations to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate grids of work recognition and inspection thresholds")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
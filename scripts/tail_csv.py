@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from welder import NozzleProductionAudit, inspect_waveform
+from welder.tail import CsvTailer
+from welder.monitor import NozzleMonitor, EVENT_STARTED, EVENT_FINISHED
+from welder.production import ProductionTracker
+from welder.checkpoint import Checkpointer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('tail_csv')
+
+
+def define_args(parser):
+    parser.add_argument("directory", help="용접기가 CSV 파일을 기록하는 디렉토리")
+    parser.add_argument("--pattern", default="*.csv", help="따라 읽을 파일 이름 패턴")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="디렉토리 검사 주기(초). inotify를 사용할 수 없으면 이 주기로만 변경을 감지한다")
+    parser.add_argument("--no-inotify", action='store_true', default=False, help="inotify를 사용하지 않음")
+    parser.add_argument("--lateness", type=int, default=0,
+                        help="늦게 도착한 전류 값을 재정렬하기 위해 기다리는 시간(milli-second)")
+    parser.add_argument("--checkpoint", default="checkpoint/tail_csv.ckpt",
+                        help="파일별 읽은 위치와 인식기/생산 통계 상태를 저장할 체크포인트 파일")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="체크포인트 저장 주기(초)")
+
+def run(args):
+    checkpointer = Checkpointer(args.checkpoint, interval=args.checkpoint_interval)
+    saved = checkpointer.load()
+    tailer = CsvTailer(args.directory, args.pattern, poll_interval=args.poll_interval,
+                       use_inotify=not args.no_inotify)
+    if saved is not None:
+        # 파일별 읽은 위치와 인식기 상태를 함께 복원하여, 이미 처리한 측정값을 다시 읽지 않는다.
+        tailer.restore(saved['tailer'])
+        monitor = NozzleMonitor.from_snapshot(saved['monitor'])
+        tracker:ProductionTracker = saved['tracker']
+    else:
+        monitor = NozzleMonitor()
+        tracker = ProductionTracker(NozzleProductionAudit(Timestamp=datetime.min, QuantityProduced=0,
+                                                          AvgProcessingTime=timedelta(0),
+                                                          AvgWaitingTime=timedelta(0),
+                                                          DefectVolume=0, AvgDefectRate=0.0))
+    monitor.ingest.lateness = timedelta(milliseconds=args.lateness)
+    checkpointer.start()
+
+    def save_checkpoint() -> None:
+        checkpointer.save({ 'tailer': tailer.snapshot(), 'monitor': monitor.snapshot(), 'tracker': tracker })
+
+    try:
+        for measures in tailer.follow():
+            started = time.perf_counter()
+            for measure in measures:
+                for m in monitor.ingest.push(measure):
+                    event = monitor.update(m.timestamp, m.ampere)
+                    if event is None:
+                        continue
+                    kind, waveform = event
+                    if kind == EVENT_STARTED and waveform:
+                        tracker.on_started(waveform.waiting_time)
+                    elif kind == EVENT_FINISHED:
+                        # 기존 스크립트들과 같이 inspect_waveform()의 결과가 True인 파형을 불량으로 본다.
+                        is_defect = inspect_waveform(waveform)
+                        tracker.on_finished(waveform[-1].timestamp, waveform[-1].timestamp - waveform[0].timestamp,
+                                            is_defect)
+                        print(tracker.production)
+            logger.debug(f"processed {len(measures)} measures in {(time.perf_counter() - started) * 1000:.1f}ms")
+            if checkpointer.due():
+                save_checkpoint()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"read {tailer.bytes_read} bytes (invalid lines={tailer.invalid_lines}), "
+                    f"ingest: {monitor.ingest.stats}")
+        save_checkpoint()
+        checkpointer.stop(timeout=5)
+        tailer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a directory of growing CSV files and inspect nozzle waveforms")
+    define_args(parser)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 데이터베이스 테스트는 테스트 전용 PostgreSQL 데이터베이스가 지정된 경우에만 수행한다.
+# (예: WELDER_TEST_DSN="dbname=welder_test user=postgres host=localhost")
+TEST_DSN_VARIABLE = 'WELDER_TEST_DSN'
+TEST_TABLES = ('nozzle_productions', 'nozzle_production_rollups', 'welder_ampere_pyramid')
+
+
+@pytest.fixture
+def pg_conn():
+    dsn = os.environ.get(TEST_DSN_VARIABLE)
+    if not dsn:
+        pytest.skip(f'{TEST_DSN_VARIABLE} is not set')
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    def drop_tables():
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(TEST_TABLES)}")
+        conn.commit()
+    drop_tables()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        drop_tables()
+        conn.close()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+import pytest
+
+from welder.audit import AUDIT_COLUMNS, WELDER_ID_COLUMN, read_audit_frame_from_csv
+
+
+def processing_time(q:int) -> float:
+    return 2000.0 + q % 7
+
+
+def write_audits(path, quantity:int) -> None:
+    # ProductionTracker와 같이 누적 평균 시간을 milli-second 단위로 반올림하여 기록한다.
+    lines = [','.join(AUDIT_COLUMNS)]
+    processing_sum = waiting_sum = 0.0
+    for q in range(1, quantity + 1):
+        processing_sum += processing_time(q)
+        waiting_sum += 500.0 + q % 3 if q > 1 else 0.0
+        lines.append(f"2023-05-25 04:{q // 60:02d}:{q % 60:02d},{q},{round(processing_sum / q)},"
+                     f"{round(waiting_sum / (q - 1)) if q > 1 else 0},0,0.0")
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def test_malformed_rows_are_skipped(tmp_path, caplog):
+    path = tmp_path / 'audit.csv'
+    write_audits(path, 5)
+    lines = path.read_text(encoding='utf-8').splitlines()
+    lines.insert(3, '2023-05-25 04:00:02,x,2000,500,0,0.0')
+    lines.insert(5, '2023-05-25 04:00:03,3')
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    with caplog.at_level(logging.ERROR, logger='welder.audit'):
+        frame = read_audit_frame_from_csv(str(path))
+    assert frame.quantity_produced.tolist() == [1, 2, 3, 4, 5]
+    assert sum('Error processing row' in r.message for r in caplog.records) == 2
+
+
+def test_nozzles_drop_unreliable_reconstructions(tmp_path):
+    path = tmp_path / 'audit.csv'
+    write_audits(path, 3000)
+    deltas = read_audit_frame_from_csv(str(path)).deltas()
+
+    nozzles = deltas.nozzles()
+    assert len(nozzles) == 3000
+    # 오차의 상한은 누적 수량에 비례하고, 실제 복원 오차는 그 상한 안에 있다.
+    expected = np.array([processing_time(q) for q in range(1, 3001)])
+    assert (np.abs(nozzles.processing_time - expected) <= nozzles.processing_error + 1e-6).all()
+    assert nozzles.processing_error[-1] > 2000.0
+
+    reliable = deltas.nozzles(max_relative_error=0.1)
+    assert 0 < len(reliable) < len(nozzles)
+    assert (reliable.processing_error <= 0.1 * reliable.processing_time).all()
+
+
+def test_multi_welder_export_is_filtered_by_welder_id(tmp_path):
+    single = tmp_path / 'audit.csv'
+    write_audits(single, 10)
+    header, *rows = single.read_text(encoding='utf-8').splitlines()
+    # 두 용접기의 기록이 같은 시각들에 교차하여 저장된 export
+    lines = [f'{WELDER_ID_COLUMN},{header}']
+    for row in rows:
+        lines += [f'w1,{row}', f'w2,{row.replace(",0,0.0", ",1,0.1")}']
+    path = tmp_path / 'welders.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        read_audit_frame_from_csv(str(path))
+    w1 = read_audit_frame_from_csv(str(path), welder_id='w1')
+    assert w1.quantity_produced.tolist() == list(range(1, 11))
+    assert w1.defect_volume.tolist() == [0] * 10
+    assert (w1.deltas().quantity == 1).all()
+    assert read_audit_frame_from_csv(str(path), welder_id='w2').defect_volume.tolist() == [1] * 10
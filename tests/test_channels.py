@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+import random
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from welder.reader import read_measures_from_csv, read_channel_rows_from_csv, detect_csv_layout, \
+                          LAYOUT_CHANNEL, LAYOUT_VALUE, DEFAULT_CHANNEL
+from welder.ingest import IngestStage
+from welder.monitor import NozzleMonitor, EVENT_FINISHED
+from welder.channels import ChannelMonitor
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DATA_FILE = os.path.join(DATA_DIR, 'fasten.csv')
+CHANNELS = ('a', 'b', 'c')
+SCALES = np.array([1.0, 0.9, 1.1])
+
+
+@pytest.fixture(scope='module')
+def measures():
+    return list(islice(read_measures_from_csv(DATA_FILE), 20000))
+
+
+def reference_waveforms(measures) -> list[list]:
+    monitor = NozzleMonitor()
+    return [waveform for kind, waveform in monitor.catch_up(measures) if kind == EVENT_FINISHED]
+
+
+def finished(events) -> list:
+    return [waveform for kind, waveform in events if kind == EVENT_FINISHED]
+
+
+def check_alignment(waveforms) -> None:
+    assert waveforms
+    for w in waveforms:
+        assert w.amperes.shape == (len(w.waveform), len(CHANNELS))
+        # 대표 전류('a' 채널)와 채널별 전류가 같은 시각의 값이어야 한다.
+        assert w.amperes[:, 0].tolist() == [m.ampere for m in w.waveform]
+        assert np.allclose(w.amperes, w.amperes[:, :1] * SCALES)
+
+
+def test_channel_rows_align_with_waveform_under_reordering(measures):
+    rng = random.Random(11)
+    delivered = []
+    for i in range(0, len(measures), 8):
+        block = measures[i:i+8]
+        block += rng.sample(block, 1)
+        rng.shuffle(block)
+        delivered += block
+
+    monitor = ChannelMonitor(CHANNELS, driver='a',
+                             monitor=NozzleMonitor(ingest=IngestStage(lateness=timedelta(seconds=3))))
+    events = [e for m in delivered for e in monitor.push(m.timestamp, m.ampere * SCALES)]
+    events += monitor.flush()
+    waveforms = finished(events)
+
+    check_alignment(waveforms)
+    assert [w.waveform for w in waveforms] == reference_waveforms(measures)
+
+
+def test_snapshot_round_trip_during_waveform(measures):
+    monitor = ChannelMonitor(CHANNELS, driver='a')
+    events = []
+    index = 0
+    # 파형이 진행 중인 지점에서 저장하고 복원한다.
+    while not (monitor.monitor.waveform and len(monitor.rows) > 5 and finished(events)):
+        events += monitor.push(measures[index].timestamp, measures[index].ampere * SCALES)
+        index += 1
+    assert len(monitor.rows) == len(monitor.monitor.waveform)
+
+    restored = ChannelMonitor.from_snapshot(monitor.snapshot())
+    for m in measures[index:]:
+        events += restored.push(m.timestamp, m.ampere * SCALES)
+    events += restored.flush()
+    waveforms = finished(events)
+
+    check_alignment(waveforms)
+    assert [w.waveform for w in waveforms] == reference_waveforms(measures)
+
+
+@pytest.mark.parametrize('row, layout', [
+    (['2023-05-25 04:10:56', 'Mean', '5.16258'], LAYOUT_CHANNEL),
+    (['2023-05-25 04:10:56', '5.16258', '-1'], LAYOUT_VALUE),
+    (['2023-05-25 04:10:56', '5.16258'], LAYOUT_VALUE),
+    (['2023-05-25 04:10:56', 'Mean'], LAYOUT_VALUE),
+])
+def test_detect_csv_layout(row, layout):
+    assert detect_csv_layout(row) == layout
+
+
+def test_read_channel_rows_of_each_layout():
+    channel_rows = list(islice(read_channel_rows_from_csv(os.path.join(DATA_DIR, 'test.csv')), 3))
+    assert [(c, v) for _, c, v in channel_rows] == [('Mean', 5.16258), ('Mean', 5.08745), ('Mean', 5.00565)]
+
+    value_rows = list(islice(read_channel_rows_from_csv(DATA_FILE), 3))
+    assert [(c, v) for _, c, v in value_rows] == [(DEFAULT_CHANNEL, 5.16258), (DEFAULT_CHANNEL, 5.08745),
+                                                  (DEFAULT_CHANNEL, 5.00565)]
+    assert [ts for ts, _, _ in value_rows] == [m.timestamp for m in islice(read_measures_from_csv(DATA_FILE), 3)]
+
+    with pytest.raises(ValueError):
+        next(read_channel_rows_from_csv(DATA_FILE, layout='wide'))
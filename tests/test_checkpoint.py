@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from welder.types import NozzleProductionAudit
+from welder.reader import read_measures_from_csv
+from welder.monitor import NozzleMonitor, EVENT_STARTED, EVENT_FINISHED
+from welder.production import ProductionTracker
+from welder.checkpoint import Checkpointer
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+
+def run_nozzles(monitor:NozzleMonitor, tracker:ProductionTracker, measures) -> list[tuple]:
+    """inspect_waveform과 같은 순서로 이벤트를 처리하고, spool에 기록할 'nozzle' 레코드들을 반환한다."""
+    records = []
+    for kind, waveform in monitor.catch_up(measures):
+        if kind == EVENT_STARTED:
+            tracker.on_started(waveform.waiting_time)
+        elif kind == EVENT_FINISHED:
+            processing_time = waveform[-1].timestamp - waveform[0].timestamp
+            waiting_time = tracker.last_waiting_time
+            is_defect = max(m.ampere for m in waveform) > 80
+            tracker.on_finished(waveform[-1].timestamp, processing_time, is_defect)
+            records.append((asdict(tracker.production),
+                            (waveform[-1].timestamp, processing_time, waiting_time, is_defect)))
+    return records
+
+
+def test_catch_up_from_older_checkpoint_reemits_identical_records(tmp_path):
+    measures = list(islice(read_measures_from_csv(DATA_FILE), 6000))
+    monitor = NozzleMonitor()
+    tracker = ProductionTracker(NozzleProductionAudit(datetime(2023, 5, 25), 0, timedelta(0), timedelta(0), 0, 0.0))
+
+    checkpointer = Checkpointer(str(tmp_path / 'ckpt')).start()
+    before = run_nozzles(monitor, tracker, measures[:3000])
+    checkpointer.save({ 'monitor': monitor.snapshot(), 'tracker': tracker })
+    checkpointer.stop(timeout=5)
+
+    # checkpoint 이후의 기록은 spool에 이미 들어간 채로 중단된 경우
+    spooled = run_nozzles(monitor, tracker, measures[3000:])
+    assert before and spooled
+
+    # 재시작: 이전 checkpoint에서 Tail 세그먼트 전체를 다시 따라잡는다.
+    saved = Checkpointer(str(tmp_path / 'ckpt')).load()
+    replayed = run_nozzles(NozzleMonitor.from_snapshot(saved['monitor']), saved['tracker'], measures)
+
+    # 같은 노즐은 같은 (시각, 생산 통계)로 다시 기록되므로, 자연 키로 upsert하고
+    # 새로 삽입된 경우에만 집계하는 record_nozzle_productions()에서 중복되지 않는다.
+    assert replayed == spooled
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+
+from welder.types import ElectricCurrentMeasure
+from welder.compression import AmpereCompressor, reconstruct
+
+
+def idle_measures(count:int, duplicates:set[int]) -> list[ElectricCurrentMeasure]:
+    start = datetime(2025, 3, 1)
+    measures = []
+    for i in range(count):
+        m = ElectricCurrentMeasure(start + timedelta(milliseconds=100 * i), 4.6 + 0.5 * math.sin(i / 5))
+        measures.append(m)
+        if i in duplicates:
+            # 같은 시각에 다시 전달된 측정값
+            measures.append(m)
+    return measures
+
+
+def test_duplicate_timestamp_after_emitted_point():
+    compressor = AmpereCompressor()
+    measures = idle_measures(200, duplicates={ 13, 14, 40, 41, 42, 100 })
+    points = [p for m in measures for p in compressor.add(m)]
+    points += compressor.flush()
+
+    assert all(a.timestamp <= b.timestamp for a, b in zip(points, points[1:]))
+    restored = { m.timestamp: m.ampere for m in reconstruct(points) }
+    tolerance = compressor.error + compressor.deadband + 1e-9
+    assert all(abs(restored[m.timestamp] - m.ampere) <= tolerance for m in measures)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from welder.reader import read_measures_from_csv
+from welder.waveform import segment_waveforms, inspect_waveform
+from welder.features import extract_features, inspect_features, inspect_patterns
+from welder.shedding import inspect_waveform_in_mode
+from welder.types import INSPECTION_FULL
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+
+@pytest.fixture(scope='module')
+def waveforms():
+    return list(segment_waveforms(read_measures_from_csv(DATA_FILE)))
+
+
+def test_single_waveform_verdicts_match_feature_matrix(waveforms):
+    reference = inspect_features(extract_features(waveforms)).tolist()
+    assert 0 < sum(reference) < len(reference)
+    assert [inspect_waveform(w) for w in waveforms] == reference
+    assert [inspect_waveform_in_mode(w, INSPECTION_FULL) for w in waveforms] == reference
+
+
+@pytest.mark.parametrize('dtw_threshold', [0.5, 2.0, 4.0])
+def test_pattern_verdicts_match_exact_dtw(waveforms, dtw_threshold):
+    reference = inspect_features(extract_features(waveforms), width_threshold=1.0, dtw_threshold=dtw_threshold)
+    verdicts = inspect_patterns(extract_features(waveforms, dtw=False), width_threshold=1.0,
+                                dtw_threshold=dtw_threshold)
+    assert verdicts.tolist() == reference.tolist()
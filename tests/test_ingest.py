@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+import random
+from datetime import timedelta
+from itertools import islice
+
+from welder.reader import read_measures_from_csv
+from welder.ingest import IngestStage, reorder
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+
+def test_reorder_and_deduplicate_within_lateness():
+    measures = list(islice(read_measures_from_csv(DATA_FILE), 5000))
+    rng = random.Random(7)
+    # 측정 간격이 200ms이므로 10개씩(2초 이내) 섞고, 일부 측정값은 한 번 더 보낸다.
+    delivered = []
+    for i in range(0, len(measures), 10):
+        block = measures[i:i+10]
+        block += rng.sample(block, 2)
+        rng.shuffle(block)
+        delivered += block
+
+    stage = IngestStage(lateness=timedelta(seconds=3))
+    released = list(reorder(delivered, stage))
+    assert released == measures
+    assert stage.stats.duplicates == len(delivered) - len(measures)
+    assert stage.stats.late == 0 and stage.stats.forced == 0
+
+
+def test_measure_later_than_lateness_is_dropped():
+    measures = list(islice(read_measures_from_csv(DATA_FILE), 100))
+    late = measures.pop(10)
+    stage = IngestStage(lateness=timedelta(seconds=1))
+    released = list(reorder(measures[:50] + [late] + measures[50:], stage))
+    assert released == measures
+    assert stage.stats.late == 1
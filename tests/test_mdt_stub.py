@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from welder.mdt_stub import MDTServerStub, MDTStubError, LatencyProfile, default_nozzle_production
+from welder.inspect_nozzle import read_tail_measures
+
+
+def calls(stub:MDTServerStub, count:int) -> int:
+    """'Status' 파라미터를 `count`번 읽고 실패한 횟수를 반환한다."""
+    parameter = stub.instances['w1'].parameters['Status']
+    failures = 0
+    for _ in range(count):
+        try:
+            parameter.read_value()
+        except MDTStubError:
+            failures += 1
+    return failures
+
+
+def make_stub(profile:LatencyProfile, **kwargs) -> MDTServerStub:
+    stub = MDTServerStub(profile, **kwargs)
+    stub.add_instance('w1', { 'Status': 'IDLE', 'NozzleProduction': default_nozzle_production() })
+    return stub
+
+
+def test_failure_rate_is_applied_and_counted():
+    stub = make_stub(LatencyProfile(failure_rate=0.2), seed=1)
+    failures = calls(stub, 2000)
+    assert 300 < failures < 500
+    summary = stub.summary()
+    assert summary['read_parameter']['calls'] == 2000
+    assert summary['read_parameter']['failures'] == failures
+    assert summary['read_parameter']['latency']['p99'] == 0.0
+
+    # 같은 seed이면 같은 호출들이 실패한다.
+    assert calls(make_stub(LatencyProfile(failure_rate=0.2), seed=1), 2000) == failures
+
+
+def test_latency_is_applied_and_summarized():
+    stub = make_stub(LatencyProfile(latency=0.005, jitter=0.002), seed=2)
+    started = time.monotonic()
+    assert calls(stub, 20) == 0
+    assert time.monotonic() - started >= 20 * 0.005
+    latency = stub.summary()['read_parameter']['latency']
+    assert 5.0 <= latency['p50'] <= latency['p99'] < 50.0
+
+
+def test_outage_windows_fail_every_call():
+    stub = make_stub(LatencyProfile(outages=[(0.0, 60.0), (120.0, 180.0)]))
+    assert calls(stub, 10) == 10
+    # stub 생성 후 90초가 지난 것으로 만든다: 두 장애 구간 사이.
+    stub.started -= 90.0
+    assert calls(stub, 10) == 0
+    stub.started -= 60.0
+    assert calls(stub, 10) == 10
+    assert stub.summary()['read_parameter'] == { 'calls': 30, 'failures': 20,
+                                                'latency': { 'p50': 0.0, 'p95': 0.0, 'p99': 0.0 } }
+
+
+def test_parameters_and_tail_segment():
+    stub = make_stub(LatencyProfile(), tail_size=3)
+    written = []
+    stub.on_write = lambda instance_id, name, value: written.append((instance_id, name, value['ParameterValue']))
+    instance = stub.connect().instances['w1']
+
+    start = datetime(2025, 3, 1, 9)
+    for k in range(5):
+        stub.publish_ampere('w1', start + timedelta(seconds=k), float(k))
+    assert instance.parameters['Ampere'].read_value() == { 'EventDateTime': start + timedelta(seconds=4),
+                                                          'ParameterValue': 4.0 }
+    # Tail 세그먼트에는 최근 `tail_size`개만 남는다.
+    assert [m.ampere for m in read_tail_measures(instance)] == [2.0, 3.0, 4.0]
+
+    instance.parameters['Status'] = 'WORKING'
+    instance.parameters['NozzleProduction'] = { 'EventDateTime': start, 'ParameterValue': { 'QuantityProduced': 1 } }
+    assert instance.parameters['Status'].value == 'WORKING'
+    assert written == [('w1', 'Status', 'WORKING'), ('w1', 'NozzleProduction', { 'QuantityProduced': 1 })]
+    with pytest.raises(KeyError):
+        instance.parameters['Missing'].read_value()
+    with pytest.raises(KeyError):
+        instance.timeseries['WelderAmpereLog'].segment('Head')
+    assert { endpoint: s['calls'] for endpoint, s in stub.summary().items() } \
+        == { 'read_parameter': 3, 'read_segment': 1, 'write_parameter': 2 }
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+import copy
+import math
+import statistics
+from datetime import datetime, timedelta
+from itertools import islice
+
+from welder.types import ElectricCurrentMeasure
+from welder.reader import read_measures_from_csv
+from welder.monitor import IdlePeriod, NozzleMonitor, STATE_IDLE, EVENT_STARTED
+from welder.work_recognizer import WorkRecognizer
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+
+def test_idle_period_stats():
+    start = datetime(2025, 3, 1)
+    amperes = [4.6 + 0.3 * math.sin(i) for i in range(1000)]
+    period = IdlePeriod.from_measures(ElectricCurrentMeasure(start + timedelta(milliseconds=100 * i), a)
+                                      for i, a in enumerate(amperes))
+    assert len(period) == 1000
+    assert period.waiting_time == timedelta(milliseconds=100 * 999)
+    assert math.isclose(period.ampere_mean, statistics.fmean(amperes), rel_tol=1e-12)
+    assert math.isclose(period.ampere_std, statistics.pstdev(amperes), rel_tol=1e-9)
+    assert (period.ampere_min, period.ampere_max) == (min(amperes), max(amperes))
+
+
+def test_waiting_time_of_empty_and_single_sample_periods():
+    empty = IdlePeriod()
+    assert len(empty) == 0 and empty.waiting_time == timedelta(0) and empty.ampere_std == 0.0
+    single = IdlePeriod()
+    single.add(datetime(2025, 3, 1), 4.6)
+    assert single.waiting_time == timedelta(0)
+    assert (single.ampere_mean, single.ampere_std, single.ampere_min, single.ampere_max) == (4.6, 0.0, 4.6, 4.6)
+
+
+def idle_monitor() -> tuple[NozzleMonitor, list[ElectricCurrentMeasure]]:
+    """대기 구간 도중에 멈춘 monitor와 나머지 측정값들."""
+    measures = list(islice(read_measures_from_csv(DATA_FILE), 3000))
+    monitor = NozzleMonitor()
+    for index, m in enumerate(measures):
+        monitor.update(m.timestamp, m.ampere)
+        if monitor.state == STATE_IDLE and len(monitor.idle) >= 20:
+            return monitor, measures[index + 1:]
+    raise AssertionError('no idle period in the data')
+
+
+def started_events(monitor:NozzleMonitor, measures:list[ElectricCurrentMeasure]) -> list[tuple]:
+    events = [monitor.update(m.timestamp, m.ampere) for m in measures]
+    return [(e[1].first, e[1].last, len(e[1]), e[1].waiting_time) for e in events
+            if e is not None and e[0] == EVENT_STARTED]
+
+
+def test_checkpoint_taken_while_idle_is_restored():
+    monitor, rest = idle_monitor()
+    # checkpoint는 pickle로 저장되므로 복원된 객체는 원래 객체와 상태를 공유하지 않는다.
+    restored = NozzleMonitor.from_snapshot(copy.deepcopy(monitor.snapshot()))
+    assert restored.waveform == []
+    assert restored.idle == monitor.idle
+    assert started_events(restored, rest) == started_events(monitor, rest)
+
+
+def test_recognizer_keeps_min_and_max_initial_timestamps_of_unordered_input():
+    start = datetime(2025, 3, 1)
+    recognizer = WorkRecognizer()
+    offsets = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 20, 16, 30, 15, 25]
+    for offset in offsets:
+        recognizer.recognize(start + timedelta(seconds=offset), 4.6)
+    # 버퍼가 채워진 이후(15번째 측정값부터)의 시각들 중 최소/최대값
+    assert recognizer.status_initial_timestamp == [start + timedelta(seconds=14), start + timedelta(seconds=30)]
+    assert WorkRecognizer.from_snapshot(recognizer.snapshot()).status_initial_timestamp \
+        == recognizer.status_initial_timestamp
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('paho.mqtt.client')
+
+from welder.mqtt_client import MQTTClient, DECODE_JSON, DECODE_RAW
+
+
+def deliver(client:MQTTClient, *messages:tuple[str,bytes]) -> None:
+    """paho 네트워크 쓰레드 대신 메시지를 넣고, worker들이 큐를 모두 처리할 때까지 기다린다."""
+    for topic, payload in messages:
+        client._on_message(client.client, None, SimpleNamespace(topic=topic, payload=payload))
+    workers = [threading.Thread(target=client._work, args=(q,), daemon=True) for q in client.queues]
+    for worker, q in zip(workers, client.queues):
+        worker.start()
+        q.put(None, timeout=5)
+    for worker in workers:
+        worker.join(timeout=5)
+
+
+def test_wildcard_subscriptions_route_by_topic():
+    client = MQTTClient()
+    received = []
+    client.subscribe('mdt/+/parameters/Ampere', lambda topic, value: received.append(('ampere', topic, value)))
+    client.subscribe('mdt/#', lambda topic, value: received.append(('all', topic, value)), decode=DECODE_RAW)
+    deliver(client, ('mdt/w1/parameters/Ampere', b'{"a": 1}'),
+                    ('mdt/w1/parameters/Status', b'IDLE'),
+                    ('other/w1/parameters/Ampere', b'{}'))
+    assert received == [('ampere', 'mdt/w1/parameters/Ampere', { 'a': 1 }),
+                        ('all', 'mdt/w1/parameters/Ampere', b'{"a": 1}'),
+                        ('all', 'mdt/w1/parameters/Status', b'IDLE')]
+    # 매칭 결과는 토픽별로 캐시되며, 구독이 추가되면 다시 계산된다.
+    assert len(client.routes['mdt/w1/parameters/Ampere']) == 2
+    assert client.routes['other/w1/parameters/Ampere'] == []
+    client.subscribe('other/#', lambda topic, value: None)
+    assert client.routes == {}
+
+
+def test_per_topic_handlers_are_created_once_per_topic():
+    client = MQTTClient()
+    created = []
+    received:dict[str,list] = {}
+    def factory(topic:str):
+        created.append(topic)
+        values = received.setdefault(topic, [])
+        return lambda topic, value: values.append(value['seq'])
+    client.subscribe_per_topic('mdt/+/parameters/Ampere', factory, decode=DECODE_JSON)
+    deliver(client, *[(f'mdt/w{w}/parameters/Ampere', json.dumps({ 'seq': seq }).encode())
+                      for seq in range(3) for w in (1, 2)])
+    assert created == ['mdt/w1/parameters/Ampere', 'mdt/w2/parameters/Ampere']
+    assert received == { 'mdt/w1/parameters/Ampere': [0, 1, 2], 'mdt/w2/parameters/Ampere': [0, 1, 2] }
+
+
+def test_handler_errors_are_counted():
+    client = MQTTClient()
+    client.subscribe('mdt/#', lambda topic, value: None)
+    deliver(client, ('mdt/w1', b'not json'), ('mdt/w2', b'{}'))
+    assert client.error_count == 1
+
+
+def test_full_queue_drops_messages():
+    client = MQTTClient(queue_size=2)
+    received = []
+    client.subscribe('mdt/#', lambda topic, value: received.append(value), decode=DECODE_RAW)
+    for seq in range(5):
+        client._on_message(client.client, None, SimpleNamespace(topic='mdt/w1', payload=bytes([seq])))
+    assert client.dropped_count == 3
+    deliver(client)
+    assert received == [b'\x00', b'\x01']
+
+
+def test_disconnect_does_not_block_on_a_full_queue():
+    client = MQTTClient(queue_size=2)
+    client.subscribe('mdt/#', lambda topic, value: None)
+    for seq in range(2):
+        client._on_message(client.client, None, SimpleNamespace(topic='mdt/w1', payload=b'{}'))
+    # worker가 없으므로 큐가 비워지지 않는다.
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (client.disconnect(), done.set()), daemon=True)
+    thread.start()
+    assert done.wait(5)
+    assert client.dropped_count == 2
+    assert [client.queues[0].get_nowait()] == [None]
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from functools import partial
+
+from welder.types import NozzleProductionAudit, INSPECTION_WIDTH_ONLY
+from welder.spool import Spool, SpoolDrainer, CURSOR_FILE
+from welder.rollup import RESOLUTION_HOUR
+from welder.database_utils import create_nozzle_production_audit_table, create_nozzle_production_rollup_table, \
+                                  record_nozzle_productions, record_reinspections, read_nozzle_rollups, \
+                                  read_nozzle_production_frame, merge_nozzle_rollups
+
+
+def nozzle_event(index:int) -> tuple:
+    ts = datetime(2025, 3, 1, 9, 0) + timedelta(seconds=10 * index)
+    processing_time = timedelta(milliseconds=1500 + index)
+    waiting_time = timedelta(seconds=8) if index > 0 else None
+    is_defect = index % 7 == 3
+    audit = NozzleProductionAudit(ts, index + 1, processing_time, waiting_time or timedelta(0),
+                                  index // 7 + (1 if is_defect else 0), 0.0)
+    return audit, (ts, processing_time, waiting_time, is_defect)
+
+
+def rollup_totals(conn) -> list[tuple]:
+    start, end = datetime(2025, 3, 1), datetime(2025, 3, 2)
+    return [(row['bucket_start'], row['quantity_produced'], row['defect_volume'],
+             row['processing_time_sum'], row['waiting_count'], row['waiting_time_sum'])
+            for row in read_nozzle_rollups(conn, RESOLUTION_HOUR, start, end)]
+
+
+def test_replayed_spool_batch_does_not_inflate_rollups(pg_conn, tmp_path):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    handler = partial(record_nozzle_productions, pg_conn, welder_id='w1')
+
+    spool = Spool(str(tmp_path), segment_size=1024*1024)
+    for index in range(50):
+        spool.append('nozzle', nozzle_event(index))
+    assert SpoolDrainer(spool, { 'nozzle': handler }).drain_once() == 50
+    totals = rollup_totals(pg_conn)
+    assert sum(row[1] for row in totals) == 50
+
+    # cursor를 기록하기 전에 중단된 경우처럼 같은 묶음을 다시 재생한다.
+    spool.close()
+    os.remove(tmp_path / CURSOR_FILE)
+    spool = Spool(str(tmp_path), segment_size=1024*1024)
+    assert SpoolDrainer(spool, { 'nozzle': handler }).drain_once() == 50
+    spool.close()
+
+    assert rollup_totals(pg_conn) == totals
+    assert len(read_nozzle_production_frame(pg_conn, welder_id='w1')) == 50
+
+
+def test_partially_replayed_batch_adds_only_new_nozzles(pg_conn):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    events = [nozzle_event(index) for index in range(20)]
+
+    record_nozzle_productions(pg_conn, events[:10], welder_id='w1')
+    # 이미 반영된 앞부분과 새 기록이 섞인 묶음, 묶음 안의 중복 기록
+    record_nozzle_productions(pg_conn, events[5:] + events[15:], welder_id='w1')
+    # 다른 용접기의 같은 시각 기록은 별개의 노즐이다.
+    record_nozzle_productions(pg_conn, events[:1], welder_id='w2')
+
+    totals = rollup_totals(pg_conn)
+    assert sum(row[1] for row in totals) == 21
+    assert sum(row[2] for row in totals) == sum(1 for _, rollup in events if rollup[3]) \
+                                            + (1 if events[0][1][3] else 0)
+
+
+def test_provisional_defects_move_to_defect_volume_when_reinspected(pg_conn):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    events = []
+    for index in range(4):
+        audit, (ts, processing_time, waiting_time, _) = nozzle_event(index)
+        audit.InspectionMode = INSPECTION_WIDTH_ONLY
+        events.append((audit, (ts, processing_time, waiting_time, True)))
+    record_nozzle_productions(pg_conn, events, welder_id='w1')
+
+    def defects() -> tuple[int,int]:
+        rows = read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, datetime(2025, 3, 1), datetime(2025, 3, 2))
+        return sum(r['defect_volume'] for r in rows), sum(r['provisional_defect_volume'] for r in rows)
+    assert defects() == (0, 4)
+
+    results = [(audit.Timestamp, True, index == 0) for index, (audit, _) in enumerate(events[:3])]
+    record_reinspections(pg_conn, results, welder_id='w1')
+    # 같은 결과를 다시 반영해도 두 번 보정하지 않는다.
+    record_reinspections(pg_conn, results, welder_id='w1')
+    assert defects() == (1, 1)
+
+
+def test_bulk_batch_matches_nozzle_by_nozzle_rollups(pg_conn):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    events = [nozzle_event(index) for index in range(2500)]
+    record_nozzle_productions(pg_conn, events, welder_id='w1')
+    bulk = read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, datetime(2025, 3, 1), datetime(2025, 3, 2))
+
+    with pg_conn.cursor() as cur:
+        cur.execute("TRUNCATE nozzle_productions, nozzle_production_rollups")
+    pg_conn.commit()
+    for event in events:
+        record_nozzle_productions(pg_conn, [event], welder_id='w1')
+    single = read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, datetime(2025, 3, 1), datetime(2025, 3, 2))
+
+    assert len(bulk) == len(single) == 7
+    for b, s in zip(bulk, single):
+        for key in ('bucket_start', 'quantity_produced', 'defect_volume', 'processing_time_sum',
+                    'processing_time_min', 'processing_time_max', 'waiting_count', 'waiting_time_sum',
+                    'waiting_time_min', 'waiting_time_max'):
+            assert b[key] == s[key], key
+        assert b['processing_time_sketch'].count == s['processing_time_sketch'].count == b['quantity_produced']
+    assert sum(row['quantity_produced'] for row in bulk) == 2500
+
+
+def test_welders_writing_the_same_bucket_keep_separate_rollups(pg_conn):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    start, end = datetime(2025, 3, 1), datetime(2025, 3, 2)
+    events = [nozzle_event(index) for index in range(30)]
+    record_nozzle_productions(pg_conn, events[:20], welder_id='w1')
+    record_nozzle_productions(pg_conn, events[10:], welder_id='w2')
+
+    w1 = read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, start, end, welder_id='w1')
+    w2 = read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, start, end, welder_id='w2')
+    assert [row['welder_id'] for row in w1] == ['w1'] and [row['welder_id'] for row in w2] == ['w2']
+    assert w1[0]['bucket_start'] == w2[0]['bucket_start']
+    assert (w1[0]['quantity_produced'], w2[0]['quantity_produced']) == (20, 20)
+    assert w1[0]['defect_volume'] == sum(1 for _, rollup in events[:20] if rollup[3])
+    assert w2[0]['defect_volume'] == sum(1 for _, rollup in events[10:] if rollup[3])
+    assert w1[0]['processing_time_sketch'].count == w2[0]['processing_time_sketch'].count == 20
+
+    # 재검사 결과는 해당 용접기의 집계에만 반영된다.
+    audit, _ = events[12]
+    with pg_conn.cursor() as cur:
+        cur.execute("UPDATE nozzle_productions SET inspection_mode = %s WHERE welder_id = 'w2' AND timestamp = %s",
+                    (INSPECTION_WIDTH_ONLY, audit.Timestamp))
+    pg_conn.commit()
+    record_reinspections(pg_conn, [(audit.Timestamp, False, True)], welder_id='w2')
+    assert read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, start, end, welder_id='w1')[0]['defect_volume'] \
+            == w1[0]['defect_volume']
+    assert read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, start, end, welder_id='w2')[0]['defect_volume'] \
+            == w2[0]['defect_volume'] + 1
+
+    merged = merge_nozzle_rollups(read_nozzle_rollups(pg_conn, RESOLUTION_HOUR, start, end))
+    assert merged['quantity_produced'] == 40
+    assert merged['processing_time_sketch'].count == 40
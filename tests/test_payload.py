@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from welder.reader import read_measures_from_csv
+from welder.work_recognizer import WorkRecognizer
+from welder.payload import FORMAT_BINARY, FORMAT_JSON, FORMAT_TEXT, encode_samples, decode_samples, label_samples
+
+
+TIMES = np.array([1684987860000, 1684987860010, 1684987860020], dtype=np.int64)
+AMPERES = np.array([0.5, 12.25, 3.0], dtype=np.float32)
+STATES = np.array([0, 2, 1], dtype=np.int8)
+
+
+@pytest.mark.parametrize('format', [FORMAT_BINARY, FORMAT_JSON])
+def test_batch_payload_carries_states(format):
+    batch = decode_samples(encode_samples(TIMES, AMPERES, STATES, format=format))
+    assert batch.times.tolist() == TIMES.tolist()
+    assert batch.amperes.tolist() == AMPERES.tolist()
+    assert batch.states.tolist() == STATES.tolist()
+    assert [m.state for m in batch.to_measures()] == STATES.tolist()
+
+
+def test_text_payload_holds_a_single_sample():
+    batch = decode_samples(encode_samples(TIMES[:1], AMPERES[:1], STATES[:1], format=FORMAT_TEXT),
+                           default_time=int(TIMES[0]))
+    assert batch.amperes.tolist() == [0.5]
+    assert batch.states.tolist() == [-1]
+    with pytest.raises(ValueError):
+        encode_samples(TIMES, AMPERES, STATES, format=FORMAT_TEXT)
+
+
+def test_mismatched_states_are_rejected():
+    with pytest.raises(ValueError):
+        encode_samples(TIMES, AMPERES, STATES[:2])
+
+
+def test_published_csv_batch_carries_recognized_states():
+    data_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+    amperes, states = label_samples(islice(read_measures_from_csv(data_file), 2000))
+    assert len(amperes) == len(states) == 2000
+    batch = decode_samples(encode_samples(np.arange(2000, dtype=np.int64), amperes, states))
+    # 인식 버퍼가 채워진 뒤로는 모두 실제 상태 코드(0~3)이며, 작업 구간의 상태들이 모두 나타난다.
+    assert set(batch.states[WorkRecognizer.BUFFER_SIZE:].tolist()) == { 0, 1, 2, 3 }
+    assert (batch.states[:WorkRecognizer.BUFFER_SIZE - 1] == -1).all()
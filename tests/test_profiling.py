@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+import time
+import signal
+import pstats
+import logging
+import threading
+
+import pytest
+
+from welder.profiling import LoopStats, ProfilerControl, PROFILE_SAMPLE, PROFILE_CPROFILE, PROFILE_STOP
+
+
+def busy(seconds:float) -> int:
+    total = 0
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        total += sum(range(100))
+    return total
+
+
+def test_loop_stats_tracks_lag_and_catch_up():
+    stats = LoopStats(interval=0.1)
+    assert stats.sleep_time(0.0) == 0.1
+
+    assert stats.begin(10.0) == 0.0
+    assert not stats.record(0.05)
+    assert stats.sleep_time(10.05) == pytest.approx(0.05)
+
+    # 0.25초가 걸린 반복 이후로는 일정보다 늦게 시작하고, 늦은 동안에는 쉬지 않는다.
+    assert stats.begin(10.1) == pytest.approx(0.0)
+    assert stats.record(0.25)
+    assert stats.sleep_time(10.35) == 0.0
+    assert stats.begin(10.35) == pytest.approx(0.15)
+    assert not stats.record(0.01)
+    # 빨리 끝난 반복들로 일정을 따라잡으면 lag이 줄어든다.
+    assert stats.begin(10.36) == pytest.approx(0.06)
+    assert not stats.record(0.01)
+    assert stats.begin(10.4) == pytest.approx(0.0)
+    assert stats.sleep_time(10.41) == pytest.approx(0.09)
+
+    assert stats.iterations == 4 and stats.overruns == 1
+    assert stats.overrun_rate == 0.25
+    assert stats.max_elapsed == 0.25
+    assert stats.max_lag == pytest.approx(0.15)
+    assert stats.elapsed.max == pytest.approx(250.0)
+    assert 'overruns=1 (25.00%)' in repr(stats)
+    assert LoopStats(interval=1.0).overrun_rate == 0.0
+
+
+def test_control_messages_request_profiles(tmp_path, caplog):
+    profiler = ProfilerControl(str(tmp_path), duration=5.0)
+    profiler.on_control_message('control', { 'command': 'sample', 'duration': '60' })
+    assert profiler.pending == (PROFILE_SAMPLE, 60.0)
+    profiler.on_control_message('control', { 'command': 'cprofile' })
+    assert profiler.pending == (PROFILE_CPROFILE, 5.0)
+
+    # 잘못된 요청은 기록만 하고 이전 요청을 유지한다.
+    with caplog.at_level(logging.ERROR, logger='welder.profiling'):
+        for payload in ({ 'duration': 10 }, { 'command': 'trace' }, { 'command': 'sample', 'duration': 'x' }):
+            profiler.on_control_message('control', payload)
+    assert len(caplog.records) == 3
+    assert profiler.pending == (PROFILE_CPROFILE, 5.0)
+    with pytest.raises(ValueError):
+        profiler.request('trace')
+
+    # 시작 요청이 없으면 poll()은 아무것도 하지 않는다.
+    profiler.pending = None
+    profiler.poll()
+    assert not profiler.active
+    profiler.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_sample_profile_runs_until_the_deadline(tmp_path):
+    profiler = ProfilerControl(str(tmp_path / 'profiles'), name='loop', interval=0.001)
+    profiler.request(PROFILE_SAMPLE, duration=0.2)
+    profiler.poll()
+    assert profiler.active and profiler.mode == PROFILE_SAMPLE
+
+    # 처리 루프처럼 매 주기 poll()을 호출하면 기간이 끝난 뒤 결과를 기록한다.
+    started = time.monotonic()
+    while profiler.active and time.monotonic() - started < 5.0:
+        busy(0.02)
+        profiler.poll()
+    assert not profiler.active
+
+    files = sorted(os.listdir(tmp_path / 'profiles'))
+    assert len(files) == 2 and all(f.startswith('loop-sample-') for f in files)
+    folded, stats = (str(tmp_path / 'profiles' / f) for f in files)
+    assert folded.endswith('.folded') and stats.endswith('.txt')
+    with open(folded) as fp:
+        lines = fp.read().splitlines()
+    # 표본은 poll()을 호출한 쓰레드의 스택이다.
+    assert lines and any('busy (test_profiling.py' in line for line in lines)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) > 10
+    with open(stats) as fp:
+        assert fp.readline().startswith('samples=')
+
+
+def test_cprofile_stops_on_request_and_on_close(tmp_path):
+    profiler = ProfilerControl(str(tmp_path), duration=60.0)
+    profiler.request(PROFILE_CPROFILE)
+    profiler.poll()
+    busy(0.01)
+    profiler.request(PROFILE_STOP)
+    profiler.poll()
+    assert not profiler.active
+
+    files = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(f)[1] for f in files] == ['.prof', '.txt']
+    functions = { name for _, _, name in pstats.Stats(str(tmp_path / files[0])).stats }
+    assert 'busy' in functions
+
+    # 프로파일 중에 다른 프로파일을 요청하면 이전 결과를 기록하고 새로 시작한다.
+    profiler.name = 'restart'
+    profiler.request(PROFILE_CPROFILE)
+    profiler.poll()
+    profiler.request(PROFILE_SAMPLE)
+    profiler.poll()
+    assert profiler.mode == PROFILE_SAMPLE
+    profiler.close()
+    assert not profiler.active and profiler.sampler is None
+    restarted = sorted(f.split('-')[1] for f in os.listdir(tmp_path) if f.startswith('restart-'))
+    assert restarted == ['cprofile', 'cprofile', 'sample', 'sample']
+
+
+def test_signals_toggle_profiles(tmp_path):
+    assert threading.current_thread() is threading.main_thread()
+    previous = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+    profiler = ProfilerControl(str(tmp_path))
+    try:
+        profiler.install_signals()
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert profiler.pending[0] == PROFILE_SAMPLE
+        profiler.poll()
+        # 같은 시그널을 다시 받으면 중지한다.
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert profiler.pending[0] == PROFILE_STOP
+        os.kill(os.getpid(), signal.SIGUSR2)
+        assert profiler.pending[0] == PROFILE_CPROFILE
+        profiler.poll()
+        assert profiler.mode == PROFILE_CPROFILE
+    finally:
+        profiler.close()
+        signal.signal(signal.SIGUSR1, previous[0])
+        signal.signal(signal.SIGUSR2, previous[1])
+
+    # 시그널 handler는 main 쓰레드에서만 등록할 수 있다.
+    errors = []
+    def install():
+        try:
+            ProfilerControl(str(tmp_path)).install_signals()
+        except ValueError as e:
+            errors.append(e)
+    thread = threading.Thread(target=install)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from copy import copy
+from collections import defaultdict
+from itertools import islice
+
+import pytest
+
+from welder.reader import read_measures_from_csv
+from welder.pyramid import AmperePyramid, AmpereSummary, PYRAMID_RESOLUTIONS, pyramid_bucket_start
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+
+@pytest.fixture(scope='module')
+def measures():
+    return list(islice(read_measures_from_csv(DATA_FILE), 20000))
+
+
+def brute_force(measures) -> dict[tuple,tuple]:
+    buckets = defaultdict(list)
+    for m in measures:
+        for resolution in PYRAMID_RESOLUTIONS:
+            buckets[(resolution, pyramid_bucket_start(m.timestamp, resolution))].append(m.ampere)
+    return { key: (len(values), min(values), max(values), sum(values)) for key, values in buckets.items() }
+
+
+def run_pyramid(measures) -> list[AmpereSummary]:
+    pyramid = AmperePyramid()
+    summaries = [s for m in measures for s in pyramid.add(m)]
+    return summaries + pyramid.flush()
+
+
+def apply(stored:dict, summaries:list[AmpereSummary]) -> dict:
+    # spool에서 전달되는 요약은 매번 새로 복원된 객체이다.
+    for s in map(copy, summaries):
+        key = (s.resolution, s.bucket_start)
+        stored[key] = stored[key].update(s) if key in stored else s
+    return stored
+
+
+def as_values(stored:dict) -> dict[tuple,tuple]:
+    return { key: (s.count, s.min, s.max, pytest.approx(s.sum)) for key, s in stored.items() }
+
+
+def test_pyramid_matches_brute_force(measures):
+    summaries = run_pyramid(measures)
+    assert as_values(apply({}, summaries)) == brute_force(measures)
+    # 처음 구간과 flush()로 닫은 구간을 제외하면 모두 완전한 요약이다.
+    assert sum(not s.complete for s in summaries) <= 2 * len(PYRAMID_RESOLUTIONS)
+
+
+def test_redelivered_and_resumed_pieces_are_counted_once(measures):
+    # 중단(flush) 후 재시작한 두 실행의 요약이 spool에서 각각 두 번씩 전달된 경우
+    first, second = run_pyramid(measures[:7777]), run_pyramid(measures[7777:])
+    stored = apply({}, first + first + second)
+    stored = apply(stored, second + first)
+    assert as_values(stored) == brute_force(measures)
+
+    # 같은 파일을 처음부터 다시 처리하면 완전한 요약이 기존 조각들을 대체한다.
+    stored = apply(stored, run_pyramid(measures))
+    assert as_values(stored) == brute_force(measures)
+
+
+def test_replayed_summaries_are_idempotent_in_database(pg_conn, measures):
+    from welder.database_utils import create_ampere_pyramid_table_if_absent, log_ampere_summaries
+
+    create_ampere_pyramid_table_if_absent(pg_conn)
+    first, second = run_pyramid(measures[:7777]), run_pyramid(measures[7777:])
+    def stored() -> dict[tuple,tuple]:
+        with pg_conn.cursor() as cur:
+            cur.execute("SELECT resolution, bucket_start, count, min, max, sum FROM welder_ampere_pyramid")
+            return { (r, b): (c, lo, hi, pytest.approx(s)) for r, b, c, lo, hi, s in cur.fetchall() }
+
+    for batch in (first, first, second, second + first):
+        log_ampere_summaries(pg_conn, batch)
+    assert stored() == brute_force(measures)
+
+    # 같은 파일을 처음부터 다시 처리하면 완전한 요약이 기존 조각들을 대체한다.
+    log_ampere_summaries(pg_conn, run_pyramid(measures))
+    assert stored() == brute_force(measures)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from welder.waveform import BASE_PATTERNS
+from welder.reference_library import ReferenceLibrary, ReferenceSet, VPTree, FILE_FORMAT, DEFAULT_WELDER_TYPE, \
+                                     dtw_distance, dtw_distances, dtw_matrix, lower_bound_key, k_medoids
+
+
+def make_patterns(count:int, spread:float, seed:int) -> np.ndarray:
+    """`BASE_PATTERNS` 주위에 흩어진 4-point 패턴들."""
+    rng = np.random.default_rng(seed)
+    base = np.array(BASE_PATTERNS)
+    return base[rng.integers(len(base), size=count)] + rng.normal(0, spread, (count, base.shape[1]))
+
+
+def brute_force(pattern:np.ndarray, references:np.ndarray) -> np.ndarray:
+    return np.array([dtw_distance(pattern.tolist(), ref.tolist()) for ref in references])
+
+
+def test_vectorized_dtw_matches_scalar_dtw():
+    a, b = make_patterns(7, 1.0, seed=1), make_patterns(9, 1.0, seed=2)
+    expected = np.array([brute_force(p, b) for p in a])
+    assert np.allclose(dtw_matrix(a, b, max_cells=500), expected)
+    assert np.allclose([dtw_distances(p.tolist(), b) for p in a], expected)
+    assert dtw_distance([1.0, 2.0, 3.0, 4.0], [1.0, 2.0, 3.0, 4.0]) == 0.0
+
+
+def test_lower_bound_never_exceeds_dtw():
+    a, b = make_patterns(200, 1.0, seed=3), make_patterns(200, 1.0, seed=4)
+    bounds = np.array([[abs(p[0] - q[0]) + abs(p[-1] - q[-1]) for q in b] for p in a])
+    assert (bounds <= dtw_matrix(a, b) + 1e-12).all()
+
+
+@pytest.mark.parametrize('leaf_size', [1, 4, 128])
+def test_vptree_search_and_within_match_brute_force(leaf_size):
+    # 같은 키가 여러 개 있어도 모든 점을 찾아야 한다.
+    keys = [lower_bound_key(p) for p in make_patterns(300, 1.0, seed=5)] + [(5.0, 8.0)] * 50
+    tree = VPTree(keys, leaf_size=leaf_size)
+    points = np.array(keys)
+    for query in [(5.0, 8.0), (6.3, 5.1), (20.0, -3.0)]:
+        expected = np.abs(points - query).sum(axis=1)
+        found = list(tree.search(query))
+        assert sorted(index for _, index in found) == list(range(len(keys)))
+        assert [lb for lb, _ in found] == sorted(lb for lb, _ in found)
+        assert np.allclose([lb for lb, _ in found], expected[[index for _, index in found]])
+        for radius in (0.0, 0.5, 2.0):
+            indices, bounds = tree.within(query, radius)
+            assert sorted(indices.tolist()) == np.flatnonzero(expected <= radius).tolist()
+            assert np.allclose(bounds, expected[indices])
+    assert list(VPTree([]).search((0.0, 0.0))) == []
+
+
+@pytest.mark.parametrize('count', [10, 3000])
+def test_queries_match_brute_force_dtw(count):
+    # 후보가 적은 경우(순서대로 확인)와 많은 경우(한 번에 계산)를 모두 거친다.
+    refs = ReferenceSet(make_patterns(count, 0.5, seed=6))
+    for pattern in make_patterns(100, 1.0, seed=7):
+        dists = brute_force(pattern, refs.references)
+        distance, index = refs.nearest(pattern)
+        assert distance == pytest.approx(dists.min())
+        assert dists[index] == pytest.approx(distance)
+        # 하한으로 걸러낸 후보들 중에 임계값 이내의 기준 패턴이 있으면 반드시 찾아야 한다.
+        for threshold in (0.5, 1.0, 2.0, 4.0):
+            assert refs.any_within(pattern, threshold) == bool((dists <= threshold).any())
+    assert ReferenceSet(np.empty((0, 4))).nearest(np.ones(4)) == (float('inf'), -1)
+
+
+def test_any_within_is_sub_millisecond_with_thousands_of_references():
+    refs = ReferenceSet(make_patterns(5000, 0.5, seed=8))
+    queries = make_patterns(300, 1.0, seed=9)
+    elapsed = []
+    for pattern in queries:
+        started = time.perf_counter()
+        refs.any_within(pattern, 2.0)
+        elapsed.append(time.perf_counter() - started)
+    assert np.median(elapsed) < 0.001
+
+
+def test_k_medoids_minimizes_within_cluster_distances():
+    patterns = make_patterns(120, 0.3, seed=10)
+    medoids = k_medoids(patterns, 5)
+    assert len(set(medoids.tolist())) == 5
+    assert k_medoids(patterns, 5).tolist() == medoids.tolist()
+
+    dist = dtw_matrix(patterns, patterns)
+    labels = np.argmin(dist[:, medoids], axis=1)
+    for c, medoid in enumerate(medoids):
+        members = np.flatnonzero(labels == c)
+        costs = dist[np.ix_(members, members)].sum(axis=1)
+        assert dist[medoid, members].sum() == pytest.approx(costs.min())
+    assert k_medoids(patterns[:3], 5).tolist() == [0, 1, 2]
+
+
+def test_library_save_load_and_versioning(tmp_path):
+    library = ReferenceLibrary()
+    library.set_references(DEFAULT_WELDER_TYPE, np.array(BASE_PATTERNS))
+    refs = library.learn('spot', make_patterns(60, 0.3, seed=11), k=4)
+    assert library.version == 2
+    assert len(refs) == 4 and refs.source_count == 60
+
+    path = str(tmp_path / 'library.json')
+    library.save(path)
+    loaded = ReferenceLibrary.load(path)
+    assert loaded.version == 2 and loaded.created == library.created
+    assert sorted(loaded.welder_types()) == ['default', 'spot']
+    assert np.array_equal(loaded['spot'].references, library['spot'].references)
+    assert loaded['spot'].source_count == 60
+    pattern = np.array(BASE_PATTERNS[0]) + 0.1
+    assert loaded.nearest(pattern) == library.nearest(pattern)
+
+    loaded.set_references('spot', np.array(BASE_PATTERNS[:2]))
+    assert loaded.version == 3 and loaded.created > library.created
+
+    with open(path) as f:
+        data = json.load(f)
+    data['format'] = FILE_FORMAT + 1
+    with pytest.raises(ValueError):
+        ReferenceLibrary.from_dict(data)
+    assert isinstance(loaded.created, datetime)
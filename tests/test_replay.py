@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from welder.types import ElectricCurrentMeasure
+from welder.replay import ReplayScheduler
+
+
+class FakeClock:
+    """`ReplayScheduler`에 주입하는 시계. sleep()은 요청한 시간보다 `oversleep`만큼 더 잔다."""
+    def __init__(self, oversleep:float=0.0005):
+        self.now = 100.0
+        self.oversleep = oversleep
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds:float) -> None:
+        self.now += max(0.0, seconds) + self.oversleep
+
+
+def measures(offsets:list[float], start:datetime=datetime(2025, 3, 1, 9)) -> list[ElectricCurrentMeasure]:
+    return [ElectricCurrentMeasure(start + timedelta(seconds=s), float(i)) for i, s in enumerate(offsets)]
+
+
+def replay(scheduler:ReplayScheduler, clock:FakeClock, stall:Optional[dict[int,float]]=None) -> list[tuple[float,list]]:
+    """방출된 묶음마다 (재생 시작 이후 시각, 묶음)을 반환한다. `stall[i]`초 만큼 i번째 묶음 처리를 지연시킨다."""
+    emitted = []
+    start = clock.now
+    for i, batch in enumerate(scheduler.run()):
+        emitted.append((clock.now - start, batch))
+        clock.now += (stall or {}).get(i, 0.0)
+    return emitted
+
+
+def test_emissions_follow_the_absolute_schedule():
+    # 매번 조금씩 늦게 깨어나도 오차가 누적되지 않아야 한다.
+    clock = FakeClock(oversleep=0.003)
+    scheduler = ReplayScheduler(speed=2.0, tick=0.005, clock=clock, sleep=clock.sleep)
+    scheduler.add_stream('a', measures([0.0, 1.0, 3.0, 3.5] + [4.0 + 0.2 * k for k in range(50)]))
+    emitted = replay(scheduler, clock)
+
+    due = [0.0, 0.5, 1.5, 1.75] + [2.0 + 0.1 * k for k in range(50)]
+    assert [len(batch) for _, batch in emitted] == [1] * len(due)
+    for (at, _), expected in zip(emitted, due):
+        assert expected <= at < expected + 0.005 + 0.003 + 1e-9
+    assert scheduler.stats.emitted == len(due)
+    assert scheduler.stats.scheduled == pytest.approx(due[-1])
+
+
+def test_streams_due_in_the_same_tick_are_batched():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(tick=0.01, clock=clock, sleep=clock.sleep)
+    # 예정 시각은 tick 단위로 올림되므로 0.495초와 0.5초는 같은 tick이다.
+    scheduler.add_stream('a', measures([0.0, 0.495, 0.991]))
+    scheduler.add_stream('b', measures([0.0, 0.5, 1.0]))
+    # 간격을 지정한 스트림은 측정 시각과 무관하게 k * interval에 방출된다.
+    scheduler.add_stream('c', measures([0.0, 7.0, 9.0], start=datetime(2020, 1, 1)), interval=0.5)
+    emitted = replay(scheduler, clock)
+
+    assert [sorted(key for key, _ in batch) for _, batch in emitted] == [['a', 'b', 'c']] * 3
+    assert [m.ampere for _, batch in emitted for key, m in batch if key == 'b'] == [0.0, 1.0, 2.0]
+    with pytest.raises(ValueError):
+        scheduler.add_stream('d', measures([0.0]))
+
+
+def test_catch_up_after_a_stall_keeps_the_original_schedule():
+    clock = FakeClock()
+    scheduler = ReplayScheduler(tick=0.005, wheel_size=16, clock=clock, sleep=clock.sleep)
+    scheduler.add_stream('a', measures([0.1 * k for k in range(30)]))
+    # 첫 묶음을 처리하는 데 1초가 걸렸다.
+    emitted = replay(scheduler, clock, stall={0: 1.0})
+
+    # 밀린 측정값들(0.1~1.0초 예정)을 한 묶음으로 방출한 뒤, 이후로는 원래 일정대로 방출한다.
+    assert [m.ampere for _, m in emitted[1][1]] == [float(k) for k in range(1, 11)]
+    for at, batch in emitted[2:]:
+        due = 0.1 * batch[0][1].ampere
+        assert len(batch) == 1 and due <= at < due + 0.005 + 0.0005 + 1e-9
+    assert sum(len(batch) for _, batch in emitted) == 30
+    lateness = scheduler.stats.lateness
+    assert lateness.max == pytest.approx(900, abs=1)
+    assert lateness.quantile(0.5) < 10
+
+
+def test_wheel_wraps_for_far_schedules():
+    # 예정 시각이 wheel 한 바퀴(4 tick)보다 먼 경우에도 그 시각에 방출되어야 한다.
+    clock = FakeClock()
+    scheduler = ReplayScheduler(tick=0.01, wheel_size=4, clock=clock, sleep=clock.sleep)
+    scheduler.add_stream('a', measures([0.0, 0.25, 0.33, 1.0]))
+    emitted = replay(scheduler, clock)
+    assert [round(at, 2) for at, _ in emitted] == [0.0, 0.25, 0.33, 1.0]
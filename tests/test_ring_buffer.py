@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from welder.ring_buffer import SharedRingBuffer, RingBufferOverrun
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRingBuffer.create(capacity=8)
+    yield ring
+    ring.close()
+
+
+def write(ring:SharedRingBuffer, start:int, count:int) -> None:
+    times = np.arange(start, start + count, dtype=np.int64)
+    ring.extend(times, times.astype(np.float32) / 10, states=np.full(count, 2, dtype=np.int8),
+                welder_ids=np.full(count, 3, dtype=np.uint16))
+
+
+def test_extend_wraps_at_ring_end(ring):
+    write(ring, 0, 5)
+    write(ring, 5, 6)           # 슬롯 5, 6, 7에 이어 0, 1, 2에 기록된다.
+    assert ring.write_seq == 11
+    assert ring.records['seq'].tolist() == [8, 9, 10, 3, 4, 5, 6, 7]
+    assert ring.records['time'].tolist() == [8, 9, 10, 3, 4, 5, 6, 7]
+    assert set(ring.records['state'].tolist()) == {2} and set(ring.records['welder_id'].tolist()) == {3}
+
+    # 링의 끝에서 나뉘는 구간은 이어붙인 복사본으로 반환된다.
+    records = ring.view(5, 11)
+    assert records['seq'].tolist() == list(range(5, 11))
+    assert np.allclose(records['ampere'], np.arange(5, 11) / 10)
+
+    # poll()은 링의 끝까지만 반환하고 나머지는 다음 호출에서 반환한다.
+    reader = ring.reader(5)
+    assert reader.poll()['seq'].tolist() == [5, 6, 7]
+    assert reader.poll()['seq'].tolist() == [8, 9, 10]
+    assert len(reader.poll()) == 0 and reader.lost == 0
+
+
+def test_extend_larger_than_capacity_keeps_the_last_records(ring):
+    write(ring, 0, 20)
+    assert ring.write_seq == 20
+    assert sorted(ring.records['seq'].tolist()) == list(range(12, 20))
+    assert ring.view(12, 20)['time'].tolist() == list(range(12, 20))
+    with pytest.raises(RingBufferOverrun):
+        ring.view(11, 20)
+
+
+def test_overrun_reader_skips_to_the_oldest_record(ring):
+    reader = ring.reader(0)
+    for t in range(3):
+        ring.append(t, 1.0)
+    assert reader.poll()['seq'].tolist() == [0, 1, 2]
+    write(ring, 3, 15)          # 3~17을 기록하여 3~9가 덮어써진다.
+    records = reader.poll()
+    assert records['seq'].tolist() == list(range(10, 16))
+    assert reader.lost == 7
+    assert reader.poll()['seq'].tolist() == [16, 17]
+    assert reader.lost == 7
+
+
+def test_validate_drops_records_overwritten_while_processing(ring):
+    write(ring, 0, 8)
+    reader = ring.reader(0)
+    records = reader.poll()
+    assert records['seq'].tolist() == list(range(8))
+    assert len(reader.validate(records)) == 8 and reader.lost == 0
+
+    # 처리하는 동안 생산자가 앞쪽 3개를 덮어쓴다.
+    write(ring, 8, 3)
+    valid = reader.validate(records)
+    assert valid['seq'].tolist() == list(range(3, 8))
+    assert reader.lost == 3
+    assert reader.poll()['seq'].tolist() == [8, 9, 10]
+
+
+def produce(name:str, count:int) -> None:
+    ring = SharedRingBuffer.attach(name)
+    times = np.arange(count, dtype=np.int64)
+    ring.extend(times, times.astype(np.float32))
+    ring.close()
+
+
+def test_attach_from_another_process():
+    ring = SharedRingBuffer.create(capacity=1024)
+    try:
+        reader = ring.reader(0)
+        process = mp.Process(target=produce, args=(ring.name, 1000))
+        process.start()
+        process.join(timeout=30)
+        assert process.exitcode == 0
+        # 연결했던 프로세스가 종료되어도 공유 메모리는 생성한 프로세스가 닫을 때까지 남는다.
+        assert reader.wait(timeout=5)
+        records = reader.poll(max_count=2048)
+        assert records['seq'].tolist() == list(range(1000))
+        assert float(records['ampere'].sum()) == sum(range(1000))
+        del records
+        reader = None
+    finally:
+        ring.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=ring.name)
+
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from welder.types import ElectricCurrentMeasure, NozzleProductionAudit, INSPECTION_FULL, INSPECTION_NO_DTW, \
+                         INSPECTION_WIDTH_ONLY
+from welder.shedding import LoadShedder, ReinspectionQueue, inspect_waveform_in_mode
+from welder.features import extract_features, inspect_features
+from welder.spool import Spool
+from welder.production import ProductionTracker
+from welder.rollup import RESOLUTION_HOUR
+
+
+def waveform(index:int) -> list[ElectricCurrentMeasure]:
+    return [ElectricCurrentMeasure(datetime(2025, 3, 1) + timedelta(seconds=index), 10.0, 2)]
+
+
+def wait_until(condition, timeout:float=5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_throttled_queue_keeps_draining():
+    queue = ReinspectionQueue(inspect=lambda w: True, throttled_interval=0.05)
+    queue.throttle()
+    queue.start()
+    for index in range(3):
+        queue.submit(waveform(index), False)
+    assert wait_until(lambda: queue.completed == 3)
+    queue.stop(timeout=1)
+    assert [r.changed for r in queue.drain()] == [True, True, True]
+
+
+def test_snapshot_includes_in_flight_and_undrained_results():
+    started, release = threading.Event(), threading.Event()
+    def inspect(w):
+        if w[-1].timestamp.second == 1:
+            started.set()
+            release.wait(5)
+        return True
+
+    queue = ReinspectionQueue(inspect=inspect).start()
+    for index in range(3):
+        queue.submit(waveform(index), False)
+    assert started.wait(5)
+    # 0번은 완료되었지만 drain()되지 않았고, 1번은 재검사 중, 2번은 대기 중이다.
+    snapshot = queue.snapshot()
+    release.set()
+    queue.stop(timeout=1)
+    assert [r.timestamp.second for r in snapshot['results']] == [0]
+    assert [w[-1].timestamp.second for w, _ in snapshot['pending']] == [1, 2]
+
+    restored = ReinspectionQueue(inspect=lambda w: True)
+    restored.restore(snapshot)
+    assert len(restored) == 2 and len(restored.drain()) == 1
+
+
+def test_overflow_is_counted():
+    queue = ReinspectionQueue(inspect=lambda w: True, max_size=2)
+    for index in range(5):
+        queue.submit(waveform(index), False)
+    assert queue.stats() == { 'pending': 2, 'completed': 0, 'dropped': 3 }
+
+
+def test_shedder_levels_and_recovery():
+    shedder = LoadShedder((3.0, 6.0), recovery=0.5)
+    assert [shedder.update(age) for age in (1.0, 4.0, 7.0, 4.0, 2.9, 1.0)] \
+        == [INSPECTION_FULL, INSPECTION_NO_DTW, INSPECTION_WIDTH_ONLY, INSPECTION_WIDTH_ONLY,
+            INSPECTION_NO_DTW, INSPECTION_FULL]
+    assert shedder.changes == 4
+    with pytest.raises(ValueError):
+        LoadShedder((3.0, 6.0, 12.0))
+
+
+def test_provisional_defects_are_not_counted_until_reinspected():
+    tracker = ProductionTracker(NozzleProductionAudit(datetime(2025, 3, 1), 0, timedelta(0), timedelta(0), 0, 0.0))
+    ts = datetime(2025, 3, 1, 9)
+    tracker.on_finished(ts, timedelta(seconds=2), True)
+    for index in range(1, 4):
+        tracker.on_finished(ts + timedelta(seconds=10 * index), timedelta(seconds=2), True, INSPECTION_WIDTH_ONLY)
+    assert tracker.production.DefectVolume == 1
+    assert tracker.provisional_defects == 3
+    rollup = tracker.rollup.get(RESOLUTION_HOUR, ts)
+    assert (rollup.DefectVolume, rollup.ProvisionalDefectVolume) == (1, 3)
+
+    # 재검사 결과 하나는 불량으로 확정되고, 나머지 둘은 정상으로 바뀐다.
+    for index, verdict in zip(range(1, 4), (True, False, False)):
+        tracker.on_reinspected(True, verdict, ts + timedelta(seconds=10 * index))
+    assert tracker.production.DefectVolume == 2
+    assert tracker.provisional_defects == 0
+    assert tracker.production.AvgDefectRate == 0.5
+    assert (rollup.DefectVolume, rollup.ProvisionalDefectVolume) == (2, 0)
+
+
+@pytest.fixture(scope='module')
+def fasten_waveforms():
+    from welder.reader import read_measures_from_csv
+    from welder.monitor import NozzleMonitor, EVENT_FINISHED
+    data_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+    waveforms = [waveform for kind, waveform in NozzleMonitor().catch_up(read_measures_from_csv(data_file))
+                 if kind == EVENT_FINISHED]
+    assert waveforms
+    return waveforms[:500]
+
+
+def test_degraded_modes_are_cheaper(fasten_waveforms):
+    def cost(mode:str) -> float:
+        # 파형마다 여러 번 측정한 최소값의 합 (스케줄링 잡음을 줄이기 위해)
+        total = 0.0
+        for waveform in fasten_waveforms:
+            best = float('inf')
+            for _ in range(5):
+                started = time.perf_counter()
+                inspect_waveform_in_mode(waveform, mode)
+                best = min(best, time.perf_counter() - started)
+            total += best
+        return total
+
+    assert cost(INSPECTION_WIDTH_ONLY) < cost(INSPECTION_NO_DTW) < cost(INSPECTION_FULL)
+
+    verdicts = [inspect_waveform_in_mode(waveform, INSPECTION_NO_DTW) for waveform in fasten_waveforms]
+    assert verdicts == inspect_features(extract_features(fasten_waveforms, dtw=False), dtw_threshold=None).tolist()
+
+
+def test_degraded_verdicts_are_queued_for_reinspection(fasten_waveforms, tmp_path):
+    script = pytest.importorskip('scripts.inspect_waveform')
+    tracker = ProductionTracker(NozzleProductionAudit(datetime(2025, 3, 1), 0, timedelta(0), timedelta(0), 0, 0.0))
+    spool = Spool(str(tmp_path / 'spool'))
+    queue = ReinspectionQueue()
+    modes = [INSPECTION_FULL, INSPECTION_NO_DTW, INSPECTION_WIDTH_ONLY]
+    for waveform, mode in zip(fasten_waveforms, modes):
+        script.on_nozzle_production_finished(tracker, spool, waveform, mode=mode, reinspection=queue)
+    pending = queue.snapshot()['pending']
+    assert [w for w, _ in pending] == fasten_waveforms[1:3]
+    assert [p for _, p in pending] == [inspect_waveform_in_mode(w, m) for w, m in zip(fasten_waveforms[1:3], modes[1:])]
+    assert len(spool.read_batch(10)[0]) == 3
+    spool.close()
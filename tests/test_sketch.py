@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import random
+import bisect
+
+import pytest
+
+from welder.sketch import QuantileSketch
+
+QUANTILES = (0.05, 0.5, 0.9, 0.95, 0.99)
+MAX_RANK_ERROR = 0.015
+
+
+def uniform(seed:int, count:int=100000) -> list[float]:
+    rng = random.Random(seed)
+    return [rng.random() for _ in range(count)]
+
+
+def rank_errors(sketch:QuantileSketch, data:list[float]) -> dict[float,float]:
+    """각 분위수 추정값의 실제 순위와 목표 순위의 차이."""
+    data = sorted(data)
+    return { q: bisect.bisect_right(data, sketch.quantile(q)) / len(data) - q for q in QUANTILES }
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_add_bounds_rank_error(seed):
+    data = uniform(seed)
+    sketch = QuantileSketch(k=200, seed=seed)
+    sketch.update(data)
+    assert sketch.count == len(data)
+    assert (sketch.min, sketch.max) == (min(data), max(data))
+    assert max(map(abs, rank_errors(sketch, data).values())) <= MAX_RANK_ERROR
+    # 저장되는 값의 수는 입력 개수와 무관하게 제한된다.
+    assert sum(len(level) for level in sketch.levels) < 3 * sketch.k
+
+
+def test_estimates_are_not_biased():
+    # 압축 방향이 고정되어 있으면 여러 입력에서 같은 방향으로 치우친다.
+    errors = []
+    for seed in range(10):
+        data = uniform(100 + seed)
+        sketch = QuantileSketch(k=200, seed=seed)
+        sketch.update(data)
+        errors.append(rank_errors(sketch, data)[0.95])
+    assert abs(sum(errors) / len(errors)) <= 0.005
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_merge_bounds_rank_error(seed):
+    data = uniform(seed)
+    parts = [QuantileSketch(k=200, seed=seed * 10 + i) for i in range(7)]
+    for index, value in enumerate(data):
+        parts[index % len(parts)].add(value)
+    merged = QuantileSketch(k=200, seed=seed)
+    for part in parts:
+        merged.merge(part)
+    assert merged.count == len(data)
+    assert max(map(abs, rank_errors(merged, data).values())) <= MAX_RANK_ERROR
+    other = QuantileSketch(k=100)
+    other.add(1.0)
+    with pytest.raises(ValueError):
+        merged.merge(other)
+
+
+def test_dict_round_trip_keeps_estimates_and_merges():
+    data = uniform(7)
+    sketch = QuantileSketch(k=200, seed=7)
+    sketch.update(data[:60000])
+    # DB와 트윈에는 JSON으로 저장된다.
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.count == sketch.count
+    assert restored.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)
+
+    restored.update(data[60000:])
+    assert max(map(abs, rank_errors(restored, data).values())) <= MAX_RANK_ERROR
+    merged = QuantileSketch.from_dict(sketch.to_dict()).merge(QuantileSketch.from_dict(restored.to_dict()))
+    assert merged.count == 60000 + len(data)
+
+
+def test_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None and sketch.rank(1.0) == 0.0
+    assert QuantileSketch.from_dict(sketch.to_dict()).count == 0
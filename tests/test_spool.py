@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pickle
+from datetime import datetime, timedelta
+from functools import partial
+
+import pytest
+
+from welder.types import NozzleProductionAudit
+from welder.spool import Spool, SpoolDrainer
+from welder.rollup import RESOLUTION_HOUR
+from welder.database_utils import create_nozzle_production_audit_table, create_nozzle_production_rollup_table, \
+                                  record_nozzle_productions, read_nozzle_rollups, read_nozzle_production_frame
+
+
+def append_nozzles(spool:Spool, count:int) -> None:
+    start = datetime(2023, 5, 25, 4, 11)
+    for i in range(count):
+        ts = start + timedelta(seconds=10 * i)
+        audit = NozzleProductionAudit(ts, i + 1, timedelta(seconds=2), timedelta(seconds=8), 0, 0.0)
+        spool.append('nozzle', (audit, (ts, timedelta(seconds=2), timedelta(seconds=8), False)))
+
+
+def quantity_produced(conn) -> int:
+    rows = read_nozzle_rollups(conn, RESOLUTION_HOUR, datetime(2023, 5, 25), datetime(2023, 5, 26))
+    return sum(row['quantity_produced'] for row in rows)
+
+
+@pytest.fixture
+def nozzle_tables(pg_conn):
+    create_nozzle_production_audit_table(pg_conn)
+    create_nozzle_production_rollup_table(pg_conn)
+    return pg_conn
+
+
+def test_redelivered_batch_is_counted_once(nozzle_tables, tmp_path):
+    conn = nozzle_tables
+    calls = []
+    def record(payloads:list) -> None:
+        record_nozzle_productions(conn, payloads, welder_id='w1')
+        calls.append(len(payloads))
+        if len(calls) == 2:
+            # 데이터베이스에는 반영되었지만 cursor를 기록하기 전에 중단된 경우
+            raise ConnectionError('connection lost before commit')
+
+    spool = Spool(str(tmp_path / 'spool'), segment_size=4096)
+    append_nozzles(spool, 50)
+    drainer = SpoolDrainer(spool, { 'nozzle': record }, batch_size=20)
+
+    assert drainer.drain_once() == 20
+    with pytest.raises(ConnectionError):
+        drainer.drain_once()
+    while drainer.drain_once():
+        pass
+    spool.close()
+    assert len(calls) == 4
+    assert len(read_nozzle_production_frame(conn, welder_id='w1')) == quantity_produced(conn) == 50
+
+
+def test_uncommitted_events_are_replayed_after_restart(nozzle_tables, tmp_path):
+    conn = nozzle_tables
+    handler = partial(record_nozzle_productions, conn, welder_id='w1')
+    directory = str(tmp_path / 'spool')
+    spool = Spool(directory, segment_size=4096)
+    append_nozzles(spool, 50)
+    SpoolDrainer(spool, { 'nozzle': handler }, batch_size=30).drain_once()
+    events, _ = spool.read_batch(100)
+    spool.close()
+
+    # 재시작하면 commit한 위치부터 다시 재생한다.
+    spool = Spool(directory, segment_size=4096)
+    assert spool.read_batch(100)[0] == events
+    SpoolDrainer(spool, { 'nozzle': handler }, batch_size=100).drain_once()
+    assert len(read_nozzle_production_frame(conn, welder_id='w1')) == quantity_produced(conn) == 50
+    assert spool.read_batch(100)[0] == []
+    spool.close()
+
+
+def test_commit_after_dropped_segment_resumes_at_oldest_segment(tmp_path):
+    spool = Spool(str(tmp_path / 'spool'), segment_size=1024, max_segments=3)
+    for i in range(20):
+        spool.append('n', i)
+    events, position = spool.read_batch(5)
+    assert [e[1] for e in events] == list(range(5))
+
+    # 묶음을 처리하는 동안 spool이 가득 차서 읽었던 세그먼트가 버려진다.
+    for i in range(20, 400):
+        spool.append('n', i)
+    assert spool.dropped_segments > 0
+    assert position[0] < spool.segments[0].seqno
+    spool.commit(position)
+    assert spool.cursor == (spool.segments[0].seqno, 0)
+
+    first = spool.segments[0].read(0)[0]
+    values = []
+    while True:
+        events, position = spool.read_batch(50)
+        if not events:
+            break
+        values.extend(e[1] for e in events)
+        spool.commit(position)
+    assert values[0] == pickle.loads(first)[1]
+    assert values == list(range(values[0], 400))
+    spool.close()
+
+
+def test_stale_cursor_is_read_from_start_of_next_segment(tmp_path):
+    spool = Spool(str(tmp_path / 'spool'), segment_size=1024, max_segments=3)
+    for i in range(400):
+        spool.append('n', i)
+    first = pickle.loads(spool.segments[0].read(0)[0])[1]
+
+    # 삭제된 세그먼트의 중간을 가리키는 cursor
+    spool.cursor = (spool.segments[0].seqno - 1, 100)
+    events, _ = spool.read_batch(1)
+    assert events[0][1] == first
+    spool.close()
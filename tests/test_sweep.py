@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import os
+from itertools import islice, product
+
+import pytest
+
+from welder.reader import read_measures_from_csv
+from welder.monitor import NozzleMonitor, EVENT_FINISHED
+from welder.features import extract_features, inspect_features
+from welder.sweep import INSPECTION_THRESHOLDS, DEFAULT_INSPECTION_THRESHOLDS, sweep_inspection
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'fasten.csv')
+
+GRID = {
+    'height': [6.0, 8.0, 12.0],
+    'peak_floor': [9.0, 5.0],
+    'width_threshold': [1.0, 2.0, 4.0],
+    'dtw_threshold': [None, 2.0, 0.5],
+}
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    monitor = NozzleMonitor()
+    waveforms = [waveform for kind, waveform in monitor.catch_up(islice(read_measures_from_csv(DATA_FILE), 200000))
+                 if kind == EVENT_FINISHED]
+    assert waveforms
+    return extract_features(waveforms)
+
+
+def test_sweep_matches_inspect_features(matrix):
+    reference = inspect_features(matrix, **DEFAULT_INSPECTION_THRESHOLDS)
+    result = sweep_inspection(matrix, GRID, reference)
+    assert result.total == len(matrix)
+    names = list(INSPECTION_THRESHOLDS)
+    for index in product(*(range(len(GRID[name])) for name in names)):
+        thresholds = { name: GRID[name][i] for name, i in zip(names, index) }
+        verdicts = inspect_features(matrix, **thresholds)
+        assert result.defects[index] == verdicts.sum(), thresholds
+        assert result.agreements[index] == (verdicts == reference).sum(), thresholds
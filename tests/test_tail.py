@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+
+from welder.tail import CsvTailer
+
+
+def lines(start:int, count:int) -> str:
+    return ''.join(f'2025-03-01 09:00:{s:02d},{s}.5,1\n' for s in range(start, start + count))
+
+
+def seconds(measures) -> list[int]:
+    return [m.timestamp.second for m in measures]
+
+
+def test_rotated_file_is_read_to_the_end(tmp_path):
+    path = tmp_path / 'ampere.csv'
+    tailer = CsvTailer(str(tmp_path), use_inotify=False)
+    with open(path, 'w') as writer:
+        writer.write(lines(0, 3))
+        writer.flush()
+        assert seconds(tailer.read()) == [0, 1, 2]
+
+        # 이름이 패턴에 맞지 않게 바뀐 뒤에도 쓰던 내용이 이어진다.
+        writer.write(lines(3, 2) + '2025-03-01 09:00:05,5')
+        writer.flush()
+        os.rename(path, tmp_path / 'ampere.csv.1')
+        writer.write('.5,1\n' + lines(6, 1))
+    with open(path, 'w') as writer:
+        writer.write(lines(7, 2))
+
+    assert seconds(tailer.read()) == [3, 4, 5, 6, 7, 8]
+    assert len(tailer.files) == 1
+    tailer.close()
+
+
+def test_snapshot_restores_offsets_and_truncation_rereads(tmp_path):
+    path = tmp_path / 'ampere.csv'
+    path.write_text(lines(0, 3) + '2025-03-01 09:00:03,3')
+    tailer = CsvTailer(str(tmp_path), use_inotify=False)
+    assert seconds(tailer.read()) == [0, 1, 2]
+    snapshot = tailer.snapshot()
+    tailer.close()
+
+    with open(path, 'a') as writer:
+        writer.write('.5,1\n')
+    restored = CsvTailer(str(tmp_path), use_inotify=False)
+    restored.restore(snapshot)
+    assert seconds(restored.read()) == [3]
+
+    with open(path, 'w') as writer:
+        writer.write(lines(10, 1))
+    assert seconds(restored.read()) == [10]
+    restored.close()
@@ -1,7 +1,48 @@
-from .types import ElectricCurrentMeasure, NozzleProductionAudit
-from .work_recognizer import recognize_work
-from .waveform import recognize_waveform, inspect_waveform
-from .reader import read_measures_from_csv
-from .inspect_nozzle import extract_last_waveform, process_nozzle_waveform, log_nozzle_waveform
-from .database_utils import open_connection, create_nozzle_production_audit_table, audit_nozzle_production, \
-                            create_ampere_log_table_if_absent
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import importlib
+
+# 하위 모듈들은 처음 접근할 때 import한다 (PEP 562).
+# 'import welder'만으로 numpy, scipy, psycopg2, mdtpy 등이 로딩되지 않도록 하여
+# 짧게 실행되는 CLI 도구들의 시작 시간을 줄인다.
+_EXPORTS = {
+    'ElectricCurrentMeasure': '.types',
+    'NozzleProductionAudit': '.types',
+    'recognize_work': '.work_recognizer',
+    'recognize_waveform': '.waveform',
+    'inspect_waveform': '.waveform',
+    'read_measures_from_csv': '.reader',
+    'extract_last_waveform': '.inspect_nozzle',
+    'process_nozzle_waveform': '.inspect_nozzle',
+    'log_nozzle_waveform': '.inspect_nozzle',
+    'open_connection': '.database_utils',
+    'create_nozzle_production_audit_table': '.database_utils',
+    'audit_nozzle_production': '.database_utils',
+    'create_ampere_log_table_if_absent': '.database_utils',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name:str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .types import ElectricCurrentMeasure, NozzleProductionAudit
+    from .work_recognizer import recognize_work
+    from .waveform import recognize_waveform, inspect_waveform
+    from .reader import read_measures_from_csv
+    from .inspect_nozzle import extract_last_waveform, process_nozzle_waveform, log_nozzle_waveform
+    from .database_utils import open_connection, create_nozzle_production_audit_table, audit_nozzle_production, \
+                                create_ampere_log_table_if_absent
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional, Sequence
+from dataclasses import dataclass
+
+import csv
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .types import NozzleProductionAudit
+from .rollup import DEFAULT_SHIFT_HOURS, RESOLUTION_MINUTE, bucket_start
+
+logger = logging.getLogger(__name__)
+
+# nozzle_productions 테이블(및 그 CSV export)의 컬럼 이름
+AUDIT_COLUMNS = ('timestamp', 'quantity_produced', 'avg_processing_time', 'avg_waiting_time',
+                 'defect_volume', 'avg_defect_rate')
+# 여러 용접기의 기록을 담은 테이블을 export한 경우 용접기를 구분하는 컬럼
+WELDER_ID_COLUMN = 'welder_id'
+
+
+def _to_datetime64(values:Sequence) -> np.ndarray:
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[us]')
+    return np.array([v.isoformat() if isinstance(v, datetime) else v for v in values], dtype='datetime64[us]')
+
+
+def _slice_bounds(times:np.ndarray, start:Optional[datetime], end:Optional[datetime]) -> tuple[int,int]:
+    lo = int(np.searchsorted(times, np.datetime64(start, 'us'), 'left')) if start is not None else 0
+    hi = int(np.searchsorted(times, np.datetime64(end, 'us'), 'right')) if end is not None else len(times)
+    return lo, hi
+
+
+@dataclass(slots=True)
+class AuditFrame:
+    """
+    노즐 생산 통계(NozzleProductionAudit) 기록들을 컬럼별 배열로 담은 것.
+
+    시간 값의 단위는 nozzle_productions 테이블과 같이 milli-second이며, 기록은 시각 순서로 정렬되어 있다.
+    `window()`는 배열을 복사하지 않고 잘라내며, `deltas()`와 `buckets()`는 누적 통계로부터
+    기록 사이의 증분을 배열 연산으로 복원한다.
+    """
+    times: np.ndarray                   # datetime64[us]
+    quantity_produced: np.ndarray       # int64
+    avg_processing_time: np.ndarray     # float64 (ms)
+    avg_waiting_time: np.ndarray        # float64 (ms)
+    defect_volume: np.ndarray           # int64
+    avg_defect_rate: np.ndarray         # float64
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def from_columns(cls, times:Sequence, quantity_produced:Sequence[int], avg_processing_time:Sequence[float],
+                     avg_waiting_time:Sequence[float], defect_volume:Sequence[int],
+                     avg_defect_rate:Sequence[float]) -> AuditFrame:
+        frame = cls(times=_to_datetime64(times),
+                    quantity_produced=np.asarray(quantity_produced, dtype=np.int64),
+                    avg_processing_time=np.asarray(avg_processing_time, dtype=np.float64),
+                    avg_waiting_time=np.asarray(avg_waiting_time, dtype=np.float64),
+                    defect_volume=np.asarray(defect_volume, dtype=np.int64),
+                    avg_defect_rate=np.asarray(avg_defect_rate, dtype=np.float64))
+        if len(frame) > 1 and (np.diff(frame.times) < np.timedelta64(0, 'us')).any():
+            order = np.argsort(frame.times, kind='stable')
+            frame = frame._take(order)
+        return frame
+
+    def _take(self, index) -> AuditFrame:
+        return AuditFrame(self.times[index], self.quantity_produced[index], self.avg_processing_time[index],
+                          self.avg_waiting_time[index], self.defect_volume[index], self.avg_defect_rate[index])
+
+    def window(self, start:Optional[datetime]=None, end:Optional[datetime]=None) -> AuditFrame:
+        """[start, end] 구간의 기록들."""
+        lo, hi = _slice_bounds(self.times, start, end)
+        return self._take(slice(lo, hi))
+
+    def audits(self) -> Iterator[NozzleProductionAudit]:
+        for ts, qty, proc, wait, defects, rate in zip(self.times.tolist(), self.quantity_produced.tolist(),
+                                                      self.avg_processing_time.tolist(),
+                                                      self.avg_waiting_time.tolist(), self.defect_volume.tolist(),
+                                                      self.avg_defect_rate.tolist()):
+            yield NozzleProductionAudit(Timestamp=ts, QuantityProduced=qty,
+                                        AvgProcessingTime=timedelta(milliseconds=proc),
+                                        AvgWaitingTime=timedelta(milliseconds=wait),
+                                        DefectVolume=defects, AvgDefectRate=rate)
+
+    def deltas(self) -> AuditDeltas:
+        """
+        각 기록과 그 직전 기록 사이에 생산된 노즐들의 통계를 누적 평균으로부터 복원한다.
+
+        `ProductionTracker`와 같이 처리 시간의 합계는 평균 × 생산 수량, 대기 시간의 합계는
+        평균 × (생산 수량 - 1)로 복원한 뒤 차분한다. 생산 수량이 줄어든 기록은 통계가 초기화된
+        것으로 보고 0부터의 증분으로 계산한다. 첫 기록은 생산 수량이 1인 경우에만 증분으로 보고,
+        그렇지 않으면 이전 기록을 알 수 없으므로 증분을 0으로 둔다.
+
+        평균 시간이 milli-second 단위로 반올림되어 저장되므로 복원한 처리 시간의 합계에는 기록당
+        최대 ±생산 수량 × 0.5ms의 오차가 있다. 증분을 더한 구간 합계에는 구간 양 끝 기록의 오차만 남으므로
+        `buckets()`의 평균은 충분히 정확하지만, 증분 하나의 오차는 직전과 현재 기록의 오차를 더한 만큼이어서
+        누적 수량에 비례하여 커진다 (예: 3000번째 노즐의 처리 시간은 약 ±3s). 증분별 오차의 상한은
+        `processing_error`, `waiting_error`에 담는다.
+        """
+        qty = self.quantity_produced
+        waiting_count = np.maximum(qty - 1, 0)
+        processing_sum = qty * self.avg_processing_time
+        waiting_sum = waiting_count * self.avg_waiting_time
+        defects = self.defect_volume
+
+        def previous(values:np.ndarray) -> np.ndarray:
+            prev = np.empty_like(values)
+            if len(values):
+                prev[1:] = values[:-1]
+                prev[0] = 0 if qty[0] == 1 else values[0]
+            prev[reset] = 0
+            return prev
+
+        def diff(values:np.ndarray) -> np.ndarray:
+            return values - previous(values)
+
+        def rounding_error(count:np.ndarray) -> np.ndarray:
+            # 평균 × 개수로 복원한 합계의 오차(±개수 × 0.5ms)가 직전 기록과 현재 기록에서 더해진다.
+            error = 0.5 * (count + previous(count))
+            if len(error) and qty[0] != 1:
+                error[0] = 0.0
+            return error
+
+        reset = np.zeros(len(qty), dtype=bool)
+        reset[1:] = qty[1:] < qty[:-1]
+        return AuditDeltas(times=self.times, quantity=diff(qty), defects=diff(defects),
+                           processing_time=diff(processing_sum), waiting_count=diff(waiting_count),
+                           waiting_time=diff(waiting_sum), processing_error=rounding_error(qty),
+                           waiting_error=rounding_error(waiting_count))
+
+    def buckets(self, resolution:str, shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS,
+                start:Optional[datetime]=None, end:Optional[datetime]=None) -> AuditBuckets:
+        """[start, end] 구간의 기록들을 `rollup.bucket_start()`의 구간(분/시/교대)별로 집계한다."""
+        return self.deltas().window(start, end).buckets(resolution, shift_hours)
+
+
+@dataclass(slots=True)
+class AuditDeltas:
+    """
+    기록별 증분. `quantity[i]`는 `times[i]` 직전 기록 이후 생산된 노즐 수이며,
+    `processing_time`, `waiting_time`은 그 노즐들의 처리/대기 시간 합계(ms)이다.
+    `quantity[i] == 1`인 기록의 값이 곧 노즐 하나의 처리 시간이다.
+    `processing_error`, `waiting_error`는 평균값의 반올림으로 생기는 합계 오차의 상한(±ms)이다.
+    """
+    times: np.ndarray
+    quantity: np.ndarray
+    defects: np.ndarray
+    processing_time: np.ndarray
+    waiting_count: np.ndarray
+    waiting_time: np.ndarray
+    processing_error: np.ndarray
+    waiting_error: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _take(self, index) -> AuditDeltas:
+        return AuditDeltas(self.times[index], self.quantity[index], self.defects[index],
+                           self.processing_time[index], self.waiting_count[index], self.waiting_time[index],
+                           self.processing_error[index], self.waiting_error[index])
+
+    def window(self, start:Optional[datetime]=None, end:Optional[datetime]=None) -> AuditDeltas:
+        lo, hi = _slice_bounds(self.times, start, end)
+        return self._take(slice(lo, hi))
+
+    def nozzles(self, max_relative_error:Optional[float]=None) -> AuditDeltas:
+        """
+        노즐 하나만큼 증가한 기록들 (노즐별 처리/대기 시간과 불량 여부).
+
+        `max_relative_error`를 지정하면 처리/대기 시간 오차의 상한이 그 값의 `max_relative_error`배를
+        넘는 기록(누적 수량이 커서 노즐별 시간을 신뢰할 수 없는 기록)은 제외한다.
+        """
+        index = self.quantity == 1
+        if max_relative_error is not None:
+            index &= self.processing_error <= max_relative_error * np.abs(self.processing_time)
+            index &= (self.waiting_count == 0) | (self.waiting_error <= max_relative_error * np.abs(self.waiting_time))
+        return self._take(index)
+
+    def buckets(self, resolution:str, shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS) -> AuditBuckets:
+        if len(self) == 0:
+            return AuditBuckets(resolution, [], *(np.zeros(0) for _ in range(5)))
+        # bucket_start()는 분(minute) 또는 시(hour)까지의 값에만 의존하므로, 값이 바뀌는 위치에서만 호출한다.
+        # (분 단위 구간의 시작 시각은 분 단위로 내린 시각 그 자체이다.)
+        unit = 'm' if resolution == RESOLUTION_MINUTE else 'h'
+        floored = self.times.astype(f'datetime64[{unit}]')
+        changes = np.flatnonzero(floored[1:] != floored[:-1]) + 1
+        heads = np.concatenate(([0], changes))
+        heads_floored = floored[heads].astype('datetime64[us]').tolist()
+        if resolution == RESOLUTION_MINUTE:
+            starts = heads_floored
+        else:
+            starts = [bucket_start(ts, resolution, shift_hours) for ts in heads_floored]
+        # 정렬된 시각에 대해 bucket_start()는 단조 증가하므로 같은 구간은 연속해 있다.
+        keep = [0] + [i for i in range(1, len(starts)) if starts[i] != starts[i-1]]
+        offsets = heads[keep]
+        return AuditBuckets(resolution=resolution, starts=[starts[i] for i in keep],
+                            quantity=np.add.reduceat(self.quantity, offsets),
+                            defects=np.add.reduceat(self.defects, offsets),
+                            processing_time=np.add.reduceat(self.processing_time, offsets),
+                            waiting_count=np.add.reduceat(self.waiting_count, offsets),
+                            waiting_time=np.add.reduceat(self.waiting_time, offsets))
+
+
+@dataclass(slots=True)
+class AuditBuckets:
+    """구간별 생산 수량, 불량 수량과 처리/대기 시간 합계(ms)."""
+    resolution: str
+    starts: list[datetime]
+    quantity: np.ndarray
+    defects: np.ndarray
+    processing_time: np.ndarray
+    waiting_count: np.ndarray
+    waiting_time: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def avg_processing_time(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.quantity > 0, self.processing_time / self.quantity, np.nan)
+
+    @property
+    def avg_waiting_time(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.waiting_count > 0, self.waiting_time / self.waiting_count, np.nan)
+
+    @property
+    def defect_rate(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.quantity > 0, self.defects / self.quantity, np.nan)
+
+
+def read_audit_frame_from_csv(file:str, delimiter:str=',', welder_id:Optional[str]=None) -> AuditFrame:
+    """
+    nozzle_productions 테이블을 export한 CSV 파일(헤더 포함)을 컬럼별로 읽는다.
+    처리/대기 시간 컬럼은 milli-second 단위이다. 형식이 잘못된 행은 오류를 기록하고 건너뛴다.
+
+    누적 통계는 용접기별로 계산되므로, 파일에 `welder_id` 컬럼이 있으면 `welder_id`의 기록만 읽는다.
+    여러 용접기의 기록이 섞인 파일을 `welder_id` 없이 읽으면 ValueError를 발생시킨다.
+    """
+    with open(file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        rows = [row for row in reader if row]
+    if header is None:
+        return AuditFrame.from_columns(*([()] * len(AUDIT_COLUMNS)))
+    missing = [name for name in AUDIT_COLUMNS if name not in header]
+    if missing:
+        logger.error(f"Missing columns {missing} in {file}, header: {header}")
+        return AuditFrame.from_columns(*([()] * len(AUDIT_COLUMNS)))
+    if WELDER_ID_COLUMN in header:
+        w = header.index(WELDER_ID_COLUMN)
+        if welder_id is not None:
+            rows = [row for row in rows if len(row) > w and row[w] == welder_id]
+        else:
+            welders = { row[w] for row in rows if len(row) > w }
+            if len(welders) > 1:
+                raise ValueError(f"{file} holds the audits of several welders {sorted(welders)}: "
+                                 f"specify welder_id")
+    elif welder_id is not None:
+        logger.warning(f"no '{WELDER_ID_COLUMN}' column in {file}: reading all rows as the audits of {welder_id!r}")
+    index = [header.index(name) for name in AUDIT_COLUMNS]
+    try:
+        # 대부분의 파일은 모든 행이 올바르므로 먼저 컬럼 단위로 한 번에 변환한다.
+        times, *values = ([row[i] for row in rows] for i in index)
+        return AuditFrame.from_columns(_to_datetime64(times), *(np.array(v, dtype=np.float64) for v in values))
+    except (IndexError, ValueError):
+        pass
+    # 잘못된 행이 있으면 행 단위로 변환하여 그 행들만 건너뛴다.
+    parsed = []
+    for row in rows:
+        try:
+            parsed.append(_parse_audit_row(row, index))
+        except (IndexError, ValueError) as e:
+            logger.error(f"Error processing row: {row}, Error: {e}")
+    columns = list(zip(*parsed)) if parsed else [()] * len(AUDIT_COLUMNS)
+    return AuditFrame.from_columns(*columns)
+
+
+def _parse_audit_row(row:list[str], index:list[int]) -> tuple:
+    ts, qty, proc, wait, defects, rate = (row[i] for i in index)
+    return (datetime.fromisoformat(ts), int(qty), float(proc), float(wait), int(defects), float(rate))
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator, Optional, Sequence, Union
+from dataclasses import dataclass
+
+from datetime import datetime
+
+import numpy as np
+
+from .types import ElectricCurrentMeasure
+from .reader import read_channel_rows_from_csv
+from .monitor import NozzleMonitor, IdlePeriod, EVENT_STARTED
+from .features import WaveformBatch, extract_batch_features, inspect_patterns
+from .reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+
+
+@dataclass(slots=True)
+class ChannelFrame:
+    """
+    여러 채널(상)의 전류 측정값들을 담은 (시각 × 채널) 배열.
+
+    `values[i, c]`는 `times[i]` 시각의 `channels[c]` 채널의 전류이며, 해당 시각에 보고되지 않은
+    채널의 값은 NaN이다. 시각은 증가하는 순서이다.
+    """
+    times: list[datetime]
+    channels: tuple[str,...]
+    values: np.ndarray      # (T, C)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def from_rows(cls, rows:Iterable[tuple[datetime,str,float]],
+                  channels:Optional[Sequence[str]]=None) -> ChannelFrame:
+        """
+        (시각, 채널, 전류) 행들을 시각별로 묶는다. `channels`를 지정하면 그 채널들만 그 순서대로 사용하고,
+        지정하지 않으면 처음 나타난 순서대로 모든 채널을 사용한다. 같은 시각, 같은 채널의 값은 먼저 읽은 것을 사용한다.
+        """
+        index:dict[str,int] = { name: c for c, name in enumerate(channels) } if channels is not None else {}
+        fixed = channels is not None
+        points:dict[datetime,dict[int,float]] = {}
+        for ts, channel, value in rows:
+            c = index.get(channel)
+            if c is None:
+                if fixed:
+                    continue
+                c = index[channel] = len(index)
+            points.setdefault(ts, {}).setdefault(c, value)
+
+        times = sorted(points)
+        values = np.full((len(times), len(index)), np.nan)
+        for i, ts in enumerate(times):
+            for c, value in points[ts].items():
+                values[i, c] = value
+        return cls(times=times, channels=tuple(index), values=values)
+
+    def channel(self, name:str) -> list[ElectricCurrentMeasure]:
+        """한 채널의 측정값들 (값이 없는 시각은 제외)."""
+        column = self.values[:, self.channels.index(name)]
+        return [ElectricCurrentMeasure(ts, float(v)) for ts, v in zip(self.times, column) if not np.isnan(v)]
+
+    def rows(self) -> Iterator[tuple[datetime,np.ndarray]]:
+        return zip(self.times, self.values)
+
+
+def read_channel_frame_from_csv(files:Sequence[str], channels:Optional[Sequence[str]]=None,
+                                layout:Optional[str]=None) -> ChannelFrame:
+    """`layout`을 지정하지 않으면 파일별로 첫 행에서 형식을 판단한다 (`reader.detect_csv_layout()`)."""
+    rows = (row for file in files for row in read_channel_rows_from_csv(file, layout=layout))
+    return ChannelFrame.from_rows(rows, channels)
+
+
+@dataclass(slots=True)
+class ChannelWaveform:
+    """
+    여러 채널의 작업 구간 파형. `waveform`은 작업 인식에 사용한 대표 전류와 상태이고,
+    `amperes[i, c]`는 `waveform[i]` 시각의 채널별 전류이다.
+    """
+    waveform: list[ElectricCurrentMeasure]
+    channels: tuple[str,...]
+    amperes: np.ndarray     # (T, C)
+
+    def __len__(self) -> int:
+        return len(self.waveform)
+
+
+# (이벤트 종류, 내용): 시작 이벤트는 대표 전류의 대기 구간 요약, 종료 이벤트는 채널별 파형을 담는다.
+ChannelEvent = tuple[str, Union[IdlePeriod, ChannelWaveform]]
+
+
+class ChannelMonitor:
+    """
+    채널별 전류를 한 번에 받아 노즐 생산의 시작과 종료를 감지한다.
+
+    작업 인식은 채널들의 대표 전류(`driver` 채널, 지정하지 않으면 채널별 최대값) 하나로 수행하므로
+    채널 수와 무관하게 한 번만 하며, 진행 중인 파형의 채널별 전류는 (시각 × 채널) 행으로 함께 보관한다.
+    """
+    def __init__(self, channels:Sequence[str], driver:Optional[str]=None, monitor:Optional[NozzleMonitor]=None):
+        self.channels = tuple(channels)
+        self.driver = self.channels.index(driver) if driver is not None else None
+        self.monitor = monitor if monitor is not None else NozzleMonitor()
+        self.rows:list[np.ndarray] = []                 # monitor.waveform과 같은 길이의 채널별 전류
+        self.pending:dict[datetime,np.ndarray] = {}     # 재정렬 대기 중인 측정값들의 채널별 전류
+
+    def representative(self, amperes:np.ndarray) -> float:
+        if self.driver is not None:
+            return float(amperes[self.driver])
+        # 보고되지 않은 채널(NaN)은 제외한다.
+        return float(np.nanmax(amperes)) if not np.isnan(amperes).all() else 0.0
+
+    def push(self, ts:datetime, amperes:Sequence[float]) -> list[ChannelEvent]:
+        """
+        한 시각의 채널별 전류를 받아, 재정렬 단계를 거쳐 처리할 수 있게 된 측정값들을 반영하고
+        발생한 이벤트들을 반환한다.
+        """
+        ingest = self.monitor.ingest
+        row = np.asarray(amperes, dtype=np.float64)
+        # 재정렬 단계에서 버려질 측정값(중복 또는 늦게 도착한 값)의 채널 값은 보관하지 않는다.
+        if ts not in self.pending and (ingest.frontier is None or ts > ingest.frontier):
+            self.pending[ts] = row
+        events = []
+        for m in ingest.push(ElectricCurrentMeasure(ts, self.representative(row))):
+            event = self.update(m.timestamp, self.pending.pop(m.timestamp))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def update(self, ts:datetime, amperes:np.ndarray) -> Optional[ChannelEvent]:
+        """시각이 증가하는 순서로 주어진 측정값 하나를 반영한다 (재정렬을 거치지 않는다)."""
+        monitor = self.monitor
+        previous, length = monitor.waveform, len(monitor.waveform)
+        rows = self.rows
+        event = monitor.update(ts, self.representative(amperes))
+
+        result = None
+        if event is not None:
+            kind, waveform = event
+            if kind == EVENT_STARTED:
+                result = event
+            else:
+                event_rows = rows + [amperes] if len(waveform) > length else rows
+                result = (kind, self._waveform(waveform, event_rows))
+        if monitor.waveform is previous:
+            if len(previous) > length:
+                rows.append(amperes)
+        else:
+            self.rows = [amperes] if monitor.waveform else []
+        return result
+
+    def flush(self) -> list[ChannelEvent]:
+        """재정렬 대기 중인 측정값들을 모두 반영한다 (입력이 끝났을 때 사용)."""
+        events = []
+        for m in self.monitor.ingest.flush():
+            event = self.update(m.timestamp, self.pending.pop(m.timestamp))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _waveform(self, waveform:list[ElectricCurrentMeasure], rows:list[np.ndarray]) -> ChannelWaveform:
+        amperes = np.vstack(rows) if rows else np.empty((0, len(self.channels)))
+        return ChannelWaveform(waveform=waveform, channels=self.channels, amperes=amperes)
+
+    def snapshot(self) -> dict[str,Any]:
+        return {
+            'channels': self.channels,
+            'driver': self.channels[self.driver] if self.driver is not None else None,
+            'monitor': self.monitor.snapshot(),
+            'rows': [row.tolist() for row in self.rows],
+            'pending': { ts: row.tolist() for ts, row in self.pending.items() },
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot:dict[str,Any]) -> ChannelMonitor:
+        monitor = cls(snapshot['channels'], snapshot['driver'], NozzleMonitor.from_snapshot(snapshot['monitor']))
+        monitor.rows = [np.array(row) for row in snapshot['rows']]
+        monitor.pending = { ts: np.array(row) for ts, row in snapshot['pending'].items() }
+        return monitor
+
+
+def extract_channel_features(waveform:ChannelWaveform, library:Optional[ReferenceLibrary]=None,
+                             welder_type:str=DEFAULT_WELDER_TYPE, dtw:bool=True) -> np.ndarray:
+    """
+    파형의 채널별 특징 행렬 (채널 수, len(FEATURES))을 계산한다.
+
+    모든 채널이 같은 시각과 상태를 공유하므로 채널들을 하나의 `WaveformBatch`의 행으로 묶어,
+    피크/너비/DTW 계산을 채널 수와 무관하게 한 번의 배열 연산으로 수행한다.
+    보고되지 않은 채널 값(NaN)은 0으로 간주한다.
+    """
+    measures = waveform.waveform
+    C = len(waveform.channels)
+    T = len(measures)
+    if T == 0:
+        batch = WaveformBatch(times=np.zeros((C, 1)), amperes=np.zeros((C, 1)),
+                              states=np.full((C, 1), -1, dtype=np.int8), lengths=np.zeros(C, dtype=np.int64))
+    else:
+        t0 = measures[0].timestamp
+        times = np.array([(m.timestamp - t0).total_seconds() for m in measures])
+        states = np.array([m.state for m in measures], dtype=np.int8)
+        batch = WaveformBatch(times=np.broadcast_to(times, (C, T)),
+                              amperes=np.nan_to_num(waveform.amperes.T),
+                              states=np.broadcast_to(states, (C, T)),
+                              lengths=np.full(C, T, dtype=np.int64))
+    return extract_batch_features(batch, library, welder_type, dtw)
+
+
+def inspect_channels(waveform:ChannelWaveform, library:Optional[ReferenceLibrary]=None,
+                     welder_type:str=DEFAULT_WELDER_TYPE) -> dict[str,bool]:
+    """채널별로 `inspect_waveform()`과 같은 판정을 한 번에 수행한다."""
+    verdicts = inspect_patterns(extract_channel_features(waveform, dtw=False), library, welder_type)
+    return dict(zip(waveform.channels, verdicts.tolist()))
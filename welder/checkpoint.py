@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import os
+import time
+import zlib
+import pickle
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = 1
+
+
+class Checkpointer:
+    """
+    서비스 상태의 주기적인 스냅샷을 파일로 저장하고 복원한다.
+
+    `save()`는 호출 시점의 상태를 직렬화(pickle)만 하고, 압축과 파일 기록은 백그라운드
+    쓰레드가 수행하므로 처리 루프를 지연시키지 않는다. 기록이 밀리는 경우에는 가장 최근의
+    스냅샷만 기록한다. 파일은 임시 파일에 쓴 뒤 `os.replace()`로 교체하므로 중간에
+    중단되더라도 이전 스냅샷이 손상되지 않는다.
+
+    스냅샷은 spool 기록과 원자적으로 저장되지 않으므로, 복원한 뒤 다시 처리되는 구간의 기록은
+    저장소에서 중복 없이 반영되어야 한다 (예: `database_utils.record_nozzle_productions()`).
+    """
+    def __init__(self, path:str, interval:float=5.0):
+        self.path = path
+        self.interval = interval
+        self.last_saved = time.monotonic()
+        self.saved_count = 0
+        self.lock = threading.Lock()
+        self.pending = threading.Condition(self.lock)
+        self.data:Optional[bytes] = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name='checkpointer', daemon=True)
+
+    def start(self) -> Checkpointer:
+        self.thread.start()
+        return self
+
+    def stop(self, timeout:Optional[float]=None) -> None:
+        """아직 기록되지 않은 스냅샷을 기록한 뒤 쓰레드를 종료한다."""
+        with self.lock:
+            self.stopped = True
+            self.pending.notify_all()
+        self.thread.join(timeout)
+
+    def due(self) -> bool:
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def save(self, state:dict[str,Any]) -> None:
+        data = pickle.dumps({ 'format': CHECKPOINT_FORMAT, 'created': datetime.now(), 'state': state },
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        self.last_saved = time.monotonic()
+        with self.lock:
+            self.data = data
+            self.pending.notify_all()
+
+    def load(self) -> Optional[dict[str,Any]]:
+        """저장된 스냅샷의 상태를 반환한다. 스냅샷이 없거나 읽을 수 없으면 None을 반환한다."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                checkpoint = pickle.loads(zlib.decompress(f.read()))
+        except Exception as e:
+            logger.warning(f'failed to read checkpoint {self.path}: {e}')
+            return None
+        if checkpoint.get('format') != CHECKPOINT_FORMAT:
+            logger.warning(f"unsupported checkpoint format: {checkpoint.get('format')}")
+            return None
+        logger.info(f"loaded checkpoint {self.path} (created={checkpoint['created']})")
+        return checkpoint['state']
+
+    def _run(self) -> None:
+        while True:
+            with self.lock:
+                while self.data is None and not self.stopped:
+                    self.pending.wait()
+                data, self.data = self.data, None
+                stopped = self.stopped
+            if data is not None:
+                try:
+                    self._write(zlib.compress(data))
+                    self.saved_count += 1
+                except Exception as e:
+                    logger.error(f'failed to write checkpoint {self.path}: {e}')
+            if stopped:
+                return
+
+    def _write(self, data:bytes) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
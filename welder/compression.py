@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import Iterable, Generator, Optional
+from dataclasses import dataclass
+
+from datetime import datetime, timedelta
+
+from .types import ElectricCurrentMeasure
+from .work_recognizer import WorkRecognizer, STATUS_UNKNOWN, STATUS_START, STATUS_MIDDLE, STATUS_END, \
+                             START_THRESHOLD
+
+
+@dataclass(frozen=True, slots=True)
+class CompressedMeasure:
+    """압축 후 저장되는 측정값. `skipped`는 직전 저장값과 이 값 사이에서 생략된 (등간격) 측정값 수이다."""
+    timestamp: datetime
+    ampere: float
+    state: int = -1
+    skipped: int = 0
+
+
+class AmpereCompressor:
+    """
+    전류 측정값에 대한 deadband + swinging-door 압축기.
+
+    작업 구간(상태 1~3)과 그 직후 `guard`개의 측정값, 그리고 작업 시작 임계값에 가까운
+    측정값은 그대로 저장하고, 그 외의 대기 구간 측정값만 압축한다. 대기 구간에서는
+    마지막 저장값과의 차이가 `deadband` 이내인 값을 변화가 없는 것으로 보고, 그 결과에
+    대해 허용 오차가 `error`인 swinging-door 알고리즘을 적용한다. 따라서 복원된 값과
+    원래 값의 차이는 `deadband + error` 이하이다.
+
+    생략된 측정값들의 시각은 `reconstruct()`에서 등간격으로 복원되므로, 측정 간격이
+    `jitter` 이상 달라지는 지점에서는 압축 구간을 나눈다. 또한 복원 시 오래된 저장값까지
+    읽지 않도록 저장값 사이의 간격은 `max_interval`을 넘지 않는다.
+
+    작업 구간 판정은 내부의 `WorkRecognizer`로 하므로, 복원된 측정값들을 다시 인식하면
+    원래 측정값들과 같은 작업 구간(파형)이 얻어진다. 인식기는 최근 15개 측정값의 피크로
+    작업 종료를 판정하는데, 대기 구간의 값은 직전 작업의 피크와 함께 버퍼에 있을 때만 판정에
+    영향을 준다. 작업 시작 측정값 다음부터 피크를 검사하므로, 이는 작업 종료 후 12개 이내의
+    대기 구간 값에 해당한다 (`guard`의 기본값).
+    """
+    def __init__(self, error:float=0.2, deadband:float=0.2, guard:int=WorkRecognizer.BUFFER_SIZE - 3,
+                 jitter:timedelta=timedelta(milliseconds=1), max_interval:timedelta=timedelta(seconds=60),
+                 recognizer:Optional[WorkRecognizer]=None):
+        self.error = error
+        self.deadband = deadband
+        self.guard = guard
+        self.jitter = jitter
+        self.max_interval = max_interval
+        # 이 값 이상인 측정값은 복원 오차로 인해 작업 시작 판정이 달라질 수 있으므로 그대로 저장한다.
+        self.keep_above = START_THRESHOLD - (error + deadband)
+        self.recognizer = recognizer if recognizer is not None else WorkRecognizer()
+
+        self.guard_left = 0
+        self.anchor:Optional[CompressedMeasure] = None       # 마지막 저장값
+        self.last:Optional[tuple[ElectricCurrentMeasure,float,int]] = None   # 압축 구간의 마지막 값 (측정값, 보정값, 상태)
+        self.last_ts:Optional[datetime] = None
+        self.step:Optional[timedelta] = None
+        self.skipped = 0
+        self.upper = float('inf')
+        self.lower = float('-inf')
+        self.input_count = 0
+        self.output_count = 0
+
+    def add(self, measure:ElectricCurrentMeasure) -> list[CompressedMeasure]:
+        """측정값 하나를 추가하고, 저장이 확정된 값들을 반환한다."""
+        self.input_count += 1
+        code = self.recognizer.recognize(measure.timestamp, measure.ampere)
+        out:list[CompressedMeasure] = []
+        if code in (STATUS_UNKNOWN, STATUS_START, STATUS_MIDDLE, STATUS_END) or measure.ampere >= self.keep_above:
+            self._keep(measure, code, out)
+            if code != STATUS_UNKNOWN:
+                self.guard_left = self.guard
+        elif self.guard_left > 0:
+            self.guard_left -= 1
+            self._keep(measure, code, out)
+        else:
+            self._compress(measure, code, out)
+        self.output_count += len(out)
+        return out
+
+    def flush(self) -> list[CompressedMeasure]:
+        """압축 중인 구간을 닫고 남은 저장값을 반환한다."""
+        out:list[CompressedMeasure] = []
+        self._close(out)
+        self.output_count += len(out)
+        return out
+
+    def ratio(self) -> float:
+        """압축률 (입력 측정값 수 / 저장값 수)."""
+        return self.input_count / self.output_count if self.output_count else 0.0
+
+    def _keep(self, measure:ElectricCurrentMeasure, code:int, out:list[CompressedMeasure]) -> None:
+        self._close(out)
+        self._emit(CompressedMeasure(measure.timestamp, measure.ampere, code), out)
+        self.last_ts = measure.timestamp
+
+    def _emit(self, point:CompressedMeasure, out:list[CompressedMeasure]) -> None:
+        out.append(point)
+        self.anchor = point
+        self.last = None
+        self.step = None
+        self.skipped = 0
+        self.upper = float('inf')
+        self.lower = float('-inf')
+
+    def _close(self, out:list[CompressedMeasure]) -> None:
+        # 압축 구간의 마지막 값을 저장하여 구간을 닫는다.
+        if self.last is not None:
+            measure, value, code = self.last
+            # 구간 내의 모든 값이 오차 이내가 되도록, 기울기를 문(door)의 범위 안으로 제한한 직선 위의 값을 저장한다.
+            anchor = self.anchor
+            dt = (measure.timestamp - anchor.timestamp).total_seconds()
+            slope = min(max((value - anchor.ampere) / dt, self.lower), self.upper)
+            self._emit(CompressedMeasure(measure.timestamp, anchor.ampere + slope * dt, code, self.skipped), out)
+
+    def _compress(self, measure:ElectricCurrentMeasure, code:int, out:list[CompressedMeasure]) -> None:
+        ts = measure.timestamp
+        step = ts - self.last_ts if self.last_ts is not None else None
+        self.last_ts = ts
+        if self.anchor is None or step is None:
+            self._emit(CompressedMeasure(ts, measure.ampere, code), out)
+            return
+
+        # 측정 간격이 달라지거나 저장 간격이 너무 길어지면 구간을 나눈다.
+        if self.last is not None and (abs(step - self.step) > self.jitter
+                                      or ts - self.anchor.timestamp > self.max_interval):
+            self._close(out)
+        if ts <= self.anchor.timestamp:
+            # 마지막 저장값보다 늦지 않은 값(예: 같은 시각의 중복 측정값)은 기울기를 구할 수 없으므로
+            # 구간을 닫고 그대로 저장한다.
+            self._close(out)
+            self._emit(CompressedMeasure(ts, measure.ampere, code), out)
+            return
+        if self.last is None and (step > self.max_interval or ts - self.anchor.timestamp > self.max_interval):
+            self._emit(CompressedMeasure(ts, measure.ampere, code), out)
+            return
+
+        value, upper, lower = self._door(measure)
+        if self.last is not None and lower > upper:
+            # 문(door)이 닫히면 직전 값까지를 하나의 직선 구간으로 저장하고 새 구간을 시작한다.
+            self._close(out)
+            value, upper, lower = self._door(measure)
+        elif self.last is not None:
+            self.skipped += 1
+        if self.last is None:
+            self.step = step
+        self.upper, self.lower = upper, lower
+        self.last = (measure, value, code)
+
+    def _door(self, measure:ElectricCurrentMeasure) -> tuple[float,float,float]:
+        # 마지막 저장값과의 차이가 deadband 이내이면 변화가 없는 것으로 본다.
+        anchor = self.anchor
+        value = anchor.ampere if abs(measure.ampere - anchor.ampere) <= self.deadband else measure.ampere
+        dt = (measure.timestamp - anchor.timestamp).total_seconds()
+        upper = min(self.upper, (value + self.error - anchor.ampere) / dt)
+        lower = max(self.lower, (value - self.error - anchor.ampere) / dt)
+        return value, upper, lower
+
+
+def reconstruct(points:Iterable[CompressedMeasure],
+                previous:Optional[CompressedMeasure]=None) -> Generator[ElectricCurrentMeasure,None,None]:
+    """
+    저장값들로부터 생략된 측정값들을 선형 보간하여 원래 시각의 측정값들을 복원한다.
+
+    `previous`는 `points`의 첫 값 이전의 저장값으로, 첫 값의 생략된 측정값들을 복원하는 데 사용된다.
+    """
+    for point in points:
+        if point.skipped > 0 and previous is not None:
+            span = point.timestamp - previous.timestamp
+            slope = point.ampere - previous.ampere
+            n = point.skipped + 1
+            for i in range(1, n):
+                yield ElectricCurrentMeasure(timestamp=previous.timestamp + span * i / n,
+                                             ampere=previous.ampere + slope * i / n,
+                                             state=point.state)
+        yield ElectricCurrentMeasure(timestamp=point.timestamp, ampere=point.ampere, state=point.state)
+        previous = point
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Callable, Optional
+
 import logging
+from datetime import datetime, timedelta
 
 import psycopg2
 from psycopg2.extensions import connection
+from psycopg2.extras import RealDictCursor, Json, execute_values
 
 from .types import ElectricCurrentMeasure
-from .types import NozzleProductionAudit
+from .types import NozzleProductionAudit, INSPECTION_FULL, DEFAULT_WELDER_ID
+from .sketch import QuantileSketch
+from .compression import CompressedMeasure, reconstruct
+from .pyramid import AmpereSummary, PYRAMID_RESOLUTIONS, RESOLUTION_RAW, pyramid_bucket_start, choose_resolution
+from .rollup import RESOLUTIONS, DEFAULT_SHIFT_HOURS, NozzleRollup, bucket_start, to_millis
+
+if TYPE_CHECKING:
+    from .channels import ChannelFrame
+    from .audit import AuditFrame
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,6 +27,44 @@ logger = logging.getLogger(__name__)
 def open_connection(connection_params:dict) -> connection:
     return psycopg2.connect(**connection_params)
 
+
+class ReconnectingConnection:
+    """
+    Lazily (re)opens a connection; `reset()` drops a broken connection
+    so that the next `get()` reconnects. `on_connect` is called on every
+    new connection (e.g. to create missing tables).
+    """
+    def __init__(self, connection_params:dict, on_connect:Optional[Callable[[connection],None]]=None):
+        self.connection_params = connection_params
+        self.on_connect = on_connect
+        self.conn:Optional[connection] = None
+
+    def get(self) -> connection:
+        if self.conn is None or self.conn.closed:
+            conn = open_connection(self.connection_params)
+            if self.on_connect is not None:
+                self.on_connect(conn)
+            self.conn = conn
+        return self.conn
+
+    def reset(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+    def handler(self, func:Callable[[connection,list],None]) -> Callable[[list],None]:
+        """Wrap `func(conn, payloads)` as a spool handler that reconnects after a failure."""
+        def handle(payloads:list) -> None:
+            try:
+                func(self.get(), payloads)
+            except Exception:
+                self.reset()
+                raise
+        return handle
+
 def create_ampere_log_table_if_absent(conn:connection) -> None:
     """Initialize database table if it doesn't exist"""
     with conn.cursor() as cur:
@@ -33,10 +83,14 @@ def create_ampere_log_table_if_absent(conn:connection) -> None:
                 CREATE TABLE welder_ampere_log (
                     id SERIAL PRIMARY KEY,
                     timestamp TIMESTAMP NOT NULL,
-                    ampere FLOAT NOT NULL
+                    ampere FLOAT NOT NULL,
+                    -- 압축 저장(log_compressed_measures)을 위한 컬럼: 작업 상태와 직전 행 이후 생략된 측정값 수
+                    state SMALLINT NOT NULL DEFAULT -1,
+                    skipped INTEGER NOT NULL DEFAULT 0
                 )
             """)
-            conn.commit()
+        cur.execute("CREATE INDEX IF NOT EXISTS welder_ampere_log_timestamp_idx ON welder_ampere_log (timestamp)")
+    conn.commit()
 
 def log_measure(conn:connection, measure: ElectricCurrentMeasure) -> None:
     """Log single ElectricCurrentMeasure data to PostgreSQL database"""
@@ -46,8 +100,182 @@ def log_measure(conn:connection, measure: ElectricCurrentMeasure) -> None:
             VALUES (%s, %s)
         """, (measure.timestamp, measure.ampere))
     conn.commit()
+
+def log_measures(conn:connection, measures:list[ElectricCurrentMeasure]) -> None:
+    """Log a batch of ElectricCurrentMeasure data to PostgreSQL database in a single transaction"""
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO welder_ampere_log (timestamp, ampere) VALUES %s
+        """, [(m.timestamp, m.ampere) for m in measures], page_size=1000)
+    conn.commit()
         
 
+def log_compressed_measures(conn:connection, points:list[CompressedMeasure]) -> None:
+    """Log a batch of compressed measures (see `welder.compression`) in a single transaction"""
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO welder_ampere_log (timestamp, ampere, state, skipped) VALUES %s
+        """, [(p.timestamp, p.ampere, p.state, p.skipped) for p in points], page_size=1000)
+    conn.commit()
+
+def read_ampere_log(conn:connection, start:datetime, end:datetime) -> list[ElectricCurrentMeasure]:
+    """
+    Read the measures in [start, end] from `welder_ampere_log`, interpolating the
+    samples dropped by compression back to their original timestamps.
+    """
+    with conn.cursor() as cur:
+        # 구간 양 끝의 생략된 측정값들을 복원하기 위해 구간 바로 앞과 뒤의 행을 함께 읽는다.
+        cur.execute("""
+            (SELECT timestamp, ampere, state, skipped FROM welder_ampere_log
+                WHERE timestamp < %s ORDER BY timestamp DESC LIMIT 1)
+            UNION ALL
+            (SELECT timestamp, ampere, state, skipped FROM welder_ampere_log
+                WHERE timestamp >= %s AND timestamp <= %s ORDER BY timestamp)
+            UNION ALL
+            (SELECT timestamp, ampere, state, skipped FROM welder_ampere_log
+                WHERE timestamp > %s ORDER BY timestamp LIMIT 1)
+        """, (start, start, end, end))
+        points = [CompressedMeasure(timestamp=row[0], ampere=row[1], state=row[2], skipped=row[3])
+                    for row in cur.fetchall()]
+    points.sort(key=lambda p: p.timestamp)
+    return [m for m in reconstruct(points) if start <= m.timestamp <= end]
+
+def create_ampere_pyramid_table_if_absent(conn:connection) -> None:
+    """
+    Create the welder_ampere_pyramid table if it doesn't exist.
+    
+    Each row holds the min/max/sum/count of the samples in one (resolution, bucket_start) bucket,
+    the timestamps of its first and last samples, and whether it holds all samples of the bucket.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS welder_ampere_pyramid (
+                resolution INTEGER NOT NULL,
+                bucket_start TIMESTAMP NOT NULL,
+                count INTEGER NOT NULL,
+                min FLOAT NOT NULL,
+                max FLOAT NOT NULL,
+                sum FLOAT NOT NULL,
+                first_ts TIMESTAMP,
+                last_ts TIMESTAMP,
+                complete BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (resolution, bucket_start)
+            )
+        """)
+    conn.commit()
+
+def log_ampere_summaries(conn:connection, summaries:list[AmpereSummary]) -> None:
+    """
+    Write a batch of pyramid buckets (see `welder.pyramid`) into welder_ampere_pyramid.
+    
+    Complete buckets replace the stored ones. A partial bucket (e.g. flushed on shutdown)
+    is added only when it starts after the last sample already stored for the bucket,
+    so writing the same buckets again (e.g. on spool redelivery) does not count them twice.
+    The stored buckets are locked and combined with `AmpereSummary.update()`, so the rule
+    lives in one place and the rows are then simply overwritten.
+    """
+    merged:dict[tuple[int,datetime],AmpereSummary] = {}
+    for s in summaries:
+        key = (s.resolution, s.bucket_start)
+        merged[key] = merged[key].update(s) if key in merged else s
+    if not merged:
+        return
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT resolution, bucket_start, count, min, max, sum, first_ts, last_ts, complete
+            FROM welder_ampere_pyramid
+            WHERE (resolution, bucket_start) IN %s
+            FOR UPDATE
+        """, (tuple(merged),))
+        for row in cur.fetchall():
+            stored = AmpereSummary(*row)
+            key = (stored.resolution, stored.bucket_start)
+            merged[key] = stored.update(merged[key])
+        execute_values(cur, """
+            INSERT INTO welder_ampere_pyramid
+                (resolution, bucket_start, count, min, max, sum, first_ts, last_ts, complete) VALUES %s
+            ON CONFLICT (resolution, bucket_start) DO UPDATE SET
+                count = EXCLUDED.count,
+                min = EXCLUDED.min,
+                max = EXCLUDED.max,
+                sum = EXCLUDED.sum,
+                first_ts = EXCLUDED.first_ts,
+                last_ts = EXCLUDED.last_ts,
+                complete = EXCLUDED.complete
+        """, [_summary_row(s) for s in merged.values()], page_size=1000)
+    conn.commit()
+
+def _summary_row(s:AmpereSummary) -> tuple:
+    return (s.resolution, s.bucket_start, s.count, s.min, s.max, s.sum, s.first, s.last, s.complete)
+
+def read_ampere_summaries(conn:connection, start:datetime, end:datetime, max_points:int=1000) -> list[AmpereSummary]:
+    """
+    Read the ampere summaries within [start, end) using at most about `max_points` buckets.
+    
+    The finest pyramid resolution that fits in `max_points` is used. If the range holds
+    no more than `max_points` raw samples, the raw samples are returned instead
+    (as summaries of a single sample with resolution `RESOLUTION_RAW`).
+    """
+    resolution = choose_resolution(start, end, max_points)
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT resolution, bucket_start, count, min, max, sum FROM welder_ampere_pyramid
+            WHERE resolution = %s AND bucket_start >= %s AND bucket_start < %s
+            ORDER BY bucket_start
+        """, (resolution, pyramid_bucket_start(start, resolution), end))
+        summaries = [AmpereSummary(*row) for row in cur.fetchall()]
+    if resolution == PYRAMID_RESOLUTIONS[0] and sum(s.count for s in summaries) <= max_points:
+        return [AmpereSummary(RESOLUTION_RAW, m.timestamp, 1, m.ampere, m.ampere, m.ampere)
+                    for m in read_ampere_log(conn, start, end) if m.timestamp < end]
+    return summaries
+
+def create_ampere_channel_table_if_absent(conn:connection) -> None:
+    """
+    Create the welder_ampere_channels table if it doesn't exist.
+    
+    Each row holds the per-channel (phase) amperes reported at one timestamp.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS welder_ampere_channels (
+                timestamp TIMESTAMP PRIMARY KEY,
+                channels TEXT[] NOT NULL,
+                amperes DOUBLE PRECISION[] NOT NULL
+            )
+        """)
+    conn.commit()
+
+def log_channel_frame(conn:connection, frame:ChannelFrame) -> None:
+    """Log the rows of a ChannelFrame in a single transaction. Rows of existing timestamps are kept."""
+    channels = list(frame.channels)
+    rows = []
+    for ts, values in frame.rows():
+        # 보고되지 않은 채널(NaN)은 저장하지 않는다.
+        present = [(c, float(v)) for c, v in zip(channels, values) if v == v]
+        if present:
+            rows.append((ts, [c for c, _ in present], [v for _, v in present]))
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO welder_ampere_channels (timestamp, channels, amperes) VALUES %s
+            ON CONFLICT (timestamp) DO NOTHING
+        """, rows, page_size=1000)
+    conn.commit()
+
+def read_channel_frame(conn:connection, start:datetime, end:datetime,
+                       channels:Optional[list[str]]=None) -> ChannelFrame:
+    """Read the per-channel amperes in [start, end] as a ChannelFrame."""
+    from .channels import ChannelFrame
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT timestamp, channels, amperes FROM welder_ampere_channels
+            WHERE timestamp >= %s AND timestamp <= %s
+            ORDER BY timestamp
+        """, (start, end))
+        rows = cur.fetchall()
+    return ChannelFrame.from_rows(((ts, c, v) for ts, names, values in rows for c, v in zip(names, values)),
+                                  channels)
+
 def create_nozzle_production_audit_table(conn:connection) -> None:
     """
     Create a nozzle_productions table in PostgreSQL if it doesn't exist.
@@ -72,16 +300,39 @@ def create_nozzle_production_audit_table(conn:connection) -> None:
             cur.execute("""
                 CREATE TABLE nozzle_productions (
                     id SERIAL PRIMARY KEY,
+                    welder_id TEXT NOT NULL DEFAULT '',
                     timestamp TIMESTAMP NOT NULL,
                     quantity_produced INTEGER NOT NULL,
                     avg_processing_time BIGINT NOT NULL,
                     avg_waiting_time BIGINT NOT NULL,
                     defect_volume INTEGER NOT NULL,
-                    avg_defect_rate REAL NOT NULL
+                    avg_defect_rate REAL NOT NULL,
+                    inspection_mode TEXT NOT NULL DEFAULT 'FULL',
+                    reinspected_defect BOOLEAN
                 );
             """)
             conn.commit()
             logger.info("Table 'nozzle_productions' created successfully")
+
+        # (welder_id, timestamp)를 자연 키로 사용하여 재전송된 생산 기록이 중복 저장되지 않도록 한다.
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM pg_indexes
+                WHERE tablename = 'nozzle_productions' AND indexname = 'nozzle_productions_natural_key'
+            );
+        """)
+        if not cur.fetchone()[0]:
+            # 키가 없던 시기에 중복 저장된 기록은 가장 나중에 저장된 것만 남긴다.
+            cur.execute("""
+                DELETE FROM nozzle_productions a USING nozzle_productions b
+                WHERE a.welder_id = b.welder_id AND a.timestamp = b.timestamp AND a.id < b.id
+            """)
+            if cur.rowcount > 0:
+                logger.warning(f"removed {cur.rowcount} duplicated rows from 'nozzle_productions'")
+            cur.execute("""
+                CREATE UNIQUE INDEX nozzle_productions_natural_key ON nozzle_productions (welder_id, timestamp)
+            """)
+            conn.commit()
             
     except Exception as e:
         logger.error(f"Error creating table: {e}")
@@ -90,36 +341,337 @@ def create_nozzle_production_audit_table(conn:connection) -> None:
         if 'cur' in locals():
             cur.close()
 
-def audit_nozzle_production(conn:connection, audit:NozzleProductionAudit) -> int:
+def audit_nozzle_production(conn:connection, audit:NozzleProductionAudit, welder_id:str=DEFAULT_WELDER_ID) -> int:
     """
     Insert a NozzleProductionAudit record into the nozzle_productions table.
     
+    A record with the same (welder_id, timestamp) replaces the existing one,
+    so writing the same audit again is harmless.
+    
     Args:
         conn: psycopg2.extensions.connection
         audit: NozzleProductionAudit object containing production data
+        welder_id: identifier of the welder that produced the nozzle
     """
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO nozzle_productions (
-                    timestamp, quantity_produced, avg_processing_time, 
-                    avg_waiting_time, defect_volume, avg_defect_rate, 
-                    defect_estimated
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+            cur.execute(f"""
+                {_UPSERT_NOZZLE_PRODUCTION.format(values='VALUES (%s, %s, %s, %s, %s, %s, %s, %s)')}
                 RETURNING id
-            """, (
-                audit.timestamp, 
-                audit.quantity_produced, 
-                audit.avg_processing_time,
-                audit.avg_waiting_time, 
-                audit.defect_volume, 
-                audit.avg_defect_rate, 
-                audit.defect_estimation
-            ))
+            """, _audit_row(audit, welder_id))
             record_id = cur.fetchone()[0]
             conn.commit()
             return record_id
     except Exception as e:
         logger.error(f"Error inserting nozzle production record: {e}")
         conn.rollback()
-        raise
\ No newline at end of file
+        raise
+
+
+def audit_nozzle_productions(conn:connection, audits:list[NozzleProductionAudit],
+                             welder_id:str=DEFAULT_WELDER_ID, page_size:int=1000) -> None:
+    """
+    Upsert a batch of NozzleProductionAudit records in a single transaction.
+    
+    Records are keyed by (welder_id, timestamp), so replaying a batch (e.g. a spool
+    that is drained again after a failure) updates the rows instead of duplicating them.
+    When the batch holds several audits of the same key, the last one wins.
+    
+    Args:
+        conn: psycopg2.extensions.connection
+        audits: NozzleProductionAudit objects to insert
+        welder_id: identifier of the welder that produced the nozzles
+    """
+    # 한 INSERT 문 안에서 같은 키의 행을 두 번 갱신할 수 없으므로 미리 하나만 남긴다.
+    rows = list({ a.Timestamp: _audit_row(a, welder_id) for a in audits }.values())
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, _UPSERT_NOZZLE_PRODUCTION.format(values='VALUES %s'), rows, page_size=page_size)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error inserting nozzle production records: {e}")
+        conn.rollback()
+        raise
+
+
+_UPSERT_NOZZLE_PRODUCTION = """
+    INSERT INTO nozzle_productions (
+        welder_id, timestamp, quantity_produced, avg_processing_time, 
+        avg_waiting_time, defect_volume, avg_defect_rate, inspection_mode
+    ) {values}
+    ON CONFLICT (welder_id, timestamp) DO UPDATE SET
+        quantity_produced = EXCLUDED.quantity_produced,
+        avg_processing_time = EXCLUDED.avg_processing_time,
+        avg_waiting_time = EXCLUDED.avg_waiting_time,
+        defect_volume = EXCLUDED.defect_volume,
+        avg_defect_rate = EXCLUDED.avg_defect_rate,
+        inspection_mode = EXCLUDED.inspection_mode
+"""
+
+def _audit_row(audit:NozzleProductionAudit, welder_id:str) -> tuple:
+    return (welder_id, audit.Timestamp, audit.QuantityProduced, to_millis(audit.AvgProcessingTime),
+            to_millis(audit.AvgWaitingTime), audit.DefectVolume, audit.AvgDefectRate, audit.InspectionMode)
+
+
+def record_reinspections(conn:connection, reinspections:list[tuple[datetime,bool,bool]],
+                         shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS, welder_id:str=DEFAULT_WELDER_ID) -> None:
+    """
+    Record the results of the full inspections of nozzles judged by a degraded inspection mode.
+    
+    Each item is (timestamp, provisional verdict, full verdict). The verdict is stored
+    on the audit row that was written with an inspection mode other than FULL, and the
+    rollup rows move the nozzle from the provisional defect count to the confirmed one.
+    A result that is already recorded on the audit row is skipped, so replaying the
+    same results does not correct the rollups twice.
+    """
+    try:
+        with conn.cursor() as cur:
+            for timestamp, provisional, verdict in reinspections:
+                cur.execute("""
+                    UPDATE nozzle_productions SET reinspected_defect = %s
+                    WHERE welder_id = %s AND timestamp = %s AND inspection_mode <> %s
+                        AND reinspected_defect IS DISTINCT FROM %s
+                """, (verdict, welder_id, timestamp, INSPECTION_FULL, verdict))
+                if (verdict or provisional) and cur.rowcount > 0:
+                    cur.executemany("""
+                        UPDATE nozzle_production_rollups
+                        SET defect_volume = defect_volume + %s,
+                            provisional_defect_volume = provisional_defect_volume - %s
+                        WHERE welder_id = %s AND resolution = %s AND bucket_start = %s
+                    """, [(int(verdict), int(provisional), welder_id, res, bucket_start(timestamp, res, shift_hours))
+                          for res in RESOLUTIONS])
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error recording re-inspection results: {e}")
+        conn.rollback()
+        raise
+
+
+def read_nozzle_production_frame(conn:connection, start:Optional[datetime]=None, end:Optional[datetime]=None,
+                                 welder_id:Optional[str]=None) -> AuditFrame:
+    """
+    Read the nozzle_productions rows within [start, end] column by column as an AuditFrame.
+    
+    The cumulative statistics are per welder, so pass `welder_id` when the table holds
+    the audits of several welders.
+    """
+    from .audit import AuditFrame, AUDIT_COLUMNS
+
+    conditions, params = [], []
+    if welder_id is not None:
+        conditions.append("welder_id = %s")
+        params.append(welder_id)
+    if start is not None:
+        conditions.append("timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp <= %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(AUDIT_COLUMNS)} FROM nozzle_productions {where} ORDER BY timestamp", params)
+        rows = cur.fetchall()
+    columns = list(zip(*rows)) if rows else [()] * len(AUDIT_COLUMNS)
+    return AuditFrame.from_columns(*columns)
+
+
+def create_nozzle_production_rollup_table(conn:connection) -> None:
+    """
+    Create a nozzle_production_rollups table in PostgreSQL if it doesn't exist.
+    
+    Each row holds the aggregates of one (resolution, bucket_start) bucket.
+    Defect verdicts of degraded inspection modes are counted in provisional_defect_volume
+    until they are re-inspected, and only then in defect_volume.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS nozzle_production_rollups (
+                welder_id TEXT NOT NULL DEFAULT '',
+                resolution TEXT NOT NULL,
+                bucket_start TIMESTAMP NOT NULL,
+                quantity_produced INTEGER NOT NULL,
+                defect_volume INTEGER NOT NULL,
+                provisional_defect_volume INTEGER NOT NULL DEFAULT 0,
+                processing_time_sum BIGINT NOT NULL,
+                processing_time_min BIGINT NOT NULL,
+                processing_time_max BIGINT NOT NULL,
+                waiting_count INTEGER NOT NULL,
+                waiting_time_sum BIGINT NOT NULL,
+                waiting_time_min BIGINT,
+                waiting_time_max BIGINT,
+                processing_time_sketch JSONB,
+                waiting_time_sketch JSONB,
+                PRIMARY KEY (welder_id, resolution, bucket_start)
+            )
+        """)
+    conn.commit()
+
+def record_nozzle_rollups(conn:connection, timestamp:datetime, processing_time:timedelta,
+                          waiting_time:Optional[timedelta], is_defect:bool,
+                          shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS, welder_id:str=DEFAULT_WELDER_ID) -> None:
+    """
+    Add a single finished nozzle to the minute/hour/shift rollup rows of the welder.
+    
+    Rows are updated in place with ON CONFLICT arithmetic, so the aggregates
+    stay correct across restarts of the inspection service. The quantile
+    sketches are merged in the same transaction while the row is locked.
+    
+    Calling this twice for the same nozzle counts it twice; use
+    `record_nozzle_productions()` for records that may be delivered again.
+    """
+    try:
+        with conn.cursor() as cur:
+            _add_nozzle_rollups(cur, welder_id, [(timestamp, processing_time, waiting_time, is_defect, False)],
+                                shift_hours)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error updating nozzle production rollups: {e}")
+        conn.rollback()
+        raise
+
+def record_nozzle_productions(conn:connection,
+                              productions:list[tuple[NozzleProductionAudit,tuple[datetime,timedelta,Optional[timedelta],bool]]],
+                              shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS, welder_id:str=DEFAULT_WELDER_ID,
+                              page_size:int=1000) -> None:
+    """
+    Upsert the audits of finished nozzles and add them to the rollups in a single transaction.
+    
+    Each item is (audit, (timestamp, processing_time, waiting_time, is_defect)). A nozzle is
+    added to the rollups only when its (welder_id, timestamp) audit row is newly inserted, so
+    a batch that is delivered again (e.g. by a spool drained again after a failure, or by a
+    catch-up after restarting from an older checkpoint) updates the audits without counting
+    the nozzles twice. A defect verdict of an audit written with an inspection mode other
+    than FULL is counted as provisional (see `record_reinspections()`).
+    
+    The audits are upserted with multi-row INSERT statements and the newly inserted nozzles
+    are aggregated per rollup bucket before they are written, so the number of statements
+    does not grow with the number of nozzles. When the batch holds several items of the same
+    timestamp, the last one wins.
+    """
+    # 한 INSERT 문 안에서 같은 키의 행을 두 번 갱신할 수 없으므로 미리 하나만 남긴다.
+    latest = { audit.Timestamp: (audit, rollup) for audit, rollup in productions }
+    try:
+        with conn.cursor() as cur:
+            # 새로 삽입된 행은 xmax가 0이고, ON CONFLICT로 갱신된 행은 현재 트랜잭션 id를 갖는다.
+            inserted = execute_values(cur, f"""
+                {_UPSERT_NOZZLE_PRODUCTION.format(values='VALUES %s')}
+                RETURNING timestamp, (xmax = 0)
+            """, [_audit_row(audit, welder_id) for audit, _ in latest.values()], page_size=page_size, fetch=True)
+            nozzles = []
+            for timestamp, is_new in inserted:
+                if is_new:
+                    audit, rollup = latest[timestamp]
+                    nozzles.append((*rollup, audit.InspectionMode != INSPECTION_FULL))
+            _add_nozzle_rollups(cur, welder_id, nozzles, shift_hours)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Error recording nozzle productions: {e}")
+        conn.rollback()
+        raise
+
+def _add_nozzle_rollups(cur, welder_id:str, nozzles:list[tuple[datetime,timedelta,Optional[timedelta],bool,bool]],
+                        shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS) -> None:
+    """
+    Add the finished nozzles (timestamp, processing_time, waiting_time, is_defect, provisional)
+    of a welder to its rollups.
+    """
+    # 노즐들을 먼저 구간별로 집계하여 구간마다 한 번씩만 갱신한다.
+    buckets:dict[tuple[str,datetime],NozzleRollup] = {}
+    for timestamp, processing_time, waiting_time, is_defect, provisional in nozzles:
+        processing_millis = to_millis(processing_time)
+        waiting_millis = to_millis(waiting_time) if waiting_time is not None else None
+        for res in RESOLUTIONS:
+            start = bucket_start(timestamp, res, shift_hours)
+            rollup = buckets.get((res, start))
+            if rollup is None:
+                rollup = buckets[(res, start)] = NozzleRollup(resolution=res, BucketStart=start)
+            rollup.add(processing_millis, waiting_millis, is_defect, provisional)
+    if not buckets:
+        return
+
+    cur.executemany("""
+        INSERT INTO nozzle_production_rollups AS r (
+            welder_id, resolution, bucket_start, quantity_produced, defect_volume, provisional_defect_volume,
+            processing_time_sum, processing_time_min, processing_time_max,
+            waiting_count, waiting_time_sum, waiting_time_min, waiting_time_max
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (welder_id, resolution, bucket_start) DO UPDATE SET
+            quantity_produced = r.quantity_produced + EXCLUDED.quantity_produced,
+            defect_volume = r.defect_volume + EXCLUDED.defect_volume,
+            provisional_defect_volume = r.provisional_defect_volume + EXCLUDED.provisional_defect_volume,
+            processing_time_sum = r.processing_time_sum + EXCLUDED.processing_time_sum,
+            processing_time_min = LEAST(r.processing_time_min, EXCLUDED.processing_time_min),
+            processing_time_max = GREATEST(r.processing_time_max, EXCLUDED.processing_time_max),
+            waiting_count = r.waiting_count + EXCLUDED.waiting_count,
+            waiting_time_sum = r.waiting_time_sum + EXCLUDED.waiting_time_sum,
+            waiting_time_min = LEAST(r.waiting_time_min, EXCLUDED.waiting_time_min),
+            waiting_time_max = GREATEST(r.waiting_time_max, EXCLUDED.waiting_time_max)
+    """, [(welder_id, r.resolution, r.BucketStart, r.QuantityProduced, r.DefectVolume, r.ProvisionalDefectVolume,
+           r.ProcessingTime.sum, r.ProcessingTime.min, r.ProcessingTime.max,
+           r.WaitingTime.count, r.WaitingTime.sum, r.WaitingTime.min, r.WaitingTime.max)
+          for r in buckets.values()])
+
+    cur.execute("""
+        SELECT resolution, bucket_start, processing_time_sketch, waiting_time_sketch
+        FROM nozzle_production_rollups
+        WHERE welder_id = %s AND (resolution, bucket_start) IN %s
+        FOR UPDATE
+    """, (welder_id, tuple(buckets)))
+    updates = []
+    for res, start, processing_sketch, waiting_sketch in cur.fetchall():
+        rollup = buckets[(res, start)]
+        processing_sketch = _load_sketch(processing_sketch).merge(rollup.ProcessingTime.sketch)
+        waiting_sketch = _load_sketch(waiting_sketch).merge(rollup.WaitingTime.sketch)
+        updates.append((Json(processing_sketch.to_dict()), Json(waiting_sketch.to_dict()), welder_id, res, start))
+    cur.executemany("""
+        UPDATE nozzle_production_rollups
+        SET processing_time_sketch = %s, waiting_time_sketch = %s
+        WHERE welder_id = %s AND resolution = %s AND bucket_start = %s
+    """, updates)
+
+def _load_sketch(data:Optional[dict]) -> QuantileSketch:
+    return QuantileSketch.from_dict(data) if data is not None else QuantileSketch()
+
+def read_nozzle_rollups(conn:connection, resolution:str, start:datetime, end:datetime,
+                        welder_id:Optional[str]=None) -> list[dict]:
+    """
+    Read the precomputed rollup rows of the given resolution within [start, end).
+    
+    Rows are kept per welder; pass `welder_id` to read a single welder, or merge the
+    rows of several welders with `merge_nozzle_rollups()`.
+    """
+    conditions = ["resolution = %s", "bucket_start >= %s", "bucket_start < %s"]
+    params:list = [resolution, start, end]
+    if welder_id is not None:
+        conditions.append("welder_id = %s")
+        params.append(welder_id)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(f"""
+            SELECT * FROM nozzle_production_rollups
+            WHERE {' AND '.join(conditions)}
+            ORDER BY bucket_start, welder_id
+        """, params)
+        rows = list(cur)
+    for row in rows:
+        row['processing_time_sketch'] = _load_sketch(row['processing_time_sketch'])
+        row['waiting_time_sketch'] = _load_sketch(row['waiting_time_sketch'])
+    return rows
+
+def merge_nozzle_rollups(rows:list[dict]) -> dict:
+    """
+    Merge rollup rows (e.g. several buckets or several welders) into a single aggregate.
+    
+    Percentiles of the merged rows are obtained from the merged sketches.
+    """
+    merged = {
+        'quantity_produced': 0, 'defect_volume': 0, 'provisional_defect_volume': 0,
+        'processing_time_sum': 0, 'waiting_count': 0, 'waiting_time_sum': 0,
+        'processing_time_sketch': QuantileSketch(), 'waiting_time_sketch': QuantileSketch(),
+    }
+    for row in rows:
+        for key in ('quantity_produced', 'defect_volume', 'provisional_defect_volume',
+                    'processing_time_sum', 'waiting_count', 'waiting_time_sum'):
+            merged[key] += row[key]
+        merged['processing_time_sketch'].merge(row['processing_time_sketch'])
+        merged['waiting_time_sketch'].merge(row['waiting_time_sketch'])
+    return merged
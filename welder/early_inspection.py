@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from typing import Optional
+from dataclasses import dataclass
+
+from datetime import datetime
+
+from .types import ElectricCurrentMeasure
+from .reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE, PATTERN_LENGTH
+from .features import PEAK_HEIGHT
+from .work_recognizer import STATUS_MIDDLE
+
+
+@dataclass(frozen=True, slots=True)
+class EarlyVerdict:
+    """
+    작업 도중 또는 종료 시점의 판정 결과. `verdict`는 `inspect_waveform()`의 결과와 같은 의미이다.
+
+    `final`이 False이면 그때까지의 state 2 측정값으로 내린 잠정 판정이다.
+    """
+    verdict: bool
+    final: bool
+    timestamp: datetime         # 판정에 사용된 마지막 측정값의 시각
+    samples: int                # 판정에 사용된 state 2 측정값 수
+    changed: bool = False       # 직전 잠정 판정과 결과가 달라졌는지 여부
+
+
+class EarlyInspector:
+    """
+    state 2 측정값을 도착하는 대로 반영하여 파형 판정을 점진적으로 수행한다.
+
+    최대 피크(첫 번째 최대값)와 그 양쪽의 최소값, 국소 피크들의 최대 높이를 측정값마다 갱신하고,
+    최대 피크의 4-point 패턴이 완성되면(피크 이후 2개의 측정값) 그 시점까지의 값으로
+    잠정 판정을 내린다. DTW 거리는 최대 피크가 바뀌어 패턴이 달라질 때만 다시 계산한다.
+    작업이 종료되면 `finish()`가 전체 state 2 측정값에 대한 최종 판정을 반환하며, 이는
+    `inspect_waveform()`의 결과와 같다.
+    """
+    def __init__(self, library:Optional[ReferenceLibrary]=None, welder_type:str=DEFAULT_WELDER_TYPE,
+                 height:float=PEAK_HEIGHT, peak_floor:float=9.0, width_threshold:float=2.0,
+                 dtw_threshold:float=2.0):
+        if library is None:
+            from .waveform import default_reference_library
+            library = default_reference_library()
+        self.references = library[welder_type]
+        self.height = height
+        self.peak_floor = peak_floor
+        self.width_threshold = width_threshold
+        self.dtw_threshold = dtw_threshold
+        self.reset()
+
+    def reset(self, start:Optional[datetime]=None) -> None:
+        """새 파형의 판정을 시작한다. `start`는 파형의 첫 측정값 시각이다."""
+        self.start = start
+        self.x:list[float] = []
+        self.last_ts:Optional[datetime] = None
+        self.prefix_min = float('inf')
+        self.peak_idx = -1              # 최대 피크(첫 번째 최대값)의 위치
+        self.left_min = float('inf')    # [0, peak_idx] 구간의 최소값
+        self.right_min = float('inf')   # [peak_idx, 끝] 구간의 최소값
+        self.last_sign = 0              # 마지막으로 0이 아니었던 증감 부호
+        self.peak_max_height = float('-inf')
+        self.pattern_match:Optional[bool] = None     # 현재 최대 피크의 패턴 판정 (패턴이 미완성이면 None)
+        self.provisional:Optional[EarlyVerdict] = None
+
+    def update(self, waveform:list[ElectricCurrentMeasure]) -> Optional[EarlyVerdict]:
+        """
+        진행 중인 파형에 마지막으로 추가된 측정값을 반영한다.
+
+        파형에 측정값이 하나뿐이면 새 파형으로 보고 판정을 새로 시작하며, 시작부터 보지 못한
+        파형(예: 재시작 직후 진행 중이던 파형)은 판정하지 않는다.
+        """
+        if len(waveform) == 1:
+            self.reset(waveform[0].timestamp)
+        if not self.covers(waveform):
+            return None
+        return self.add(waveform[-1])
+
+    def covers(self, waveform:list[ElectricCurrentMeasure]) -> bool:
+        """주어진 파형을 시작부터 모두 반영했는지 확인한다."""
+        return len(waveform) > 0 and self.start is not None and waveform[0].timestamp == self.start
+
+    def add(self, measure:ElectricCurrentMeasure) -> Optional[EarlyVerdict]:
+        """
+        측정값 하나를 반영한다. state 2가 아닌 측정값은 무시한다.
+
+        최대 피크의 패턴이 완성되어 잠정 판정을 처음 내리거나, 이후 잠정 판정이 바뀌면 그 판정을 반환한다.
+        """
+        if measure.state != STATUS_MIDDLE:
+            return None
+        x = self.x
+        value = measure.ampere
+        i = len(x)
+        x.append(value)
+        self.last_ts = measure.timestamp
+
+        # 국소 피크: 상승 후 하강하는 지점 (평탄한 구간은 하강 직전의 값)
+        if i > 0:
+            diff = value - x[i-1]
+            sign = (diff > 0) - (diff < 0)
+            # local_peak_max()와 같은 정의
+            if sign == -1 and self.last_sign == 1:
+                self.peak_max_height = max(self.peak_max_height, x[i-1])
+            if sign != 0:
+                self.last_sign = sign
+
+        self.prefix_min = min(self.prefix_min, value)
+        if self.peak_idx < 0 or value > x[self.peak_idx]:
+            self.peak_idx = i
+            self.left_min = self.prefix_min
+            self.right_min = value
+            self.pattern_match = None
+        else:
+            self.right_min = min(self.right_min, value)
+
+        # 최대 피크의 4-point 패턴이 완성되면 DTW 판정을 한 번만 계산한다.
+        p = self.peak_idx
+        if self.pattern_match is None and p >= 1 and p + PATTERN_LENGTH - 1 <= len(x):
+            pattern = x[p-1:p-1+PATTERN_LENGTH]
+            self.pattern_match = self.references.any_within(pattern, self.dtw_threshold)
+        if self.pattern_match is None:
+            return None
+
+        verdict = self._verdict()
+        previous = self.provisional
+        if previous is not None and previous.verdict == verdict:
+            return None
+        self.provisional = EarlyVerdict(verdict=verdict, final=False, timestamp=measure.timestamp,
+                                        samples=len(x), changed=previous is not None)
+        return self.provisional
+
+    def finish(self, timestamp:Optional[datetime]=None) -> EarlyVerdict:
+        """작업이 종료되었을 때 전체 state 2 측정값에 대한 최종 판정을 반환한다."""
+        verdict = self._verdict()
+        previous = self.provisional
+        return EarlyVerdict(verdict=verdict, final=True,
+                            timestamp=timestamp if timestamp is not None else self.last_ts,
+                            samples=len(self.x), changed=previous is not None and previous.verdict != verdict)
+
+    def inspect(self, waveform:list[ElectricCurrentMeasure]) -> bool:
+        """완료된 파형 전체를 한 번에 판정한다. 결과는 `inspect_waveform()`과 같다."""
+        self.reset(waveform[0].timestamp if waveform else None)
+        for measure in waveform:
+            self.add(measure)
+        return self._verdict()
+
+    def peak_width(self) -> float:
+        """최대 피크의 너비 (`scipy.signal.peak_widths`, rel_height=0.5와 같은 값)."""
+        return peak_width(self.x, self.peak_idx, self.left_min, self.right_min)
+
+    def _verdict(self) -> bool:
+        if not self.x or not self.pattern_match:
+            return False
+        return (self.peak_max_height >= self.height
+                and self.x[self.peak_idx] >= self.peak_floor
+                and self.peak_width() >= self.width_threshold)
+
+
+def peak_width(x:list[float], p:int, left_min:float, right_min:float) -> float:
+    """
+    `p` 위치 피크의 너비 (`scipy.signal.peak_widths`, rel_height=0.5와 같은 값).
+    `left_min`/`right_min`은 피크 양쪽 구간([0, p], [p, 끝])의 최소값이다.
+    """
+    xp = x[p]
+    height = xp - (xp - max(left_min, right_min)) * 0.5
+    i_left = p
+    while i_left > 0 and height < x[i_left]:
+        i_left -= 1
+    i_right = p
+    while i_right < len(x) - 1 and height < x[i_right]:
+        i_right += 1
+    left_ip = i_left + (height - x[i_left]) / (x[i_left+1] - x[i_left]) if x[i_left] < height else i_left
+    right_ip = i_right - (height - x[i_right]) / (x[i_right-1] - x[i_right]) if x[i_right] < height else i_right
+    return right_ip - left_ip
+
+
+def local_peak_max(x:list[float]) -> float:
+    """국소 피크(상승 후 하강하는 지점, 평탄한 구간은 하강 직전의 값)들 중 최대값. 국소 피크가 없으면 -inf."""
+    best = float('-inf')
+    last_sign = 0
+    for prev, value in zip(x, x[1:]):
+        if value < prev:
+            if last_sign == 1 and prev > best:
+                best = prev
+            last_sign = -1
+        elif value > prev:
+            last_sign = 1
+    return best
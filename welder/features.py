@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from typing import Optional, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from .types import ElectricCurrentMeasure
+from .reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE, dtw_matrix
+
+
+# 특징 행렬의 열 이름. 시간 단위는 초, 전류 단위는 암페어이다.
+FEATURES = (
+    'length',            # 파형의 샘플 수
+    'duration',          # 첫 샘플부터 마지막 샘플까지의 시간 (처리 시간)
+    'duration_s1',       # 상태별 지속 시간
+    'duration_s2',
+    'duration_s3',
+    'max_ampere',        # 파형 전체의 최대/평균/RMS 전류
+    'mean_ampere',
+    'rms_ampere',
+    'area',              # 전류 곡선 아래 면적 (A·s, 사다리꼴 적분)
+    'rise_slope',        # 최대 상승 기울기 (A/s)
+    'fall_slope',        # 최대 하강 기울기 (A/s, 음수)
+    's2_length',         # state 2 구간의 샘플 수
+    's2_max',            # state 2 구간의 최대 전류 (최대 피크)
+    's2_max_idx',        # state 2 구간에서 최대 전류의 위치
+    'peak_count',        # state 2 구간에서 높이 8A 이상인 피크 수
+    'peak_max_height',   # state 2 구간에서 가장 높은 (국소) 피크의 높이
+    'peak_width',        # 최대 피크의 너비 (반 prominence 기준, 샘플 단위)
+    'pattern_0',         # 최대 피크 주변 4-point 패턴 (없으면 NaN)
+    'pattern_1',
+    'pattern_2',
+    'pattern_3',
+    'dtw_min',           # 가장 가까운 기준 패턴과의 DTW 거리 (패턴이 없으면 NaN)
+)
+FEATURE_INDEX = { name: idx for idx, name in enumerate(FEATURES) }
+PATTERN_COLUMNS = [FEATURE_INDEX[f'pattern_{i}'] for i in range(4)]
+
+PEAK_HEIGHT = 8.0
+
+
+@dataclass(slots=True)
+class WaveformBatch:
+    """길이가 다른 파형들을 패딩하여 담은 배열들. 패딩 위치의 state는 -1이다."""
+    times: np.ndarray       # (B, T) 파형 시작 시각 기준 초
+    amperes: np.ndarray     # (B, T)
+    states: np.ndarray      # (B, T)
+    lengths: np.ndarray     # (B,)
+
+    @classmethod
+    def pack(cls, waveforms:Sequence[list[ElectricCurrentMeasure]]) -> WaveformBatch:
+        lengths = np.array([len(w) for w in waveforms], dtype=np.int64)
+        width = max(int(lengths.max()) if len(lengths) else 0, 1)
+        times = np.zeros((len(waveforms), width))
+        amperes = np.zeros((len(waveforms), width))
+        states = np.full((len(waveforms), width), -1, dtype=np.int8)
+        for row, waveform in enumerate(waveforms):
+            n = len(waveform)
+            if n == 0:
+                continue
+            t0 = waveform[0].timestamp
+            times[row, :n] = [(m.timestamp - t0).total_seconds() for m in waveform]
+            amperes[row, :n] = [m.ampere for m in waveform]
+            states[row, :n] = [m.state for m in waveform]
+        return cls(times=times, amperes=amperes, states=states, lengths=lengths)
+
+
+def feature(matrix:np.ndarray, name:str) -> np.ndarray:
+    """특징 행렬에서 주어진 이름의 열을 반환한다."""
+    return matrix[:, FEATURE_INDEX[name]]
+
+
+def extract_features(waveforms:Sequence[list[ElectricCurrentMeasure]], library:Optional[ReferenceLibrary]=None,
+                     welder_type:str=DEFAULT_WELDER_TYPE, chunk_size:int=512, dtw:bool=True) -> np.ndarray:
+    """
+    파형들을 (파형 수, len(FEATURES)) 크기의 특징 행렬로 변환한다.
+
+    파형들을 길이 순으로 정렬하여 `chunk_size`개씩 패딩된 배열로 묶은 뒤, 각 묶음에 대해
+    모든 특징을 numpy 연산으로 한 번에 계산한다. 피크 검출과 너비 계산은
+    `scipy.signal.find_peaks`/`peak_widths`와 같은 결과를 내도록 구현되어 있다.
+    `dtw`가 False이면 DTW 거리를 계산하지 않는다 ('dtw_min' 열은 NaN).
+    """
+    if dtw and library is None:
+        from .waveform import default_reference_library
+        library = default_reference_library()
+
+    out = np.full((len(waveforms), len(FEATURES)), np.nan)
+    order = np.argsort([len(w) for w in waveforms], kind='stable')
+    for start in range(0, len(order), chunk_size):
+        rows = order[start:start + chunk_size]
+        batch = WaveformBatch.pack([waveforms[i] for i in rows])
+        out[rows] = _extract_batch(batch)
+
+    if dtw:
+        _add_dtw(out, library, welder_type)
+    return out
+
+
+def extract_batch_features(batch:WaveformBatch, library:Optional[ReferenceLibrary]=None,
+                           welder_type:str=DEFAULT_WELDER_TYPE, dtw:bool=True) -> np.ndarray:
+    """이미 패딩된 배열로 묶인 파형들(예: 한 파형의 채널별 전류)의 특징 행렬을 계산한다."""
+    if dtw and library is None:
+        from .waveform import default_reference_library
+        library = default_reference_library()
+    out = _extract_batch(batch)
+    if dtw:
+        _add_dtw(out, library, welder_type)
+    return out
+
+
+def _add_dtw(out:np.ndarray, library:ReferenceLibrary, welder_type:str) -> None:
+    # 패턴이 있는 파형들에 대해서만 가장 가까운 기준 패턴과의 DTW 거리를 계산한다.
+    # (판정만 필요한 경우에는 `inspect_patterns()`가 임계값 이내의 패턴을 찾는 즉시 멈춘다.)
+    patterns = out[:, PATTERN_COLUMNS]
+    has_pattern = ~np.isnan(patterns).any(axis=1)
+    if has_pattern.any():
+        refs = library[welder_type]
+        if has_pattern.sum() <= 16:
+            dists = [refs.nearest(p)[0] for p in patterns[has_pattern]]
+        else:
+            dists = dtw_matrix(patterns[has_pattern], refs.references).min(axis=1)
+        out[has_pattern, FEATURE_INDEX['dtw_min']] = dists
+
+
+def _extract_batch(batch:WaveformBatch) -> np.ndarray:
+    B, T = batch.amperes.shape
+    cols = np.arange(T)
+    valid = cols[None, :] < batch.lengths[:, None]
+    x = np.where(valid, batch.amperes, 0.0)
+    t = batch.times
+    out = np.full((B, len(FEATURES)), np.nan)
+    F = FEATURE_INDEX
+
+    n = batch.lengths
+    nonempty = n > 0
+    out[:, F['length']] = n
+    last = np.maximum(n - 1, 0)
+    out[:, F['duration']] = t[np.arange(B), last] - t[:, 0]
+
+    # 샘플 간 시간 간격 (마지막 샘플과 패딩은 0)
+    dt = np.zeros((B, T))
+    dt[:, :-1] = np.diff(t, axis=1)
+    pair_valid = np.zeros((B, T), dtype=bool)
+    pair_valid[:, :-1] = valid[:, 1:]
+    dt = np.where(pair_valid, dt, 0.0)
+    for state in (1, 2, 3):
+        out[:, F[f'duration_s{state}']] = np.where(batch.states == state, dt, 0.0).sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[:, F['max_ampere']] = np.where(nonempty, np.where(valid, x, -np.inf).max(axis=1), np.nan)
+        out[:, F['mean_ampere']] = x.sum(axis=1) / n
+        out[:, F['rms_ampere']] = np.sqrt((x * x).sum(axis=1) / n)
+
+        dx = np.zeros((B, T))
+        dx[:, :-1] = np.diff(x, axis=1)
+        out[:, F['area']] = (0.5 * (x[:, :-1] + x[:, 1:]) * dt[:, :-1]).sum(axis=1)
+        slope_valid = pair_valid & (dt > 0)
+        slope = np.where(slope_valid, dx / np.where(slope_valid, dt, 1.0), np.nan)
+        any_slope = slope_valid.any(axis=1)
+        out[:, F['rise_slope']] = np.where(any_slope, np.nanmax(np.where(slope_valid, slope, -np.inf), axis=1), np.nan)
+        out[:, F['fall_slope']] = np.where(any_slope, np.nanmin(np.where(slope_valid, slope, np.inf), axis=1), np.nan)
+
+    _extract_state2(batch, out)
+    return out
+
+
+def _extract_state2(batch:WaveformBatch, out:np.ndarray) -> None:
+    F = FEATURE_INDEX
+    B, T = batch.amperes.shape
+    cols = np.arange(T)
+
+    # state 2 샘플들을 순서를 유지한 채 각 행의 앞쪽으로 모은다.
+    is_s2 = batch.states == 2
+    order = np.argsort(~is_s2, axis=1, kind='stable')
+    x = np.take_along_axis(batch.amperes, order, axis=1)
+    n = is_s2.sum(axis=1)
+    valid = cols[None, :] < n[:, None]
+    x = np.where(valid, x, 0.0)
+    out[:, F['s2_length']] = n
+    has_s2 = n > 0
+
+    # 최대 피크 (가장 앞쪽의 최대값)
+    p = np.argmax(np.where(valid, x, -np.inf), axis=1)
+    rows = np.arange(B)
+    xp = x[rows, p]
+    out[:, F['s2_max']] = np.where(has_s2, xp, np.nan)
+    out[:, F['s2_max_idx']] = np.where(has_s2, p, np.nan)
+
+    # 국소 최대값(피크) 검출: 평탄한 구간은 상승 후 하강하는 경우 하나의 피크로 본다.
+    if T > 1:
+        sign = np.sign(np.diff(x, axis=1))
+        sign[~(cols[None, :-1] < (n[:, None] - 1))] = 0
+        last_nz = np.maximum.accumulate(np.where(sign != 0, cols[None, :-1], -1), axis=1)
+        prev_nz = np.full_like(last_nz, -1)
+        prev_nz[:, 1:] = last_nz[:, :-1]
+        prev_sign = np.where(prev_nz >= 0, np.take_along_axis(sign, np.maximum(prev_nz, 0), axis=1), 0)
+        is_peak = (sign == -1) & (prev_sign == 1)
+        peak_values = np.where(is_peak, x[:, :-1], -np.inf)
+        out[:, F['peak_count']] = (peak_values >= PEAK_HEIGHT).sum(axis=1)
+        peak_max = peak_values.max(axis=1)
+        out[:, F['peak_max_height']] = np.where(np.isfinite(peak_max), peak_max, np.nan)
+    else:
+        out[:, F['peak_count']] = 0
+
+    # 최대 피크의 너비 (scipy.signal.peak_widths, rel_height=0.5와 동일)
+    left = cols[None, :] <= p[:, None]
+    right = (cols[None, :] >= p[:, None]) & valid
+    left_min = np.where(left & valid, x, np.inf).min(axis=1)
+    right_min = np.where(right, x, np.inf).min(axis=1)
+    prominence = xp - np.maximum(left_min, right_min)
+    height = xp - prominence * 0.5
+    below = valid & (x <= height[:, None])
+    i_left = np.where(below & left, cols[None, :], -1).max(axis=1)
+    i_right = np.where(below & right, cols[None, :], T).min(axis=1)
+    i_left = np.clip(i_left, 0, T - 1)
+    i_right = np.clip(i_right, 0, T - 1)
+
+    x_left = x[rows, i_left]
+    x_right = x[rows, i_right]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        left_ip = np.where(x_left < height,
+                           i_left + (height - x_left) / (x[rows, np.minimum(i_left + 1, T - 1)] - x_left),
+                           i_left)
+        right_ip = np.where(x_right < height,
+                            i_right - (height - x_right) / (x[rows, np.maximum(i_right - 1, 0)] - x_right),
+                            i_right)
+    out[:, F['peak_width']] = np.where(has_s2, right_ip - left_ip, np.nan)
+
+    # 4-point 패턴: 최대 피크 직전 1개와 이후 3개
+    has_pattern = has_s2 & (p >= 1) & (p + 3 <= n)
+    idx = np.clip(p[:, None] - 1 + np.arange(4)[None, :], 0, T - 1)
+    patterns = np.take_along_axis(x, idx, axis=1)
+    out[:, PATTERN_COLUMNS] = np.where(has_pattern[:, None], patterns, np.nan)
+
+
+def inspect_features(matrix:np.ndarray, height:float=PEAK_HEIGHT, peak_floor:float=9.0,
+                     width_threshold:float=2.0, dtw_threshold:Optional[float]=2.0) -> np.ndarray:
+    """
+    특징 행렬로부터 `inspect_waveform()`과 같은 판정 결과(bool 배열)를 계산한다.
+
+    state 2 구간에 `height` 이상인 피크가 있고, 최대 피크가 `peak_floor` 이상이며,
+    피크 너비가 `width_threshold` 이상이고, 4-point 패턴의 DTW 거리가 `dtw_threshold` 이하여야 True이다.
+    `dtw_threshold`가 None이면 DTW 조건은 검사하지 않는다.
+    """
+    with np.errstate(invalid='ignore'):
+        verdicts = ((feature(matrix, 's2_length') > 0)
+                    & (feature(matrix, 'peak_max_height') >= height)
+                    & (feature(matrix, 's2_max') >= peak_floor)
+                    & (feature(matrix, 'peak_width') >= width_threshold))
+        if dtw_threshold is not None:
+            verdicts &= feature(matrix, 'dtw_min') <= dtw_threshold
+        return verdicts
+
+
+def inspect_patterns(matrix:np.ndarray, library:Optional[ReferenceLibrary]=None,
+                     welder_type:str=DEFAULT_WELDER_TYPE, height:float=PEAK_HEIGHT, peak_floor:float=9.0,
+                     width_threshold:float=2.0, dtw_threshold:float=2.0) -> np.ndarray:
+    """
+    'dtw_min' 열 없이 구한 특징 행렬(`dtw=False`)에 대해 `inspect_features()`와 같은 판정을 계산한다.
+
+    DTW 조건은 나머지 조건을 모두 만족하는 파형에 대해서만, 거리가 `dtw_threshold` 이내인
+    기준 패턴을 찾는 즉시 멈추는 `ReferenceSet.any_within()`으로 검사한다.
+    """
+    if library is None:
+        from .waveform import default_reference_library
+        library = default_reference_library()
+    verdicts = inspect_features(matrix, height, peak_floor, width_threshold, dtw_threshold=None)
+    patterns = matrix[:, PATTERN_COLUMNS]
+    verdicts &= ~np.isnan(patterns).any(axis=1)
+    refs = library[welder_type]
+    for row in np.flatnonzero(verdicts):
+        verdicts[row] = refs.any_within(patterns[row], dtw_threshold)
+    return verdicts
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import Any, Generator, Iterable, Optional
+from collections import deque
+from dataclasses import dataclass
+
+import heapq
+from datetime import datetime, timedelta
+
+from .types import ElectricCurrentMeasure
+
+
+@dataclass(slots=True)
+class IngestStats:
+    accepted: int = 0           # 받아들인 측정값 수
+    released: int = 0           # 시각 순서대로 내보낸 측정값 수
+    duplicates: int = 0         # 같은 시각의 측정값이 이미 있어 버린 측정값 수
+    late: int = 0               # watermark보다 늦게 도착하여 버린 측정값 수
+    forced: int = 0             # 대기 측정값이 너무 많아 watermark 이전에 내보낸 측정값 수
+
+
+class IngestStage:
+    """
+    watermark 기반의 측정값 재정렬/중복 제거 단계.
+
+    지금까지 받은 가장 늦은 측정 시각에서 `lateness`를 뺀 시각을 watermark로 하여, watermark
+    이전의 측정값들을 시각 순서대로 내보낸다. 따라서 `lateness` 이내로 늦게 도착한 측정값은
+    제자리로 재정렬되고, 이미 내보낸 시각보다 이른 측정값은 늦은 측정값으로 버린다. 같은 시각의
+    측정값은 먼저 도착한 것만 사용한다. 내보내는 측정값들의 시각은 항상 증가하므로, 작업 인식기
+    등 이후 단계는 중복이나 순서를 검사할 필요가 없다.
+
+    중복 검사는 대기 중인 측정값과 최근 `lateness` 이내에 내보낸 측정값의 시각 집합으로 하며,
+    두 집합의 크기는 각각 `max_pending` 이하로 제한된다. `lateness`가 0이면 시각이 증가하는
+    측정값만 바로 내보낸다.
+    """
+    def __init__(self, lateness:timedelta=timedelta(0), max_pending:int=4096):
+        self.lateness = lateness
+        self.max_pending = max_pending
+        self.pending:list[tuple[datetime,ElectricCurrentMeasure]] = []      # 시각 순의 heap
+        self.pending_ts:set[datetime] = set()
+        self.recent:deque[datetime] = deque()       # 최근에 내보낸 측정값들의 시각
+        self.recent_ts:set[datetime] = set()
+        self.max_ts:Optional[datetime] = None
+        self.frontier:Optional[datetime] = None     # 마지막으로 내보낸 측정값의 시각
+        self.stats = IngestStats()
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        return self.max_ts - self.lateness if self.max_ts is not None else None
+
+    def push(self, measure:ElectricCurrentMeasure) -> list[ElectricCurrentMeasure]:
+        """측정값 하나를 받아, watermark가 지나 내보낼 수 있게 된 측정값들을 시각 순서대로 반환한다."""
+        ts = measure.timestamp
+        stats = self.stats
+        if self.frontier is not None and ts <= self.frontier:
+            if ts in self.recent_ts:
+                stats.duplicates += 1
+            else:
+                stats.late += 1
+            return []
+        if ts in self.pending_ts:
+            stats.duplicates += 1
+            return []
+        stats.accepted += 1
+        if self.max_ts is None or ts > self.max_ts:
+            self.max_ts = ts
+
+        # 대기 중인 측정값이 없고 바로 내보낼 수 있으면 heap을 거치지 않는다.
+        if not self.pending and ts <= self.max_ts - self.lateness:
+            released = [measure]
+            self._release(measure)
+            return released
+
+        heapq.heappush(self.pending, (ts, measure))
+        self.pending_ts.add(ts)
+        watermark = self.max_ts - self.lateness
+        released = []
+        while self.pending and (self.pending[0][0] <= watermark or len(self.pending) > self.max_pending):
+            if self.pending[0][0] > watermark:
+                stats.forced += 1
+            released.append(self._pop())
+        return released
+
+    def flush(self) -> list[ElectricCurrentMeasure]:
+        """대기 중인 측정값들을 모두 시각 순서대로 반환한다 (입력이 끝났을 때 사용)."""
+        released = []
+        while self.pending:
+            released.append(self._pop())
+        return released
+
+    def snapshot(self) -> dict[str,Any]:
+        return {
+            'lateness': self.lateness,
+            'max_pending': self.max_pending,
+            'pending': [(m.timestamp, m.ampere, m.state) for _, m in sorted(self.pending, key=lambda p: p[0])],
+            'recent': list(self.recent),
+            'max_ts': self.max_ts,
+            'frontier': self.frontier,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot:dict[str,Any]) -> IngestStage:
+        stage = cls(snapshot['lateness'], snapshot['max_pending'])
+        # 시각 순으로 정렬된 목록은 그 자체로 heap이다.
+        stage.pending = [(m[0], ElectricCurrentMeasure(*m)) for m in snapshot['pending']]
+        stage.pending_ts = { ts for ts, _ in stage.pending }
+        stage.recent = deque(snapshot['recent'])
+        stage.recent_ts = set(stage.recent)
+        stage.max_ts = snapshot['max_ts']
+        stage.frontier = snapshot['frontier']
+        return stage
+
+    def _pop(self) -> ElectricCurrentMeasure:
+        ts, measure = heapq.heappop(self.pending)
+        self.pending_ts.discard(ts)
+        self._release(measure)
+        return measure
+
+    def _release(self, measure:ElectricCurrentMeasure) -> None:
+        ts = measure.timestamp
+        self.frontier = ts
+        self.stats.released += 1
+        # 중복 판별을 위해 lateness 이내에 내보낸 시각들만 유지한다.
+        recent = self.recent
+        recent.append(ts)
+        self.recent_ts.add(ts)
+        horizon = ts - self.lateness
+        while recent and (recent[0] < horizon or len(recent) > self.max_pending):
+            self.recent_ts.discard(recent.popleft())
+
+
+def reorder(measures:Iterable[ElectricCurrentMeasure],
+            stage:Optional[IngestStage]=None) -> Generator[ElectricCurrentMeasure,None,None]:
+    """측정값들을 `IngestStage`로 재정렬/중복 제거하여 생성한다. 입력이 끝나면 대기 중인 측정값도 모두 생성한다."""
+    if stage is None:
+        stage = IngestStage()
+    for measure in measures:
+        yield from stage.push(measure)
+    yield from stage.flush()
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
-import psycopg2
-from psycopg2.extensions import connection
+from .types import ElectricCurrentMeasure, NozzleProductionAudit, DEFAULT_WELDER_ID
+from .reader import parse_timestamp
+from .waveform import recognize_waveform, inspect_waveform
 
-from mdtpy.client import MDTInstance
-from mdtpy.model import TimeseriesSubmodelServiceCollection, Segment
-from welder import recognize_waveform, inspect_waveform, ElectricCurrentMeasure, NozzleProductionAudit
+if TYPE_CHECKING:
+    from psycopg2.extensions import connection
+    from mdtpy.client import MDTInstance
+    from mdtpy.model import TimeseriesSubmodelServiceCollection, Segment
 
 
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +30,18 @@ def extract_last_waveform(instance:MDTInstance) -> list[ElectricCurrentMeasure]:
     return recognize_waveform(tail.records)
 
 
+def read_tail_measures(instance:MDTInstance) -> list[ElectricCurrentMeasure]:
+    """WelderAmpereLog 타임시리즈의 Tail 세그먼트에 있는 측정값들을 시간 순으로 반환한다."""
+    tail:Segment = instance.timeseries['WelderAmpereLog'].segment('Tail')
+    measures = []
+    for rec in tail.records:
+        ts = rec['Time']
+        measures.append(ElectricCurrentMeasure(timestamp=parse_timestamp(ts) if isinstance(ts, str) else ts,
+                                               ampere=float(rec['Ampere'])))
+    measures.sort(key=lambda m: m.timestamp)
+    return measures
+
+
 def process_nozzle_waveform(welder:MDTInstance, waveform:list[ElectricCurrentMeasure]) -> NozzleProductionAudit:
     # Waveform을 검사하여 불량 파형인지 확인한다.
     is_defect = inspect_waveform(waveform)
@@ -55,13 +70,15 @@ def process_nozzle_waveform(welder:MDTInstance, waveform:list[ElectricCurrentMea
     return logEntry
             
 
-def log_nozzle_waveform(conn:connection, logEntry:NozzleProductionAudit) -> None:
+def log_nozzle_waveform(conn:connection, logEntry:NozzleProductionAudit, welder_id:str=DEFAULT_WELDER_ID) -> None:
     try:
         cur = conn.cursor()
         
         # Insert the log entry into nozzle_productions table
+        # (같은 용접기, 같은 시각의 기록이 이미 있으면 갱신한다.)
         cur.execute("""
             INSERT INTO nozzle_productions (
+                welder_id,
                 timestamp,
                 quantity_produced,
                 avg_processing_time,
@@ -69,9 +86,16 @@ def log_nozzle_waveform(conn:connection, logEntry:NozzleProductionAudit) -> None
                 defect_volume,
                 avg_defect_rate
             ) VALUES (
-                %s, %s, %s, %s, %s, %s
-            );
+                %s, %s, %s, %s, %s, %s, %s
+            )
+            ON CONFLICT (welder_id, timestamp) DO UPDATE SET
+                quantity_produced = EXCLUDED.quantity_produced,
+                avg_processing_time = EXCLUDED.avg_processing_time,
+                avg_waiting_time = EXCLUDED.avg_waiting_time,
+                defect_volume = EXCLUDED.defect_volume,
+                avg_defect_rate = EXCLUDED.avg_defect_rate;
         """, (
+            welder_id,
             logEntry.timestamp,
             logEntry.quantity_produced,
             logEntry.avg_processing_time,
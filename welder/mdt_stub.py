@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+from collections import deque
+from dataclasses import dataclass, field
+
+import time
+import random
+import threading
+from datetime import datetime, timedelta
+
+from .sketch import QuantileSketch
+
+
+TAIL_SEGMENT = 'Tail'
+AMPERE_LOG = 'WelderAmpereLog'
+
+
+class MDTStubError(ConnectionError):
+    """지연/장애 설정에 따라 stub이 호출을 실패시킬 때 발생한다."""
+
+
+@dataclass(slots=True)
+class LatencyProfile:
+    """
+    MDT 서버 호출마다 주입할 지연과 장애.
+
+    각 호출은 `latency` + 지수분포(평균 `jitter`)만큼 지연되며, `failure_rate`의 확률로
+    실패한다. `outages`에 지정된 (시작, 끝) 구간(stub 생성 후 경과 초) 동안에는 모든 호출이 실패한다.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    outages: list[tuple[float,float]] = field(default_factory=list)
+
+
+PROFILES = {
+    'local': LatencyProfile(),
+    'lan': LatencyProfile(latency=0.002, jitter=0.001),
+    'slow': LatencyProfile(latency=0.150, jitter=0.100),
+    'flaky': LatencyProfile(latency=0.020, jitter=0.020, failure_rate=0.05),
+    'outage': LatencyProfile(latency=0.010, jitter=0.005, outages=[(5.0, 15.0)]),
+}
+
+
+@dataclass(slots=True)
+class StubSegment:
+    StartTime: Optional[datetime]
+    EndTime: Optional[datetime]
+    RecordCount: int
+    records: list[dict[str,Any]]
+
+
+class MDTServerStub:
+    """
+    테스트용 in-process MDT 프레임워크 서버.
+
+    welder 코드가 사용하는 `mdtpy.connect()`의 결과와 같은 모양의 객체로, `instances[id]`의
+    `parameters[name]` 읽기/쓰기와 `timeseries['WelderAmpereLog'].segment('Tail')` 조회를
+    지원한다. 모든 호출은 `profile`에 따라 호출한 쓰레드에서 지연되거나 실패하며, 호출 종류별
+    횟수/실패 수/지연 분포를 `stats`에 기록한다. 원격 서버 없이 느린/불안정한 서버 조건에서의
+    종단 간 지연을 측정하는 데 사용한다.
+    """
+    def __init__(self, profile:LatencyProfile|str='local', tail_size:int=600, seed:Optional[int]=None):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.tail_size = tail_size
+        self.instances:dict[str,StubInstance] = {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.stats:dict[str,dict[str,Any]] = {}
+        # 파라미터가 기록될 때 호출된다: (instance id, 파라미터 이름, 값)
+        self.on_write:Optional[Callable[[str,str,Any],None]] = None
+
+    def connect(self, host:Optional[str]=None, port:Optional[int]=None) -> MDTServerStub:
+        """`mdtpy.connect()` 대신 사용한다."""
+        return self
+
+    def add_instance(self, instance_id:str, parameters:Optional[dict[str,Any]]=None) -> StubInstance:
+        instance = StubInstance(self, instance_id)
+        now = datetime.now()
+        for name, value in (parameters or {}).items():
+            instance.values[name] = { 'EventDateTime': now, 'ParameterValue': value }
+        self.instances[instance_id] = instance
+        return instance
+
+    def publish_ampere(self, instance_id:str, timestamp:datetime, ampere:float, state:int=-1) -> None:
+        """
+        용접기가 전류 값을 보고한 것처럼 'Ampere' 파라미터와 WelderAmpereLog 타임시리즈를 갱신한다.
+        (지연/장애를 적용하지 않는다.)
+        """
+        instance = self.instances[instance_id]
+        with self.lock:
+            instance.values['Ampere'] = { 'EventDateTime': timestamp, 'ParameterValue': ampere }
+            instance.ampere_log.append({ 'Time': timestamp, 'Ampere': ampere, 'State': state })
+
+    def call(self, endpoint:str) -> None:
+        """호출 하나에 지연과 장애를 적용하고 통계를 기록한다."""
+        profile = self.profile
+        delay = profile.latency
+        if profile.jitter > 0:
+            delay += self.rng.expovariate(1.0 / profile.jitter)
+        elapsed = time.monotonic() - self.started
+        failed = (any(start <= elapsed < end for start, end in profile.outages)
+                  or (profile.failure_rate > 0 and self.rng.random() < profile.failure_rate))
+        if delay > 0:
+            time.sleep(delay)
+        with self.lock:
+            stats = self.stats.get(endpoint)
+            if stats is None:
+                stats = self.stats[endpoint] = { 'calls': 0, 'failures': 0, 'latency': QuantileSketch() }
+            stats['calls'] += 1
+            stats['failures'] += int(failed)
+            stats['latency'].add(delay * 1000)
+        if failed:
+            raise MDTStubError(f'MDT stub: {endpoint} failed (profile={profile})')
+
+    def summary(self) -> dict[str,dict[str,Any]]:
+        """호출 종류별 횟수, 실패 수, 지연(ms) 분위수."""
+        with self.lock:
+            return { endpoint: { 'calls': s['calls'], 'failures': s['failures'],
+                                 'latency': s['latency'].quantiles() }
+                     for endpoint, s in self.stats.items() }
+
+
+class StubInstance:
+    def __init__(self, server:MDTServerStub, instance_id:str):
+        self.server = server
+        self.id = instance_id
+        self.values:dict[str,dict[str,Any]] = {}
+        self.ampere_log:deque[dict[str,Any]] = deque(maxlen=server.tail_size)
+        self.parameters = StubParameterCollection(self)
+        self.timeseries = { AMPERE_LOG: StubTimeseries(self) }
+
+
+class StubParameterCollection:
+    def __init__(self, instance:StubInstance):
+        self.instance = instance
+
+    def __getitem__(self, name:str) -> StubParameter:
+        return StubParameter(self.instance, name)
+
+    def __setitem__(self, name:str, value:Any) -> None:
+        instance = self.instance
+        server = instance.server
+        server.call('write_parameter')
+        # EventDateTime/ParameterValue 형식이 아니면 기록 시각을 붙인다.
+        if not (isinstance(value, dict) and 'ParameterValue' in value):
+            value = { 'EventDateTime': datetime.now(), 'ParameterValue': value }
+        with server.lock:
+            instance.values[name] = value
+        if server.on_write is not None:
+            server.on_write(instance.id, name, value)
+
+
+class StubParameter:
+    def __init__(self, instance:StubInstance, name:str):
+        self.instance = instance
+        self.name = name
+
+    def read_value(self) -> dict[str,Any]:
+        server = self.instance.server
+        server.call('read_parameter')
+        with server.lock:
+            value = self.instance.values.get(self.name)
+        if value is None:
+            raise KeyError(f'parameter not found: {self.instance.id}/{self.name}')
+        return dict(value)
+
+    @property
+    def value(self) -> Any:
+        return self.read_value()['ParameterValue']
+
+
+class StubTimeseries:
+    def __init__(self, instance:StubInstance):
+        self.instance = instance
+
+    def segment(self, name:str) -> StubSegment:
+        if name != TAIL_SEGMENT:
+            raise KeyError(f'unsupported segment: {name}')
+        server = self.instance.server
+        server.call('read_segment')
+        with server.lock:
+            records = list(self.instance.ampere_log)
+        return StubSegment(StartTime=records[0]['Time'] if records else None,
+                           EndTime=records[-1]['Time'] if records else None,
+                           RecordCount=len(records), records=records)
+
+
+def default_nozzle_production() -> dict[str,Any]:
+    """NozzleProduction 파라미터의 초기값 (생산 기록이 없는 상태)."""
+    return {
+        'QuantityProduced': 0,
+        'AvgProcessingTime': timedelta(0),
+        'AvgWaitingTime': timedelta(0),
+        'DefectVolume': 0,
+        'AvgDefectRate': 0.0,
+    }
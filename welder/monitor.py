@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional, Union
+from dataclasses import dataclass
+
+import math
+from datetime import datetime, timedelta
+
+from .types import ElectricCurrentMeasure
+from .work_recognizer import WorkRecognizer, STATUS_INITIAL, STATUS_START, STATUS_END
+from .ingest import IngestStage
+
+
+STATE_UNKNOWN = -1
+STATE_IDLE = 0
+STATE_RUNNING = 1
+
+EVENT_STARTED = 'started'
+EVENT_FINISHED = 'finished'
+
+
+
+@dataclass(slots=True)
+class IdlePeriod:
+    """
+    대기 구간의 요약. 측정값들을 보관하지 않고 첫/마지막 시각, 개수와 전류의 통계만 유지하므로
+    대기 시간이 아무리 길어도 크기가 일정하다. 분산은 Welford 방식으로 갱신한다.
+    """
+    first: Optional[datetime] = None
+    last: Optional[datetime] = None
+    count: int = 0
+    ampere_mean: float = 0.0
+    ampere_m2: float = 0.0          # 평균과의 차의 제곱합
+    ampere_min: float = math.inf
+    ampere_max: float = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, ts:datetime, ampere:float) -> None:
+        if self.count == 0:
+            self.first = ts
+        self.last = ts
+        self.count += 1
+        delta = ampere - self.ampere_mean
+        self.ampere_mean += delta / self.count
+        self.ampere_m2 += delta * (ampere - self.ampere_mean)
+        if ampere < self.ampere_min:
+            self.ampere_min = ampere
+        if ampere > self.ampere_max:
+            self.ampere_max = ampere
+
+    @property
+    def waiting_time(self) -> timedelta:
+        """첫 측정값부터 마지막 측정값까지의 시간 (측정값이 없으면 0)."""
+        return self.last - self.first if self.count > 0 else timedelta(0)
+
+    @property
+    def ampere_std(self) -> float:
+        return math.sqrt(self.ampere_m2 / self.count) if self.count > 0 else 0.0
+
+    @classmethod
+    def from_measures(cls, measures:Iterable[ElectricCurrentMeasure]) -> IdlePeriod:
+        period = cls()
+        for m in measures:
+            period.add(m.timestamp, m.ampere)
+        return period
+
+
+# (이벤트 종류, 내용): 시작 이벤트는 직전 대기 구간의 요약(IdlePeriod), 종료 이벤트는 작업 구간의 파형을 담는다.
+NozzleEvent = tuple[str, Union[IdlePeriod, list[ElectricCurrentMeasure]]]
+
+
+class NozzleMonitor:
+    """
+    전류 측정값을 차례로 받아 노즐 생산의 시작과 종료를 감지하는 상태 기계.
+
+    작업 인식기의 상태, 진행 중인 파형, 마지막 측정 시각을 모두 가지므로
+    `snapshot()`/`from_snapshot()`으로 저장해 두었다가 재시작 후 같은 지점부터 이어갈 수 있다.
+    대기 구간의 측정값들은 보관하지 않고 `idle`에 요약만 유지한다.
+
+    수신한 측정값은 `ingest`로 재정렬/중복 제거한 뒤 `update()`에 전달한다.
+    """
+    def __init__(self, recognizer:Optional[WorkRecognizer]=None, ingest:Optional[IngestStage]=None):
+        self.recognizer = recognizer if recognizer is not None else WorkRecognizer()
+        self.ingest = ingest if ingest is not None else IngestStage()
+        self.state = STATE_UNKNOWN
+        self.waveform:list[ElectricCurrentMeasure] = []
+        self.idle = IdlePeriod()
+        self.last_ts:Optional[datetime] = None
+
+    def update(self, ts:datetime, ampere:float) -> Optional[NozzleEvent]:
+        """
+        측정값 하나를 반영하고, 노즐 생산이 시작되거나 종료되면 해당 이벤트를 반환한다.
+        측정값은 `ingest`를 거쳐 시각이 증가하는 순서로 주어져야 한다.
+        """
+        self.last_ts = ts
+
+        code = self.recognizer.recognize(ts, ampere)
+        event = None
+        if self.state == STATE_RUNNING:
+            self.waveform.append(ElectricCurrentMeasure(ts, ampere, code))
+            if code == STATUS_END:
+                event = (EVENT_FINISHED, self.waveform)
+                self.waveform = []
+                self.idle = IdlePeriod()
+                self.state = STATE_IDLE
+        elif self.state == STATE_IDLE:
+            if code == STATUS_INITIAL:
+                self.idle.add(ts, ampere)
+            elif code == STATUS_START:
+                event = (EVENT_STARTED, self.idle)
+                self.idle = IdlePeriod()
+                self.waveform = [ElectricCurrentMeasure(ts, ampere, code)]
+                self.state = STATE_RUNNING
+        else:
+            if code == STATUS_START:
+                self.waveform = [ElectricCurrentMeasure(ts, ampere, code)]
+                self.state = STATE_RUNNING
+            elif code == STATUS_END:
+                self.waveform = []
+                self.idle = IdlePeriod()
+                self.state = STATE_IDLE
+        return event
+
+    def catch_up(self, measures:Iterable[ElectricCurrentMeasure]) -> list[NozzleEvent]:
+        """
+        밀린 측정값들(예: WelderAmpereLog의 Tail 세그먼트)을 반영한다. 이미 반영한 시각의 측정값은
+        `ingest`에서 걸러진다.
+        """
+        events = []
+        for measure in measures:
+            for m in self.ingest.push(measure):
+                event = self.update(m.timestamp, m.ampere)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def snapshot(self) -> dict[str,Any]:
+        return {
+            'recognizer': self.recognizer.snapshot(),
+            'ingest': self.ingest.snapshot(),
+            'state': self.state,
+            # 직렬화 비용을 줄이기 위해 측정값을 tuple로 저장한다.
+            'waveform': [(m.timestamp, m.ampere, m.state) for m in self.waveform],
+            'idle': self.idle,
+            'last_ts': self.last_ts,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot:dict[str,Any]) -> NozzleMonitor:
+        monitor = cls(WorkRecognizer.from_snapshot(snapshot['recognizer']), IngestStage.from_snapshot(snapshot['ingest']))
+        monitor.state = snapshot['state']
+        monitor.waveform = [ElectricCurrentMeasure(*m) for m in snapshot['waveform']]
+        monitor.idle = snapshot['idle']
+        monitor.last_ts = snapshot['last_ts']
+        return monitor
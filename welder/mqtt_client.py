@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import json
+import time
+import queue
 import logging
+import threading
 from typing import Callable, Optional, Any
+from dataclasses import dataclass, field
 
 import paho.mqtt.client as mqtt
 
+from .payload import decode_samples
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -15,13 +21,48 @@ logger = logging.getLogger("mqtt_client")
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 
+DECODE_SAMPLES = 'samples'
+DECODE_JSON = 'json'
+DECODE_RAW = 'raw'
+
+MessageCallback = Callable[[str, Any], None]
+
+
+@dataclass(slots=True)
+class Subscription:
+    topic: str
+    decode: str
+    callback: Optional[MessageCallback] = None
+    factory: Optional[Callable[[str], MessageCallback]] = None
+    handlers: dict[str, MessageCallback] = field(default_factory=dict)
+
+    def handler(self, topic:str) -> MessageCallback:
+        if self.callback is not None:
+            return self.callback
+        # 토픽(용접기)별 handler는 처음 메시지를 받을 때 생성한다.
+        handler = self.handlers.get(topic)
+        if handler is None:
+            handler = self.handlers[topic] = self.factory(topic)
+        return handler
+
+
 class MQTTClient:
+    """
+    여러 토픽을 구독하고, 수신한 메시지를 worker 쓰레드에서 해석하여 등록된 handler에 전달한다.
+    
+    paho 네트워크 쓰레드는 수신한 메시지를 worker 큐에 넣기만 하며, 큐가 가득 차면 기다리지 않고
+    메시지를 버린 뒤 `dropped_count`에 센다 (연결 해제 시 처리하지 못하고 버린 메시지도 센다).
+    같은 토픽의 메시지는 항상 같은 worker에서 처리되므로 토픽별 순서가 유지된다. 토픽과 구독(wildcard 포함)의
+    매칭 결과는 토픽별로 캐시하므로 다수의 용접기 스트림을 하나의 연결에서 처리할 수 있다.
+    """
     def __init__(self, 
                 client_id: str = "waveform_inspector", 
                 broker: str = MQTT_BROKER, 
                 port: int = MQTT_PORT,
                 username: Optional[str] = None,
-                password: Optional[str] = None):
+                password: Optional[str] = None,
+                workers: int = 1,
+                queue_size: int = 10000):
         """MQTT 클라이언트 초기화"""
         self.client = mqtt.Client(client_id=client_id)
         self.broker = broker
@@ -36,11 +77,27 @@ class MQTTClient:
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
         
-        # 메시지 처리 콜백
-        self.message_callback: Optional[Callable[[str, Any], None]] = None
+        # 구독 정보 및 토픽별 구독 매칭 캐시
+        self.subscriptions: list[Subscription] = []
+        self.routes: dict[str, list[Subscription]] = {}
+        self.lock = threading.Lock()
+        
+        # 메시지 처리 worker. 쓰레드는 한 번만 시작할 수 있으므로 connect()에서 새로 생성한다.
+        self.queues: list[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.workers: list[threading.Thread] = []
+        
+        # 여러 worker 쓰레드와 paho 네트워크 쓰레드에서 갱신하는 카운터
+        self.counter_lock = threading.Lock()
+        self.error_count = 0
+        self.dropped_count = 0
         
     def connect(self) -> None:
         """브로커에 연결"""
+        if not any(worker.is_alive() for worker in self.workers):
+            self.workers = [threading.Thread(target=self._work, args=(q,), name=f'mqtt-worker-{i}', daemon=True)
+                            for i, q in enumerate(self.queues)]
+            for worker in self.workers:
+                worker.start()
         try:
             self.client.connect(self.broker, self.port, 60)
             self.client.loop_start()
@@ -52,19 +109,61 @@ class MQTTClient:
         """브로커 연결 해제"""
         self.client.loop_stop()
         self.client.disconnect()
+        for q in self.queues:
+            # worker가 멈춰 있으면 가득 찬 큐에 종료 신호를 넣을 수 없으므로, 남은 메시지를 버리고 넣는다.
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                discarded = self._discard(q)
+                logger.warning(f"discarded {discarded} unprocessed messages on disconnect")
+                q.put_nowait(None)
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.join(timeout=5)
         logger.info("Disconnected from MQTT broker")
         
-    def subscribe(self, topic:str, callback: Callable[[str, Any], None]) -> None:
-        """웰더 상태 토픽 구독"""
-        self.message_callback = callback
-        self.client.subscribe(topic)
-        self.client.on_message = callback
-        logger.info(f"Subscribed to topic: {topic}")
+    def subscribe(self, topic:str, callback:MessageCallback, decode:str=DECODE_JSON) -> None:
+        """
+        토픽(wildcard 허용)을 구독한다.
+        
+        `decode`가 'samples'이면 payload를 `SampleBatch`로, 'json'이면 JSON 객체로 변환하여 전달하고,
+        'raw'이면 bytes 그대로 전달한다.
+        """
+        self._add_subscription(Subscription(topic=topic, decode=decode, callback=callback))
+        
+    def subscribe_per_topic(self, topic:str, factory:Callable[[str], MessageCallback],
+                            decode:str=DECODE_SAMPLES) -> None:
+        """
+        wildcard 토픽을 구독하고, 실제 토픽마다 `factory(topic)`으로 생성한 handler를 사용한다.
+        
+        예: `subscribe_per_topic('mdt/+/parameters/Ampere', lambda topic: WelderHandler(topic))`
+        """
+        self._add_subscription(Subscription(topic=topic, decode=decode, factory=factory))
+        
+    def _add_subscription(self, sub:Subscription) -> None:
+        with self.lock:
+            self.subscriptions.append(sub)
+            self.routes.clear()
+        self.client.subscribe(sub.topic)
+        logger.info(f"Subscribed to topic: {sub.topic}")
+        
+    def _match(self, topic:str) -> list[Subscription]:
+        subs = self.routes.get(topic)
+        if subs is None:
+            with self.lock:
+                subs = [sub for sub in self.subscriptions if mqtt.topic_matches_sub(sub.topic, topic)]
+                self.routes[topic] = subs
+        return subs
         
     def _on_connect(self, client, userdata, flags, rc):
         """연결 콜백"""
         if rc == 0:
             logger.info("Connected to MQTT broker successfully")
+            # 재연결된 경우를 위해 기존 구독을 다시 등록한다.
+            with self.lock:
+                topics = [sub.topic for sub in self.subscriptions]
+            for topic in topics:
+                client.subscribe(topic)
         else:
             logger.error(f"Failed to connect to MQTT broker, return code: {rc}")
             
@@ -74,18 +173,58 @@ class MQTTClient:
             logger.warning(f"Unexpected disconnection from MQTT broker, return code: {rc}")
             
     def _on_message(self, client, userdata, msg):
-        """메시지 수신 콜백"""
+        """메시지 수신 콜백: 수신 시각과 함께 worker 큐에 넣기만 한다."""
         topic = msg.topic
+        q = self.queues[hash(topic) % len(self.queues)]
         try:
-            payload = json.loads(msg.payload.decode('utf-8'))
-            logger.debug(f"Received message on topic {topic}: {payload}")
-            
-            if self.message_callback is not None and topic == MQTT_TOPIC:
-                self.message_callback(topic, payload)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode JSON payload from topic {topic}")
-        except Exception as e:
-            logger.error(f"Error processing message from topic {topic}: {e}")
+            # 네트워크 쓰레드가 막히면 keepalive와 다른 토픽의 수신까지 멈추므로 기다리지 않는다.
+            q.put_nowait((topic, msg.payload, round(time.time() * 1000)))
+        except queue.Full:
+            with self.counter_lock:
+                self.dropped_count += 1
+                dropped = self.dropped_count
+            if dropped & (dropped - 1) == 0:
+                logger.warning(f"worker queue is full: dropped a message from topic {topic} (total {dropped})")
+        
+    def _work(self, q:queue.Queue) -> None:
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            topic, payload, received = item
+            for sub in self._match(topic):
+                try:
+                    if sub.decode == DECODE_SAMPLES:
+                        value = decode_samples(payload, default_time=received)
+                    elif sub.decode == DECODE_JSON:
+                        value = json.loads(payload.decode('utf-8'))
+                    else:
+                        value = payload
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Received message on topic {topic}: {value}")
+                    sub.handler(topic)(topic, value)
+                except json.JSONDecodeError:
+                    self._count_error()
+                    logger.error(f"Failed to decode JSON payload from topic {topic}")
+                except Exception as e:
+                    self._count_error()
+                    logger.error(f"Error processing message from topic {topic}: {e}")
+
+    def _discard(self, q:queue.Queue) -> int:
+        discarded = 0
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+            discarded += 1
+        with self.counter_lock:
+            self.dropped_count += discarded
+        return discarded
+
+    def _count_error(self) -> None:
+        with self.counter_lock:
+            self.error_count += 1
 
 
 # 사용 예시
@@ -101,14 +240,13 @@ if __name__ == "__main__":
     client.connect()
     
     # 상태 토픽 구독
-    client.subscribe_to_status(process_status_message)
+    client.subscribe('mdt/+/parameters/Status', process_status_message)
     
     try:
-        # 메인 스레드가 종료되지 않도록 대기
-        import time
+        # 메인 쓰레드가 종료되지 않도록 대기
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         logger.info("Shutting down MQTT client...")
     finally:
-        client.disconnect() 
\ No newline at end of file
+        client.disconnect()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+from dataclasses import dataclass
+
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from .types import ElectricCurrentMeasure
+from .work_recognizer import WorkRecognizer
+
+
+# 바이너리 payload 형식: header(magic, version, count) + count개의 (time, ampere, state) 레코드
+BINARY_MAGIC = b'WA'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<2sBxI')
+SAMPLE_DTYPE = np.dtype([('time', '<i8'), ('ampere', '<f4'), ('state', 'i1')])
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+FORMATS = (FORMAT_TEXT, FORMAT_JSON, FORMAT_BINARY)
+
+
+@dataclass(slots=True)
+class SampleBatch:
+    """하나의 메시지에 담긴 전류 샘플들. 시각은 UTC epoch milli-second이다."""
+    times: np.ndarray
+    amperes: np.ndarray
+    states: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def to_measures(self) -> list[ElectricCurrentMeasure]:
+        return [ElectricCurrentMeasure(timestamp=datetime.fromtimestamp(t / 1000), ampere=float(a), state=int(s))
+                for t, a, s in zip(self.times.tolist(), self.amperes.tolist(), self.states.tolist())]
+
+
+def label_samples(measures:Iterable[ElectricCurrentMeasure],
+                  recognizer:Optional[WorkRecognizer]=None) -> tuple[np.ndarray,np.ndarray]:
+    """
+    측정값들의 전류 배열과 상태 코드 배열을 만든다.
+
+    CSV 파일의 측정값들에는 상태가 기록되어 있지 않으므로(-1), 상태 코드는 `WorkRecognizer`로
+    측정값을 순서대로 인식한 결과를 사용한다. 인식 버퍼가 채워지기 전의 처음 몇 개는 -1로 남는다.
+    """
+    recognizer = recognizer if recognizer is not None else WorkRecognizer()
+    amperes, states = [], []
+    for m in measures:
+        amperes.append(m.ampere)
+        states.append(recognizer.recognize(m.timestamp, m.ampere))
+    return np.array(amperes, dtype=np.float32), np.array(states, dtype=np.int8)
+
+
+def encode_samples(times:np.ndarray, amperes:np.ndarray, states:np.ndarray, format:str=FORMAT_BINARY) -> bytes:
+    """
+    전류 샘플 묶음을 MQTT payload로 변환한다.
+
+    - binary: 헤더 뒤에 (int64 time, float32 ampere, int8 state) 레코드를 이어붙인 형식 (13 bytes/sample)
+    - json: `[[time, ampere, state], ...]` 형식의 JSON 배열
+    - text: 기존 형식과 호환되는 단일 전류 값 문자열 (샘플이 하나인 경우만 가능).
+      시각과 상태 코드는 담지 않으므로 수신 측에서는 수신 시각과 상태 -1(미상)로 복원된다.
+    """
+    count = len(amperes)
+    if len(times) != count or len(states) != count:
+        raise ValueError(f'sample arrays differ in length: times={len(times)}, amperes={count}, '
+                         f'states={len(states)}')
+
+    if format == FORMAT_BINARY:
+        records = np.empty(count, dtype=SAMPLE_DTYPE)
+        records['time'] = times
+        records['ampere'] = amperes
+        records['state'] = states
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, count) + records.tobytes()
+    elif format == FORMAT_JSON:
+        rows = zip(np.asarray(times).tolist(), np.round(np.asarray(amperes, dtype=float), 5).tolist(),
+                   np.asarray(states).tolist())
+        return json.dumps([list(row) for row in rows], separators=(',', ':')).encode('utf-8')
+    elif format == FORMAT_TEXT:
+        if count != 1:
+            raise ValueError(f'text payload can hold only a single sample: count={count}')
+        return str(float(amperes[0])).encode('utf-8')
+    else:
+        raise ValueError(f'unknown payload format: {format}')
+
+
+def decode_samples(payload:bytes, default_time:Optional[int]=None) -> SampleBatch:
+    """
+    `encode_samples()`로 생성된 payload를 numpy 배열들로 변환한다.
+
+    payload 형식은 내용으로부터 자동으로 판별한다. 시각 정보가 없는 text 형식의 경우에는
+    `default_time`(보통 수신 시각)을 사용한다.
+    """
+    if payload[:2] == BINARY_MAGIC:
+        _, version, count = BINARY_HEADER.unpack_from(payload)
+        if version != BINARY_VERSION:
+            raise ValueError(f'unsupported binary payload version: {version}')
+        records = np.frombuffer(payload, dtype=SAMPLE_DTYPE, count=count, offset=BINARY_HEADER.size)
+        return SampleBatch(times=records['time'], amperes=records['ampere'], states=records['state'])
+
+    text = payload.decode('utf-8').strip()
+    if text.startswith('['):
+        rows = np.array(json.loads(text), dtype=np.float64).reshape(-1, 3)
+        return SampleBatch(times=rows[:,0].astype(np.int64), amperes=rows[:,1].astype(np.float32),
+                           states=rows[:,2].astype(np.int8))
+    else:
+        # text 형식에는 상태 코드가 없으므로 -1(미상)으로 채운다.
+        if default_time is None:
+            raise ValueError('text payload has no timestamp: default_time is required')
+        return SampleBatch(times=np.array([default_time], dtype=np.int64),
+                           amperes=np.array([float(text)], dtype=np.float32),
+                           states=np.array([-1], dtype=np.int8))
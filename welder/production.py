@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from datetime import datetime, timedelta
+
+from .types import NozzleProductionAudit, INSPECTION_FULL
+from .sketch import QuantileSketch
+from .rollup import NozzleProductionRollup, NozzleRollup, to_millis
+
+
+class ProductionTracker:
+    """
+    노즐 생산 통계(NozzleProductionAudit)를 갱신한다.
+
+    평균 처리/대기 시간은 이동 평균을 반복 계산하지 않고 누적 합계(timedelta)와
+    개수로부터 매번 다시 구하므로 부동소수점 오차가 누적되지 않는다.
+    누적 합계는 트윈에 저장된 평균값과 개수로부터 복원한다.
+
+    평균 외에 처리/대기 시간(milli-second)의 분위수 스케치를 함께 유지하므로,
+    재시작 시 `restore_sketches()`로 이전 스케치를 복원할 수 있고
+    여러 용접기의 스케치를 병합하여 라인 단위 p50/p95/p99를 구할 수 있다.
+
+    저비용 검사 방식(`INSPECTION_FULL` 이외)의 불량 판정은 잠정 판정이므로 `DefectVolume`에
+    더하지 않고 `provisional_defects`에 따로 세며, `on_reinspected()`로 재검사 결과를 받았을 때
+    확정된 판정만 `DefectVolume`에 반영한다.
+    """
+    def __init__(self, production:NozzleProductionAudit, rollup:Optional[NozzleProductionRollup]=None):
+        self.production = production
+        self.rollup = rollup if rollup is not None else NozzleProductionRollup()
+
+        count = production.QuantityProduced
+        self.total_processing_time = production.AvgProcessingTime * count
+        # 첫 노즐 생산 이전의 대기 시간은 집계되지 않으므로 대기 횟수는 생산 수량보다 하나 적다.
+        self.waiting_count = max(count - 1, 0)
+        self.total_waiting_time = production.AvgWaitingTime * self.waiting_count
+        self.last_waiting_time:Optional[timedelta] = None
+        self.provisional_defects = 0
+        self.processing_sketch = QuantileSketch()
+        self.waiting_sketch = QuantileSketch()
+
+    def on_started(self, waiting_time:timedelta) -> None:
+        self.waiting_count += 1
+        self.total_waiting_time += waiting_time
+        self.production.AvgWaitingTime = self.total_waiting_time / self.waiting_count
+        self.last_waiting_time = waiting_time
+        self.waiting_sketch.add(to_millis(waiting_time))
+
+    def on_finished(self, timestamp:datetime, processing_time:timedelta, is_defect:bool,
+                    inspection_mode:str=INSPECTION_FULL) -> list[NozzleRollup]:
+        production = self.production
+        production.Timestamp = timestamp
+        production.InspectionMode = inspection_mode
+        production.QuantityProduced += 1
+        self.total_processing_time += processing_time
+        production.AvgProcessingTime = self.total_processing_time / production.QuantityProduced
+        provisional = inspection_mode != INSPECTION_FULL
+        if is_defect:
+            if provisional:
+                self.provisional_defects += 1
+            else:
+                production.DefectVolume += 1
+        production.AvgDefectRate = production.DefectVolume / production.QuantityProduced
+        self.processing_sketch.add(to_millis(processing_time))
+
+        rollups = self.rollup.add(timestamp, processing_time, self.last_waiting_time, is_defect, provisional)
+        self.last_waiting_time = None
+        return rollups
+
+    def on_reinspected(self, provisional:bool, verdict:bool, timestamp:Optional[datetime]=None) -> None:
+        """
+        저비용 방식으로 내렸던 잠정 판정을 재검사 결과로 확정한다. `timestamp`가 주어지면
+        메모리에 남아있는 집계 구간도 함께 보정한다.
+        """
+        production = self.production
+        self.provisional_defects -= int(provisional)
+        production.DefectVolume += int(verdict)
+        if timestamp is not None:
+            self.rollup.reinspect(timestamp, provisional, verdict)
+        if production.QuantityProduced > 0:
+            production.AvgDefectRate = production.DefectVolume / production.QuantityProduced
+
+    def quantiles(self) -> dict[str,dict[str,Optional[float]]]:
+        return {
+            'ProcessingTime': self.processing_sketch.quantiles(),
+            'WaitingTime': self.waiting_sketch.quantiles(),
+        }
+
+    def sketches_to_dict(self) -> dict[str,Any]:
+        return {
+            'ProcessingTime': self.processing_sketch.to_dict(),
+            'WaitingTime': self.waiting_sketch.to_dict(),
+        }
+
+    def restore_sketches(self, data:dict[str,Any]) -> None:
+        self.processing_sketch = QuantileSketch.from_dict(data['ProcessingTime'])
+        self.waiting_sketch = QuantileSketch.from_dict(data['WaitingTime'])
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+from collections import Counter
+from dataclasses import dataclass, field
+
+import io
+import os
+import sys
+import time
+import pstats
+import signal
+import logging
+import cProfile
+import threading
+from datetime import datetime
+
+from .sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_SAMPLE = 'sample'           # 주기적으로 호출 스택을 표본 추출하는 저비용 프로파일
+PROFILE_CPROFILE = 'cprofile'       # 모든 함수 호출을 계측하는 cProfile
+PROFILE_STOP = 'stop'
+
+
+@dataclass(slots=True)
+class LoopStats:
+    """
+    주기적으로 수행되는 처리 루프의 수행 시간과, 주기를 넘긴(overrun) 횟수.
+
+    `begin()`/`sleep_time()`을 사용하면 루프를 고정된 일정(`interval`초 간격)에 맞춰 수행하며,
+    각 반복이 일정보다 늦게 시작된 시간(`lag`)을 구한다. 주기를 넘기는 반복이 이어지면 `lag`이
+    누적되고, 주기보다 빨리 끝나는 반복들로 일정을 따라잡으면 줄어든다.
+    """
+    interval: float                     # 루프 주기(초)
+    iterations: int = 0
+    overruns: int = 0
+    max_elapsed: float = 0.0            # 가장 오래 걸린 수행 시간(초)
+    elapsed: QuantileSketch = field(default_factory=QuantileSketch)     # 수행 시간(ms)
+    due: Optional[float] = None         # 다음 반복이 시작되어야 하는 시각 (time.monotonic())
+    lag: float = 0.0                    # 현재 반복이 일정보다 늦게 시작된 시간(초)
+    max_lag: float = 0.0
+
+    def begin(self, now:float) -> float:
+        """반복을 시작하면서 일정보다 늦게 시작된 시간(초)을 반환한다."""
+        if self.due is None:
+            self.due = now
+        self.lag = max(0.0, now - self.due)
+        if self.lag > self.max_lag:
+            self.max_lag = self.lag
+        self.due += self.interval
+        return self.lag
+
+    def sleep_time(self, now:float) -> float:
+        """다음 반복의 예정 시각까지 남은 시간(초). 일정보다 늦은 경우에는 0이다."""
+        return max(0.0, self.due - now) if self.due is not None else self.interval
+
+    def record(self, elapsed:float) -> bool:
+        """한 번의 수행 시간(초)을 기록하고, 주기를 넘겼는지 여부를 반환한다."""
+        self.iterations += 1
+        self.elapsed.add(elapsed * 1000)
+        if elapsed > self.max_elapsed:
+            self.max_elapsed = elapsed
+        overrun = elapsed > self.interval
+        if overrun:
+            self.overruns += 1
+        return overrun
+
+    @property
+    def overrun_rate(self) -> float:
+        return self.overruns / self.iterations if self.iterations > 0 else 0.0
+
+    def __repr__(self):
+        elapsed = ', '.join(f'{k}={v:.1f}ms' for k, v in self.elapsed.quantiles().items() if v is not None)
+        return (f'LoopStats(iterations={self.iterations}, overruns={self.overruns} '
+                f'({self.overrun_rate:.2%}), max={self.max_elapsed*1000:.1f}ms, elapsed=[{elapsed}], '
+                f'max_lag={self.max_lag*1000:.1f}ms)')
+
+
+def _frame_name(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """
+    대상 쓰레드의 호출 스택을 `interval`초마다 표본 추출한다.
+
+    대상 쓰레드를 계측하지 않고 별도 쓰레드에서 `sys._current_frames()`로 스택만 읽으므로,
+    운영 중인 서비스에 붙여도 부하가 작다. 결과는 flamegraph.pl/speedscope가 읽을 수 있는
+    folded stack 형식('root;...;leaf count')과 함수별 표본 수로 저장한다.
+    """
+    def __init__(self, thread_id:int, interval:float=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks:Counter[tuple[str,...]] = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self) -> SamplingProfiler:
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def dump(self, prefix:str) -> list[str]:
+        """folded stack 파일과 함수별 표본 수 파일을 기록하고 그 경로들을 반환한다."""
+        folded_path = f'{prefix}.folded'
+        with open(folded_path, 'w') as fp:
+            for stack, count in self.stacks.most_common():
+                fp.write(f"{';'.join(stack)} {count}\n")
+
+        own:Counter[str] = Counter()
+        total:Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        stats_path = f'{prefix}.txt'
+        with open(stats_path, 'w') as fp:
+            fp.write(f'samples={self.samples}, interval={self.interval*1000:.1f}ms\n\n')
+            fp.write(f"{'own':>8}{'own%':>8}{'total':>8}{'total%':>8}  function\n")
+            samples = max(self.samples, 1)
+            for name, count in sorted(total.items(), key=lambda t: (own[t[0]], t[1]), reverse=True):
+                fp.write(f'{own[name]:>8}{own[name]/samples:>8.1%}{count:>8}{count/samples:>8.1%}  {name}\n')
+        return [folded_path, stats_path]
+
+
+class ProfilerControl:
+    """
+    실행 중인 처리 루프를 재시작하지 않고 프로파일링한다.
+
+    시그널(SIGUSR1: 표본 추출, SIGUSR2: cProfile)이나 제어 메시지로 프로파일을 요청하면,
+    처리 루프가 매 주기 호출하는 `poll()`에서 그 루프의 쓰레드를 대상으로 프로파일을 시작하고
+    `duration`초 후(또는 중지 요청 시) 결과를 `output_dir`에 기록한다. cProfile은 호출한
+    쓰레드만 계측하므로 요청을 받은 쓰레드가 아니라 `poll()`에서 시작/종료한다.
+    """
+    def __init__(self, output_dir:str, name:str='profile', duration:float=30.0, interval:float=0.005):
+        self.output_dir = output_dir
+        self.name = name
+        self.duration = duration
+        self.interval = interval
+        # 시그널 handler에서도 설정하므로 lock 없이 (mode, duration) tuple 하나만 교체한다.
+        self.pending:Optional[tuple[str,float]] = None
+        self.mode:Optional[str] = None
+        self.deadline = 0.0
+        self.started:Optional[datetime] = None
+        self.sampler:Optional[SamplingProfiler] = None
+        self.profile:Optional[cProfile.Profile] = None
+
+    @property
+    def active(self) -> bool:
+        return self.mode is not None
+
+    def request(self, mode:str, duration:Optional[float]=None) -> None:
+        """프로파일 시작(`PROFILE_SAMPLE`, `PROFILE_CPROFILE`) 또는 중지(`PROFILE_STOP`)를 요청한다."""
+        if mode not in (PROFILE_SAMPLE, PROFILE_CPROFILE, PROFILE_STOP):
+            raise ValueError(f'unknown profile mode: {mode}')
+        self.pending = (mode, duration if duration is not None else self.duration)
+
+    def install_signals(self) -> None:
+        """SIGUSR1/SIGUSR2 handler를 등록한다. 프로파일 중에 같은 시그널을 받으면 중지한다."""
+        def handler(mode:str):
+            def on_signal(signum, frame):
+                self.request(PROFILE_STOP if self.mode == mode else mode)
+            return on_signal
+        signal.signal(signal.SIGUSR1, handler(PROFILE_SAMPLE))
+        signal.signal(signal.SIGUSR2, handler(PROFILE_CPROFILE))
+
+    def on_control_message(self, topic:str, payload:dict[str,Any]) -> None:
+        """
+        제어 토픽의 메시지를 처리한다 (MQTTClient의 JSON 구독 callback).
+
+        예: `{"command": "sample", "duration": 60}`, `{"command": "stop"}`
+        """
+        try:
+            duration = payload.get('duration')
+            self.request(payload['command'], float(duration) if duration is not None else None)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"invalid profiling request from {topic}: {payload} ({e})")
+
+    def poll(self) -> None:
+        """처리 루프의 쓰레드에서 매 주기 호출하여, 요청된 프로파일을 시작/종료한다."""
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            mode, duration = pending
+            if self.active:
+                self._finish()
+            if mode != PROFILE_STOP:
+                self._begin(mode, duration)
+        elif self.active and time.monotonic() >= self.deadline:
+            self._finish()
+
+    def close(self) -> None:
+        if self.active:
+            self._finish()
+
+    def _begin(self, mode:str, duration:float) -> None:
+        if mode == PROFILE_SAMPLE:
+            self.sampler = SamplingProfiler(threading.get_ident(), self.interval).start()
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.mode = mode
+        self.started = datetime.now()
+        self.deadline = time.monotonic() + duration
+        logger.info(f"started {mode} profiling for {duration:.0f}s")
+
+    def _finish(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"{self.name}-{self.mode}-{self.started:%Y%m%d-%H%M%S}")
+        try:
+            if self.mode == PROFILE_SAMPLE:
+                self.sampler.stop()
+                paths = self.sampler.dump(prefix)
+            else:
+                self.profile.disable()
+                paths = [f'{prefix}.prof', f'{prefix}.txt']
+                self.profile.dump_stats(paths[0])
+                out = io.StringIO()
+                pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(50)
+                with open(paths[1], 'w') as fp:
+                    fp.write(out.getvalue())
+            logger.info(f"finished {self.mode} profiling: {', '.join(paths)}")
+        except OSError as e:
+            logger.error(f"failed to write {self.mode} profile: {e}")
+        finally:
+            self.mode = None
+            self.sampler = None
+            self.profile = None
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from typing import Optional
+from dataclasses import dataclass
+
+import math
+from datetime import datetime, timedelta
+
+from .types import ElectricCurrentMeasure
+
+
+# 피라미드 해상도(초): 1초, 10초, 1분, 10분
+PYRAMID_RESOLUTIONS = (1, 10, 60, 600)
+# 원본 측정값을 나타내는 해상도
+RESOLUTION_RAW = 0
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+@dataclass(slots=True)
+class AmpereSummary:
+    """
+    `resolution`초 구간에 속한 전류 측정값들의 요약 (개수, 최소, 최대, 합).
+
+    `first`/`last`는 요약에 포함된 첫/마지막 측정값의 시각이고, `complete`는 구간의 측정값을
+    처음부터 끝까지 모두 포함하는지 여부이다. 중단이나 재시작으로 한 구간이 여러 조각으로
+    기록되는 경우, 이 값들로 같은 조각이 다시 기록되더라도 중복 합산하지 않는다 (`update()`).
+    """
+    resolution: int
+    bucket_start: datetime
+    count: int = 0
+    min: float = math.inf
+    max: float = -math.inf
+    sum: float = 0.0
+    first: Optional[datetime] = None
+    last: Optional[datetime] = None
+    complete: bool = False
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def add(self, ampere:float, timestamp:datetime) -> None:
+        self.count += 1
+        self.sum += ampere
+        if ampere < self.min:
+            self.min = ampere
+        if ampere > self.max:
+            self.max = ampere
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+
+    def merge(self, other:AmpereSummary) -> AmpereSummary:
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.first is not None and (self.first is None or other.first < self.first):
+            self.first = other.first
+        if other.last is not None and (self.last is None or other.last > self.last):
+            self.last = other.last
+        return self
+
+    def update(self, other:AmpereSummary) -> AmpereSummary:
+        """
+        같은 구간의 요약 조각 `other`를 반영한 결과를 반환한다.
+
+        완전한 요약이나 이미 반영된 범위를 모두 포함하는 조각은 기존 요약을 대체하고,
+        마지막으로 반영된 시각 이후의 조각만 합산한다. 그 외의 조각(이미 반영된 조각)은 무시한다.
+        `database_utils.log_ampere_summaries()`도 저장된 요약을 이 메서드로 갱신한다.
+        """
+        if other.complete or covers(other, self):
+            return other
+        if not self.complete and is_after(other, self):
+            return self.merge(other)
+        return self
+
+
+def covers(piece:AmpereSummary, summary:AmpereSummary) -> bool:
+    return piece.first is not None and summary.first is not None \
+            and piece.first <= summary.first and piece.last >= summary.last
+
+
+def is_after(piece:AmpereSummary, summary:AmpereSummary) -> bool:
+    # 시각 정보가 없는 요약(이전 버전에서 기록된 요약)은 합산한다.
+    return piece.first is None or summary.last is None or piece.first > summary.last
+
+
+def pyramid_bucket_start(ts:datetime, resolution:int) -> datetime:
+    """주어진 시각이 속한 `resolution`초 구간의 시작 시각을 반환한다 (자정 기준으로 정렬)."""
+    if resolution == 1:
+        return ts.replace(microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = (ts.hour * 3600 + ts.minute * 60 + ts.second) // resolution * resolution
+    return day + timedelta(seconds=seconds)
+
+
+def choose_resolution(start:datetime, end:datetime, max_points:int,
+                      resolutions:tuple[int,...]=PYRAMID_RESOLUTIONS) -> int:
+    """
+    [start, end) 구간을 `max_points`개 이하의 구간으로 나타낼 수 있는 가장 세밀한 해상도를 반환한다.
+    가장 거친 해상도로도 부족하면 가장 거친 해상도를 반환한다.
+    """
+    span = (end - start).total_seconds()
+    for resolution in resolutions:
+        if math.ceil(span / resolution) <= max_points:
+            return resolution
+    return resolutions[-1]
+
+
+class AmperePyramid:
+    """
+    전류 측정값들을 여러 해상도의 요약 구간으로 점진적으로 집계한다.
+
+    측정값은 가장 세밀한 해상도의 구간에만 반영하고, 구간이 끝나면 그 요약을 다음 해상도의
+    구간에 병합한다. 따라서 측정값당 비용은 해상도 수와 무관하며, 해상도마다 진행 중인
+    구간 하나만 메모리에 유지한다. 측정값은 시각 순서대로 주어져야 한다.
+
+    첫 측정값 이후에 시작되어 다음 구간의 측정값으로 닫힌 구간만 완전한 요약(`complete`)이고,
+    처음 측정값이 속한 구간과 `flush()`로 닫은 구간은 일부만 포함한 요약이다.
+    """
+    def __init__(self, resolutions:tuple[int,...]=PYRAMID_RESOLUTIONS):
+        for finer, coarser in zip(resolutions, resolutions[1:]):
+            if coarser % finer != 0:
+                raise ValueError(f'pyramid resolution {coarser} is not a multiple of {finer}')
+        if SECONDS_PER_DAY % resolutions[-1] != 0:
+            raise ValueError(f'pyramid resolution does not divide a day: {resolutions[-1]}')
+        self.resolutions = resolutions
+        self.open:list[Optional[AmpereSummary]] = [None] * len(resolutions)
+        self.first:Optional[datetime] = None
+
+    def add(self, measure:ElectricCurrentMeasure) -> list[AmpereSummary]:
+        """측정값 하나를 반영하고, 이로 인해 끝난 구간들의 요약을 반환한다."""
+        closed:list[AmpereSummary] = []
+        if self.first is None:
+            self.first = measure.timestamp
+        start = pyramid_bucket_start(measure.timestamp, self.resolutions[0])
+        bucket = self.open[0]
+        if bucket is not None and bucket.bucket_start != start:
+            self._close(0, closed, True)
+            bucket = None
+        if bucket is None:
+            bucket = self.open[0] = AmpereSummary(self.resolutions[0], start)
+        bucket.add(measure.ampere, measure.timestamp)
+        return closed
+
+    def flush(self) -> list[AmpereSummary]:
+        """진행 중인 모든 구간을 닫고 그 요약들을 반환한다."""
+        closed:list[AmpereSummary] = []
+        for level in range(len(self.resolutions)):
+            if self.open[level] is not None:
+                self._close(level, closed, False)
+        # 이후에 같은 구간의 측정값이 이어지더라도 나머지 조각만 포함하게 된다.
+        self.first = None
+        return closed
+
+    def _close(self, level:int, closed:list[AmpereSummary], ended:bool) -> None:
+        bucket = self.open[level]
+        self.open[level] = None
+        bucket.complete = ended and self.first <= bucket.bucket_start
+        closed.append(bucket)
+        if level + 1 < len(self.resolutions):
+            resolution = self.resolutions[level + 1]
+            start = pyramid_bucket_start(bucket.bucket_start, resolution)
+            parent = self.open[level + 1]
+            if parent is not None and parent.bucket_start != start:
+                self._close(level + 1, closed, ended)
+                parent = None
+            if parent is None:
+                parent = self.open[level + 1] = AmpereSummary(resolution, start)
+            parent.merge(bucket)
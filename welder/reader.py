@@ -1,18 +1,66 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Generator
+from typing import Generator, Optional
 
 import csv
-from dateutil.parser import parse
-from pyutils.utils import datetime2utc
+from datetime import datetime
 
 from .types import ElectricCurrentMeasure
 
 
+def parse_timestamp(text:str) -> datetime:
+  """ISO 8601 형식은 표준 라이브러리로 처리하고, 그 외의 형식만 dateutil을 사용한다."""
+  try:
+    return datetime.fromisoformat(text)
+  except ValueError:
+    from dateutil.parser import parse
+    return parse(text)
+
+
 def read_measures_from_csv(file:str) -> Generator[ElectricCurrentMeasure,None,None]:
   with open(file, 'r') as f:
     for line in csv.reader(f):
-      ts = parse(line[0])
+      ts = parse_timestamp(line[0])
       ampere = float(line[1])
-      yield ElectricCurrentMeasure(timestamp=ts, ampere=ampere)
\ No newline at end of file
+      yield ElectricCurrentMeasure(timestamp=ts, ampere=ampere)
+
+# 채널 이름이 없는 'ts,value' 형식의 측정값에 사용하는 채널 이름
+DEFAULT_CHANNEL = 'Ampere'
+
+# CSV 파일 형식
+LAYOUT_CHANNEL = 'channel'    # 'ts,channel,value' (예: data/test.csv)
+LAYOUT_VALUE = 'value'        # 'ts,value[,...]' (예: data/fasten.csv의 'ts,value,state')
+LAYOUTS = (LAYOUT_CHANNEL, LAYOUT_VALUE)
+
+def detect_csv_layout(row:list[str]) -> str:
+  """
+  파일의 첫 행으로 형식을 판단한다. 두 번째 열이 숫자이면 채널 이름이 없는 형식으로 보므로,
+  채널 이름이 숫자인 파일은 형식을 직접 지정해야 한다.
+  """
+  try:
+    float(row[1])
+    return LAYOUT_VALUE
+  except ValueError:
+    return LAYOUT_CHANNEL if len(row) >= 3 else LAYOUT_VALUE
+
+def read_channel_rows_from_csv(file:str, default_channel:str=DEFAULT_CHANNEL,
+                               layout:Optional[str]=None) -> Generator[tuple[datetime,str,float],None,None]:
+  """
+  'ts,channel,value' 또는 'ts,value[,...]' 형식의 CSV 파일에서 (시각, 채널, 전류) 행들을 읽는다.
+  `layout`을 지정하지 않으면 첫 행으로 파일 전체의 형식을 정한다 (`detect_csv_layout()`).
+  같은 시각의 여러 채널 값은 `welder.channels.ChannelFrame`으로 묶는다.
+  """
+  if layout is not None and layout not in LAYOUTS:
+    raise ValueError(f'unknown csv layout: {layout}')
+  with open(file, 'r') as f:
+    for line in csv.reader(f):
+      if not line:
+        continue
+      if layout is None:
+        layout = detect_csv_layout(line)
+      ts = parse_timestamp(line[0])
+      if layout == LAYOUT_CHANNEL:
+        yield ts, line[1], float(line[2])
+      else:
+        yield ts, default_channel, float(line[1])
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional, Sequence
+from dataclasses import dataclass, field
+
+import os
+import json
+import heapq
+from datetime import datetime
+
+import numpy as np
+
+
+PATTERN_LENGTH = 4
+FILE_FORMAT = 1
+DEFAULT_WELDER_TYPE = 'default'
+
+
+def dtw_distance(a:Sequence[float], b:Sequence[float]) -> float:
+    """두 시퀀스 사이의 DTW 거리 (|a_i - b_j| 비용)."""
+    n, m = len(a), len(b)
+    prev = [0.0] + [float('inf')] * m
+    for i in range(1, n + 1):
+        curr = [float('inf')] * (m + 1)
+        ai = a[i-1]
+        for j in range(1, m + 1):
+            curr[j] = abs(ai - b[j-1]) + min(prev[j], curr[j-1], prev[j-1])
+        prev = curr
+    return prev[m]
+
+
+def dtw_matrix(a:np.ndarray, b:np.ndarray, max_cells:int=1 << 24) -> np.ndarray:
+    """
+    (n, L) 패턴들과 (m, L) 패턴들 사이의 DTW 거리 행렬 (n, m)을 계산한다.
+
+    모든 패턴 쌍에 대해 동시에 동적 계획법을 수행하므로 반복문은 L x L 셀에 대해서만 돈다.
+    메모리 사용량을 제한하기 위해 한 번에 계산하는 셀 수가 `max_cells`를 넘지 않도록 `a`를 나눈다.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    out = np.empty((len(a), len(b)))
+    if len(a) == 0 or len(b) == 0:
+        return out
+    n, m = a.shape[1], b.shape[1]
+    chunk = max(1, max_cells // (len(b) * (n + 1) * (m + 1)))
+    for start in range(0, len(a), chunk):
+        block = a[start:start + chunk]
+        cost = np.abs(block[:, None, :, None] - b[None, :, None, :])        # (c, m, n, m)
+        acc = np.full((len(block), len(b), n + 1, m + 1), np.inf)
+        acc[:, :, 0, 0] = 0.0
+        for i in range(1, n + 1):
+            for j in range(1, m + 1):
+                acc[:, :, i, j] = cost[:, :, i-1, j-1] + np.minimum(np.minimum(acc[:, :, i-1, j], acc[:, :, i, j-1]),
+                                                                    acc[:, :, i-1, j-1])
+        out[start:start + chunk] = acc[:, :, n, m]
+    return out
+
+
+def dtw_distances(pattern:Sequence[float], references:np.ndarray) -> np.ndarray:
+    """
+    패턴 하나와 (m, L) 기준 패턴들 각각의 DTW 거리 (m,)를 계산한다.
+
+    `dtw_distance()`와 같은 동적 계획법을 기준 패턴들의 열(column) 배열에 대해 수행하므로,
+    후보가 많을 때 기준 패턴마다 `dtw_distance()`를 호출하는 것보다 훨씬 빠르다.
+    """
+    columns = list(np.asarray(references, dtype=np.float64).reshape(-1, len(pattern)).T)
+    inf = np.full(len(columns[0]) if columns else 0, np.inf)
+    prev = [np.zeros_like(inf)] + [inf] * len(columns)
+    for ai in pattern:
+        curr = [inf]
+        for j, column in enumerate(columns, start=1):
+            curr.append(np.abs(column - ai) + np.minimum(np.minimum(prev[j], curr[j-1]), prev[j-1]))
+        prev = curr
+    return prev[-1]
+
+
+def lower_bound_key(pattern:Sequence[float]) -> tuple[float,float]:
+    """
+    DTW 하한을 위한 (첫 값, 마지막 값) 투영.
+
+    DTW 경로는 항상 (0,0)과 (n-1,m-1) 셀을 지나므로, 두 패턴의 투영 사이의 L1 거리는
+    DTW 거리의 하한이 된다. L1은 거리 공간(metric)이므로 VP-tree로 색인할 수 있다.
+    """
+    return (float(pattern[0]), float(pattern[-1]))
+
+
+def _l1(p:tuple[float,float], q:tuple[float,float]) -> float:
+    return abs(p[0] - q[0]) + abs(p[1] - q[1])
+
+
+@dataclass(slots=True)
+class _VPNode:
+    index: int = -1                         # vantage point의 인덱스 (리프이면 -1)
+    radius: float = 0.0
+    inside: Optional[_VPNode] = None
+    outside: Optional[_VPNode] = None
+    leaf: Optional[np.ndarray] = None       # 리프에 속한 점들의 인덱스
+
+
+class VPTree:
+    """
+    (첫 값, 마지막 값) 투영에 대한 L1 VP-tree.
+
+    점이 `leaf_size`개 이하인 부분 트리는 인덱스 배열(리프) 하나로 저장하고 리프 안의 거리는
+    numpy로 한 번에 계산하므로, 질의 반경 안에 많은 점이 들어도 파이썬으로 방문하는 노드 수는 적다.
+    """
+    def __init__(self, keys:list[tuple[float,float]], leaf_size:int=128):
+        self.keys = keys
+        self.points = np.asarray(keys, dtype=np.float64).reshape(-1, 2)
+        self.leaf_size = leaf_size
+        self.root = self._build(np.arange(len(keys)))
+
+    def _build(self, indices:np.ndarray) -> Optional[_VPNode]:
+        if len(indices) == 0:
+            return None
+        if len(indices) <= self.leaf_size:
+            return _VPNode(leaf=indices)
+        vp = int(indices[0])
+        rest = indices[1:]
+        dists = self._distances(self.keys[vp], rest)
+        radius = float(np.median(dists))
+        inside = dists <= radius
+        if inside.all():
+            # 같은 거리의 점들이 많아 나눌 수 없으면 리프로 둔다.
+            return _VPNode(leaf=indices)
+        return _VPNode(index=vp, radius=radius, inside=self._build(rest[inside]), outside=self._build(rest[~inside]))
+
+    def _distances(self, key:tuple[float,float], indices:np.ndarray) -> np.ndarray:
+        return np.abs(self.points[indices] - np.asarray(key, dtype=np.float64)).sum(axis=1)
+
+    def search(self, key:tuple[float,float]) -> Iterable[tuple[float,int]]:
+        """하한(L1 거리)이 작은 순서대로 (하한, 인덱스)를 생성한다."""
+        heap:list[tuple[float,int,_VPNode]] = []
+        counter = 0
+        if self.root is not None:
+            heap.append((0.0, counter, self.root))
+        points:list[tuple[float,int]] = []
+        while heap or points:
+            # 아직 방문하지 않은 노드들의 하한보다 작은 점들을 먼저 내보낸다.
+            while points and (not heap or points[0][0] <= heap[0][0]):
+                yield heapq.heappop(points)
+            if not heap:
+                continue
+            _, _, node = heapq.heappop(heap)
+            if node.leaf is not None:
+                for d, index in zip(self._distances(key, node.leaf).tolist(), node.leaf.tolist()):
+                    heapq.heappush(points, (d, index))
+                continue
+            d = _l1(key, self.keys[node.index])
+            heapq.heappush(points, (d, node.index))
+            if node.inside is not None:
+                counter += 1
+                heapq.heappush(heap, (max(0.0, d - node.radius), counter, node.inside))
+            if node.outside is not None:
+                counter += 1
+                heapq.heappush(heap, (max(0.0, node.radius - d), counter, node.outside))
+
+    def within(self, key:tuple[float,float], radius:float) -> tuple[np.ndarray,np.ndarray]:
+        """하한(L1 거리)이 `radius` 이하인 모든 점의 (인덱스, 하한) 배열을 반환한다 (순서 없음)."""
+        indices:list[np.ndarray] = []
+        bounds:list[np.ndarray] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.leaf is not None:
+                dists = self._distances(key, node.leaf)
+                matched = dists <= radius
+                indices.append(node.leaf[matched])
+                bounds.append(dists[matched])
+                continue
+            d = _l1(key, self.keys[node.index])
+            if d <= radius:
+                indices.append(np.array([node.index]))
+                bounds.append(np.array([d]))
+            if node.inside is not None and d - node.radius <= radius:
+                stack.append(node.inside)
+            if node.outside is not None and node.radius - d <= radius:
+                stack.append(node.outside)
+        if not indices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(indices), np.concatenate(bounds)
+
+
+@dataclass(slots=True)
+class ReferenceSet:
+    """한 용접기 유형에 대한 기준 패턴 집합과 그 색인."""
+    references: np.ndarray
+    source_count: int = 0
+    tree: VPTree = field(init=False)
+    rows: list[list[float]] = field(init=False)
+
+    def __post_init__(self):
+        self.references = np.asarray(self.references, dtype=np.float64).reshape(-1, PATTERN_LENGTH)
+        self.tree = VPTree([lower_bound_key(ref) for ref in self.references])
+        # DTW 계산은 numpy 스칼라보다 파이썬 float에서 훨씬 빠르다.
+        self.rows = self.references.tolist()
+
+    def __len__(self) -> int:
+        return len(self.references)
+
+    def nearest(self, pattern:np.ndarray) -> tuple[float,int]:
+        """DTW 거리가 가장 작은 기준 패턴의 (거리, 인덱스)를 반환한다."""
+        pattern = np.asarray(pattern, dtype=np.float64).tolist()
+        key = lower_bound_key(pattern)
+        # 하한이 가장 작은 기준 패턴과의 거리를 반경으로 하여, 그 안의 후보들 중에서 찾는다.
+        first = next(iter(self.tree.search(key)), None)
+        if first is None:
+            return float('inf'), -1
+        best, best_index = dtw_distance(pattern, self.rows[first[1]]), first[1]
+        indices, bounds = self.tree.within(key, best)
+        if len(indices) > 16:
+            dists = dtw_distances(pattern, self.references[indices])
+            i = int(np.argmin(dists))
+            if dists[i] < best:
+                best, best_index = float(dists[i]), int(indices[i])
+            return best, best_index
+        for lb, index in sorted(zip(bounds.tolist(), indices.tolist())):
+            if lb >= best:
+                break
+            d = dtw_distance(pattern, self.rows[index])
+            if d < best:
+                best, best_index = d, index
+        return best, best_index
+
+    def any_within(self, pattern:np.ndarray, threshold:float) -> bool:
+        """DTW 거리가 `threshold` 이하인 기준 패턴이 존재하는지 확인한다."""
+        pattern = np.asarray(pattern, dtype=np.float64).tolist()
+        key = lower_bound_key(pattern)
+        # 하한이 작은 순서대로 몇 개를 먼저 확인하고(대부분 여기서 결정된다), 결정되지 않으면
+        # 하한이 `threshold` 이하인 나머지 후보들의 DTW 거리를 한 번에 계산한다.
+        for count, (lb, index) in enumerate(self.tree.search(key)):
+            if lb > threshold:
+                return False
+            if dtw_distance(pattern, self.rows[index]) <= threshold:
+                return True
+            if count >= 16:
+                break
+        else:
+            return False
+        indices, _ = self.tree.within(key, threshold)
+        return bool((dtw_distances(pattern, self.references[indices]) <= threshold).any())
+
+
+class ReferenceLibrary:
+    """
+    용접기 유형별 기준 패턴 라이브러리.
+
+    기준 패턴은 양품으로 분류된 파형들의 4-point 패턴을 k-medoids로 군집화하여 만들며,
+    버전 정보와 함께 JSON 파일로 저장된다.
+    """
+    def __init__(self, sets:Optional[dict[str,ReferenceSet]]=None, version:int=0,
+                 created:Optional[datetime]=None):
+        self.sets:dict[str,ReferenceSet] = sets if sets is not None else {}
+        self.version = version
+        self.created = created if created is not None else datetime.now()
+
+    def __getitem__(self, welder_type:str) -> ReferenceSet:
+        return self.sets[welder_type]
+
+    def __contains__(self, welder_type:str) -> bool:
+        return welder_type in self.sets
+
+    def welder_types(self) -> list[str]:
+        return list(self.sets.keys())
+
+    def set_references(self, welder_type:str, references:np.ndarray, source_count:int=0) -> None:
+        self.sets[welder_type] = ReferenceSet(references=references, source_count=source_count)
+        self.version += 1
+        self.created = datetime.now()
+
+    def learn(self, welder_type:str, good_patterns:np.ndarray, k:int=10) -> ReferenceSet:
+        """양품 패턴들로부터 `k`개의 medoid를 구하여 해당 유형의 기준 패턴으로 설정한다."""
+        good_patterns = np.asarray(good_patterns, dtype=np.float64).reshape(-1, PATTERN_LENGTH)
+        medoids = k_medoids(good_patterns, k)
+        self.set_references(welder_type, good_patterns[medoids], source_count=len(good_patterns))
+        return self.sets[welder_type]
+
+    def nearest(self, pattern:np.ndarray, welder_type:str=DEFAULT_WELDER_TYPE) -> tuple[float,int]:
+        return self.sets[welder_type].nearest(np.asarray(pattern, dtype=np.float64))
+
+    def to_dict(self) -> dict[str,Any]:
+        return {
+            'format': FILE_FORMAT,
+            'version': self.version,
+            'created': self.created.isoformat(),
+            'libraries': {
+                welder_type: { 'source_count': refs.source_count, 'references': refs.references.tolist() }
+                    for welder_type, refs in self.sets.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data:dict[str,Any]) -> ReferenceLibrary:
+        if data.get('format') != FILE_FORMAT:
+            raise ValueError(f"unsupported reference library format: {data.get('format')}")
+        sets = { welder_type: ReferenceSet(references=np.array(lib['references']),
+                                           source_count=int(lib.get('source_count', 0)))
+                    for welder_type, lib in data['libraries'].items() }
+        return cls(sets=sets, version=int(data['version']), created=datetime.fromisoformat(data['created']))
+
+    def save(self, path:str) -> None:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path:str) -> ReferenceLibrary:
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def k_medoids(patterns:np.ndarray, k:int, max_iter:int=50) -> np.ndarray:
+    """
+    DTW 거리를 사용하는 k-medoids 군집화. medoid들의 인덱스를 반환한다.
+
+    초기 medoid는 전체 medoid에서 시작하여 가장 먼 패턴을 차례로 선택(farthest-first)하므로
+    결과가 재현 가능하다.
+    """
+    n = len(patterns)
+    if n <= k:
+        return np.arange(n)
+    dist = dtw_matrix(patterns, patterns)
+
+    medoids = [int(np.argmin(dist.sum(axis=1)))]
+    nearest = dist[medoids[0]].copy()
+    while len(medoids) < k:
+        candidate = int(np.argmax(nearest))
+        medoids.append(candidate)
+        nearest = np.minimum(nearest, dist[candidate])
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        labels = np.argmin(dist[:, medoids], axis=1)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(labels == c)
+            if len(members) > 0:
+                costs = dist[np.ix_(members, members)].sum(axis=1)
+                updated[c] = members[np.argmin(costs)]
+        if np.array_equal(np.sort(updated), np.sort(medoids)):
+            break
+        medoids = updated
+    return medoids
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional
+from dataclasses import dataclass, field
+
+import math
+import time
+import logging
+from datetime import datetime
+
+from .types import ElectricCurrentMeasure
+from .sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+
+# 한 tick에 함께 방출되는 (스트림 키, 측정값) 목록
+ReplayBatch = list[tuple[Any, ElectricCurrentMeasure]]
+
+
+@dataclass(slots=True)
+class ReplayStats:
+    """재생 결과 통계. 지연(lateness)은 예정 시각 대비 실제 방출 시각의 차이(ms)이다."""
+    emitted: int = 0
+    elapsed: float = 0.0                # 재생 시작 이후 경과 시간(초)
+    scheduled: float = 0.0              # 마지막으로 방출된 측정값의 예정 시각(초)
+    batches: int = 0
+    lateness: QuantileSketch = field(default_factory=QuantileSketch)
+
+    @property
+    def target_rate(self) -> float:
+        """일정대로라면 달성했어야 할 초당 방출 수."""
+        return self.emitted / self.scheduled if self.scheduled > 0 else 0.0
+
+    @property
+    def actual_rate(self) -> float:
+        """실제 초당 방출 수."""
+        return self.emitted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        lateness = ', '.join(f'{k}={v:.1f}ms' for k, v in self.lateness.quantiles().items() if v is not None)
+        return (f'ReplayStats(emitted={self.emitted}, batches={self.batches}, '
+                f'rate={self.actual_rate:.1f}/{self.target_rate:.1f} per sec, lateness=[{lateness}])')
+
+
+class _Stream:
+    __slots__ = ('key', 'measures', 'interval', 'pending', 'index', 'due', 'due_tick')
+
+    def __init__(self, key:Any, measures:Iterator[ElectricCurrentMeasure], interval:Optional[float]):
+        self.key = key
+        self.measures = measures
+        self.interval = interval
+        self.pending:Optional[ElectricCurrentMeasure] = None
+        self.index = 0
+        self.due = 0.0
+        self.due_tick = 0
+
+
+class ReplayScheduler:
+    """
+    단조 시계(monotonic clock)와 하나의 timer wheel로 여러 측정값 스트림을 함께 재생한다.
+
+    각 측정값의 예정 시각은 재생 시작 시각을 기준으로 한 절대 일정이다. 원래 시각으로 재생하는
+    스트림은 (측정 시각 - 전체 스트림의 가장 이른 측정 시각) / `speed`에, 간격을 지정한
+    스트림은 k * `interval`에 방출되므로, 처리 지연이 있어도 오차가 누적되지 않는다.
+
+    예정 시각은 `tick` 단위로 올림되어 wheel의 slot에 등록되며, 스트림마다 다음 측정값 하나만
+    등록해 둔다. 같은 tick에 예정된 측정값들은 한 묶음(`ReplayBatch`)으로 방출되고, 재생이
+    늦어진 경우에는 현재 시각까지 밀린 측정값들을 한 번에 방출하여 일정을 따라잡는다.
+    """
+    def __init__(self, speed:float=1.0, tick:float=0.005, wheel_size:int=1024,
+                 clock:Callable[[],float]=time.monotonic, sleep:Callable[[float],None]=time.sleep):
+        if speed <= 0:
+            raise ValueError(f'invalid replay speed: {speed}')
+        self.speed = speed
+        self.tick = tick
+        self.wheel:list[list[_Stream]] = [[] for _ in range(wheel_size)]
+        self.clock = clock
+        self.sleep = sleep
+        self.streams:list[_Stream] = []
+        self.origin:Optional[datetime] = None
+        self.start:Optional[float] = None
+        self.stats = ReplayStats()
+
+    def add_stream(self, key:Any, measures:Iterable[ElectricCurrentMeasure], interval:Optional[float]=None) -> None:
+        """
+        재생할 스트림을 추가한다.
+
+        `interval`(초)을 지정하면 측정 시각과 무관하게 그 간격으로, 지정하지 않으면 원래
+        측정 시각의 간격을 `speed`로 나눈 간격으로 재생한다.
+        """
+        if self.start is not None:
+            raise ValueError('cannot add a stream after replay has started')
+        self.streams.append(_Stream(key, iter(measures), interval))
+
+    def __iter__(self) -> Generator[ReplayBatch,None,None]:
+        return self.run()
+
+    def run(self, report_interval:Optional[float]=None) -> Generator[ReplayBatch,None,None]:
+        """
+        일정에 따라 측정값 묶음을 방출한다. `report_interval`(초)을 지정하면 그 주기로
+        재생 통계를 로그로 남긴다.
+        """
+        streams = [s for s in self.streams if self._advance(s)]
+        origins = [s.pending.timestamp for s in streams if s.interval is None]
+        self.origin = min(origins) if origins else None
+        self.start = self.clock()
+        for s in streams:
+            self._schedule(s)
+            self.wheel[s.due_tick % len(self.wheel)].append(s)
+        active = len(streams)
+
+        size = len(self.wheel)
+        current = 0                 # 다음에 처리할 tick
+        next_report = report_interval
+        while active > 0:
+            now = self.clock()
+            elapsed = now - self.start
+            now_tick = int(elapsed / self.tick)
+            if now_tick < current:
+                self.sleep(current * self.tick - elapsed)
+                continue
+
+            # 지난 tick들의 slot을 (최대 wheel 한 바퀴) 확인하여 예정 시각이 된 스트림들을 방출한다.
+            batch:ReplayBatch = []
+            for t in range(current, current + min(now_tick - current + 1, size)):
+                slot = self.wheel[t % size]
+                if not slot:
+                    continue
+                self.wheel[t % size] = [s for s in slot if s.due_tick > now_tick]
+                for s in slot:
+                    if s.due_tick <= now_tick:
+                        active -= self._fire(s, now_tick, elapsed, batch)
+            current = now_tick + 1
+            self.stats.elapsed = elapsed
+            if batch:
+                self.stats.batches += 1
+                yield batch
+
+            if next_report is not None and elapsed >= next_report:
+                logger.info(f'replay: {self.stats}')
+                next_report = elapsed + report_interval
+        self.stats.elapsed = self.clock() - self.start
+
+    def measures(self) -> Generator[ElectricCurrentMeasure,None,None]:
+        """측정값들을 일정에 따라 하나씩 방출한다 (스트림 키는 버린다)."""
+        for batch in self.run():
+            for _, measure in batch:
+                yield measure
+
+    def _advance(self, s:_Stream) -> bool:
+        s.pending = next(s.measures, None)
+        return s.pending is not None
+
+    def _schedule(self, s:_Stream) -> None:
+        if s.interval is not None:
+            s.due = s.index * s.interval
+        else:
+            s.due = (s.pending.timestamp - self.origin).total_seconds() / self.speed
+        # 예정 시각보다 먼저 방출되지 않도록 tick 단위로 올림한다.
+        s.due_tick = math.ceil(s.due / self.tick - 1e-9)
+        s.index += 1
+
+    def _fire(self, s:_Stream, now_tick:int, elapsed:float, batch:ReplayBatch) -> int:
+        # 스트림의 측정값 중 현재 tick까지 예정된 것들을 모두 방출하고, 다음 측정값을 wheel에 등록한다.
+        # 스트림이 끝나면 1을 반환한다.
+        stats = self.stats
+        while True:
+            batch.append((s.key, s.pending))
+            stats.emitted += 1
+            stats.scheduled = max(stats.scheduled, s.due)
+            stats.lateness.add(max(0.0, elapsed - s.due) * 1000)
+            if not self._advance(s):
+                return 1
+            self._schedule(s)
+            if s.due_tick > now_tick:
+                self.wheel[s.due_tick % len(self.wheel)].append(s)
+                return 0
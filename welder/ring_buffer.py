@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# 레코드 형식: 순번, 시각(UTC epoch milli-second), 전류, 상태, 용접기 식별자
+RECORD_DTYPE = np.dtype([('seq', '<i8'), ('time', '<i8'), ('ampere', '<f4'), ('state', 'i1'), ('welder_id', '<u2')])
+
+# 헤더(int64 x 8): magic, version, capacity, record size, 다음에 기록할 순번, 기록 중인 구간의 끝 순번
+HEADER_MAGIC = 0x5745_4C44_5249_4E47     # 'WELDRING'
+HEADER_VERSION = 1
+HEADER_SLOTS = 8
+_MAGIC, _VERSION, _CAPACITY, _RECORD_SIZE, _WRITE_SEQ, _RESERVE_SEQ = range(6)
+HEADER_SIZE = HEADER_SLOTS * 8
+
+# SharedMemory(track=False)는 Python 3.13부터 지원된다.
+_TRACK_SUPPORTED = sys.version_info >= (3, 13)
+
+
+class RingBufferOverrun(Exception):
+    """읽으려는 레코드가 이미 생산자에 의해 덮어써진 경우 발생한다."""
+    def __init__(self, seq:int, oldest:int):
+        super().__init__(f'ring buffer overrun: seq={seq}, oldest available={oldest}')
+        self.seq = seq
+        self.oldest = oldest
+
+
+class SharedRingBuffer:
+    """
+    `multiprocessing.shared_memory` 위의 단일 생산자/다중 소비자 링 버퍼.
+
+    수집 프로세스(생산자)는 고정 크기 레코드를 기록한 뒤 헤더의 순번을 갱신하며,
+    소비자를 기다리지 않으므로 수집이 검사 때문에 지연되지 않는다. 각 소비자는 자신의
+    읽기 위치를 따로 가지며, 레코드들을 복사 없이 numpy view로 읽는다. 너무 늦은 소비자의
+    레코드는 덮어써질 수 있으므로, 소비자는 `RingReader`를 통해 누락 여부를 확인한다.
+
+    생산자는 기록할 구간의 끝 순번(reserve)을 먼저 알린 뒤 레코드를 기록하고, 기록이 끝나면
+    다음 순번(write)을 갱신한다. 소비자는 write 순번보다 앞선 레코드만 읽으며, 읽은 후에
+    reserve 순번과 비교하여 읽는 동안 덮어써진 레코드를 검출한다 (seqlock과 같은 방식).
+    """
+    def __init__(self, shm:shared_memory.SharedMemory, owner:bool):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_SLOTS,), dtype='<i8', buffer=shm.buf)
+        if self.header[_MAGIC] != HEADER_MAGIC or self.header[_VERSION] != HEADER_VERSION:
+            raise ValueError(f'not a welder ring buffer: {shm.name}')
+        if self.header[_RECORD_SIZE] != RECORD_DTYPE.itemsize:
+            raise ValueError(f'incompatible ring buffer record size: {self.header[_RECORD_SIZE]}')
+        self.capacity = int(self.header[_CAPACITY])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=shm.buf, offset=HEADER_SIZE)
+
+    @classmethod
+    def create(cls, name:Optional[str]=None, capacity:int=1 << 20) -> SharedRingBuffer:
+        """`capacity`개의 레코드를 담는 링 버퍼를 생성한다. 생성한 프로세스가 생산자가 된다."""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        header = np.ndarray((HEADER_SLOTS,), dtype='<i8', buffer=shm.buf)
+        header[:] = 0
+        header[_MAGIC] = HEADER_MAGIC
+        header[_VERSION] = HEADER_VERSION
+        header[_CAPACITY] = capacity
+        header[_RECORD_SIZE] = RECORD_DTYPE.itemsize
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name:str) -> SharedRingBuffer:
+        """다른 프로세스가 생성한 링 버퍼에 연결한다."""
+        if _TRACK_SUPPORTED:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Python 3.13 이전에는 연결한 프로세스가 종료될 때 resource tracker가 공유 메모리를
+            # 삭제하므로, 생성한 프로세스만 삭제하도록 등록을 해제한다.
+            from multiprocessing import resource_tracker
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_seq(self) -> int:
+        """다음에 기록될 레코드의 순번 (지금까지 기록된 레코드 수)."""
+        return int(self.header[_WRITE_SEQ])
+
+    def oldest_seq(self) -> int:
+        """덮어써지지 않았고, 덮어써지는 중도 아닌 가장 오래된 레코드의 순번."""
+        return max(0, int(self.header[_RESERVE_SEQ]) - self.capacity)
+
+    def append(self, time:int, ampere:float, state:int=-1, welder_id:int=0) -> int:
+        """레코드 하나를 기록하고 그 순번을 반환한다."""
+        seq = int(self.header[_WRITE_SEQ])
+        self.header[_RESERVE_SEQ] = seq + 1
+        record = self.records[seq % self.capacity]
+        record['time'] = time
+        record['ampere'] = ampere
+        record['state'] = state
+        record['welder_id'] = welder_id
+        record['seq'] = seq
+        self.header[_WRITE_SEQ] = seq + 1
+        return seq
+
+    def extend(self, times:np.ndarray, amperes:np.ndarray, states:Optional[np.ndarray]=None,
+               welder_ids:np.ndarray|int=0) -> int:
+        """
+        여러 레코드를 한 번에 기록하고, 다음에 기록될 순번을 반환한다.
+
+        링 버퍼 크기보다 많은 레코드가 주어지면 마지막 `capacity`개만 남는다.
+        """
+        count = len(times)
+        seq = int(self.header[_WRITE_SEQ])
+        if count == 0:
+            return seq
+        self.header[_RESERVE_SEQ] = seq + count
+        skip = max(0, count - self.capacity)
+        seqs = np.arange(seq + skip, seq + count, dtype=np.int64)
+        slots = seqs % self.capacity
+        # 순번이 연속이므로 링의 끝에서 나뉘는 최대 두 개의 연속 구간에 기록한다.
+        split = min(len(slots), self.capacity - int(slots[0]))
+        for part, (lo, hi) in ((slice(0, split), (int(slots[0]), int(slots[0]) + split)),
+                               (slice(split, len(slots)), (0, len(slots) - split))):
+            if hi <= lo:
+                continue
+            dest = self.records[lo:hi]
+            src = slice(skip + part.start, skip + part.stop)
+            dest['time'] = times[src]
+            dest['ampere'] = amperes[src]
+            dest['state'] = states[src] if states is not None else -1
+            dest['welder_id'] = welder_ids[src] if isinstance(welder_ids, np.ndarray) else welder_ids
+            dest['seq'] = seqs[part]
+        self.header[_WRITE_SEQ] = seq + count
+        return seq + count
+
+    def view(self, start_seq:int, end_seq:int) -> np.ndarray:
+        """
+        [start_seq, end_seq) 구간의 레코드들을 반환한다.
+
+        구간이 링의 끝에서 나뉘지 않으면 공유 메모리에 대한 view(복사 없음)를,
+        나뉘면 두 구간을 이어붙인 복사본을 반환한다. 구간의 레코드가 이미 덮어써졌으면
+        `RingBufferOverrun`이 발생한다. view는 이후에 덮어써질 수 있으므로 사용 후
+        `check()`로 유효성을 확인해야 한다.
+        """
+        oldest = self.oldest_seq()
+        if start_seq < oldest:
+            raise RingBufferOverrun(start_seq, oldest)
+        end_seq = min(end_seq, self.write_seq)
+        if end_seq <= start_seq:
+            return self.records[0:0]
+        lo, hi = start_seq % self.capacity, (end_seq - 1) % self.capacity + 1
+        if lo < hi:
+            return self.records[lo:hi]
+        return np.concatenate((self.records[lo:], self.records[:hi]))
+
+    def check(self, start_seq:int) -> None:
+        """`start_seq` 이후의 레코드들이 아직 덮어써지지 않았는지 확인한다."""
+        oldest = self.oldest_seq()
+        if start_seq < oldest:
+            raise RingBufferOverrun(start_seq, oldest)
+
+    def reader(self, start_seq:Optional[int]=None) -> RingReader:
+        return RingReader(self, start_seq)
+
+    def close(self) -> None:
+        # numpy view들이 공유 메모리를 참조하고 있으면 닫을 수 없으므로 먼저 해제한다.
+        self.header = None
+        self.records = None
+        self.shm.close()
+        if self.owner:
+            if not _TRACK_SUPPORTED:
+                # 같은 resource tracker를 공유하는 자식 프로세스가 attach()에서 등록을 해제했을 수
+                # 있으므로, 삭제하기 전에 다시 등록한다 (중복 등록은 무시된다).
+                from multiprocessing import resource_tracker
+                resource_tracker.register(self.shm._name, 'shared_memory')
+            self.shm.unlink()
+
+
+class RingReader:
+    """
+    링 버퍼의 한 소비자. 자신의 읽기 위치를 가지며 다른 소비자와 독립적으로 읽는다.
+
+    소비자가 너무 늦어 레코드가 덮어써지면, 남아 있는 가장 오래된 레코드부터 다시 읽고
+    누락된 레코드 수를 `lost`에 누적한다.
+    """
+    def __init__(self, ring:SharedRingBuffer, start_seq:Optional[int]=None):
+        self.ring = ring
+        # 시작 위치를 지정하지 않으면 현재 이후에 기록되는 레코드부터 읽는다.
+        self.next_seq = ring.write_seq if start_seq is None else start_seq
+        self.lost = 0
+
+    def poll(self, max_count:int=4096) -> np.ndarray:
+        """
+        읽지 않은 레코드들을 최대 `max_count`개 반환한다 (없으면 빈 배열).
+
+        반환되는 배열은 항상 공유 메모리에 대한 view이며, 링의 끝에서 나뉘는 경우에는
+        끝까지만 반환하고 나머지는 다음 호출에서 반환한다.
+        """
+        ring = self.ring
+        write_seq = ring.write_seq
+        oldest = ring.oldest_seq()
+        if self.next_seq < oldest:
+            self.lost += oldest - self.next_seq
+            self.next_seq = oldest
+        end_seq = min(write_seq, self.next_seq + max_count)
+        lo = self.next_seq % ring.capacity
+        end_seq = min(end_seq, self.next_seq + ring.capacity - lo)
+        records = ring.records[lo:lo + (end_seq - self.next_seq)]
+        self.next_seq = end_seq
+        return records
+
+    def wait(self, timeout:Optional[float]=None, poll_interval:float=0.001) -> bool:
+        """읽지 않은 레코드가 생길 때까지 기다린다. 시간 내에 생기지 않으면 False를 반환한다."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.ring.write_seq <= self.next_seq:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def validate(self, records:np.ndarray) -> np.ndarray:
+        """
+        `poll()`로 받은 레코드들 중 처리하는 동안 덮어써지지 않은 것들만 반환한다.
+
+        레코드들은 순번이 연속이므로 덮어써진 레코드들은 항상 앞쪽에 있다.
+        """
+        start_seq = self.next_seq - len(records)
+        overwritten = min(len(records), max(0, self.ring.oldest_seq() - start_seq))
+        if overwritten > 0:
+            self.lost += overwritten
+            return records[overwritten:]
+        return records
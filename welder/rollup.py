@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from datetime import datetime, timedelta
+
+from .sketch import QuantileSketch
+
+
+RESOLUTION_MINUTE = 'minute'
+RESOLUTION_HOUR = 'hour'
+RESOLUTION_SHIFT = 'shift'
+RESOLUTIONS = (RESOLUTION_MINUTE, RESOLUTION_HOUR, RESOLUTION_SHIFT)
+
+# 기본 교대 시작 시각 (3교대, 8시간)
+DEFAULT_SHIFT_HOURS = (6, 14, 22)
+
+
+def bucket_start(ts:datetime, resolution:str, shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS) -> datetime:
+    """주어진 시각이 속한 집계 구간의 시작 시각을 반환한다."""
+    if resolution == RESOLUTION_MINUTE:
+        return ts.replace(second=0, microsecond=0)
+    elif resolution == RESOLUTION_HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    elif resolution == RESOLUTION_SHIFT:
+        hours = sorted(shift_hours)
+        day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+        starts = [h for h in hours if h <= ts.hour]
+        if starts:
+            return day.replace(hour=starts[-1])
+        # 첫 교대 시작 이전이면 전날 마지막 교대에 속한다.
+        return (day - timedelta(days=1)).replace(hour=hours[-1])
+    else:
+        raise ValueError(f'unknown rollup resolution: {resolution}')
+
+
+@dataclass(slots=True)
+class DurationStats:
+    """처리/대기 시간(milli-second)에 대한 누적 통계."""
+    count: int = 0
+    sum: int = 0
+    min: Optional[int] = None
+    max: Optional[int] = None
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def add(self, millis:int) -> None:
+        self.count += 1
+        self.sum += millis
+        self.min = millis if self.min is None else min(self.min, millis)
+        self.max = millis if self.max is None else max(self.max, millis)
+        self.sketch.add(millis)
+
+    def merge(self, other:DurationStats) -> DurationStats:
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.sum += other.sum
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def percentile(self, q:float) -> Optional[float]:
+        """q(0~1)에 해당하는 분위수의 근사값을 반환한다."""
+        return self.sketch.quantile(q)
+
+
+@dataclass(slots=True)
+class NozzleRollup:
+    resolution: str
+    BucketStart: datetime
+    QuantityProduced: int = 0
+    DefectVolume: int = 0
+    ProvisionalDefectVolume: int = 0    # 재검사를 기다리는 저비용 방식의 불량 판정 수 (DefectVolume과 별도)
+    ProcessingTime: DurationStats = field(default_factory=DurationStats)
+    WaitingTime: DurationStats = field(default_factory=DurationStats)
+
+    @property
+    def DefectRate(self) -> float:
+        return self.DefectVolume / self.QuantityProduced if self.QuantityProduced > 0 else 0.0
+
+    def add(self, processing_millis:int, waiting_millis:Optional[int], is_defect:bool,
+            provisional:bool=False) -> None:
+        self.QuantityProduced += 1
+        if is_defect:
+            if provisional:
+                self.ProvisionalDefectVolume += 1
+            else:
+                self.DefectVolume += 1
+        self.ProcessingTime.add(processing_millis)
+        if waiting_millis is not None:
+            self.WaitingTime.add(waiting_millis)
+
+    def merge(self, other:NozzleRollup) -> NozzleRollup:
+        """다른 용접기 혹은 다른 구간의 집계를 병합한다."""
+        self.QuantityProduced += other.QuantityProduced
+        self.DefectVolume += other.DefectVolume
+        self.ProvisionalDefectVolume += other.ProvisionalDefectVolume
+        self.ProcessingTime.merge(other.ProcessingTime)
+        self.WaitingTime.merge(other.WaitingTime)
+        return self
+
+    def __repr__(self):
+        p50 = self.ProcessingTime.percentile(0.5)
+        p50 = f'{p50:.0f}ms' if p50 is not None else '-'
+        return f"NozzleRollup: {self.resolution}@{self.BucketStart.isoformat()}, " \
+               f"count={self.QuantityProduced}, defects={self.DefectVolume}, " \
+               f"provisional_defects={self.ProvisionalDefectVolume}, p50(processing)={p50}"
+
+
+def to_millis(delta:timedelta) -> int:
+    return round(delta.total_seconds() * 1000)
+
+
+class NozzleProductionRollup:
+    """
+    노즐 생산 결과를 분/시간/교대 단위로 점진적으로 집계한다.
+
+    각 해상도별로 최근 `retention`개의 구간만 메모리에 유지하며,
+    구간 통계는 노즐이 추가될 때마다 상수 시간(분위수는 고정 크기 스케치)으로 갱신된다.
+    """
+    def __init__(self, shift_hours:tuple[int,...]=DEFAULT_SHIFT_HOURS, retention:int=8):
+        self.shift_hours = shift_hours
+        self.retention = retention
+        self.buckets:dict[str,OrderedDict[datetime,NozzleRollup]] = { res: OrderedDict() for res in RESOLUTIONS }
+
+    def add(self, timestamp:datetime, processing_time:timedelta, waiting_time:Optional[timedelta],
+            is_defect:bool, provisional:bool=False) -> list[NozzleRollup]:
+        """
+        완료된 노즐 하나를 모든 해상도의 집계에 반영하고, 갱신된 구간들을 반환한다.
+        `provisional`이면 불량 판정을 `ProvisionalDefectVolume`에만 센다.
+        """
+        processing_millis = to_millis(processing_time)
+        waiting_millis = to_millis(waiting_time) if waiting_time is not None else None
+
+        updated = []
+        for res in RESOLUTIONS:
+            rollup = self._get_or_create(res, bucket_start(timestamp, res, self.shift_hours))
+            rollup.add(processing_millis, waiting_millis, is_defect, provisional)
+            updated.append(rollup)
+        return updated
+
+    def reinspect(self, timestamp:datetime, provisional:bool, verdict:bool) -> list[NozzleRollup]:
+        """
+        잠정 판정을 재검사 결과로 확정한다. 이미 메모리에서 밀려난 구간은 보정하지 않으며,
+        보정된 구간들을 반환한다.
+        """
+        updated = []
+        for res in RESOLUTIONS:
+            rollup = self.get(res, timestamp)
+            if rollup is not None:
+                rollup.ProvisionalDefectVolume -= int(provisional)
+                rollup.DefectVolume += int(verdict)
+                updated.append(rollup)
+        return updated
+
+    def get(self, resolution:str, ts:datetime) -> Optional[NozzleRollup]:
+        return self.buckets[resolution].get(bucket_start(ts, resolution, self.shift_hours))
+
+    def latest(self, resolution:str) -> Optional[NozzleRollup]:
+        buckets = self.buckets[resolution]
+        return next(reversed(buckets.values())) if buckets else None
+
+    def _get_or_create(self, resolution:str, start:datetime) -> NozzleRollup:
+        buckets = self.buckets[resolution]
+        rollup = buckets.get(start)
+        if rollup is None:
+            rollup = NozzleRollup(resolution=resolution, BucketStart=start)
+            buckets[start] = rollup
+            while len(buckets) > self.retention:
+                buckets.popitem(last=False)
+        return rollup
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+from collections import Counter, deque
+from dataclasses import dataclass
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+from .types import ElectricCurrentMeasure, INSPECTION_FULL, INSPECTION_NO_DTW, INSPECTION_WIDTH_ONLY, INSPECTION_MODES
+from .reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+from .features import PEAK_HEIGHT
+from .early_inspection import peak_width, local_peak_max
+from .waveform import inspect_waveform
+from .work_recognizer import STATUS_MIDDLE
+
+logger = logging.getLogger(__name__)
+
+
+def inspect_waveform_in_mode(waveform:list[ElectricCurrentMeasure], mode:str,
+                             library:Optional[ReferenceLibrary]=None, welder_type:str=DEFAULT_WELDER_TYPE,
+                             height:float=PEAK_HEIGHT, peak_floor:float=9.0, width_threshold:float=2.0) -> bool:
+    """
+    주어진 검사 방식으로 파형을 판정한다. `INSPECTION_FULL`은 `inspect_waveform()`으로 판정한다.
+
+    저비용 방식들은 특징 행렬을 만들지 않고 state 2 측정값들로부터 최대 피크의 너비를 직접 계산한다.
+    DTW를 생략하는 경우에는 여기에 최대 전류와 국소 피크 높이 조건만 더하며, 결과는
+    `inspect_features(..., dtw_threshold=None)`과 같다.
+    """
+    if mode == INSPECTION_FULL:
+        return inspect_waveform(waveform, library, welder_type)
+    if mode not in (INSPECTION_NO_DTW, INSPECTION_WIDTH_ONLY):
+        raise ValueError(f'unknown inspection mode: {mode}')
+
+    x = [m.ampere for m in waveform if m.state == STATUS_MIDDLE]
+    if not x:
+        return False
+    xp = max(x)
+    p = x.index(xp)
+    if peak_width(x, p, min(x[:p+1]), min(x[p:])) < width_threshold:
+        return False
+    if mode == INSPECTION_WIDTH_ONLY:
+        return True
+    return xp >= peak_floor and local_peak_max(x) >= height
+
+
+class LoadShedder:
+    """
+    처리 지연에 따라 파형 검사 방식을 선택한다. 처리 지연은 처리 루프가 자신의 조회 일정보다
+    늦어진 시간(`profiling.LoopStats.lag`)이며, 측정값의 시각과 현재 시각의 차이(측정 장비와의
+    시계 차이나 조회 간격이 섞인 값)를 사용하지 않는다.
+
+    지연이 `thresholds[i]`초를 넘으면 `INSPECTION_MODES[i+1]` 이하의 저비용 방식으로 바로 낮추고,
+    지연이 해당 임계값의 `recovery` 배 미만으로 줄어들어야 다시 높은 비용의 방식으로 돌아간다.
+    방식을 결정할 때마다 그 결과를 `decisions`에 집계한다.
+
+    저비용 방식의 판정은 모두 잠정 판정이며, `ReinspectionQueue`에서 전체 검사를 마칠 때까지는
+    확정된 불량 수량에 포함되지 않는다 (`ProductionTracker.on_finished()` 참고).
+    """
+    def __init__(self, thresholds:tuple[float,float]=(3.0, 6.0), recovery:float=0.5):
+        if len(thresholds) != len(INSPECTION_MODES) - 1 or list(thresholds) != sorted(thresholds):
+            raise ValueError(f'invalid load shedding thresholds: {thresholds}')
+        self.thresholds = tuple(thresholds)
+        self.recovery = recovery
+        self.level = 0
+        self.age = 0.0
+        self.decisions:Counter[str] = Counter()
+        self.changes = 0
+
+    @property
+    def mode(self) -> str:
+        return INSPECTION_MODES[self.level]
+
+    def update(self, age:float) -> str:
+        """현재 처리 지연(초)을 반영하여 검사 방식을 결정한다. 처리 루프의 매 반복마다 한 번 호출한다."""
+        self.age = age
+        level = sum(1 for t in self.thresholds if age > t)
+        if level < self.level:
+            # 지연이 충분히 줄어든 경우에만 높은 비용의 방식으로 돌아간다.
+            level = max(level, sum(1 for t in self.thresholds if age >= t * self.recovery))
+        if level != self.level:
+            logger.warning(f"inspection mode changed: {self.mode} -> {INSPECTION_MODES[level]} (age={age:.3f}s)")
+            self.level = level
+            self.changes += 1
+        return self.mode
+
+    def record(self, mode:str) -> None:
+        """파형 하나에 실제로 사용한 검사 방식을 집계한다."""
+        self.decisions[mode] += 1
+
+
+@dataclass(frozen=True, slots=True)
+class Reinspection:
+    """재검사 결과. `provisional`은 저비용 방식으로 내렸던 잠정 판정이다."""
+    timestamp: datetime         # 파형의 마지막 측정값 시각
+    provisional: bool
+    verdict: bool
+
+    @property
+    def changed(self) -> bool:
+        return self.provisional != self.verdict
+
+
+class ReinspectionQueue:
+    """
+    저비용 방식으로 판정한 파형들을 백그라운드 쓰레드에서 전체 검사한다.
+
+    처리 루프의 CPU를 빼앗지 않도록 `throttle()`된 동안에는 `throttled_interval`초에 하나씩만
+    재검사하며 (처리가 계속 밀리더라도 큐가 조금씩 줄어들도록 멈추지는 않는다), 결과는 처리 루프가
+    `drain()`으로 가져가 자신의 쓰레드에서 반영한다. 대기 중인 파형 수는 `max_size`로 제한되며,
+    넘치는 경우 가장 오래된 파형을 버리고 `dropped`에 센다. 버려진 파형의 잠정 판정은 보정되지 않는다.
+    """
+    def __init__(self, inspect:Optional[Callable[[list[ElectricCurrentMeasure]],bool]]=None,
+                 max_size:int=10000, throttled_interval:float=1.0):
+        self.inspect = inspect if inspect is not None \
+                        else lambda waveform: inspect_waveform_in_mode(waveform, INSPECTION_FULL)
+        self.max_size = max_size
+        self.throttled_interval = throttled_interval
+        self.pending:deque[tuple[list[ElectricCurrentMeasure],bool]] = deque()
+        self.results:list[Reinspection] = []
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.throttled = False
+        self.stopped = False
+        self.dropped = 0
+        self.completed = 0
+        self.thread = threading.Thread(target=self._run, name='reinspection', daemon=True)
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def start(self) -> ReinspectionQueue:
+        self.thread.start()
+        return self
+
+    def stop(self, timeout:Optional[float]=None) -> None:
+        with self.lock:
+            self.stopped = True
+            self.not_empty.notify_all()
+        self.thread.join(timeout)
+
+    def throttle(self) -> None:
+        with self.lock:
+            self.throttled = True
+
+    def resume(self) -> None:
+        with self.lock:
+            if self.throttled:
+                self.throttled = False
+                self.not_empty.notify_all()
+
+    def submit(self, waveform:list[ElectricCurrentMeasure], provisional:bool) -> None:
+        with self.lock:
+            if len(self.pending) >= self.max_size:
+                dropped, _ = self.pending.popleft()
+                self.dropped += 1
+                # 밀리는 동안 매번 기록하지 않도록 1, 2, 4, ...번째로 버릴 때만 기록한다.
+                if self.dropped & (self.dropped - 1) == 0:
+                    logger.warning(f"re-inspection queue is full: dropped the waveform at {dropped[-1].timestamp} "
+                                   f"without re-inspection (total {self.dropped})")
+            self.pending.append((waveform, provisional))
+            self.not_empty.notify()
+
+    def drain(self) -> list[Reinspection]:
+        """완료된 재검사 결과들을 반환한다."""
+        with self.lock:
+            results, self.results = self.results, []
+        return results
+
+    def snapshot(self) -> dict[str,Any]:
+        """
+        아직 반영되지 않은 재검사들 (체크포인트용): 재검사 대기 중이거나 진행 중인 (파형, 잠정 판정)
+        목록과, 재검사를 마쳤지만 `drain()`으로 가져가지 않은 결과 목록.
+        """
+        with self.lock:
+            return { 'pending': list(self.pending), 'results': list(self.results) }
+
+    def restore(self, snapshot:dict[str,Any]) -> None:
+        """`snapshot()`으로 저장한 재검사 대기 목록과 결과를 복원한다."""
+        for waveform, provisional in snapshot['pending']:
+            self.submit(waveform, provisional)
+        with self.lock:
+            self.results.extend(snapshot['results'])
+
+    def _run(self) -> None:
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopped:
+                    self.not_empty.wait()
+                # 처리가 밀리는 동안에는 천천히 재검사한다. resume()되면 바로 이어서 진행한다.
+                deadline = time.monotonic() + self.throttled_interval
+                while self.throttled and not self.stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.not_empty.wait(remaining)
+                if self.stopped:
+                    return
+                waveform, provisional = self.pending[0]
+            try:
+                verdict = self.inspect(waveform)
+            except Exception as e:
+                logger.error(f"failed to re-inspect waveform at {waveform[-1].timestamp}: {e}")
+                verdict = provisional
+            with self.lock:
+                # 처리하는 동안 넘쳐서 버려진 경우가 아니면 대기 목록에서 제거한다.
+                if self.pending and self.pending[0][0] is waveform:
+                    self.pending.popleft()
+                self.results.append(Reinspection(waveform[-1].timestamp, provisional, verdict))
+                self.completed += 1
+
+    def stats(self) -> dict[str,Any]:
+        return { 'pending': len(self.pending), 'completed': self.completed, 'dropped': self.dropped }
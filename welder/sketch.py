@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+
+import math
+import bisect
+import random
+
+
+class QuantileSketch:
+    """
+    KLL 방식의 스트리밍 분위수 스케치.
+
+    레벨 h에 저장된 값은 2^h개의 원본 값을 대표한다. 각 레벨의 용량은 상위 레벨로
+    갈수록 c(=2/3)의 비율로 커지며, 용량을 넘으면 정렬 후 절반만 다음 레벨로 올린다.
+    따라서 메모리 사용량은 입력 개수와 무관하게 약 k/(1-c)개로 제한되며,
+    같은 k를 사용하는 스케치끼리는 레벨별로 이어붙여 병합할 수 있다.
+    압축할 때마다 홀/짝 중 어느 쪽을 올릴지 무작위로 정하므로 순위 오차가 한쪽으로 치우치지 않는다.
+    결과를 재현해야 하는 경우(테스트 등)에는 `seed`를 지정한다.
+    """
+    C = 2.0 / 3.0
+
+    def __init__(self, k:int=200, seed:Optional[int]=None):
+        self.k = k
+        self.count = 0
+        self.min:Optional[float] = None
+        self.max:Optional[float] = None
+        self.levels:list[list[float]] = [[]]
+        self.rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def capacity(self, height:int) -> int:
+        depth = len(self.levels) - height - 1
+        return max(2, int(math.ceil(self.k * (self.C ** depth))))
+
+    def add(self, value:float) -> None:
+        value = float(value)
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.levels[0].append(value)
+        if len(self.levels[0]) >= self.capacity(0):
+            self._compress()
+
+    def update(self, values:Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other:QuantileSketch) -> QuantileSketch:
+        """다른 스케치의 내용을 이 스케치에 병합한다."""
+        if other.count == 0:
+            return self
+        if other.k != self.k:
+            raise ValueError(f'cannot merge sketches of different k: {self.k} != {other.k}')
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q:float) -> Optional[float]:
+        """q(0~1) 분위수의 근사값을 반환한다."""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        items = sorted((v, 1 << h) for h, level in enumerate(self.levels) for v in level)
+        total = sum(w for _, w in items)
+        target = q * total
+        cum = 0
+        for value, weight in items:
+            cum += weight
+            if cum >= target:
+                return value
+        return self.max
+
+    def quantiles(self, qs:Iterable[float]=(0.5, 0.95, 0.99)) -> dict[str,Optional[float]]:
+        return { f'p{round(q * 100)}': self.quantile(q) for q in qs }
+
+    def rank(self, value:float) -> float:
+        """주어진 값 이하인 원본 값의 비율(CDF)을 근사한다."""
+        if self.count == 0:
+            return 0.0
+        weight = 0
+        for h, level in enumerate(self.levels):
+            weight += (1 << h) * bisect.bisect_right(sorted(level), value)
+        total = sum((1 << h) * len(level) for h, level in enumerate(self.levels))
+        return weight / total
+
+    def to_dict(self) -> dict[str,Any]:
+        """JSON으로 직렬화 가능한 dict 형태로 변환한다 (트윈 파라미터나 DB 저장용)."""
+        return {
+            'k': self.k,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'levels': [list(level) for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data:dict[str,Any]) -> QuantileSketch:
+        sketch = cls(k=int(data['k']))
+        sketch.count = int(data['count'])
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [[float(v) for v in level] for level in data['levels']]
+        return sketch
+
+    def __repr__(self):
+        qs = ', '.join(f'{k}={v:.1f}' for k, v in self.quantiles().items() if v is not None)
+        return f'QuantileSketch(count={self.count}, {qs})'
+
+    def _grow(self) -> None:
+        self.levels.append([])
+
+    def _compress(self) -> None:
+        for h in range(len(self.levels)):
+            level = self.levels[h]
+            if len(level) < self.capacity(h):
+                continue
+            if h + 1 >= len(self.levels):
+                self._grow()
+
+            level.sort()
+            # 홀수 개이면 마지막 원소는 현재 레벨에 남긴다.
+            leftover = [level.pop()] if len(level) % 2 else []
+            offset = self.rng.getrandbits(1)
+            self.levels[h + 1].extend(level[offset::2])
+            self.levels[h] = leftover
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+import os
+import mmap
+import json
+import pickle
+import struct
+import zlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 레코드 헤더: (payload 길이, payload의 crc32)
+HEADER = struct.Struct('<II')
+SEGMENT_SUFFIX = '.seg'
+CURSOR_FILE = 'cursor.json'
+
+SpoolEvent = tuple[str, Any]
+
+
+class Segment:
+    """미리 할당된 고정 크기 파일을 mmap한 spool 세그먼트."""
+    def __init__(self, path:str, seqno:int, size:int):
+        self.path = path
+        self.seqno = seqno
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.truncate(size)
+        self.file = open(path, 'r+b')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.write_offset = self._recover_write_offset()
+
+    def _recover_write_offset(self) -> int:
+        # 길이가 0이거나 crc가 맞지 않는 레코드(기록 도중 중단된 레코드)에서 끝난 것으로 간주한다.
+        offset = 0
+        while True:
+            record = self.read(offset)
+            if record is None:
+                return offset
+            offset = record[1]
+
+    def append(self, payload:bytes) -> bool:
+        end = self.write_offset + HEADER.size + len(payload)
+        if end + HEADER.size > self.size:
+            return False
+        # payload를 먼저 기록한 뒤 헤더를 기록하여, 중단된 레코드는 항상 무효가 되도록 한다.
+        self.map[self.write_offset + HEADER.size:end] = payload
+        self.map[self.write_offset:self.write_offset + HEADER.size] = HEADER.pack(len(payload), zlib.crc32(payload))
+        self.write_offset = end
+        return True
+
+    def read(self, offset:int) -> Optional[tuple[bytes,int]]:
+        if offset + HEADER.size > self.size:
+            return None
+        length, crc = HEADER.unpack_from(self.map, offset)
+        end = offset + HEADER.size + length
+        if length == 0 or end > self.size:
+            return None
+        payload = self.map[offset + HEADER.size:end]
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload, end
+
+    def flush(self) -> None:
+        self.map.flush()
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+
+class Spool:
+    """
+    세그먼트 단위의 append-only 로컬 spool (write-ahead log).
+
+    데이터베이스나 MDT 서버로 보낼 이벤트를 먼저 spool에 기록해두고, 별도의
+    `SpoolDrainer`가 이를 일괄로 재생한다. 재생이 완료된 위치(cursor)는 파일에
+    원자적으로 기록되므로 프로세스가 중단되더라도 그 위치부터 다시 재생된다.
+    전체 디스크 사용량은 `segment_size * max_segments`로 제한되며, 이를 넘으면
+    가장 오래된 세그먼트부터 버린다.
+    """
+    def __init__(self, directory:str, segment_size:int=16*1024*1024, max_segments:int=64):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.dropped_segments = 0
+
+        os.makedirs(directory, exist_ok=True)
+        seqnos = sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                        if name.endswith(SEGMENT_SUFFIX))
+        if not seqnos:
+            seqnos = [0]
+        self.segments:list[Segment] = [self._open_segment(seqno) for seqno in seqnos]
+        self.cursor = self._load_cursor()
+
+    @property
+    def head(self) -> Segment:
+        return self.segments[-1]
+
+    def append(self, kind:str, payload:Any) -> None:
+        data = pickle.dumps((kind, payload), protocol=pickle.HIGHEST_PROTOCOL)
+        if HEADER.size * 2 + len(data) > self.segment_size:
+            raise ValueError(f'spool event is too large: {len(data)} bytes')
+        with self.lock:
+            if not self.head.append(data):
+                self._roll()
+                self.head.append(data)
+            self.not_empty.notify_all()
+
+    def read_batch(self, max_count:int) -> tuple[list[SpoolEvent], tuple[int,int]]:
+        """현재 cursor 위치부터 최대 `max_count`개의 이벤트와 다음 위치를 반환한다."""
+        events:list[SpoolEvent] = []
+        with self.lock:
+            seqno, offset = self.cursor
+            index = self._segment_index(seqno)
+            if index < len(self.segments) and self.segments[index].seqno != seqno:
+                # cursor가 가리키던 세그먼트가 이미 삭제된 경우에는 다음 세그먼트의 처음부터 읽는다.
+                seqno, offset = self.segments[index].seqno, 0
+            while len(events) < max_count and index < len(self.segments):
+                segment = self.segments[index]
+                record = segment.read(offset) if offset < segment.write_offset else None
+                if record is None:
+                    if index + 1 >= len(self.segments):
+                        break
+                    index += 1
+                    seqno, offset = self.segments[index].seqno, 0
+                    continue
+                payload, offset = record
+                events.append(pickle.loads(payload))
+        return events, (seqno, offset)
+
+    def commit(self, position:tuple[int,int]) -> None:
+        """`position` 이전의 이벤트가 모두 처리되었음을 기록하고, 다 읽은 세그먼트를 삭제한다."""
+        with self.lock:
+            for segment in self.segments:
+                segment.flush()
+            if position[0] < self.segments[0].seqno:
+                # 묶음을 읽은 뒤 spool이 가득 차서 해당 세그먼트가 버려진 경우, `_roll()`이 옮겨둔
+                # cursor를 삭제된 세그먼트로 되돌리지 않는다.
+                return
+            self.cursor = position
+            self._save_cursor()
+            while len(self.segments) > 1 and self.segments[0].seqno < position[0]:
+                self._remove_segment(self.segments.pop(0))
+
+    def wait(self, timeout:float) -> None:
+        with self.lock:
+            seqno, offset = self.cursor
+            if seqno == self.head.seqno and offset >= self.head.write_offset:
+                self.not_empty.wait(timeout)
+
+    def pending_bytes(self) -> int:
+        with self.lock:
+            seqno, offset = self.cursor
+            return sum(s.write_offset for s in self.segments if s.seqno >= seqno) - offset
+
+    def close(self) -> None:
+        with self.lock:
+            for segment in self.segments:
+                segment.flush()
+                segment.close()
+            self.segments = []
+
+    def _roll(self) -> None:
+        self.head.flush()
+        self.segments.append(self._open_segment(self.head.seqno + 1))
+        while len(self.segments) > self.max_segments:
+            # 디스크 사용량 상한을 넘으면 가장 오래된 세그먼트를 버린다.
+            oldest = self.segments.pop(0)
+            self.dropped_segments += 1
+            logger.warning(f'spool is full: dropping segment {oldest.path}')
+            if self.cursor[0] <= oldest.seqno:
+                self.cursor = (self.segments[0].seqno, 0)
+                self._save_cursor()
+            self._remove_segment(oldest)
+
+    def _segment_index(self, seqno:int) -> int:
+        for index, segment in enumerate(self.segments):
+            if segment.seqno >= seqno:
+                return index
+        return len(self.segments)
+
+    def _open_segment(self, seqno:int) -> Segment:
+        path = os.path.join(self.directory, f'{seqno:012d}{SEGMENT_SUFFIX}')
+        return Segment(path, seqno, self.segment_size)
+
+    def _remove_segment(self, segment:Segment) -> None:
+        segment.close()
+        os.remove(segment.path)
+
+    def _load_cursor(self) -> tuple[int,int]:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                cursor = json.load(f)
+            position = (int(cursor['segment']), int(cursor['offset']))
+            if position[0] >= self.segments[0].seqno:
+                return position
+        return (self.segments[0].seqno, 0)
+
+    def _save_cursor(self) -> None:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({ 'segment': self.cursor[0], 'offset': self.cursor[1] }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class SpoolDrainer:
+    """
+    spool에 기록된 이벤트를 백그라운드에서 일괄로 재생하는 쓰레드.
+
+    이벤트는 종류(kind)별로 등록된 handler에 전달되며, 순서를 유지하기 위해 같은 종류가
+    연속된 구간 단위로 묶어 전달한다. handler가 예외를 발생시키면 cursor를 진행시키지 않고
+    재시도 간격을 늘려가며 다시 시도한다.
+    """
+    def __init__(self, spool:Spool, handlers:dict[str,Callable[[list[Any]],None]],
+                 batch_size:int=1000, min_retry_interval:float=0.5, max_retry_interval:float=30.0):
+        self.spool = spool
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.min_retry_interval = min_retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='spool-drainer', daemon=True)
+
+    def start(self) -> SpoolDrainer:
+        self.thread.start()
+        return self
+
+    def stop(self, timeout:Optional[float]=None) -> None:
+        self.stopped.set()
+        with self.spool.lock:
+            self.spool.not_empty.notify_all()
+        self.thread.join(timeout)
+
+    def drain_once(self) -> int:
+        events, position = self.spool.read_batch(self.batch_size)
+        if not events:
+            return 0
+        for kind, payloads in group_events(events):
+            handler = self.handlers.get(kind)
+            if handler is None:
+                logger.warning(f'no spool handler for event kind: {kind}, dropping {len(payloads)} events')
+                continue
+            handler(payloads)
+        self.spool.commit(position)
+        return len(events)
+
+    def _run(self) -> None:
+        retry_interval = self.min_retry_interval
+        while not self.stopped.is_set():
+            try:
+                if self.drain_once() == 0:
+                    self.spool.wait(1.0)
+                retry_interval = self.min_retry_interval
+            except Exception as e:
+                logger.error(f'failed to drain spool (retry in {retry_interval:.1f}s): {e}')
+                self.stopped.wait(retry_interval)
+                retry_interval = min(retry_interval * 2, self.max_retry_interval)
+
+
+def group_events(events:list[SpoolEvent]) -> list[tuple[str,list[Any]]]:
+    """연속된 같은 종류의 이벤트를 하나의 묶음으로 만든다."""
+    groups:list[tuple[str,list[Any]]] = []
+    for kind, payload in events:
+        if groups and groups[-1][0] == kind:
+            groups[-1][1].append(payload)
+        else:
+            groups.append((kind, [payload]))
+    return groups
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from .features import PEAK_HEIGHT, feature
+
+
+# 판정 임계값 이름과 (특징 이름, 비교 방향). 'ge'는 특징 값이 임계값 이상, 'le'는 이하여야 통과한다.
+# (inspect_features()의 인자 이름과 같다.)
+INSPECTION_THRESHOLDS = {
+    'height': ('peak_max_height', 'ge'),
+    'peak_floor': ('s2_max', 'ge'),
+    'width_threshold': ('peak_width', 'ge'),
+    'dtw_threshold': ('dtw_min', 'le'),
+}
+DEFAULT_INSPECTION_THRESHOLDS = { 'height': PEAK_HEIGHT, 'peak_floor': 9.0, 'width_threshold': 2.0,
+                                  'dtw_threshold': 2.0 }
+
+
+def _pass_counts(values:np.ndarray, thresholds:np.ndarray, op:str) -> tuple[np.ndarray,np.ndarray]:
+    """
+    파형별로 통과하는 임계값의 개수와, 통과하는 임계값들이 항상 앞쪽에 오도록 정렬한 순서를 반환한다.
+    'ge' 조건은 오름차순, 'le' 조건은 내림차순으로 정렬하면 파형이 통과하는 임계값들은 정렬 순서의 앞부분이 된다.
+    """
+    ascending = np.sort(thresholds)
+    if op == 'ge':
+        order = np.argsort(thresholds, kind='stable')
+        counts = np.searchsorted(ascending, np.where(np.isnan(values), np.inf, values), 'right')
+        counts[np.isnan(values)] = 0
+    else:
+        order = np.argsort(-thresholds, kind='stable')
+        # 임계값이 None(inf)이면 조건을 검사하지 않으므로, 값이 없는(NaN) 파형은 inf 임계값만 통과한다.
+        counts = len(thresholds) - np.searchsorted(ascending, np.where(np.isnan(values), np.inf, values), 'left')
+    return counts.astype(np.int64), order
+
+
+def _passing_grid(counts:list[np.ndarray], shape:tuple[int,...], mask:np.ndarray) -> np.ndarray:
+    """
+    `mask`인 파형들 중 각 격자점(정렬된 임계값 위치)의 모든 조건을 통과하는 파형 수.
+
+    파형이 격자점 (j1, j2, ...)를 통과하는 것은 모든 k에 대해 j_k < counts_k인 것과 같으므로,
+    (counts_1, counts_2, ...)의 히스토그램을 각 축의 뒤쪽부터 누적하면 모든 격자점의 값을 한 번에 구한다.
+    """
+    hist_shape = tuple(g + 1 for g in shape)
+    flat = np.ravel_multi_index(tuple(c[mask] for c in counts), hist_shape)
+    hist = np.bincount(flat, minlength=int(np.prod(hist_shape))).reshape(hist_shape)
+    for axis in range(hist.ndim):
+        hist = np.flip(np.cumsum(np.flip(hist, axis), axis=axis), axis)
+    return hist[tuple(slice(1, None) for _ in shape)]
+
+
+@dataclass(slots=True)
+class SweepResult:
+    """
+    임계값 격자의 판정 결과. `defects[i1, i2, ...]`는 `values[k][ik]` 임계값들로 판정했을 때
+    True(기존 스크립트들과 같이 불량으로 집계)가 된 파형 수이다. `reference`가 주어진 경우
+    `agreements`는 기준 판정과 같은 판정을 내린 파형 수이다.
+    """
+    names: tuple[str,...]
+    values: tuple[np.ndarray,...]
+    total: int
+    defects: np.ndarray
+    agreements: Optional[np.ndarray] = None
+
+    @property
+    def defect_rate(self) -> np.ndarray:
+        return self.defects / self.total if self.total > 0 else np.full(self.defects.shape, np.nan)
+
+    @property
+    def agreement_rate(self) -> Optional[np.ndarray]:
+        if self.agreements is None:
+            return None
+        return self.agreements / self.total if self.total > 0 else np.full(self.agreements.shape, np.nan)
+
+    def rows(self) -> Iterator[dict[str,object]]:
+        """격자점별 (임계값들, 불량 수, 불량률, 일치율) 행들."""
+        rates = self.defect_rate
+        agreement = self.agreement_rate
+        for index in np.ndindex(self.defects.shape):
+            row:dict[str,object] = { name: _threshold_value(values[i])
+                                        for name, values, i in zip(self.names, self.values, index) }
+            row['defects'] = int(self.defects[index])
+            row['defect_rate'] = float(rates[index])
+            if agreement is not None:
+                row['agreement'] = float(agreement[index])
+            yield row
+
+
+def _threshold_value(value:float) -> Optional[float]:
+    return None if np.isinf(value) else float(value)
+
+
+def sweep_inspection(matrix:np.ndarray, grid:dict[str,Sequence[Optional[float]]],
+                     reference:Optional[np.ndarray]=None) -> SweepResult:
+    """
+    특징 행렬(`extract_features()`)에 대해 판정 임계값 격자의 모든 조합을 한 번에 평가한다.
+
+    `grid`는 `INSPECTION_THRESHOLDS`의 이름별 후보 값들이며, 지정하지 않은 임계값은
+    `DEFAULT_INSPECTION_THRESHOLDS`의 값을 사용한다. 'dtw_threshold'의 None은 DTW 조건을 검사하지 않는다.
+    각 격자점의 결과는 같은 임계값으로 `inspect_features()`를 호출한 결과와 같다.
+
+    파형마다 축별로 통과하는 임계값의 개수만 구하므로, 계산량은 파형 수 + 격자점 수에 비례한다.
+    """
+    unknown = set(grid) - set(INSPECTION_THRESHOLDS)
+    if unknown:
+        raise ValueError(f'unknown inspection thresholds: {sorted(unknown)}')
+
+    names = tuple(INSPECTION_THRESHOLDS)
+    values = tuple(np.array([np.inf if v is None else v for v in grid.get(name, [DEFAULT_INSPECTION_THRESHOLDS[name]])],
+                            dtype=np.float64) for name in names)
+    if any(len(v) == 0 for v in values):
+        raise ValueError('empty threshold grid')
+
+    counts, orders = [], []
+    with np.errstate(invalid='ignore'):
+        for name, thresholds in zip(names, values):
+            column, op = INSPECTION_THRESHOLDS[name]
+            c, order = _pass_counts(feature(matrix, column), thresholds, op)
+            counts.append(c)
+            orders.append(order)
+        # state 2 구간이 없는 파형은 어떤 임계값으로도 통과하지 않는다.
+        counts[0][~(feature(matrix, 's2_length') > 0)] = 0
+
+    shape = tuple(len(v) for v in values)
+    everything = np.ones(len(matrix), dtype=bool)
+    # 정렬된 임계값 위치의 결과를 주어진 임계값 순서로 되돌린다.
+    unsort = np.ix_(*(np.argsort(order, kind='stable') for order in orders))
+    defects = _passing_grid(counts, shape, everything)[unsort]
+
+    agreements = None
+    if reference is not None:
+        reference = np.asarray(reference, dtype=bool)
+        positives = _passing_grid(counts, shape, reference)[unsort]
+        # 기준 판정이 False인 파형 중 통과하지 않은 것 + 기준 판정이 True인 파형 중 통과한 것
+        negatives = int((~reference).sum()) - (defects - positives)
+        agreements = positives + negatives
+
+    return SweepResult(names=names, values=values, total=len(matrix), defects=defects, agreements=agreements)
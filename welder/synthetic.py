@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+from dataclasses import dataclass
+
+import numpy as np
+
+from .types import ElectricCurrentMeasure
+from .monitor import NozzleMonitor, STATE_IDLE, EVENT_STARTED, EVENT_FINISHED
+from .work_recognizer import START_THRESHOLD
+
+
+@dataclass(slots=True)
+class LoadProfile:
+    """
+    실제 전류 측정값으로부터 학습한 용접기 부하 모델.
+
+    대기 구간(state 0)과 작업 구간(state 1~3)을 그대로 표본으로 보관하므로, 상태별 지속 시간과
+    전류 분포는 원본 데이터의 경험적 분포를 따른다. 작업 구간은 `inspect_waveform()`의
+    판정 결과에 따라 정상/불량 표본으로 나누어, 생성 시 불량률을 조절할 수 있도록 한다.
+    """
+    interval: float                 # 측정 간격(초)
+    idle: list[np.ndarray]          # 대기 구간 표본들
+    good: list[np.ndarray]          # 정상 작업 구간 표본들
+    defect: list[np.ndarray]        # 불량 작업 구간 표본들
+
+    @property
+    def defect_rate(self) -> float:
+        total = len(self.good) + len(self.defect)
+        return len(self.defect) / total if total > 0 else 0.0
+
+    @classmethod
+    def learn(cls, measures:Iterable[ElectricCurrentMeasure]) -> LoadProfile:
+        """시각 순서대로 정렬된 측정값들로부터 부하 모델을 학습한다."""
+        from .features import extract_features, inspect_features
+
+        monitor = NozzleMonitor()
+        idle, works = [], []
+        idle_amperes:list[float] = []
+        times = []
+        for measure in measures:
+            if len(times) < 1000:
+                times.append(measure.timestamp.timestamp())
+            for m in monitor.ingest.push(measure):
+                was_idle = monitor.state == STATE_IDLE
+                event = monitor.update(m.timestamp, m.ampere)
+                # 모니터는 대기 구간의 요약만 유지하므로, 대기 구간의 전류는 여기서 따로 모은다.
+                if was_idle and monitor.state == STATE_IDLE and monitor.idle.last == m.timestamp:
+                    idle_amperes.append(m.ampere)
+                if event is None:
+                    continue
+                kind, waveform = event
+                if kind == EVENT_STARTED:
+                    if idle_amperes:
+                        idle.append(np.array(idle_amperes, dtype=np.float32))
+                    idle_amperes = []
+                elif kind == EVENT_FINISHED:
+                    works.append(waveform)
+                    idle_amperes = []
+        if not idle or not works:
+            raise ValueError('cannot learn a load profile: no complete work cycle found')
+
+        # 기존 스크립트들과 같이 inspect_waveform()의 결과가 True인 파형을 불량으로 본다.
+        verdicts = inspect_features(extract_features(works))
+        good, defect = [], []
+        for waveform, verdict in zip(works, verdicts):
+            (defect if verdict else good).append(np.array([m.ampere for m in waveform], dtype=np.float32))
+        return cls(interval=float(np.median(np.diff(times))), idle=idle, good=good, defect=defect)
+
+    def describe(self) -> dict[str,Any]:
+        """상태별 지속 시간(샘플 수)과 전류의 분포 요약."""
+        def summary(segments:list[np.ndarray]) -> dict[str,Any]:
+            if not segments:
+                return { 'count': 0 }
+            lengths = np.array([len(s) for s in segments])
+            values = np.concatenate(segments)
+            return {
+                'count': len(segments),
+                'length': dict(zip(('p5', 'p50', 'p95'), np.percentile(lengths, [5, 50, 95]).tolist())),
+                'ampere': dict(zip(('p5', 'p50', 'p95'), np.percentile(values, [5, 50, 95]).round(3).tolist())),
+            }
+        return {
+            'interval': self.interval,
+            'idle': summary(self.idle),
+            'good': summary(self.good),
+            'defect': summary(self.defect),
+            'defect_rate': round(self.defect_rate, 4),
+        }
+
+
+class SyntheticWelder:
+    """
+    `LoadProfile`의 표본들을 이어붙여 끝없는 전류 측정값 스트림을 생성한다.
+
+    대기 구간과 작업 구간을 번갈아 무작위로 선택하며, 작업 구간은 `defect_rate`의 확률로
+    불량 표본에서 선택한다. 각 구간에는 `jitter` 비율의 곱셈 잡음을 더하며, 대기 구간의 값은
+    작업 시작으로 인식되지 않도록 `START_THRESHOLD` 미만으로 제한한다.
+    """
+    def __init__(self, profile:LoadProfile, defect_rate:Optional[float]=None, jitter:float=0.02,
+                 seed:Optional[int]=None):
+        self.profile = profile
+        self.defect_rate = profile.defect_rate if defect_rate is None else defect_rate
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+        self.buffer = np.empty(0, dtype=np.float32)
+        self.cycles = 0                 # 생성한 작업 구간 수
+        self.defects = 0                # 그 중 불량 표본에서 선택한 수
+
+    def generate(self, count:int) -> np.ndarray:
+        """다음 `count`개의 전류 값을 생성한다."""
+        parts = [self.buffer]
+        available = len(self.buffer)
+        while available < count:
+            for segment in self._next_cycle():
+                parts.append(segment)
+                available += len(segment)
+        values = np.concatenate(parts)
+        self.buffer = values[count:]
+        return values[:count]
+
+    def _next_cycle(self) -> tuple[np.ndarray,np.ndarray]:
+        profile, rng = self.profile, self.rng
+        idle = profile.idle[rng.integers(len(profile.idle))]
+        if self.jitter > 0:
+            idle = idle * rng.normal(1.0, self.jitter, len(idle))
+        idle = np.minimum(idle, START_THRESHOLD - 0.1)
+
+        use_defect = bool(profile.defect) and (not profile.good or rng.random() < self.defect_rate)
+        pool = profile.defect if use_defect else profile.good
+        work = pool[rng.integers(len(pool))]
+        if self.jitter > 0:
+            # 작업 구간은 피크 모양이 유지되도록 구간 전체에 하나의 배율을 적용한다.
+            work = work * rng.normal(1.0, self.jitter)
+        self.cycles += 1
+        if use_defect:
+            self.defects += 1
+        return idle.astype(np.float32), work.astype(np.float32)
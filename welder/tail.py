@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from typing import Any, BinaryIO, Generator, Optional
+
+import os
+import time
+import errno
+import fnmatch
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+
+from .types import ElectricCurrentMeasure
+from .reader import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+# inotify 이벤트 (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+INOTIFY_EVENT = struct.Struct('iIII')       # wd, mask, cookie, len (이후 len 바이트의 이름)
+
+
+class Inotify:
+    """ctypes로 호출하는 리눅스 inotify. 사용할 수 없는 환경에서는 생성 시 OSError가 발생한다."""
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        if libc is None or not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def add_watch(self, path:str, mask:int=WATCH_MASK) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def read(self, timeout:Optional[float]) -> list[tuple[int,str]]:
+        """최대 `timeout`초 동안 기다려 도착한 이벤트들의 (mask, 이름) 목록을 반환한다."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+                offset += length
+                events.append((mask, name))
+        return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _TailedFile:
+    __slots__ = ('path', 'offset', 'file')
+
+    def __init__(self, path:str, offset:int=0):
+        self.path = path
+        self.offset = offset        # 다음에 읽을 위치 (항상 완결된 줄의 끝)
+        # 열어 둔 파일. 이름이 바뀌거나 삭제된 뒤에도 남은 내용을 끝까지 읽을 수 있다.
+        self.file:Optional[BinaryIO] = None
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class CsvTailer:
+    """
+    디렉토리의 CSV 파일들('ts,value[,...]' 또는 'ts,channel,value')에 추가되는 측정값들을 따라 읽는다.
+
+    파일은 (device, inode)로 식별하므로, 이름을 바꾸어 순환(rotate)된 파일은 읽던 위치부터 이어서
+    읽고, 새로 생긴 파일은 처음부터 읽는다. 읽는 파일은 열어 둔 채로 따라가므로, 패턴에 맞지 않는
+    이름(예: 'x.csv.1')으로 바뀌거나 삭제된 파일도 남은 내용을 끝까지 읽은 뒤에 닫는다.
+    크기가 읽은 위치보다 작아진 파일은 잘린(truncate) 것으로 보고 처음부터 다시 읽는다. 새로 추가된 바이트만 `chunk_size` 단위로 한 번에 읽어
+    완결된 줄들만 해석하며, 마지막의 미완성 줄은 다음에 다시 읽는다.
+
+    변경 감지는 inotify를 사용하고, 사용할 수 없으면 `poll_interval`초마다 디렉토리를 검사한다.
+    inotify를 사용하는 경우에도 놓친 이벤트에 대비하여 `poll_interval`마다 디렉토리를 검사한다.
+    파일별 읽은 위치는 `snapshot()`으로 인식기 상태와 함께 저장해 두면, 재시작 후 이미 읽은
+    측정값을 다시 읽지 않는다.
+    """
+    def __init__(self, directory:str, pattern:str='*.csv', poll_interval:float=1.0, chunk_size:int=1 << 20,
+                 use_inotify:bool=True):
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.files:dict[tuple[int,int],_TailedFile] = {}
+        self.invalid_lines = 0
+        self.bytes_read = 0
+        self.inotify:Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+                self.inotify.add_watch(directory)
+            except OSError as e:
+                logger.warning(f"inotify is not available, falling back to polling every {poll_interval}s: {e}")
+                if self.inotify is not None:
+                    self.inotify.close()
+                self.inotify = None
+        self.last_scan = 0.0
+
+    def close(self) -> None:
+        for tailed in self.files.values():
+            tailed.close()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def read(self) -> list[ElectricCurrentMeasure]:
+        """지금까지 추가된 측정값들을 모두 읽어 시각 순서로 반환한다 (기다리지 않는다)."""
+        self.last_scan = time.monotonic()
+        present:set[tuple[int,int]] = set()
+        measures:list[ElectricCurrentMeasure] = []
+        for name in sorted(os.listdir(self.directory)):
+            if not fnmatch.fnmatch(name, self.pattern):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = (st.st_dev, st.st_ino)
+            present.add(key)
+            tailed = self.files.get(key)
+            if tailed is None:
+                tailed = self.files[key] = _TailedFile(path)
+            elif tailed.path != path:
+                logger.info(f"file rotated: {tailed.path} -> {path}")
+                tailed.path = path
+            if tailed.file is None and not self._open(tailed, key):
+                continue
+            self._read_appended(tailed, measures)
+        # 패턴에 맞는 이름에서 사라진 파일은 열어 둔 파일로 끝까지 읽은 뒤에 닫는다.
+        for key in [key for key in self.files if key not in present]:
+            tailed = self.files.pop(key)
+            if tailed.file is not None:
+                self._read_appended(tailed, measures, final=True)
+                logger.info(f"file left the directory, read to the end: {tailed.path}")
+                tailed.close()
+            else:
+                logger.warning(f"file is no longer found, stopped reading at offset {tailed.offset}: {tailed.path}")
+        measures.sort(key=lambda m: m.timestamp)
+        return measures
+
+    def wait(self, timeout:Optional[float]=None) -> None:
+        """파일이 변경되거나 다음 검사 시각이 될 때까지 기다린다."""
+        remaining = self.poll_interval - (time.monotonic() - self.last_scan)
+        if timeout is not None:
+            remaining = min(remaining, timeout)
+        if remaining <= 0:
+            return
+        if self.inotify is not None:
+            for mask, name in self.inotify.read(remaining):
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("inotify event queue overflowed")
+        else:
+            time.sleep(remaining)
+
+    def follow(self, stop:Optional[threading.Event]=None) -> Generator[list[ElectricCurrentMeasure],None,None]:
+        """추가되는 측정값들을 읽을 때마다 생성한다. `stop`이 설정되면 종료한다."""
+        while stop is None or not stop.is_set():
+            measures = self.read()
+            if measures:
+                yield measures
+            self.wait(0.5 if stop is not None else None)
+
+    def snapshot(self) -> dict[str,Any]:
+        return { 'directory': self.directory,
+                 'files': { key: (f.path, f.offset) for key, f in self.files.items() } }
+
+    def restore(self, snapshot:dict[str,Any]) -> None:
+        """`snapshot()`으로 저장한 파일별 읽은 위치를 복원한다."""
+        for tailed in self.files.values():
+            tailed.close()
+        self.files = { tuple(key): _TailedFile(path, offset) for key, (path, offset) in snapshot['files'].items() }
+
+    def _open(self, tailed:_TailedFile, key:tuple[int,int]) -> bool:
+        try:
+            f = open(tailed.path, 'rb')
+        except FileNotFoundError:
+            return False
+        st = os.fstat(f.fileno())
+        if (st.st_dev, st.st_ino) != key:
+            # stat 이후에 이름이 바뀐 경우: 다음 검사에서 다시 연다.
+            f.close()
+            return False
+        tailed.file = f
+        return True
+
+    def _read_appended(self, tailed:_TailedFile, measures:list[ElectricCurrentMeasure], final:bool=False) -> None:
+        """
+        읽은 위치 이후에 추가된 완결된 줄들을 읽는다. `final`이면 더 이상 추가되지 않는 파일이므로
+        끝의 미완성 줄까지 읽는다.
+        """
+        f = tailed.file
+        size = os.fstat(f.fileno()).st_size
+        if size < tailed.offset:
+            logger.warning(f"file truncated, reading from the beginning: {tailed.path}")
+            tailed.offset = 0
+        if size == tailed.offset:
+            return
+        f.seek(tailed.offset)
+        while True:
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                break
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                # 완결된 줄이 없으면 다음에 다시 읽는다. (한 줄이 chunk보다 길면 버린다.)
+                if len(chunk) == self.chunk_size:
+                    tailed.offset += len(chunk)
+                    self.invalid_lines += 1
+                    continue
+                if final:
+                    end = len(chunk)
+                else:
+                    break
+            self._parse(chunk[:end], measures)
+            tailed.offset += end
+            self.bytes_read += end
+            if end < len(chunk):
+                f.seek(tailed.offset)
+
+    def _parse(self, data:bytes, measures:list[ElectricCurrentMeasure]) -> None:
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            fields = line.split(',')
+            if len(fields) < 2:
+                if line.strip():
+                    self.invalid_lines += 1
+                continue
+            try:
+                ts = parse_timestamp(fields[0].strip())
+                try:
+                    ampere = float(fields[1])
+                except ValueError:
+                    # 'ts,channel,value' 형식이면 세 번째 열이 전류 값이다.
+                    if len(fields) < 3:
+                        raise
+                    ampere = float(fields[2])
+                measures.append(ElectricCurrentMeasure(ts, ampere))
+            except ValueError:
+                self.invalid_lines += 1
@@ -3,7 +3,16 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from datetime import datetime, timedelta
-from mdtpy.client.utils import datetime_to_iso8601
+
+
+# 파형 검사 방식 (welder.shedding 참고). 비용이 큰 것부터 나열한다.
+INSPECTION_FULL = 'FULL'                # 모든 조건 (DTW 포함)
+INSPECTION_NO_DTW = 'NO_DTW'            # DTW 거리를 제외한 조건
+INSPECTION_WIDTH_ONLY = 'WIDTH_ONLY'    # 최대 피크의 너비만 검사
+INSPECTION_MODES = (INSPECTION_FULL, INSPECTION_NO_DTW, INSPECTION_WIDTH_ONLY)
+
+# 용접기 식별자를 알 수 없는 생산 기록에 사용하는 식별자 (nozzle_productions.welder_id의 기본값)
+DEFAULT_WELDER_ID = ''
 
 
 @dataclass(frozen=True, slots=True)
@@ -21,8 +30,11 @@ class NozzleProductionAudit:
     AvgWaitingTime: timedelta
     DefectVolume: int
     AvgDefectRate: float
+    InspectionMode: str = INSPECTION_FULL   # 마지막 노즐의 파형 검사 방식
 
     def __repr__(self):
+        # mdtpy는 로딩 비용이 크므로 출력할 때만 import한다.
+        from mdtpy.client.utils import datetime_to_iso8601
         return f"NozzleProductionAudit: Timestamp={datetime_to_iso8601(self.Timestamp)}, " \
                f"AvgProcessingTime={self.AvgProcessingTime.total_seconds():.3f}s, " \
                f"AvgWaitingTime={self.AvgWaitingTime.total_seconds():.3f}s, " \
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Generator
+from typing import TYPE_CHECKING, Iterable, Iterator, Generator, Optional
 
 import numpy as np
-from scipy.signal import find_peaks, peak_widths
-from dateutil.parser import parse
 
-from mdtpy.model import Record
-from welder import ElectricCurrentMeasure
+from .types import ElectricCurrentMeasure
+from .reader import parse_timestamp
+from .work_recognizer import WorkRecognizer, recognize_work
+from .ingest import reorder
+from .reference_library import ReferenceLibrary, DEFAULT_WELDER_TYPE
+from .early_inspection import EarlyInspector
+
+if TYPE_CHECKING:
+    from mdtpy.model import Record
 
 
 def recognize_waveform(measures:Iterable[Record]) -> list[ElectricCurrentMeasure]:
@@ -24,7 +29,7 @@ def recognize_waveform(measures:Iterable[Record]) -> list[ElectricCurrentMeasure
             if state == 3:
                 phase = 'WAIT_1'
     if phase == 'WAIT_1' and int(waveform[-1]['State']) == 3:
-        return [ElectricCurrentMeasure(timestamp=parse(rec['Time']),
+        return [ElectricCurrentMeasure(timestamp=parse_timestamp(rec['Time']),
                                        ampere=float(rec['Ampere']),
                                        state=int(rec['State'])) for rec in waveform]
     else:
@@ -43,80 +48,55 @@ BASE_PATTERNS = [
     (5.06745,9.22025,10.1932,5.10037),
     (5.83547,6.94665,9.77594,8.64057)
 ]
+
+
+_default_library:Optional[ReferenceLibrary] = None
+def default_reference_library() -> ReferenceLibrary:
+    """`BASE_PATTERNS`로 구성된 기본 기준 패턴 라이브러리."""
+    global _default_library
+    if _default_library is None:
+        _default_library = ReferenceLibrary()
+        _default_library.set_references(DEFAULT_WELDER_TYPE, np.array(BASE_PATTERNS))
+    return _default_library
+
+
+def extract_pattern(amperes:np.ndarray, peak_idx:int) -> Optional[np.ndarray]:
+    """최대 피크 직전 1개와 이후 3개(피크 포함)로 구성된 4-point 패턴을 추출한다."""
+    pattern_start = max(0, peak_idx - 1)
+    pattern_end = min(len(amperes), peak_idx + 3)
+    if pattern_end - pattern_start >= 4:
+        return amperes[pattern_start:pattern_start + 4]
+    return None
+
+
+def segment_waveforms(measures:Iterable[ElectricCurrentMeasure], recognizer:Optional[WorkRecognizer]=None) \
+        -> Generator[list[ElectricCurrentMeasure],None,None]:
+    """
+    전류 측정값들에 작업 상태를 부여하고, 상태 1에서 3까지의 파형들을 차례로 생성한다.
+    중복되거나 순서가 바뀐 측정값은 `reorder()`로 걸러낸 뒤 인식한다.
+    `recognizer`를 지정하지 않으면 모듈 수준의 `recognize_work()`를 사용한다.
+    """
+    recognize = recognizer.recognize if recognizer is not None else recognize_work
+    waveform:list[ElectricCurrentMeasure] = []
+    for measure in reorder(measures):
+        state = recognize(measure.timestamp, measure.ampere)
+        if state == 1:
+            waveform = [ElectricCurrentMeasure(measure.timestamp, measure.ampere, state)]
+        elif waveform and state in (2, 3):
+            waveform.append(ElectricCurrentMeasure(measure.timestamp, measure.ampere, state))
+            if state == 3:
+                yield waveform
+                waveform = []
+
   
-def inspect_waveform(waveform:list[ElectricCurrentMeasure]) -> bool:
-    # # 상태와 데이터 출력
-    # for measure in waveform:
-    #     print(measure)
+def inspect_waveform(waveform:list[ElectricCurrentMeasure], library:Optional[ReferenceLibrary]=None,
+                     welder_type:str=DEFAULT_WELDER_TYPE) -> bool:
+    """
+    state 2 구간의 최대 피크 크기와 너비, 그리고 최대 피크 주변 4-point 패턴과
+    기준 패턴 사이의 DTW 거리로 파형을 판정한다.
     
-    # state 2 구간의 데이터 추출
-    state2_data = []
-    for measure in waveform:
-        if measure.state == 2:
-            state2_data.append(measure.ampere)
-    
-    if not state2_data:
-        return False
-    
-    # state 2 구간에서 피크 찾기
-    state2_amperes = np.array(state2_data)
-    peaks, _ = find_peaks(state2_amperes, height=8.0, distance=1)
-    
-    if len(peaks) == 0:
-        return False
-    
-    # 가장 큰 피크 찾기 (9.0A 이상)
-    max_peak_idx = np.argmax(state2_amperes)
-    max_peak_value = state2_amperes[max_peak_idx]
-    
-    if max_peak_value < 9.0:
-        return False
-    
-    # 피크의 너비 계산
-    widths = peak_widths(state2_amperes, [max_peak_idx])[0]
-    
-    # 기본 품질 판단 (너비 기준)
-    WIDTH_THRESHOLD = 2.0
-    quality = 10 if widths[0] >= WIDTH_THRESHOLD else 11
-    
-    # 현재 패턴 추출 (4개 포인트)
-    pattern_start = max(0, max_peak_idx - 1)
-    pattern_end = min(len(state2_amperes), max_peak_idx + 3)
-    if pattern_end - pattern_start >= 4:
-        current_pattern = state2_amperes[pattern_start:pattern_start + 4]
-        
-        # 모든 기준 패턴과 비교하여 가장 작은 DTW 거리 찾기
-        min_dtw_dist = float('inf')
-        for base_pattern in BASE_PATTERNS:
-            base_array = np.array(base_pattern)
-            
-            # DTW 거리 계산
-            n, m = len(current_pattern), len(base_array)
-            dtw_matrix = np.full((n+1, m+1), np.inf)
-            dtw_matrix[0, 0] = 0
-            
-            for i in range(1, n+1):
-                for j in range(1, m+1):
-                    cost = abs(current_pattern[i-1] - base_array[j-1])
-                    dtw_matrix[i, j] = cost + min(dtw_matrix[i-1, j],
-                                                dtw_matrix[i, j-1],
-                                                dtw_matrix[i-1, j-1])
-            
-            min_dtw_dist = min(min_dtw_dist, dtw_matrix[n, m])
-        
-        # DTW 기반 품질 판단
-        DTW_THRESHOLD = 2.0
-        dtw_quality = 10 if min_dtw_dist <= DTW_THRESHOLD else 11
-        
-        # print(f"\n분석 결과:")
-        # print(f"현재 패턴: {', '.join(f'{x:.2f}' for x in current_pattern)}")
-        # print(f"최대 피크: {max_peak_value:.2f}")
-        # print(f"피크 너비: {widths[0]:.2f}")
-        # print(f"최소 DTW 거리: {min_dtw_dist:.2f}")
-        # print(f"너비 기준 품질: {quality}")
-        # print(f"DTW 기준 품질: {dtw_quality}")
-        
-        # 최종 품질 판단 (둘 다 10이어야 True)
-        result = quality == 10 and dtw_quality == 10
-        return result
-    return False
\ No newline at end of file
+    파형 하나는 `EarlyInspector`로 측정값들을 한 번 훑어 판정하며, DTW 조건은 거리가 임계값
+    이내인 기준 패턴을 찾는 즉시 멈춘다(`ReferenceSet.any_within()`). 여러 파형의 특징 행렬을
+    이미 구한 경우에는 `features.inspect_features()`를 직접 사용하면 결과가 같다.
+    """
+    return EarlyInspector(library, welder_type).inspect(waveform)
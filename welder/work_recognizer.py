@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Generator
+from typing import Any, Iterable, Iterator, Generator
 
 import datetime
 import random
 
-from scipy.signal import find_peaks
+
+def find_peaks(x, **kwargs):
+  """scipy.signal은 로딩 비용이 크므로 처음 호출될 때 import하여 이 함수를 대체한다."""
+  global find_peaks
+  from scipy.signal import find_peaks as _find_peaks
+  find_peaks = _find_peaks
+  return find_peaks(x, **kwargs)
 
 
 # 상태 정의 (직접 상수 사용)
@@ -15,103 +21,147 @@ STATUS_START = 1    # 시작 상태
 STATUS_MIDDLE = 2   # 중간 상태
 STATUS_END = 3      # 종료 상태
 VALUE_THRESHOLD = 9 # 값 임계치
+START_THRESHOLD = 6 # 작업 시작으로 인식하는 전류 값
+END_THRESHOLD = 5   # 작업 종료로 인식하는 전류 값
 
-# 전역 변수 선언
-data_buffer = []  # 데이터 버퍼
-current_status = STATUS_INITIAL  # 현재 상태
-status_1_time = None  # 상태 1 시간
-status_2_recorded = set()  # 상태 2가 기록된 타임스탬프
-status_3_recorded = set()  # 상태 3이 기록된 타임스탬프
-processed_timestamps = set()  # 처리된 타임스탬프
-status_job_id = None  # 작업 ID
-status_3_condition_met = False  # 상태 3 조건 충족 여부
-status_initial_timestamp = []  # 초기 상태 타임스탬프
-
-def recognize_work(timestamp:datetime, value:float) -> int:
-  global data_buffer, current_status, status_1_time
-  global status_2_recorded, status_3_recorded
-  global status_job_id, status_3_condition_met, status_initial_timestamp
-
-  # print(f"{timestamp} {ampere}")
-  
-  # 데이터 버퍼에 추가
-  data_buffer.append((timestamp, value))
-
-  # 버퍼 크기가 15보다 작으면 STATUS_UNKNOWN를 반환
-  if len(data_buffer) < 15:
-    return STATUS_UNKNOWN
-  elif len(data_buffer) > 15:
-    data_buffer.pop(0)
-    
-  # 이미 처리된 타임스탬프인 경우 현재 상태 리턴
-  if timestamp in processed_timestamps:
-    return current_status
-
-    
-  # 현재 상태에 따른 로직 처리
-  if current_status == STATUS_INITIAL:
-    if value < 6:
-      # 상태 초기: 데이터 값이 6 미만인 경우
-      status_initial_timestamp.append(timestamp)
-      # print(f"상태: {STATUS_INITIAL} (초기 상태)")
-      processed_timestamps.add(timestamp)
-      return STATUS_INITIAL
-    else:
-      # 데이터 값이 6 이상인 경우
-      status_job_id = datetime.datetime.now().strftime("10%Y%m%d%H%M%S") + str(random.randint(10000, 99999))
-      # print(f"상태: {STATUS_START} (시작 상태)")
-      # 초기 상태에서 대기한 시간 계산
-      if status_initial_timestamp:
-        waiting_time = max(status_initial_timestamp) - min(status_initial_timestamp)
-        # print(f"대기 시간: {waiting_time}")
-        status_initial_timestamp.clear()
-      current_status = STATUS_START
-      status_1_time = timestamp
-      status_2_recorded.clear()
-      processed_timestamps.add(timestamp)
-      return STATUS_START
-
-  elif current_status == STATUS_START:
-    # 상태 시작: 현재 타임스탬프가 상태 1 시간과 다른 경우
-    if timestamp != status_1_time:
-      # 버퍼에서 x값(타임스탬프)과 y값(부동소수점 값) 추출
-      x_values = [item[0] for item in data_buffer]
-      y_values = [item[1] for item in data_buffer]
-      
-      # scipy.signal.find_peaks를 사용하여 피크 찾기
-      peaks, _ = find_peaks(y_values, distance=2)
-      
-      # 피크가 2개 이상 있고, 마지막에서 두 번째 피크의 값이 마지막 피크보다 크며 임계값보다 큰 경우
-      if len(peaks) >= 2 and y_values[peaks[-2]] > y_values[peaks[-1]] and y_values[peaks[-2]] > VALUE_THRESHOLD:
-          # 마지막 피크 이후의 값들 중 5 이하인 값이 있는지 확인
-          if any(y <= 5 for y in y_values[peaks[-1] + 1:]):
-            status_3_condition_met = True  # 상태 3의 조건 충족
-      
-      # 상태 3의 조건이 충족되지 않은 경우
-      if not status_3_condition_met:
-          if timestamp not in status_2_recorded:
-            # print(f"상태: {STATUS_MIDDLE} (중간 상태)")
-            status_2_recorded.add(timestamp)
-            processed_timestamps.add(timestamp)
-            return STATUS_MIDDLE
+
+class WorkRecognizer:
+  """
+  전류 측정값으로부터 작업 상태(0: 초기, 1: 시작, 2: 중간, 3: 종료)를 인식한다.
+
+  인식에 필요한 상태(최근 15개 측정값 버퍼, 현재 상태 등)를 객체가 가지므로,
+  `snapshot()`/`from_snapshot()`으로 상태를 저장하고 재시작 후 이어서 인식할 수 있다.
+
+  측정값들은 시각이 증가하는 순서로 주어져야 한다. 중복되거나 순서가 바뀐 측정값은
+  `welder.ingest.IngestStage`에서 미리 걸러낸다.
+
+  인식 임계값들은 기본적으로 모듈의 `START_THRESHOLD`, `END_THRESHOLD`, `VALUE_THRESHOLD`를 사용하며,
+  임계값 튜닝(`welder.sweep`)을 위해 객체별로 지정할 수 있다.
+  """
+  BUFFER_SIZE = 15
+
+  def __init__(self, start_threshold:float=START_THRESHOLD, end_threshold:float=END_THRESHOLD,
+               value_threshold:float=VALUE_THRESHOLD):
+    self.start_threshold = start_threshold
+    self.end_threshold = end_threshold
+    self.value_threshold = value_threshold
+    self.data_buffer = []  # 데이터 버퍼
+    self.current_status = STATUS_INITIAL  # 현재 상태
+    self.status_1_time = None  # 상태 1 시간
+    self.status_3_recorded = set()  # 상태 3이 기록된 타임스탬프 (버퍼 안의 것만 유지)
+    self.status_job_id = None  # 작업 ID
+    self.status_3_condition_met = False  # 상태 3 조건 충족 여부
+    self.status_initial_timestamp = []  # 초기 상태 타임스탬프
+
+  def recognize(self, timestamp:datetime.datetime, value:float) -> int:
+    # 데이터 버퍼에 추가
+    data_buffer = self.data_buffer
+    data_buffer.append((timestamp, value))
+
+    # 버퍼 크기가 15보다 작으면 STATUS_UNKNOWN를 반환
+    if len(data_buffer) < self.BUFFER_SIZE:
+      return STATUS_UNKNOWN
+    elif len(data_buffer) > self.BUFFER_SIZE:
+      data_buffer.pop(0)
+
+    # 현재 상태에 따른 로직 처리
+    if self.current_status == STATUS_INITIAL:
+      if value < self.start_threshold:
+        # 상태 초기: 데이터 값이 START_THRESHOLD(6) 미만인 경우
+        # 대기 시간 계산에는 최소/최대값만 필요하므로 두 값만 유지하여 긴 대기 구간에서도 크기가 늘지 않게 한다.
+        # (재정렬하지 않은 측정값이 주어지는 경우에도 최소/최대값을 유지한다.)
+        initial = self.status_initial_timestamp
+        if initial:
+          initial[:] = [min(initial[0], timestamp), max(initial[-1], timestamp)]
+        else:
+          initial.append(timestamp)
+        return STATUS_INITIAL
       else:
-        # 상태 3의 조건이 충족된 경우
-        for i, y in enumerate(y_values[peaks[-1] + 1:], start=peaks[-1] + 1):
-          ts = x_values[i]
-          if y <= 5 and ts not in status_3_recorded:
-            # print(f"상태: {STATUS_END} (종료 상태)")
-            processing_time = ts - status_1_time
-            # print(f"처리 시간: {processing_time}")
-            status_3_recorded.add(ts)
-            current_status = STATUS_INITIAL
-            status_job_id = None
-            status_3_condition_met = False
-            processed_timestamps.add(timestamp)
-            return STATUS_END
-      
-      processed_timestamps.add(timestamp)
-      return current_status
-  
-  #현재 상태 리턴
-  processed_timestamps.add(ts)
-  return current_status
\ No newline at end of file
+        # 데이터 값이 6 이상인 경우
+        self.status_job_id = datetime.datetime.now().strftime("10%Y%m%d%H%M%S") + str(random.randint(10000, 99999))
+        # 초기 상태에서 대기한 시간 계산
+        if self.status_initial_timestamp:
+          waiting_time = max(self.status_initial_timestamp) - min(self.status_initial_timestamp)
+          self.status_initial_timestamp.clear()
+        self.current_status = STATUS_START
+        self.status_1_time = timestamp
+        return STATUS_START
+
+    elif self.current_status == STATUS_START:
+      # 상태 시작: 현재 타임스탬프가 상태 1 시간과 다른 경우
+      if timestamp != self.status_1_time:
+        # 버퍼에서 x값(타임스탬프)과 y값(부동소수점 값) 추출
+        x_values = [item[0] for item in data_buffer]
+        y_values = [item[1] for item in data_buffer]
+
+        # scipy.signal.find_peaks를 사용하여 피크 찾기
+        peaks, _ = find_peaks(y_values, distance=2)
+
+        # 피크가 2개 이상 있고, 마지막에서 두 번째 피크의 값이 마지막 피크보다 크며 임계값보다 큰 경우
+        if len(peaks) >= 2 and y_values[peaks[-2]] > y_values[peaks[-1]] and y_values[peaks[-2]] > self.value_threshold:
+          # 마지막 피크 이후의 값들 중 5 이하인 값이 있는지 확인
+          if any(y <= self.end_threshold for y in y_values[peaks[-1] + 1:]):
+            self.status_3_condition_met = True  # 상태 3의 조건 충족
+
+        # 상태 3의 조건이 충족되지 않은 경우
+        if not self.status_3_condition_met:
+          return STATUS_MIDDLE
+        else:
+          # 상태 3의 조건이 충족된 경우
+          for i, y in enumerate(y_values[peaks[-1] + 1:], start=peaks[-1] + 1):
+            ts = x_values[i]
+            if y <= self.end_threshold and ts not in self.status_3_recorded:
+              # 버퍼에서 밀려난 타임스탬프는 다시 검사되지 않으므로 제거한다.
+              self._prune(x_values[0])
+              self.status_3_recorded.add(ts)
+              self.current_status = STATUS_INITIAL
+              self.status_job_id = None
+              self.status_3_condition_met = False
+              return STATUS_END
+
+        return self.current_status
+
+    #현재 상태 리턴
+    return self.current_status
+
+  def _prune(self, oldest:datetime.datetime) -> None:
+    self.status_3_recorded = { ts for ts in self.status_3_recorded if ts >= oldest }
+
+  def snapshot(self) -> dict[str,Any]:
+    """
+    재시작 후 인식을 이어가는 데 필요한 상태를 dict로 반환한다.
+
+    초기 상태 타임스탬프는 대기 시간 계산에 쓰이는 최소/최대값만 남겨 크기를 줄인다.
+    """
+    if self.data_buffer:
+      self._prune(self.data_buffer[0][0])
+    initial = self.status_initial_timestamp
+    return {
+      'data_buffer': list(self.data_buffer),
+      'current_status': self.current_status,
+      'status_1_time': self.status_1_time,
+      'status_3_recorded': list(self.status_3_recorded),
+      'status_job_id': self.status_job_id,
+      'status_3_condition_met': self.status_3_condition_met,
+      'status_initial_timestamp': [min(initial), max(initial)] if initial else [],
+      'thresholds': (self.start_threshold, self.end_threshold, self.value_threshold),
+    }
+
+  @classmethod
+  def from_snapshot(cls, snapshot:dict[str,Any]) -> WorkRecognizer:
+    recognizer = cls(*snapshot['thresholds'])
+    recognizer.data_buffer = list(snapshot['data_buffer'])
+    recognizer.current_status = snapshot['current_status']
+    recognizer.status_1_time = snapshot['status_1_time']
+    recognizer.status_3_recorded = set(snapshot['status_3_recorded'])
+    recognizer.status_job_id = snapshot['status_job_id']
+    recognizer.status_3_condition_met = snapshot['status_3_condition_met']
+    recognizer.status_initial_timestamp = list(snapshot['status_initial_timestamp'])
+    return recognizer
+
+
+# 모듈 수준의 recognize_work()가 사용하는 기본 인식기
+default_recognizer = WorkRecognizer()
+
+def recognize_work(timestamp:datetime.datetime, value:float) -> int:
+  return default_recognizer.recognize(timestamp, value)